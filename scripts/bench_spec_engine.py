@@ -0,0 +1,553 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for Spec Engine hot paths.
+
+Runs against an in-memory database with only the spec schema loaded, so no
+network extensions are needed.
+
+Usage:
+    python scripts/bench_spec_engine.py bulk --specs 20000
+    python scripts/bench_spec_engine.py search --specs 100000
+    python scripts/bench_spec_engine.py batch --specs 2000
+    python scripts/bench_spec_engine.py render --rows 10000
+    python scripts/bench_spec_engine.py graph --edges 100000
+    python scripts/bench_spec_engine.py ann --vectors 100000 --dim 384
+    python scripts/bench_spec_engine.py quant --vectors 100000 --dim 768
+    python scripts/bench_spec_engine.py rrf --vectors 100000 --dim 384
+    python scripts/bench_spec_engine.py bulk-embed --vectors 20000 --dim 768
+    python scripts/bench_spec_engine.py filtered --vectors 100000 --dim 384
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import duckdb
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from agent_farm import spec_engine as spec_module  # noqa: E402
+from agent_farm.spec_engine import SpecEngine  # noqa: E402
+
+
+def _engine() -> SpecEngine:
+    """Create a schema-only SpecEngine on a fresh in-memory database."""
+    engine = SpecEngine(duckdb.connect(":memory:"))
+    engine._load_schema(quiet=True)
+    engine._register_internal_udfs()
+    return engine
+
+
+def _spec_records(count: int) -> list[dict]:
+    return [
+        {
+            "kind": "skill",
+            "name": f"bench_skill_{i}",
+            "summary": f"Benchmark skill number {i}",
+            "status": "active",
+            "doc": f"# bench_skill_{i}\n\nSynthetic documentation body {i}.",
+            "payload": {"index": i, "tags": ["bench", f"group-{i % 10}"]},
+        }
+        for i in range(count)
+    ]
+
+
+def _report(label: str, count: int, seconds: float, unit: str = "specs") -> None:
+    print(f"{label:<30} {count:>8} {unit} in {seconds:7.3f}s  ({count / seconds:,.0f} {unit}/s)")
+
+
+def bench_bulk(args: argparse.Namespace) -> None:
+    """spec_bulk_upsert / spec_import / spec_export throughput vs. spec_create()."""
+    records = _spec_records(args.specs)
+
+    engine = _engine()
+    start = time.perf_counter()
+    result = engine.spec_bulk_upsert(records)
+    _report("spec_bulk_upsert (insert)", args.specs, time.perf_counter() - start)
+    assert result.get("inserted") == args.specs, result
+
+    start = time.perf_counter()
+    engine.spec_bulk_upsert(records)
+    _report("spec_bulk_upsert (update)", args.specs, time.perf_counter() - start)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for suffix in ("jsonl", "parquet"):
+            path = str(Path(tmp) / f"specs.{suffix}")
+            start = time.perf_counter()
+            engine.spec_export(path)
+            _report(f"spec_export ({suffix})", args.specs, time.perf_counter() - start)
+
+            target = _engine()
+            start = time.perf_counter()
+            target.spec_import(path)
+            _report(f"spec_import ({suffix})", args.specs, time.perf_counter() - start)
+
+    sample = records[: args.baseline]
+    engine = _engine()
+    start = time.perf_counter()
+    for record in sample:
+        engine.spec_create(**record)
+    _report("spec_create (row-at-a-time)", len(sample), time.perf_counter() - start)
+
+
+def bench_search(args: argparse.Namespace) -> None:
+    """spec_search() with and without the trigram pre-filter (no fts loaded)."""
+    engine = _engine()
+    engine.spec_bulk_upsert(_spec_records(args.specs))
+    queries = ["bench_skill_4242", "body 99", "group-3", "synthetic", "no such text"]
+
+    for label, use_prefilter in (("trigram", True), ("scan", False)):
+        engine._use_trigram_prefilter = lambda enabled=use_prefilter: enabled
+        for query in queries:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                engine.spec_search(query)
+            _report(f"{label} {query!r}", args.repeat, time.perf_counter() - start, "queries")
+
+
+def bench_batch(args: argparse.Namespace) -> None:
+    """spec_update_many / spec_delete_many vs. per-spec spec_update / spec_delete."""
+    engine = _engine()
+    engine.spec_bulk_upsert(_spec_records(args.specs))
+    rows = engine.con.execute("SELECT id FROM spec_objects ORDER BY id").fetchall()
+    ids = [row[0] for row in rows]
+    half = len(ids) // 2
+    loop_ids, batch_ids = ids[:half], ids[half:]
+
+    start = time.perf_counter()
+    for spec_id in loop_ids:
+        engine.spec_update(spec_id, status="active", doc="curated")
+    _report("spec_update (row-at-a-time)", half, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    engine.spec_update_many([{"id": i, "status": "active", "doc": "curated"} for i in batch_ids])
+    _report("spec_update_many", len(batch_ids), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for spec_id in loop_ids:
+        engine.spec_delete(spec_id)
+    _report("spec_delete (row-at-a-time)", half, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    engine.spec_delete_many(batch_ids)
+    _report("spec_delete_many", len(batch_ids), time.perf_counter() - start)
+
+
+def bench_render(args: argparse.Namespace) -> None:
+    """spec_render_template_udf over a table and render_from_template() calls."""
+    engine = _engine()
+    engine.spec_bulk_upsert(_spec_records(args.specs))
+    engine.spec_create(
+        "prompt_template",
+        "bench_prompt",
+        "Benchmark prompt",
+        status="active",
+        payload={"template": "Hello {{ name }}, task #{{ i }}{% if i % 2 %} (odd){% endif %}"},
+    )
+
+    start = time.perf_counter()
+    engine.con.execute(
+        """
+        SELECT count(spec_render_template_udf('bench_prompt', json_object('name', 'x', 'i', i)))
+        FROM range(?) t(i)
+        """,
+        [args.rows],
+    ).fetchall()
+    _report("spec_render_template_udf", args.rows, time.perf_counter() - start, "rows")
+
+    start = time.perf_counter()
+    for i in range(args.rows):
+        engine.render_from_template("bench_prompt", {"name": "x", "i": i})
+    _report("render_from_template", args.rows, time.perf_counter() - start, "calls")
+
+    # Back-to-back renders share one spec data check per poll interval; with idle
+    # gaps every render pays it, so only the render time itself is summed.
+    busy = 0.0
+    for i in range(args.idle):
+        time.sleep(spec_module.SPEC_DATA_POLL_INTERVAL)
+        start = time.perf_counter()
+        engine.render_from_template("bench_prompt", {"name": "x", "i": i})
+        busy += time.perf_counter() - start
+    _report("render_from_template (idle)", args.idle, busy, "calls")
+
+
+def bench_graph(args: argparse.Namespace) -> None:
+    """spec_dependents / spec_dependencies vs. the recursive-CTE macros and a hop-by-hop loop."""
+    engine = _engine()
+    try:
+        engine._load_macros(quiet=True)
+    except RuntimeError:
+        pass  # macros needing network extensions fail; the graph macros load fine
+    engine.spec_bulk_upsert(_spec_records(args.specs))
+    ids = engine.con.execute("SELECT id FROM spec_objects ORDER BY id").fetchnumpy()["id"]
+    rng = np.random.default_rng(42)
+    engine.con.register(
+        "bench_edges",
+        {"from_id": rng.choice(ids, args.edges), "to_id": rng.choice(ids, args.edges)},
+    )
+    engine.con.execute(
+        """
+        INSERT INTO spec_relationships (id, from_id, to_id, rel_type)
+        SELECT nextval('spec_relationships_seq'), from_id, to_id, 'uses'
+        FROM (SELECT DISTINCT from_id, to_id FROM bench_edges WHERE from_id <> to_id)
+        """
+    )
+    engine.con.unregister("bench_edges")
+    roots = [int(i) for i in rng.choice(ids, args.roots)]
+
+    start = time.perf_counter()
+    engine.spec_dependents(roots[0], args.depth)
+    _report("adjacency build (first call)", 1, time.perf_counter() - start, "calls")
+
+    for label, method in (
+        ("spec_dependencies", engine.spec_dependencies),
+        ("spec_dependents", engine.spec_dependents),
+    ):
+        start = time.perf_counter()
+        for root in roots:
+            method(root, args.depth)
+        _report(f"{label} (cached)", len(roots), time.perf_counter() - start, "calls")
+
+        start = time.perf_counter()
+        for root in roots:
+            engine.con.execute(f"SELECT * FROM {label}(?, ?)", [root, args.depth]).fetchall()
+        _report(f"{label} macro (CTE)", len(roots), time.perf_counter() - start, "calls")
+
+    start = time.perf_counter()
+    for root in roots:
+        seen, frontier = {root}, [root]
+        for _ in range(args.depth):
+            frontier = [
+                rel["id"]
+                for node in frontier
+                for rel in engine.get_related_specs(node)
+                if rel["direction"] == "incoming" and rel["id"] not in seen
+            ]
+            seen.update(frontier)
+    _report("get_related_specs loop", len(roots), time.perf_counter() - start, "calls")
+
+
+def bench_ann(args: argparse.Namespace) -> None:
+    """search_similar(): exact scan vs. vector index (HNSW when vss loads) vs. NumPy stores."""
+    engine = _engine()
+    try:
+        engine.con.execute("LOAD vss")
+    except duckdb.Error:
+        print("vss not available: the vector index falls back to an exact FLOAT[dim] scan")
+    engine._use_numpy_vectors = lambda: False
+
+    # Clustered vectors generated in SQL (Python lists of this size register slowly)
+    start = time.perf_counter()
+    engine.con.execute(
+        """
+        INSERT INTO spec_embeddings (id, content_type, content_hash, content, embedding)
+        SELECT i, 'doc', md5(i::VARCHAR), 'vector ' || i,
+               list_transform(
+                   range(?),
+                   j -> (hash(i % 100, j) % 1000) / 1000.0 + (hash(i, j) % 100) / 1000.0
+               )::FLOAT[]
+        FROM range(?) t(i)
+        """,
+        [args.dim, args.vectors],
+    )
+    _report("generate vectors", args.vectors, time.perf_counter() - start, "rows")
+
+    rng = np.random.default_rng(7)
+    query_ids = [int(i) for i in rng.choice(args.vectors, args.queries, replace=False)]
+    queries = []
+    for i in query_ids:
+        sql = "SELECT embedding FROM spec_embeddings WHERE id = ?"
+        queries.append([x + 0.01 for x in engine.con.execute(sql, [i]).fetchone()[0]])
+
+    start = time.perf_counter()
+    exact = [{r["id"] for r in engine.search_similar(q, k=args.k)} for q in queries]
+    _report("search_similar (scan)", len(queries), time.perf_counter() - start, "queries")
+
+    start = time.perf_counter()
+    built = engine.build_vector_index(persistent=False)
+    _report(
+        f"build_vector_index (hnsw={built['hnsw']})",
+        built["rows"],
+        time.perf_counter() - start,
+        "rows",
+    )
+
+    start = time.perf_counter()
+    approx = [{r["id"] for r in engine.search_similar(q, k=args.k)} for q in queries]
+    _report("search_similar (index)", len(queries), time.perf_counter() - start, "queries")
+    recall = sum(len(a & e) for a, e in zip(approx, exact)) / (args.k * len(queries))
+    print(f"recall@{args.k}: {recall:.3f}")
+
+    # The fallback used when vss is missing: first search loads the store
+    engine._use_numpy_vectors = lambda: True
+    start = time.perf_counter()
+    engine.search_similar(queries[0], k=args.k)
+    _report("numpy store load", args.vectors, time.perf_counter() - start, "rows")
+    start = time.perf_counter()
+    found = [{r["id"] for r in engine.search_similar(q, k=args.k)} for q in queries]
+    _report("search_similar (numpy)", len(queries), time.perf_counter() - start, "queries")
+    recall = sum(len(a & e) for a, e in zip(found, exact)) / (args.k * len(queries))
+    print(f"recall@{args.k}: {recall:.3f}")
+
+
+def _column_bytes(engine: SpecEngine, table: str, column: str, tmp: str) -> int:
+    """On-disk size of one column, copied alone into a fresh database file."""
+    path = Path(tmp) / f"{column}.db"
+    engine.con.execute(f"ATTACH '{path}' AS col_db")
+    try:
+        engine.con.execute(f"CREATE TABLE col_db.t AS SELECT {column} FROM {table}")
+    finally:
+        engine.con.execute("DETACH col_db")
+    return path.stat().st_size
+
+
+def bench_quant(args: argparse.Namespace) -> None:
+    """Quantized two-phase search_vectors() vs. the exact scan: latency, recall@k, storage."""
+    engine = _engine()
+    engine._use_numpy_vectors = lambda: False
+    start = time.perf_counter()
+    engine.con.execute(
+        """
+        INSERT INTO knowledge_research (id, query, content, embedding)
+        SELECT i, 'bench', 'finding ' || i,
+               list_transform(
+                   range(?),
+                   j -> (hash(i % 100, j) % 1000 + hash(i, j) % 500) / 1000.0 - 0.75
+               )::FLOAT[]
+        FROM range(?) t(i)
+        """,
+        [args.dim, args.vectors],
+    )
+    _report("generate vectors", args.vectors, time.perf_counter() - start, "rows")
+
+    start = time.perf_counter()
+    engine.enable_quantization("knowledge_research")
+    _report("enable_quantization", args.vectors, time.perf_counter() - start, "rows")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for table, column in (
+            ("knowledge_research", "embedding"),
+            ("spec_embedding_quantized", "i8"),
+            ("spec_embedding_quantized", "bits"),
+        ):
+            size = _column_bytes(engine, table, column, tmp)
+            print(f"{table + '.' + column:<40} {size / 2**20:8.1f} MiB on disk")
+
+    rng = np.random.default_rng(11)
+    queries = []
+    for i in rng.choice(args.vectors, args.queries, replace=False):
+        sql = "SELECT embedding FROM knowledge_research WHERE id = ?"
+        queries.append([x + 0.01 for x in engine.con.execute(sql, [int(i)]).fetchone()[0]])
+
+    exact = None
+    modes = [(None, 0)] + [(m, r) for m in ("binary", "int8") for r in args.rerank]
+    for mode, rerank in modes:
+        start = time.perf_counter()
+        found = [
+            {
+                r["id"]
+                for r in engine.search_vectors(
+                    "knowledge_research", q, args.k, quantization=mode, rerank=rerank
+                )
+            }
+            for q in queries
+        ]
+        label = f"{mode} (rerank {rerank})" if mode else "exact scan"
+        _report(label, len(queries), time.perf_counter() - start, "queries")
+        exact = exact or found
+        hits = sum(len(a & e) for a, e in zip(found, exact))
+        print(f"{'':<30} recall@{args.k}: {hits / (args.k * len(queries)):.3f}")
+
+
+def bench_rrf(args: argparse.Namespace) -> None:
+    """hybrid_search() (full keyword + vector joins) vs. rrf_search() (fused top-k lists)."""
+    engine = _engine()
+    engine._use_numpy_vectors = lambda: False
+
+    start = time.perf_counter()
+    engine.con.execute(
+        """
+        INSERT INTO spec_embeddings (id, content_type, content_hash, content, embedding)
+        SELECT i, 'doc', md5(i::VARCHAR),
+               'note ' || i || ' about topic' || (i % 5000) || ' and area' || (i % 37),
+               list_transform(
+                   range(?),
+                   j -> (hash(i % 100, j) % 1000) / 1000.0 + (hash(i, j) % 100) / 1000.0
+               )::FLOAT[]
+        FROM range(?) t(i)
+        """,
+        [args.dim, args.vectors],
+    )
+    engine.rebuild_trigram_index()
+    built = engine.build_vector_index(persistent=False)
+    _report("generate + index", args.vectors, time.perf_counter() - start, "rows")
+    print(f"vector index: hnsw={built['hnsw']}")
+
+    rng = np.random.default_rng(7)
+    queries = []
+    for i in rng.choice(args.vectors, args.queries, replace=False):
+        sql = "SELECT embedding FROM spec_embeddings WHERE id = ?"
+        vector = [x + 0.01 for x in engine.con.execute(sql, [int(i)]).fetchone()[0]]
+        queries.append((f"topic{int(i) % 5000}", vector))
+
+    for label, search in (
+        ("hybrid_search", engine.hybrid_search),
+        ("rrf_search", engine.rrf_search),
+    ):
+        start = time.perf_counter()
+        for text, vector in queries:
+            search(text, vector, k=args.k)
+        _report(label, len(queries), time.perf_counter() - start, "queries")
+
+
+def bench_bulk_embed(args: argparse.Namespace) -> None:
+    """store_embeddings_bulk() with a NumPy batch vs. per-row store_embedding()."""
+    engine = _engine()
+    vectors = np.random.default_rng(3).random((args.vectors, args.dim), dtype=np.float32)
+
+    start = time.perf_counter()
+    for i in range(args.baseline):
+        engine.store_embedding(f"single {i}", vectors[i].tolist(), "doc")
+    _report("store_embedding", args.baseline, time.perf_counter() - start, "rows")
+
+    texts = [f"bulk {i}" for i in range(args.vectors)]
+    start = time.perf_counter()
+    result = engine.store_embeddings_bulk(texts, vectors, "doc")
+    _report("store_embeddings_bulk", result["stored"], time.perf_counter() - start, "rows")
+
+
+def bench_filtered(args: argparse.Namespace) -> None:
+    """Filtered search_similar(): selectivity-planned vs. always post-filtering candidates."""
+    engine = _engine()
+    try:
+        engine.con.execute("LOAD vss")
+    except duckdb.Error:
+        print("vss not available: the vector index falls back to an exact FLOAT[dim] scan")
+    # 1% 'rare' rows, the rest split between 'even' and 'odd'
+    engine.con.execute(
+        """
+        INSERT INTO spec_embeddings (id, content_type, content_hash, content, embedding)
+        SELECT i,
+               CASE WHEN i % 100 = 0 THEN 'rare' WHEN i % 2 = 0 THEN 'even' ELSE 'odd' END,
+               md5(i::VARCHAR), 'vector ' || i,
+               list_transform(
+                   range(?),
+                   j -> (hash(i % 100, j) % 1000) / 1000.0 + (hash(i, j) % 100) / 1000.0
+               )::FLOAT[]
+        FROM range(?) t(i)
+        """,
+        [args.dim, args.vectors],
+    )
+    engine.build_vector_index(persistent=False)
+    rng = np.random.default_rng(11)
+    queries = [
+        [float(x) for x in row] for row in rng.random((args.queries, args.dim), dtype=np.float32)
+    ]
+
+    planned = (spec_module.FILTERED_SCAN_MAX_ROWS, spec_module.FILTERED_ANN_MIN_SELECTIVITY)
+    for content_type in ("rare", "even"):
+        engine._use_numpy_vectors = lambda: False
+        spec_module.FILTERED_SCAN_MAX_ROWS = spec_module.FILTERED_ANN_MIN_SELECTIVITY = 0
+        exact = [
+            {r["id"] for r in engine.search_similar(q, k=args.k, content_type=content_type)}
+            for q in queries
+        ]
+        for label, numpy_scan, plan in (
+            ("index, post-filter", False, (0, 0)),
+            ("index, planned", False, planned),
+            ("numpy, post-filter", True, (0, 0)),
+            ("numpy, planned", True, planned),
+        ):
+            engine._use_numpy_vectors = lambda numpy_scan=numpy_scan: numpy_scan
+            spec_module.FILTERED_SCAN_MAX_ROWS, spec_module.FILTERED_ANN_MIN_SELECTIVITY = plan
+            engine.search_similar(queries[0], k=args.k, content_type=content_type)  # warm up
+            start = time.perf_counter()
+            found = [
+                {r["id"] for r in engine.search_similar(q, k=args.k, content_type=content_type)}
+                for q in queries
+            ]
+            seconds = time.perf_counter() - start
+            _report(f"{content_type}: {label}", len(queries), seconds, "queries")
+            recall = sum(len(f & e) for f, e in zip(found, exact)) / max(
+                sum(len(e) for e in exact), 1
+            )
+            print(f"recall@{args.k}: {recall:.3f}")
+    spec_module.FILTERED_SCAN_MAX_ROWS, spec_module.FILTERED_ANN_MIN_SELECTIVITY = planned
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Spec Engine micro-benchmarks")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    bulk = sub.add_parser("bulk", help=bench_bulk.__doc__)
+    bulk.add_argument("--specs", type=int, default=20000, help="Specs per bulk run")
+    bulk.add_argument("--baseline", type=int, default=500, help="Specs for spec_create()")
+    bulk.set_defaults(func=bench_bulk)
+
+    search = sub.add_parser("search", help=bench_search.__doc__)
+    search.add_argument("--specs", type=int, default=100000, help="Specs to search over")
+    search.add_argument("--repeat", type=int, default=20, help="Runs per query")
+    search.set_defaults(func=bench_search)
+
+    batch = sub.add_parser("batch", help=bench_batch.__doc__)
+    batch.add_argument("--specs", type=int, default=2000, help="Specs to mutate (half per mode)")
+    batch.set_defaults(func=bench_batch)
+
+    render = sub.add_parser("render", help=bench_render.__doc__)
+    render.add_argument("--rows", type=int, default=10000, help="Rows / calls to render")
+    render.add_argument("--specs", type=int, default=20000, help="Other specs in the database")
+    render.add_argument("--idle", type=int, default=20, help="Renders after an idle gap")
+    render.set_defaults(func=bench_render)
+
+    graph = sub.add_parser("graph", help=bench_graph.__doc__)
+    graph.add_argument("--specs", type=int, default=20000, help="Spec nodes in the graph")
+    graph.add_argument("--edges", type=int, default=100000, help="Random relationships")
+    graph.add_argument("--roots", type=int, default=50, help="Start specs per mode")
+    graph.add_argument("--depth", type=int, default=3, help="Maximum hops")
+    graph.set_defaults(func=bench_graph)
+
+    ann = sub.add_parser("ann", help=bench_ann.__doc__)
+    ann.add_argument("--vectors", type=int, default=100000, help="Embeddings (try 1000000)")
+    ann.add_argument("--dim", type=int, default=384, help="Embedding dimension")
+    ann.add_argument("--queries", type=int, default=50, help="Queries per mode")
+    ann.add_argument("-k", type=int, default=10, help="Neighbours per query")
+    ann.set_defaults(func=bench_ann)
+
+    quant = sub.add_parser("quant", help=bench_quant.__doc__)
+    quant.add_argument("--vectors", type=int, default=100000, help="knowledge_research rows")
+    quant.add_argument("--dim", type=int, default=768, help="Embedding dimension")
+    quant.add_argument("--queries", type=int, default=20, help="Queries per mode")
+    quant.add_argument("-k", type=int, default=10, help="Neighbours per query")
+    quant.add_argument(
+        "--rerank", type=int, nargs="+", default=[10, 50], help="Candidates per result"
+    )
+    quant.set_defaults(func=bench_quant)
+
+    rrf = sub.add_parser("rrf", help=bench_rrf.__doc__)
+    rrf.add_argument("--vectors", type=int, default=100000, help="spec_embeddings rows")
+    rrf.add_argument("--dim", type=int, default=384, help="Embedding dimension")
+    rrf.add_argument("--queries", type=int, default=20, help="Queries per mode")
+    rrf.add_argument("-k", type=int, default=10, help="Results per query")
+    rrf.set_defaults(func=bench_rrf)
+
+    bulk_embed = sub.add_parser("bulk-embed", help=bench_bulk_embed.__doc__)
+    bulk_embed.add_argument("--vectors", type=int, default=20000, help="Rows per bulk call")
+    bulk_embed.add_argument("--dim", type=int, default=768, help="Embedding dimension")
+    bulk_embed.add_argument("--baseline", type=int, default=20, help="Rows for store_embedding()")
+    bulk_embed.set_defaults(func=bench_bulk_embed)
+
+    filtered = sub.add_parser("filtered", help=bench_filtered.__doc__)
+    filtered.add_argument("--vectors", type=int, default=100000, help="spec_embeddings rows")
+    filtered.add_argument("--dim", type=int, default=384, help="Embedding dimension")
+    filtered.add_argument("--queries", type=int, default=20, help="Queries per mode")
+    filtered.add_argument("-k", type=int, default=10, help="Neighbours per query")
+    filtered.set_defaults(func=bench_filtered)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
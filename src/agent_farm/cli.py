@@ -15,7 +15,7 @@ from rich.table import Table
 from .duckdb_utils import split_sql_statements
 from .main import bootstrap_db, resolve_mcp_database_path
 from .mcp_host import run_mcp_stdio_host
-from .spec_engine import get_spec_engine
+from .spec_engine import EMBED_BATCH_SIZE, EMBED_CONCURRENCY, EMBED_MODEL, get_spec_engine
 
 app = typer.Typer(
     name="agent-farm",
@@ -186,6 +186,87 @@ def sql(
     console.print(f"[dim]Executed {executed} statements from {file}[/dim]")
 
 
+@app.command()
+def embed(
+    table: Annotated[
+        str, typer.Option("--table", help="spec_embeddings, knowledge_* or memory_conversations.")
+    ] = "spec_embeddings",
+    model: Annotated[str, typer.Option("--model", help="Ollama embedding model.")] = EMBED_MODEL,
+    batch_size: Annotated[
+        int, typer.Option("--batch-size", help="Texts per /api/embed request.")
+    ] = EMBED_BATCH_SIZE,
+    concurrency: Annotated[
+        int, typer.Option("--concurrency", help="Requests in flight at once.")
+    ] = EMBED_CONCURRENCY,
+    limit: Annotated[Optional[int], typer.Option("--limit", help="Stop after N rows.")] = None,
+    restart: Annotated[
+        bool, typer.Option("--restart", help="Ignore the checkpoint and retry failed rows.")
+    ] = False,
+    db: Annotated[str, typer.Option("--db", help="DuckDB database path.")] = "",
+):
+    """Embed rows without a vector via Ollama /api/embed, resuming from the last checkpoint."""
+    db = db or _db_option()
+    _, engine, _ = init_farm(db, quiet=True)
+    result = engine.embed_pending(
+        table,
+        model,
+        batch_size=batch_size,
+        concurrency=concurrency,
+        limit=limit,
+        restart=restart,
+    )
+
+    if "error" in result:
+        console.print(f"[red]Embedding failed: {result['error']}[/red]")
+        raise typer.Exit(1)
+
+    out.print(
+        f"rows={result['rows']} embedded={result['embedded']} reused={result['reused']} "
+        f"failed={result['failed']} requests={result['requests']} last_id={result['last_id']}"
+    )
+    if result["failed"]:
+        raise typer.Exit(1)
+
+
+@app.command()
+def ingest(
+    path: Annotated[str, typer.Argument(help="File or directory to chunk and embed.")],
+    org: Annotated[
+        Optional[str], typer.Option("--org", help="Only allow this org's workspaces.")
+    ] = None,
+    content_type: Annotated[
+        str, typer.Option("--content-type", help="spec_embeddings.content_type of the chunks.")
+    ] = "doc",
+    model: Annotated[str, typer.Option("--model", help="Ollama embedding model.")] = EMBED_MODEL,
+    no_embed: Annotated[
+        bool, typer.Option("--no-embed", help="Store chunks without embedding them.")
+    ] = False,
+    db: Annotated[str, typer.Option("--db", help="DuckDB database path.")] = "",
+):
+    """Chunk workspace files into spec_embeddings, skipping unchanged files and chunks."""
+    db = db or _db_option()
+    _, engine, _ = init_farm(db, quiet=True)
+    result = engine.ingest_path(
+        path, org=org, content_type=content_type, model=model, embed=not no_embed
+    )
+
+    if "error" in result:
+        console.print(f"[red]Ingest failed: {result['error']}[/red]")
+        raise typer.Exit(1)
+
+    out.print(
+        f"files={result['files']} ingested={result['ingested']} unchanged={result['unchanged']} "
+        f"removed={result['removed']} skipped={result['skipped']} "
+        f"chunks_added={result['chunks_added']} chunks_removed={result['chunks_removed']}"
+    )
+    for unreadable in result["unreadable"]:
+        console.print(f"[yellow]Skipped unreadable file {unreadable}[/yellow]")
+    embedding = result.get("embedding", {})
+    if "error" in embedding or embedding.get("failed"):
+        console.print(f"[red]Embedding incomplete: {embedding}[/red]")
+        raise typer.Exit(1)
+
+
 # ---------------------------------------------------------------------------
 # spec subcommands
 # ---------------------------------------------------------------------------
@@ -294,6 +375,41 @@ def spec_search(
     out.print(table)
 
 
+@spec_app.command("import")
+def spec_import(
+    file: Annotated[str, typer.Argument(help="JSONL or .parquet file to import.")],
+    db: Annotated[str, typer.Option("--db", help="DuckDB database path.")] = "",
+):
+    """Bulk upsert specs from a JSONL or Parquet file (matched on kind, name, version)."""
+    db = db or _db_option()
+    _, engine, _ = init_farm(db, quiet=True)
+    result = engine.spec_import(file)
+
+    if "error" in result:
+        console.print(f"[red]Import failed: {result['error']}[/red]")
+        raise typer.Exit(1)
+
+    out.print(f"inserted={result['inserted']} updated={result['updated']} file={file}")
+
+
+@spec_app.command("export")
+def spec_export(
+    file: Annotated[str, typer.Argument(help="Target JSONL or .parquet file.")],
+    kind: Annotated[Optional[str], typer.Option("--kind", help="Only export this kind.")] = None,
+    db: Annotated[str, typer.Option("--db", help="DuckDB database path.")] = "",
+):
+    """Export specs with docs and payloads to a JSONL or Parquet file."""
+    db = db or _db_option()
+    _, engine, _ = init_farm(db, quiet=True)
+    result = engine.spec_export(file, kind=kind)
+
+    if "error" in result:
+        console.print(f"[red]Export failed: {result['error']}[/red]")
+        raise typer.Exit(1)
+
+    out.print(f"exported={result['exported']} file={file}")
+
+
 # ---------------------------------------------------------------------------
 # app subcommands
 # ---------------------------------------------------------------------------
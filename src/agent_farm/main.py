@@ -636,6 +636,8 @@ def setup_ducklake_catalog(con: duckdb.DuckDBPyConnection) -> bool:
       lake.mcp_app_instances   — rendered HTML (survives MCP reconnects)
       lake.pending_approvals   — approval decisions (survive MCP restarts)
       lake.user_profile        — user settings
+      lake.spec_changes        — spec change feed (CDC) from every process
+      lake.llm_response_cache  — model responses shared when LLM_CACHE_LAKE=1
 
     Multiple processes can attach the same DuckLake catalog concurrently (MVCC).
     The ducklake extension is required (True in DUCKDB_EXTENSIONS) so it will
@@ -754,6 +756,30 @@ def setup_ducklake_catalog(con: duckdb.DuckDBPyConnection) -> bool:
                 log.info("Migrated lake.pending_approvals: added spec_id column")
         except Exception as _alt_exc:
             log.debug("spec_id migration skipped (table new or ALTER unsupported): %s", _alt_exc)
+        # Spec change feed — mirrored from each database's spec_changes log
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS lake.spec_changes (
+                origin VARCHAR NOT NULL,
+                seq BIGINT NOT NULL,
+                spec_id INTEGER,
+                kind VARCHAR,
+                name VARCHAR,
+                version VARCHAR,
+                op VARCHAR NOT NULL,
+                changed_at TIMESTAMP
+            )
+        """)
+        # LLM response cache — mirrored from each database's llm_response_cache
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS lake.llm_response_cache (
+                cache_key VARCHAR NOT NULL,
+                model VARCHAR NOT NULL,
+                response JSON NOT NULL,
+                latency_ms DOUBLE,
+                created_at TIMESTAMP,
+                expires_at TIMESTAMP NOT NULL
+            )
+        """)
         # User profile — persists across all sessions
         con.execute("""
             CREATE TABLE IF NOT EXISTS lake.user_profile (
@@ -767,7 +793,7 @@ def setup_ducklake_catalog(con: duckdb.DuckDBPyConnection) -> bool:
         log.info(
             "DuckLake shared catalog ready: %s  "
             "(notes_board, shared_sessions, shared_org_calls, mcp_app_instances, "
-            "pending_approvals, user_profile)",
+            "pending_approvals, user_profile, spec_changes, llm_response_cache)",
             catalog_path,
         )
         return True
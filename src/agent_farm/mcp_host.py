@@ -224,6 +224,16 @@ def _tool_result(text: str, resource_uri: str | None = None) -> CallToolResult:
 # Pending-action runtime handler
 # ---------------------------------------------------------------------------
 
+def _sync_note_index() -> None:
+    """Bring the notes_board trigram postings up to date after a write."""
+    try:
+        from .spec_engine import get_spec_engine
+
+        get_spec_engine(_con).sync_note_trigrams()
+    except Exception as exc:
+        log.debug("Note trigram sync skipped: %s", exc)
+
+
 def _handle_pending_action(result: Any) -> Any:
     """Handle DML sentinel values returned by DuckDB macros that cannot do DML directly.
 
@@ -278,6 +288,7 @@ def _handle_pending_action(result: Any) -> Any:
             )
             out = {**data, "status": "ok", "persisted": "lake.notes_board"}
             log.info("Created note %s in lake.notes_board (project=%s)", note_id, project)
+            _sync_note_index()
         except Exception as exc:
             log.error("Failed to persist note %s to lake.notes_board: %s", note_id, exc)
             out = {**data, "status": "error", "error": str(exc)}
@@ -294,6 +305,7 @@ def _handle_pending_action(result: Any) -> Any:
             )
             out = {**data, "status": "ok", "persisted": "lake.notes_board"}
             log.info("Updated note %s in lake.notes_board", note_id)
+            _sync_note_index()
         except Exception as exc:
             log.error("Failed to update note %s in lake.notes_board: %s", note_id, exc)
             out = {**data, "status": "error", "error": str(exc)}
@@ -16,7 +16,7 @@ from rich.table import Table
 
 from .orgs import ORG_CONFIGS, ORG_SYSTEM_PROMPTS
 from .schemas import OrgType
-from .udfs import chat_with_model, stream_model_response
+from .udfs import chat_with_model, set_llm_cache_connection, stream_model_response
 
 log = logging.getLogger(__name__)
 out = Console()
@@ -379,6 +379,7 @@ def start_repl(
     from .cli import init_farm
 
     con, engine, _ = init_farm(db)
+    set_llm_cache_connection(con.cursor())
 
     org_type = _resolve_org(org) if org else OrgType.ORCHESTRATOR
     if org_type is None:
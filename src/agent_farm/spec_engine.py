@@ -18,16 +18,30 @@ MCP Tools exposed:
 - mcp_call_remote_tool: Call remote MCP tools
 """
 
+import atexit
+import fnmatch
 import hashlib
+import heapq
+import itertools
 import json
 import logging
 import os
+import re
+import socket
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
 from pathlib import Path
-from threading import Lock
+from threading import Lock, Thread, Timer
 from typing import Any
 from weakref import WeakKeyDictionary
 
 import duckdb
+import numpy as np
 
 from .duckdb_utils import (
     has_non_comment_content,
@@ -37,9 +51,509 @@ from .duckdb_utils import (
 from .duckdb_utils import (
     start_http_server as start_duckdb_http_server,
 )
+from .orgs import ORG_CONFIGS
+from .schemas import OrgType
+from .udfs import (
+    cached_embed,
+    embedding_cache_put,
+    embedding_cache_stats,
+    evict_embedding_cache,
+    flush_embedding_hits,
+    ollama_embed_batch,
+    path_is_allowed,
+)
 
 log = logging.getLogger("agent_farm.spec_engine")
 
+# Columns accepted by spec_bulk_upsert() and written by spec_export().
+SPEC_BULK_COLUMNS = (
+    "kind",
+    "name",
+    "version",
+    "status",
+    "summary",
+    "doc",
+    "payload",
+    "schema_ref",
+)
+
+# Fields accepted per change by spec_update_many().
+_SPEC_UPDATE_COLUMNS = ("id", "version", "status", "summary", "doc", "payload", "schema_ref")
+
+# Sources covered by the spec_trigrams posting lists (see intelligence.sql).
+TRIGRAM_SOURCES = ("spec", "spec_embeddings", "notes_board")
+
+# Base table of each locally written source, reconciled by id before a search.
+_TRIGRAM_TABLES = {"spec": "spec_objects", "spec_embeddings": "spec_embeddings"}
+
+# Posting lists probed per search term (rarest first) and the candidate count above
+# which the pre-filter is dropped in favour of a plain LIKE scan.
+TRIGRAM_PROBES = 3
+TRIGRAM_MAX_CANDIDATES = 2048
+
+# Compiled templates kept in each engine's shared MiniJinja environment, and
+# template bodies kept per (name, version); both evict least recently used.
+TEMPLATE_CACHE_SIZE = 256
+
+# Seconds between checks of the template, schema and validator caches against
+# _SPEC_DATA_VERSION_SQL, which sees writes by other engines and raw SQL alike.
+SPEC_DATA_POLL_INTERVAL = 0.5
+
+# Version key of the spec rows those caches are derived from: row counts, highest
+# ids and latest timestamps, so a check reads no payloads. DuckDB has no triggers
+# and raw SQL writes are not logged in spec_changes; engine writes bump
+# spec_objects.updated_at, raw SQL edits that do not must call
+# SpecEngine.invalidate_spec_caches().
+_SPEC_DATA_VERSION_SQL = """
+    SELECT o.*, p.*, l.*
+    FROM (SELECT count(*), max(id), max(updated_at) FROM spec_objects) o,
+         (SELECT count(*), max(id), max(created_at) FROM spec_payloads) p,
+         (SELECT count(*) FROM spec_latest) l
+"""
+
+# record_usage()/record_feedback() are buffered in memory and written back once
+# this many events are pending, or by a background timer this many seconds after
+# the first buffered event.
+USAGE_FLUSH_MAX_PENDING = 500
+USAGE_FLUSH_INTERVAL = 5.0
+
+# Per (spec_id, hour) delta slots, in spec_usage_hourly column order.
+_USAGE_ROLLUP_COLUMNS = (
+    "uses",
+    "successes",
+    "feedback_count",
+    "success_feedback",
+    "failure_feedback",
+    "score_sum",
+    "scored_count",
+)
+
+# Tables with an `embedding FLOAT[]` column that build_vector_index() can index.
+VECTOR_TABLES = (
+    "spec_embeddings",
+    "knowledge_dev",
+    "knowledge_research",
+    "knowledge_studio",
+    "knowledge_ops",
+    "memory_conversations",
+)
+
+# ANN candidates fetched per requested result when a search also filters rows
+# (divided by the filter's selectivity).
+ANN_OVERFETCH = 4
+
+# Filtered vector searches: a filter matching at most FILTERED_SCAN_MAX_ROWS rows, or
+# less than FILTERED_ANN_MIN_SELECTIVITY of them, is answered exactly from the
+# matching rows (a row bitmap over the NumPy stores, a filtered scan in SQL);
+# wider filters go through the ANN index or top-n selection and filter afterwards.
+FILTERED_SCAN_MAX_ROWS = 4096
+FILTERED_ANN_MIN_SELECTIVITY = 0.1
+
+# Without vss, vector searches scan per-model NumPy matrices. For a file-backed
+# database they are memory-mapped .npy files in "<database>.vectors/"; capacity
+# grows by doubling from NUMPY_VECTOR_MIN_ROWS.
+NUMPY_VECTOR_DIR_SUFFIX = ".vectors"
+NUMPY_VECTOR_MIN_ROWS = 1024
+
+# HNSW metric -> DuckDB distance function the vss optimizer matches on.
+_VECTOR_DISTANCE_SQL = {
+    "cosine": "array_cosine_distance",
+    "ip": "array_negative_inner_product",
+    "l2sq": "array_distance",
+}
+
+# Quantized encodings are opt-in per vector table or spec_embeddings model
+# (enable_quantization()) and live in spec_embedding_quantized: 'binary' is one
+# sign bit per dimension (BIT, Hamming distance), 'int8' is the vector scaled by
+# its max |x| to TINYINT[] (cosine). Quantized searches re-rank k * QUANT_RERANK
+# candidates exactly.
+QUANTIZATIONS = ("binary", "int8")
+QUANT_RERANK = 10
+
+# Encodes the rows of {table} matching {where} whose table or model is opted in.
+_QUANTIZE_SQL = """
+    INSERT OR REPLACE INTO spec_embedding_quantized (source_table, row_id, bits, i8)
+    SELECT '{table}', id,
+           array_to_string(
+               list_transform(embedding, x -> CASE WHEN x > 0 THEN '1' ELSE '0' END), ''
+           )::BIT,
+           list_transform(embedding, x -> round(x * scale)::TINYINT)
+    FROM (
+        SELECT id, embedding,
+               127 / greatest(list_max(list_transform(embedding, x -> abs(x))), 1e-12) AS scale
+        FROM {table}
+        WHERE embedding IS NOT NULL AND len(embedding) > 0 AND {opted_in} AND {where}
+    )
+"""
+
+# Rows of {table} covered by a spec_embedding_quantization entry.
+_QUANTIZED_ROWS_SQL = """
+    EXISTS (
+        SELECT 1 FROM spec_embedding_quantization z
+        WHERE z.table_name = '{table}' AND z.model IN ('', {model})
+    )
+"""
+
+# embed_pending() defaults: Ollama model (as used by the embed() macro), inputs per
+# /api/embed request, and requests in flight at once.
+EMBED_MODEL = "nomic-embed-text"
+EMBED_BATCH_SIZE = 64
+EMBED_CONCURRENCY = 4
+
+# start_embedding_migration(): seconds to sleep between re-embedding batches so a
+# background migration leaves Ollama and the database to foreground work.
+EMBED_MIGRATION_THROTTLE = 0.2
+
+# Search metric -> (FLOAT[dim] array, FLOAT[] list) similarity functions, higher is closer.
+_VECTOR_SIMILARITY_SQL = {
+    "cosine": ("array_cosine_similarity", "list_cosine_similarity"),
+    "ip": ("array_inner_product", "list_inner_product"),
+}
+
+# store_org_knowledge(_bulk)() columns per org with their defaults (besides id,
+# content and embedding); JSON-serialized fields are listed separately.
+_KNOWLEDGE_COLUMNS = {
+    "dev": {
+        "repo": "unknown",
+        "file_path": "unknown",
+        "language": None,
+        "ast_type": None,
+        "symbol_name": None,
+        "doc_string": None,
+        "version_ref": None,
+    },
+    "research": {
+        "query": "",
+        "source_url": None,
+        "source_title": None,
+        "relevance_score": None,
+        "search_engine": "searxng",
+    },
+    "studio": {
+        "project": "default",
+        "decision_type": "general",
+        "title": "Untitled",
+        "description": None,
+        "options": None,
+        "chosen_option": None,
+        "rationale": None,
+        "user_feedback": None,
+        "performance": None,
+    },
+    "ops": {
+        "pipeline": "unknown",
+        "run_id": None,
+        "status": None,
+        "log_level": "info",
+        "artifact_refs": None,
+        "metrics": None,
+        "duration_ms": None,
+    },
+}
+_KNOWLEDGE_JSON_COLUMNS = frozenset({"options", "user_feedback", "metrics"})
+
+# knowledge_search(): org and provenance columns returned for each source table.
+_KNOWLEDGE_SEARCH_SOURCES = {
+    "spec_embeddings": (
+        None,
+        ("spec_id", "org_id", "content_type", "chunk_index", "embedding_model", "metadata"),
+    ),
+    "knowledge_dev": ("dev", ("repo", "file_path", "language", "ast_type", "symbol_name")),
+    "knowledge_research": ("research", ("query", "source_url", "source_title", "verified")),
+    "knowledge_studio": ("studio", ("project", "decision_type", "title", "chosen_option")),
+    "knowledge_ops": ("ops", ("pipeline", "run_id", "status", "log_level")),
+    "memory_conversations": (None, ("session_id", "agent_spec_id", "role", "importance")),
+}
+
+# rrf_search(): rank constant of reciprocal rank fusion (score = w / (RRF_K + rank)),
+# candidates taken from each ranked list, and BM25 parameters of the trigram fallback.
+RRF_K = 60
+RRF_CANDIDATES = 50
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# The fts index is a snapshot: rows written after it was built are scored by the
+# substring BM25 until there are more than FTS_REBUILD_ROWS of them and more than
+# FTS_REBUILD_FRACTION of the indexed rows, which triggers one rebuild.
+FTS_REBUILD_ROWS = 1000
+FTS_REBUILD_FRACTION = 0.1
+
+# get_conversation_context(): the newest MEMORY_RECENT_WINDOW turns are always
+# returned; older ones are ranked by importance halving every MEMORY_HALF_LIFE
+# seconds plus MEMORY_RELEVANCE_WEIGHT * cosine similarity to a query vector.
+# compact_conversation_memory() folds all but the newest MEMORY_COMPACT_KEEP turns
+# into summaries of MEMORY_COMPACT_CHUNK rows; store_conversation_memory() runs it
+# once a session has MEMORY_COMPACT_AFTER uncompacted rows.
+MEMORY_RECENT_WINDOW = 6
+MEMORY_HALF_LIFE = 24 * 3600.0
+MEMORY_RELEVANCE_WEIGHT = 1.0
+MEMORY_COMPACT_KEEP = 40
+MEMORY_COMPACT_CHUNK = 20
+MEMORY_COMPACT_AFTER = 100
+MEMORY_SUMMARY_LINE_CHARS = 160
+
+# Precomputed ranking key of memory_conversations (decay_key column): ordering by
+# it equals ordering by decayed importance at any time, and
+# exp(decay_key - _MEMORY_NOW_KEY_SQL) is the decayed importance now.
+_MEMORY_DECAY_KEY_SQL = (
+    f"(ln(greatest(COALESCE(importance, 0.5), 1e-6)) "
+    f"+ epoch(created_at) * ln(2) / {MEMORY_HALF_LIFE})"
+)
+_MEMORY_NOW_KEY_SQL = f"(epoch(current_timestamp::TIMESTAMP) * ln(2) / {MEMORY_HALF_LIFE})"
+
+
+# ingest_path() chunking: at most INGEST_CHUNK_LINES lines or INGEST_CHUNK_TOKENS
+# whitespace tokens per chunk, the last INGEST_CHUNK_OVERLAP lines repeated in the
+# next one; about one line in INGEST_BOUNDARY_MODULUS may end a chunk early (see
+# _chunk_lines). Larger files and these directories are skipped.
+INGEST_CHUNK_LINES = 80
+INGEST_CHUNK_TOKENS = 512
+INGEST_CHUNK_OVERLAP = 8
+INGEST_BOUNDARY_MODULUS = 8
+INGEST_MAX_FILE_BYTES = 2 * 1024 * 1024
+INGEST_SKIP_DIRS = frozenset(
+    {".git", ".hg", ".svn", ".venv", "venv", "node_modules", "__pycache__", "dist", "build"}
+)
+
+
+# Semver-aware ORDER BY for spec versions, highest first: numeric core compared
+# component-wise (optional leading 'v'), releases above pre-releases, then text.
+_VERSION_ORDER_SQL = (
+    "[COALESCE(TRY_CAST(part AS BIGINT), -1) FOR part IN string_split("
+    "regexp_extract(ltrim(lower(version), 'v'), '^[0-9]+(\\.[0-9]+)*'), '.')] DESC, "
+    "(version NOT LIKE '%-%') DESC, version DESC"
+)
+
+# DuckDB expression for the distinct lower-cased 3-character windows of column t.
+_TRIGRAM_LIST_SQL = "list_distinct([substr(lower(t), i, 3) FOR i IN range(1, length(t) - 1)])"
+
+
+def _summarize_turns(turns: list[dict[str, Any]]) -> str:
+    """Default compaction summary: one truncated 'role: text' line per turn."""
+    lines = []
+    for turn in turns:
+        text = " ".join(str(turn["content"]).split())
+        if len(text) > MEMORY_SUMMARY_LINE_CHARS:
+            text = text[: MEMORY_SUMMARY_LINE_CHARS - 3] + "..."
+        lines.append(f"{turn['role']}: {text}")
+    return "\n".join(lines)
+
+
+def _vector_literal(values: list[float], sql_type: str) -> str:
+    """Inline a vector as a typed SQL constant (list parameters bind slowly, hide it from vss)."""
+    return "[" + ", ".join(repr(float(x)) for x in values) + f"]::{sql_type}"
+
+
+def _chunk_lines(
+    lines: Iterable[str],
+    max_lines: int = INGEST_CHUNK_LINES,
+    overlap: int = INGEST_CHUNK_OVERLAP,
+    max_tokens: int = INGEST_CHUNK_TOKENS,
+) -> Iterator[tuple[int, int, str]]:
+    """
+    Split a stream of lines into overlapping chunks, yielding (start_line, end_line, text).
+
+    A chunk ends at max_lines lines or max_tokens tokens, or earlier once it holds
+    max_lines // 2 new lines and reaches a boundary line (blank, or one whose CRC32
+    is a multiple of INGEST_BOUNDARY_MODULUS). Boundaries that depend only on the
+    line itself resynchronize after an edit, so the chunks below an inserted line
+    keep their text. Only one chunk is held in memory.
+    """
+    if overlap >= max_lines:
+        raise ValueError("overlap must be smaller than max_lines")
+    window: list[tuple[int, str]] = []
+    tokens = fresh = 0
+    for lineno, line in enumerate(lines, start=1):
+        window.append((lineno, line))
+        tokens += len(line.split())
+        fresh += 1
+        if (
+            len(window) >= max_lines
+            or tokens >= max_tokens
+            or (
+                fresh >= max_lines // 2
+                and (
+                    not line.strip()
+                    or zlib.crc32(line.strip().encode()) % INGEST_BOUNDARY_MODULUS == 0
+                )
+            )
+        ):
+            yield window[0][0], window[-1][0], "".join(text for _, text in window)
+            window = window[len(window) - overlap :] if overlap else []
+            tokens = sum(len(text.split()) for _, text in window)
+            fresh = 0
+    if fresh:
+        yield window[0][0], window[-1][0], "".join(text for _, text in window)
+
+
+def _model_slug(model: str) -> str:
+    """Identifier-safe name of an embedding model; the hash suffix keeps distinct models apart."""
+    slug = re.sub(r"[^a-z0-9]+", "_", model.lower()).strip("_") or "default"
+    return f"{slug}_{hashlib.md5(model.encode('utf-8')).hexdigest()[:8]}"
+
+
+def _id_array_param(ids: Iterable[int]) -> str:
+    """Ids as array text for a `?::INTEGER[]` parameter; binding a Python list costs per element."""
+    return "[" + ", ".join(str(int(i)) for i in ids) + "]"
+
+
+class _NumpyVectorStore:
+    """
+    The vectors of one (table, model, dimension) as a float32 matrix and an id array.
+
+    With a path, both are memory-mapped .npy files with spare capacity, so a refresh
+    overwrites or appends rows in place and a restart reopens them without reading
+    the table. Rows are L2-normalized for cosine models, so a search is one
+    matrix-vector product.
+    """
+
+    def __init__(self, path: Path | None, dim: int, normalize: bool):
+        self.path = path
+        self.dim = dim
+        self.normalize = normalize
+        self.rows = 0
+        self.key: list[Any] | None = None
+        self.dirty: set[int] = set()
+        self.ids: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.matrix: np.ndarray = np.zeros((0, dim), dtype=np.float32)
+        self.slots: dict[int, int] = {}
+        if path is not None:
+            self._load()
+
+    def _file(self, suffix: str) -> Path:
+        return self.path.with_name(self.path.name + suffix)
+
+    def _load(self) -> None:
+        """Reopen the files of an earlier run; anything inconsistent starts empty."""
+        try:
+            meta = json.loads(self._file(".json").read_text(encoding="utf-8"))
+            if (meta["dim"], meta["normalize"]) != (self.dim, self.normalize):
+                return
+            matrix = np.load(self._file(".vectors.npy"), mmap_mode="r+")
+            ids = np.load(self._file(".ids.npy"), mmap_mode="r+")
+        except (OSError, ValueError, KeyError):
+            return
+        rows = meta["rows"]
+        if matrix.shape[1:] != (self.dim,) or len(ids) != len(matrix) or rows > len(ids):
+            return
+        slots = {row_id: slot for slot, row_id in enumerate(ids[:rows].tolist())}
+        if len(slots) != rows:
+            return  # interrupted while moving rows
+        self.matrix, self.ids, self.rows, self.slots = matrix, ids, rows, slots
+        self.key = meta["key"]
+
+    def _reserve(self, extra: int) -> None:
+        """Grow the capacity (doubling) to hold extra more rows."""
+        needed = self.rows + extra
+        if needed <= len(self.ids):
+            return
+        capacity = max(needed, 2 * len(self.ids), NUMPY_VECTOR_MIN_ROWS)
+        if self.path is None:
+            matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+            ids = np.zeros(capacity, dtype=np.int64)
+            matrix[: self.rows] = self.matrix[: self.rows]
+            ids[: self.rows] = self.ids[: self.rows]
+            self.matrix, self.ids = matrix, ids
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        for suffix, shape, dtype, old in (
+            (".vectors.npy", (capacity, self.dim), np.float32, self.matrix),
+            (".ids.npy", (capacity,), np.int64, self.ids),
+        ):
+            new = np.lib.format.open_memmap(
+                self._file(suffix + ".tmp"), mode="w+", dtype=dtype, shape=shape
+            )
+            new[: self.rows] = old[: self.rows]
+            new.flush()
+            del new
+        # Drop the old mappings before replacing their files
+        self.matrix = self.ids = None  # type: ignore[assignment]
+        for suffix in (".vectors.npy", ".ids.npy"):
+            os.replace(self._file(suffix + ".tmp"), self._file(suffix))
+        self.matrix = np.load(self._file(".vectors.npy"), mmap_mode="r+")
+        self.ids = np.load(self._file(".ids.npy"), mmap_mode="r+")
+
+    def upsert(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """Overwrite the rows of known ids and append the others."""
+        if self.normalize:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1, norms)
+        self._reserve(sum(1 for row_id in ids.tolist() if row_id not in self.slots))
+        slots = []
+        for row_id in ids.tolist():
+            slot = self.slots.get(row_id)
+            if slot is None:
+                slot = self.slots[row_id] = self.rows
+                self.ids[slot] = row_id
+                self.rows += 1
+            slots.append(slot)
+        self.matrix[slots] = vectors
+
+    def remove(self, ids: Iterable[int]) -> None:
+        """Drop rows by id, moving the last row into each hole."""
+        for row_id in ids:
+            slot = self.slots.pop(int(row_id), None)
+            if slot is None:
+                continue
+            last = self.rows - 1
+            if slot != last:
+                moved = int(self.ids[last])
+                self.ids[slot] = moved
+                self.matrix[slot] = self.matrix[last]
+                self.slots[moved] = slot
+            self.rows = last
+
+    def save(self, key: list[Any]) -> None:
+        """Record the table state the rows reflect (flushing the files first)."""
+        self.key = key
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(self.matrix, np.memmap):
+            self.matrix.flush()
+            self.ids.flush()
+        meta = {"dim": self.dim, "normalize": self.normalize, "rows": self.rows, "key": key}
+        self._file(".json.tmp").write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(self._file(".json.tmp"), self._file(".json"))
+
+    def scores(
+        self, query: list[float], allowed: np.ndarray | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """(ids, similarities) of all rows, or only of the allowed ids, for a query vector."""
+        vector = np.asarray(query, dtype=np.float32)
+        if self.normalize:
+            norm = np.linalg.norm(vector)
+            vector = vector / (norm or 1)
+        if allowed is None:
+            return self.ids[: self.rows].copy(), self.matrix[: self.rows] @ vector
+        slots = np.fromiter(
+            (self.slots[i] for i in allowed.tolist() if i in self.slots), dtype=np.int64
+        )
+        slots.sort()
+        return self.ids[slots], self.matrix[slots] @ vector
+
+
+def _score_numpy_stores(
+    stores: list[_NumpyVectorStore],
+    query: list[float],
+    n: int | None = None,
+    allowed: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (ids, similarities) over NumPy stores; with n, only the n best (unordered).
+
+    allowed restricts the scoring to those row ids (a pre-filter bitmap).
+    """
+    parts = [store.scores(query, allowed) for store in stores]
+    if not parts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    ids = np.concatenate([part[0] for part in parts])
+    scores = np.concatenate([part[1] for part in parts])
+    if n is not None and len(ids) > n:
+        top = np.argpartition(scores, len(ids) - n)[len(ids) - n :]
+        ids, scores = ids[top], scores[top]
+    return ids, scores
+
 
 class SpecEngine:
     """
@@ -58,6 +572,38 @@ class SpecEngine:
         self.con = con
         self.db_path = db_path or os.environ.get("DUCKDB_DATABASE", ":memory:")
         self._initialized = False
+        self._notes_trigram_watermark: Any = None
+        self._trigram_df: dict[str, dict[str, int]] = {}
+        self._trigram_fingerprints: dict[str, list[Any]] = {}
+        self._template_env: Any = None
+        self._template_names: OrderedDict[str, None] = OrderedDict()
+        self._template_lock = Lock()
+        self._template_sources: OrderedDict[tuple[str, str | None], str] = OrderedDict()
+        self._side_cursor_con: duckdb.DuckDBPyConnection | None = None
+        self._side_cursor_lock = Lock()
+        self._schema_lookups: dict[tuple[str, str], dict[str, Any]] = {}
+        self._validators: dict[tuple[str, str], Callable[[Any], list[str]] | None] = {}
+        self._relationship_graph: tuple[tuple[Any, ...], dict[str, Any]] | None = None
+        self._changes_mirrored_seq: int | None = None
+        self._change_origin: str | None = None
+        self._spec_changes_logged = False
+        self._spec_data_version: tuple[Any, ...] | None = None
+        self._spec_data_checked_at = 0.0
+        self._vector_indexes: dict[str, list[dict[str, Any]]] | None = None
+        self._embedding_models: dict[str, dict[str, Any]] | None = None
+        self._ready_vector_tables: set[str] = set()
+        self._stale_vector_tables: set[str] = set()
+        self._numpy_stores: dict[tuple[str, str, int], _NumpyVectorStore] = {}
+        self._memory_active: dict[str, int] = {}
+        self._migration_threads: dict[str, Thread] = {}
+        self._fts_snapshot: list[Any] | None = None
+        self._fts_unindexed: tuple[list[Any], list[int]] | None = None
+        self._in_transaction = False
+        self._usage_lock = Lock()
+        self._usage_deltas: dict[tuple[int, datetime], list[float]] = {}
+        self._pending_feedback: list[tuple[Any, ...]] = []
+        self._pending_usage_events = 0
+        self._usage_timer: Timer | None = None
 
     def initialize(self, *, quiet: bool = False) -> None:
         """
@@ -77,43 +623,103 @@ class SpecEngine:
 
         # Load macros
         self._load_macros(quiet=quiet)
+        self._load_vector_ann_macros()
 
         # Load seed data (if tables are empty)
         self._load_seed_data(quiet=quiet)
+        self._log_reseed()
+
+        # Spec tables are recreated on every start, so their derived indexes are too.
+        self.rebuild_spec_latest()
+        self._refresh_trigram_index(quiet=quiet)
 
         self._initialized = True
         _info("Spec Engine initialized successfully.")
 
     def _render_template(self, template_str: str | None, context_json: str | None) -> str | None:
-        """Render a MiniJinja template directly via Python - avoids re-entrant DuckDB deadlock."""
+        """
+        Render a MiniJinja template string.
+
+        Uses the engine's shared Python MiniJinja environment when the package is
+        installed, otherwise minijinja_render() on the side cursor. Neither touches
+        self.con, so this is safe to call from UDFs (re-entrant queries deadlock).
+        """
         if not template_str:
             return None
 
         context_json = context_json or "{}"
-        try:
-            from minijinja import Environment
-            env = Environment()
-            context = json.loads(context_json)
-            return env.render_str(template_str, **context)
-        except ImportError:
-            import duckdb as _duckdb
-            tmp = _duckdb.connect(self.db_path if self.db_path != ":memory:" else ":memory:")
+        env = self._minijinja_env()
+        if env is not None:
+            name = self._template_name(env, template_str)
+            return env.render_template(name, **json.loads(context_json))
+
+        with self._side_cursor() as cursor:
+            result = cursor.execute(
+                "SELECT minijinja_render(?, ?)",
+                [template_str, context_json],
+            ).fetchone()
+        return result[0] if result else None
+
+    def _minijinja_env(self) -> Any:
+        """Get the engine's shared minijinja.Environment, or None if the package is missing."""
+        if self._template_env is None:
             try:
-                tmp.execute("LOAD minijinja")
-                result = tmp.execute(
-                    "SELECT minijinja_render(?, ?)",
-                    [template_str, context_json],
-                ).fetchone()
-                return result[0] if result else None
-            finally:
-                tmp.close()
+                from minijinja import Environment
+            except ImportError:
+                self._template_env = False
+            else:
+                self._template_env = Environment()
+        return self._template_env or None
+
+    def _template_name(self, env: Any, template_str: str) -> str:
+        """Register template_str in env under its content hash (compiled once, LRU-bounded)."""
+        name = "t_" + hashlib.sha256(template_str.encode("utf-8")).hexdigest()[:32]
+        with self._template_lock:
+            if name in self._template_names:
+                self._template_names.move_to_end(name)
+                return name
+            env.add_template(name, template_str)
+            self._template_names[name] = None
+            if len(self._template_names) > TEMPLATE_CACHE_SIZE:
+                env.remove_template(self._template_names.popitem(last=False)[0])
+        return name
+
+    @contextmanager
+    def _side_cursor(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        """
+        Borrow the engine's pooled cursor for queries issued from inside UDFs.
+
+        A cursor is a separate connection to the same database, so it does not
+        deadlock on the query that invoked the UDF; it is created once, has the
+        minijinja extension loaded when available, and is used by one caller at a time.
+        """
+        with self._side_cursor_lock:
+            if self._side_cursor_con is None:
+                cursor = self.con.cursor()
+                try:
+                    cursor.execute("LOAD minijinja")
+                except Exception as e:
+                    log.debug("minijinja extension not available on side cursor: %s", e)
+                self._side_cursor_con = cursor
+            yield self._side_cursor_con
 
     def _get_template_str(
-        self, template_name: str, version: str | None = None
+        self,
+        template_name: str,
+        version: str | None = None,
+        *,
+        con: duckdb.DuckDBPyConnection | None = None,
     ) -> str | None:
         """Load template body by name (latest active) or by name+version. Returns None if not found."""
+        con = con or self.con
+        self._check_spec_data_version(con)
+        key = (template_name, version)
+        with self._template_lock:
+            if key in self._template_sources:
+                self._template_sources.move_to_end(key)
+                return self._template_sources[key]
         if version is not None:
-            result = self.con.execute(
+            result = con.execute(
                 """
                 SELECT p.payload->>'template'
                 FROM spec_objects o
@@ -121,31 +727,42 @@ class SpecEngine:
                 WHERE o.kind IN ('task_template', 'prompt_template')
                   AND o.name = ?
                   AND o.version = ?
+                ORDER BY o.id
                 LIMIT 1
                 """,
                 [template_name, version],
             ).fetchone()
         else:
-            result = self.con.execute(
-                """
-                SELECT p.payload->>'template'
-                FROM spec_objects o
-                JOIN spec_payloads p ON p.object_id = o.id
-                WHERE o.kind IN ('task_template', 'prompt_template')
-                  AND o.name = ?
-                  AND o.status = 'active'
-                ORDER BY o.version DESC
+            # Same order as the spec_get_template() macro when both kinds use the name
+            result = con.execute(
+                f"""
+                SELECT template FROM (
+                    SELECT p.payload->>'template' AS template, o.id, o.version
+                    FROM spec_latest l
+                    JOIN spec_objects o ON o.id = l.active_id
+                    JOIN spec_payloads p ON p.object_id = l.active_id
+                    WHERE l.kind IN ('task_template', 'prompt_template')
+                      AND l.name = ?
+                )
+                ORDER BY {_VERSION_ORDER_SQL}, id
                 LIMIT 1
                 """,
                 [template_name],
             ).fetchone()
-        return result[0] if result else None
+        template_str = result[0] if result else None
+        if template_str is not None:
+            with self._template_lock:
+                self._template_sources[key] = template_str
+                if len(self._template_sources) > TEMPLATE_CACHE_SIZE:
+                    self._template_sources.popitem(last=False)
+        return template_str
 
     def _register_internal_udfs(self) -> None:
         """Register internal helper UDFs used by SQL macros."""
 
         def spec_render_template_udf(template_name: str, context_json: str) -> str | None:
-            template_str = self._get_template_str(template_name)
+            with self._side_cursor() as cursor:
+                template_str = self._get_template_str(template_name, con=cursor)
             return self._render_template(template_str, context_json)
 
         def spec_render_template_version_udf(
@@ -153,7 +770,8 @@ class SpecEngine:
             version_name: str,
             context_json: str,
         ) -> str | None:
-            template_str = self._get_template_str(template_name, version_name)
+            with self._side_cursor() as cursor:
+                template_str = self._get_template_str(template_name, version_name, con=cursor)
             return self._render_template(template_str, context_json)
 
         def spec_render_direct_udf(template_str: str, context_json: str) -> str | None:
@@ -345,14 +963,16 @@ class SpecEngine:
                 FROM spec_objects o
                 LEFT JOIN spec_docs d ON d.object_id = o.id
                 LEFT JOIN spec_payloads p ON p.object_id = o.id
-                WHERE o.kind = ? AND o.name = ?
             """
             params = [kind, name]
             if version:
-                query += " AND o.version = ?"
+                query += " WHERE o.kind = ? AND o.name = ? AND o.version = ?"
                 params.append(version)
             else:
-                query += " ORDER BY o.version DESC"
+                query += """
+                    JOIN spec_latest l ON l.latest_id = o.id
+                    WHERE l.kind = ? AND l.name = ?
+                """
             query += " LIMIT 1"
             result = self.con.execute(query, params).fetchone()
         else:
@@ -398,7 +1018,8 @@ class SpecEngine:
 
         Splits multi-word queries so all words must match (AND logic), making
         'web search' find ddg_instant, brave_search etc. even when the words
-        are not adjacent in the summary.
+        are not adjacent in the summary. Without the fts extension, candidates
+        are pre-filtered through the spec_trigrams posting lists.
 
         Args:
             query: Search query (searches name, summary, and docs)
@@ -420,11 +1041,20 @@ class SpecEngine:
             for _ in words
         )
         kind_clause = "AND o.kind = ?" if kind else ""
+        trigram_clause = ""
+        trigram_params: list[Any] = []
+        if self._use_trigram_prefilter():
+            for w in words:
+                prefilter = self._trigram_prefilter("spec", "o.id", w)
+                if prefilter:
+                    trigram_clause += f" AND {prefilter[0]}"
+                    trigram_params.extend(prefilter[1])
         search_query = f"""
             SELECT DISTINCT o.id, o.kind, o.name, o.version, o.status, o.summary
             FROM spec_objects o
             LEFT JOIN spec_docs d ON d.object_id = o.id
             WHERE {word_clauses}
+            {trigram_clause}
             {kind_clause}
             ORDER BY
                 CASE WHEN LOWER(o.name) LIKE ? || '%' THEN 0 ELSE 1 END,
@@ -434,6 +1064,7 @@ class SpecEngine:
         params = []
         for w in words:
             params.extend([w, w, w])
+        params.extend(trigram_params)
         if kind:
             params.append(kind)
         params.extend([words[0], limit])
@@ -462,13 +1093,9 @@ class SpecEngine:
             if not template_str:
                 return {"error": f"Template '{template_name}' not found", "rendered": None}
 
-            # Render using minijinja
-            render_query = "SELECT minijinja_render(?, ?)"
-            context_json = json.dumps(context)
-            rendered = self.con.execute(render_query, [template_str, context_json]).fetchone()
-
-            if rendered:
-                return {"rendered": rendered[0]}
+            rendered = self._render_template(template_str, json.dumps(context))
+            if rendered is not None:
+                return {"rendered": rendered}
             return {"error": "Rendering failed", "rendered": None}
 
         except Exception as e:
@@ -491,82 +1118,193 @@ class SpecEngine:
         Returns:
             Dict with 'ok' boolean and 'errors' list
         """
+        return self.validate_many(kind, name, [payload])[0]
+
+    def validate_many(
+        self,
+        kind: str,
+        name: str,
+        payloads: list[Any],
+    ) -> list[dict[str, Any]]:
+        """
+        Validate many JSON payloads against one spec's schema.
+
+        The schema is resolved and compiled once; see _compiled_validator().
+
+        Args:
+            kind: Spec kind to validate against
+            name: Spec name (should be a 'schema' kind or have schema_ref)
+            payloads: JSON payloads (dicts or JSON strings)
+
+        Returns:
+            One dict with 'ok' boolean and 'errors' list per payload, in input order
+        """
         try:
-            # If kind is 'schema', use that directly
-            # Otherwise, look up the schema_ref
-            if kind == "schema":
-                schema_query = """
-                    SELECT p.payload
-                    FROM spec_objects o
-                    JOIN spec_payloads p ON p.object_id = o.id
-                    WHERE o.kind = 'schema'
-                      AND o.name = ?
-                      AND o.status = 'active'
-                    ORDER BY o.version DESC
-                    LIMIT 1
-                """
-                result = self.con.execute(schema_query, [name]).fetchone()
-            else:
-                # Get schema_ref from the spec
-                ref_query = """
-                    SELECT p.schema_ref
-                    FROM spec_objects o
-                    JOIN spec_payloads p ON p.object_id = o.id
-                    WHERE o.kind = ?
-                      AND o.name = ?
-                      AND o.status = 'active'
-                    ORDER BY o.version DESC
-                    LIMIT 1
-                """
-                ref_result = self.con.execute(ref_query, [kind, name]).fetchone()
-                if not ref_result or not ref_result[0]:
-                    return {"ok": True, "errors": [], "note": "No schema_ref defined for this spec"}
+            schema = self._resolve_schema(kind, name)
+            if "note" in schema:
+                return [{"ok": True, "errors": [], "note": schema["note"]} for _ in payloads]
+            if "error" in schema:
+                return [{"ok": False, "errors": [schema["error"]]} for _ in payloads]
+
+            validator = self._compiled_validator(schema["key"], schema["schema"])
+            if validator is None:
+                return self._validate_with_extension(schema["schema"], payloads)
+
+            results = []
+            for payload in payloads:
+                try:
+                    errors = validator(json.loads(payload) if isinstance(payload, str) else payload)
+                except json.JSONDecodeError as e:
+                    errors = [f"Invalid JSON payload: {e}"]
+                results.append({"ok": not errors, "errors": errors})
+            return results
+        except Exception as e:
+            return [{"ok": False, "errors": [str(e)]} for _ in payloads]
 
-                schema_ref = ref_result[0]
+    def _resolve_schema(self, kind: str, name: str) -> dict[str, Any]:
+        """
+        Find the active schema for a spec, cached until the spec data changes.
 
-                # Now get the actual schema
-                schema_query = """
-                    SELECT p.payload
-                    FROM spec_objects o
-                    JOIN spec_payloads p ON p.object_id = o.id
-                    WHERE o.kind = 'schema'
-                      AND o.name = ?
-                      AND o.status = 'active'
-                    ORDER BY o.version DESC
-                    LIMIT 1
+        Returns:
+            Dict with 'key' ((schema name, version)) and 'schema' (JSON text),
+            or 'note' when the spec has no schema_ref, or 'error'
+        """
+        self._check_spec_data_version()
+        cached = self._schema_lookups.get((kind, name))
+        if cached is not None:
+            return cached
+
+        schema_name = name
+        if kind != "schema":
+            ref_result = self.con.execute(
                 """
-                result = self.con.execute(schema_query, [schema_ref]).fetchone()
+                SELECT p.schema_ref
+                FROM spec_latest l
+                JOIN spec_payloads p ON p.object_id = l.active_id
+                WHERE l.kind = ?
+                  AND l.name = ?
+                """,
+                [kind, name],
+            ).fetchone()
+            if not ref_result or not ref_result[0]:
+                resolved: dict[str, Any] = {"note": "No schema_ref defined for this spec"}
+                self._schema_lookups[(kind, name)] = resolved
+                return resolved
+            schema_name = ref_result[0]
 
-            if not result or not result[0]:
-                return {"ok": False, "errors": [f"Schema not found: {name}"]}
+        result = self.con.execute(
+            """
+            SELECT o.version, p.payload
+            FROM spec_latest l
+            JOIN spec_objects o ON o.id = l.active_id
+            JOIN spec_payloads p ON p.object_id = o.id
+            WHERE l.kind = 'schema'
+              AND l.name = ?
+            """,
+            [schema_name],
+        ).fetchone()
+        if not result or not result[1]:
+            # Not cached: the schema may be created before the next call.
+            return {"error": f"Schema not found: {name}"}
+
+        resolved = {"key": (schema_name, result[0]), "schema": result[1]}
+        self._schema_lookups[(kind, name)] = resolved
+        return resolved
+
+    def _compiled_validator(
+        self, key: tuple[str, str], schema_text: str
+    ) -> Callable[[Any], list[str]] | None:
+        """
+        Get the compiled validator for a (schema name, version), building it on first use.
 
-            schema_json = result[0]
-            if isinstance(schema_json, str):
-                schema_json = json.loads(schema_json)
+        Uses the Python jsonschema package when installed; returns None otherwise,
+        in which case the json_schema extension validates instead.
+        """
+        if key in self._validators:
+            return self._validators[key]
+        try:
+            from jsonschema.validators import validator_for
+        except ImportError:
+            validator = None
+        else:
+            schema = json.loads(schema_text)
+            compiled = validator_for(schema)(schema)
 
-            # Validate using json_schema extension
-            validate_query = "SELECT json_schema_validate(?, ?)"
-            payload_json = json.dumps(payload)
-            schema_str = json.dumps(schema_json)
+            def validator(payload: Any) -> list[str]:
+                return [error.message for error in compiled.iter_errors(payload)]
 
-            validation_result = self.con.execute(
-                validate_query, [schema_str, payload_json]
-            ).fetchone()
+        self._validators[key] = validator
+        return validator
 
-            if validation_result and validation_result[0]:
-                # Non-empty result means validation errors
-                errors = validation_result[0]
-                if isinstance(errors, str):
-                    try:
-                        errors = json.loads(errors)
-                    except json.JSONDecodeError:
-                        errors = [errors]
-                return {"ok": False, "errors": errors if isinstance(errors, list) else [errors]}
+    def _validate_with_extension(
+        self, schema_text: str, payloads: list[Any]
+    ) -> list[dict[str, Any]]:
+        """Validate payloads in one json_schema_validate() pass."""
+        self._require_extension_loaded("json_schema", "Payload validation")
+        payload_json = [p if isinstance(p, str) else json.dumps(p) for p in payloads]
+        rows = self.con.execute(
+            """
+            SELECT json_schema_validate(?, payload)
+            FROM unnest(?::VARCHAR[]) WITH ORDINALITY AS t(payload, idx)
+            ORDER BY idx
+            """,
+            [schema_text, payload_json],
+        ).fetchall()
+
+        results = []
+        for (errors,) in rows:
+            # Non-empty result means validation errors
+            if not errors:
+                results.append({"ok": True, "errors": []})
+                continue
+            if isinstance(errors, str):
+                try:
+                    errors = json.loads(errors)
+                except json.JSONDecodeError:
+                    errors = [errors]
+            if not isinstance(errors, list):
+                errors = [errors]
+            results.append({"ok": False, "errors": errors})
+        return results
+
+    def invalidate_spec_caches(self) -> None:
+        """
+        Drop cached template sources, schema lookups and validators.
 
-            return {"ok": True, "errors": []}
+        Only needed after raw SQL edits of spec rows that leave
+        spec_objects.updated_at alone, or of spec_relationships rows in place;
+        other changes are picked up on their own. Also drops the cached
+        relationship adjacency.
+        """
+        self._invalidate_spec_caches()
+        self._relationship_graph = None
 
-        except Exception as e:
-            return {"ok": False, "errors": [str(e)]}
+    def _invalidate_spec_caches(self) -> None:
+        """Drop cached template sources, schema lookups and validators after a spec change."""
+        with self._template_lock:
+            self._template_sources.clear()
+        self._schema_lookups.clear()
+        self._validators.clear()
+
+    def _check_spec_data_version(self, con: duckdb.DuckDBPyConnection | None = None) -> None:
+        """
+        Drop cached template sources, schema lookups and validators if the spec data moved.
+
+        At most every SPEC_DATA_POLL_INTERVAL seconds the version key of the spec
+        rows (counts, highest ids, latest timestamps) is compared with the last
+        one seen. Writes by other engines sharing the database and raw SQL
+        inserts and deletes change it like the engine's own, so no entry outlives
+        the rows it was read from by more than one interval. Raw SQL edits that
+        leave spec_objects.updated_at alone need invalidate_spec_caches().
+        """
+        now = time.monotonic()
+        if now - self._spec_data_checked_at < SPEC_DATA_POLL_INTERVAL:
+            return
+        self._spec_data_checked_at = now
+        version = (con or self.con).execute(_SPEC_DATA_VERSION_SQL).fetchone()
+        if version != self._spec_data_version:
+            self._spec_data_version = version
+            self._invalidate_spec_caches()
 
     def mcp_query_remote(self, server: str, resource_uri: str) -> dict[str, Any]:
         """
@@ -692,26 +1430,7 @@ class SpecEngine:
             Dict with created spec id or error
         """
         try:
-            next_id = self._next_id("spec_objects_seq")
-
-            # Insert spec object
-            self.con.execute(
-                """
-                INSERT INTO spec_objects (id, kind, name, version, status, summary)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                [next_id, kind, name, version, status, summary],
-            )
-
-            # Insert doc if provided
-            if doc:
-                doc_id = self._next_id("spec_docs_seq")
-                self.con.execute(
-                    "INSERT INTO spec_docs (id, object_id, doc) VALUES (?, ?, ?)",
-                    [doc_id, next_id, doc],
-                )
-
-            # Insert payload if provided
+            payload_json = None
             if payload is not None:
                 if isinstance(payload, dict):
                     payload_json = json.dumps(payload)
@@ -726,13 +1445,40 @@ class SpecEngine:
                         "error": "payload must be a dict or a valid JSON string",
                         "created": False,
                     }
-                payload_id = self._next_id("spec_payloads_seq")
+
+            with self._transaction():
+                next_id = self._next_id("spec_objects_seq")
+
+                # Insert spec object
                 self.con.execute(
-                    "INSERT INTO spec_payloads (id, object_id, payload, schema_ref)"
-                    " VALUES (?, ?, ?, ?)",
-                    [payload_id, next_id, payload_json, schema_ref],
+                    """
+                    INSERT INTO spec_objects (id, kind, name, version, status, summary)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    [next_id, kind, name, version, status, summary],
                 )
 
+                # Insert doc if provided
+                if doc:
+                    doc_id = self._next_id("spec_docs_seq")
+                    self.con.execute(
+                        "INSERT INTO spec_docs (id, object_id, doc) VALUES (?, ?, ?)",
+                        [doc_id, next_id, doc],
+                    )
+
+                # Insert payload if provided
+                if payload_json is not None:
+                    payload_id = self._next_id("spec_payloads_seq")
+                    self.con.execute(
+                        "INSERT INTO spec_payloads (id, object_id, payload, schema_ref)"
+                        " VALUES (?, ?, ?, ?)",
+                        [payload_id, next_id, payload_json, schema_ref],
+                    )
+
+                self._log_spec_changes("insert", "SELECT ?::INTEGER", [next_id])
+                self._refresh_spec_latest("SELECT ?::VARCHAR, ?::VARCHAR", [kind, name])
+                self._reindex_spec_trigrams([next_id])
+            self._invalidate_spec_caches()
             return {"id": next_id, "created": True}
 
         except Exception as e:
@@ -777,78 +1523,90 @@ class SpecEngine:
                 updates.append("summary = ?")
                 params.append(summary)
 
-            if updates:
-                updates.append("updated_at = current_timestamp")
-                params.append(id)
-                self.con.execute(
-                    f"UPDATE spec_objects SET {', '.join(updates)} WHERE id = ?", params
-                )
-
-            if doc is not None:
-                existing = self.con.execute(
-                    "SELECT id FROM spec_docs WHERE object_id = ?", [id]
-                ).fetchone()
-                if existing:
-                    self.con.execute("UPDATE spec_docs SET doc = ? WHERE object_id = ?", [doc, id])
-                else:
-                    doc_id = self._next_id("spec_docs_seq")
+            with self._transaction():
+                if updates:
+                    updates.append("updated_at = current_timestamp")
+                    params.append(id)
                     self.con.execute(
-                        "INSERT INTO spec_docs (id, object_id, doc) VALUES (?, ?, ?)",
-                        [doc_id, id, doc],
+                        f"UPDATE spec_objects SET {', '.join(updates)} WHERE id = ?", params
                     )
-                self.con.execute(
-                    "UPDATE spec_objects SET updated_at = current_timestamp WHERE id = ?", [id]
-                )
 
-            if payload is not None:
-                payload_json = json.dumps(payload) if isinstance(payload, dict) else payload
-                existing = self.con.execute(
-                    "SELECT id FROM spec_payloads WHERE object_id = ?", [id]
-                ).fetchone()
-                if existing:
-                    if schema_ref is not None:
+                if doc is not None:
+                    existing = self.con.execute(
+                        "SELECT id FROM spec_docs WHERE object_id = ?", [id]
+                    ).fetchone()
+                    if existing:
                         self.con.execute(
-                            "UPDATE spec_payloads SET payload = ?, schema_ref = ? WHERE object_id = ?",
-                            [payload_json, schema_ref, id],
+                            "UPDATE spec_docs SET doc = ? WHERE object_id = ?", [doc, id]
                         )
                     else:
+                        doc_id = self._next_id("spec_docs_seq")
                         self.con.execute(
-                            "UPDATE spec_payloads SET payload = ? WHERE object_id = ?",
-                            [payload_json, id],
+                            "INSERT INTO spec_docs (id, object_id, doc) VALUES (?, ?, ?)",
+                            [doc_id, id, doc],
                         )
-                else:
-                    self.con.execute(
-                        "INSERT INTO spec_payloads (id, object_id, payload, schema_ref)"
-                        " VALUES (?, ?, ?, ?)",
-                        [self._next_id("spec_payloads_seq"), id, payload_json, schema_ref],
-                    )
-                self.con.execute(
-                    "UPDATE spec_objects SET updated_at = current_timestamp WHERE id = ?", [id]
-                )
-            elif schema_ref is not None:
-                existing = self.con.execute(
-                    "SELECT id FROM spec_payloads WHERE object_id = ?", [id]
-                ).fetchone()
-                if existing:
-                    self.con.execute(
-                        "UPDATE spec_payloads SET schema_ref = ? WHERE object_id = ?",
-                        [schema_ref, id],
-                    )
                     self.con.execute(
-                        "UPDATE spec_objects SET updated_at = current_timestamp WHERE id = ?",
-                        [id],
-                    )
-                else:
-                    self.con.execute(
-                        "INSERT INTO spec_payloads (id, object_id, payload, schema_ref)"
-                        " VALUES (?, ?, ?, ?)",
-                        [self._next_id("spec_payloads_seq"), id, "{}", schema_ref],
+                        "UPDATE spec_objects SET updated_at = current_timestamp WHERE id = ?", [id]
                     )
+
+                if payload is not None:
+                    payload_json = json.dumps(payload) if isinstance(payload, dict) else payload
+                    existing = self.con.execute(
+                        "SELECT id FROM spec_payloads WHERE object_id = ?", [id]
+                    ).fetchone()
+                    if existing:
+                        if schema_ref is not None:
+                            self.con.execute(
+                                "UPDATE spec_payloads SET payload = ?, schema_ref = ? WHERE object_id = ?",
+                                [payload_json, schema_ref, id],
+                            )
+                        else:
+                            self.con.execute(
+                                "UPDATE spec_payloads SET payload = ? WHERE object_id = ?",
+                                [payload_json, id],
+                            )
+                    else:
+                        self.con.execute(
+                            "INSERT INTO spec_payloads (id, object_id, payload, schema_ref)"
+                            " VALUES (?, ?, ?, ?)",
+                            [self._next_id("spec_payloads_seq"), id, payload_json, schema_ref],
+                        )
                     self.con.execute(
-                        "UPDATE spec_objects SET updated_at = current_timestamp WHERE id = ?",
-                        [id],
+                        "UPDATE spec_objects SET updated_at = current_timestamp WHERE id = ?", [id]
                     )
+                elif schema_ref is not None:
+                    existing = self.con.execute(
+                        "SELECT id FROM spec_payloads WHERE object_id = ?", [id]
+                    ).fetchone()
+                    if existing:
+                        self.con.execute(
+                            "UPDATE spec_payloads SET schema_ref = ? WHERE object_id = ?",
+                            [schema_ref, id],
+                        )
+                        self.con.execute(
+                            "UPDATE spec_objects SET updated_at = current_timestamp WHERE id = ?",
+                            [id],
+                        )
+                    else:
+                        self.con.execute(
+                            "INSERT INTO spec_payloads (id, object_id, payload, schema_ref)"
+                            " VALUES (?, ?, ?, ?)",
+                            [self._next_id("spec_payloads_seq"), id, "{}", schema_ref],
+                        )
+                        self.con.execute(
+                            "UPDATE spec_objects SET updated_at = current_timestamp WHERE id = ?",
+                            [id],
+                        )
 
+                if updates or doc is not None or payload is not None or schema_ref is not None:
+                    self._log_spec_changes("update", "SELECT ?::INTEGER", [id])
+                if version or status:
+                    self._refresh_spec_latest(
+                        "SELECT kind, name FROM spec_objects WHERE id = ?", [id]
+                    )
+                if summary or doc is not None:
+                    self._reindex_spec_trigrams([id])
+            self._invalidate_spec_caches()
             return {"updated": True}
 
         except Exception as e:
@@ -865,603 +1623,4676 @@ class SpecEngine:
             Dict with success status or error
         """
         try:
-            # Delete dependent records first (no FK CASCADE in schema)
-            self.con.execute("DELETE FROM spec_feedback WHERE spec_id = ?", [id])
-            self.con.execute("DELETE FROM spec_adaptations WHERE spec_id = ?", [id])
-            self.con.execute(
-                "DELETE FROM spec_relationships WHERE from_id = ? OR to_id = ?", [id, id]
-            )
-            self.con.execute("DELETE FROM spec_docs WHERE object_id = ?", [id])
-            self.con.execute("DELETE FROM spec_payloads WHERE object_id = ?", [id])
-            self.con.execute("DELETE FROM spec_objects WHERE id = ?", [id])
+            # Write buffered feedback out so it is deleted below rather than re-inserted later
+            self.flush_usage()
+            pair = self.con.execute(
+                "SELECT kind, name FROM spec_objects WHERE id = ?", [id]
+            ).fetchone()
+            with self._transaction():
+                self._log_spec_changes("delete", "SELECT ?::INTEGER", [id])
+                # Delete dependent records first (no FK CASCADE in schema)
+                self.con.execute("DELETE FROM spec_feedback WHERE spec_id = ?", [id])
+                self.con.execute("DELETE FROM spec_usage_hourly WHERE spec_id = ?", [id])
+                self.con.execute("DELETE FROM spec_adaptations WHERE spec_id = ?", [id])
+                self.con.execute(
+                    "DELETE FROM spec_relationships WHERE from_id = ? OR to_id = ?", [id, id]
+                )
+                self.con.execute("DELETE FROM spec_docs WHERE object_id = ?", [id])
+                self.con.execute("DELETE FROM spec_payloads WHERE object_id = ?", [id])
+                self.con.execute("DELETE FROM spec_objects WHERE id = ?", [id])
+                if pair:
+                    self._refresh_spec_latest("SELECT ?::VARCHAR, ?::VARCHAR", list(pair))
+                self._drop_trigrams("spec", [id])
+            self._invalidate_spec_caches()
+            self._relationship_graph = None
             return {"deleted": True}
         except Exception as e:
             return {"error": str(e), "deleted": False}
 
     # =========================================================================
-    # Utility Methods
+    # Bulk Import / Export
     # =========================================================================
 
-    def get_stats(self) -> dict[str, Any]:
-        """Get statistics about the Spec Engine."""
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Run the enclosed statements in one transaction, joining an open one."""
+        if self._in_transaction:
+            yield
+            return
+        self.con.execute("BEGIN TRANSACTION")
+        self._in_transaction = True
         try:
-            stats_query = """
-                SELECT
-                    kind,
-                    COUNT(*) AS total,
-                    COUNT(*) FILTER (WHERE status = 'active') AS active,
-                    COUNT(*) FILTER (WHERE status = 'draft') AS draft,
-                    COUNT(*) FILTER (WHERE status = 'deprecated') AS deprecated
-                FROM spec_objects
-                GROUP BY kind
-                ORDER BY kind
-            """
-            result = self.con.execute(stats_query).fetchall()
-            stats = {}
-            for row in result:
-                stats[row[0]] = {
-                    "total": row[1],
-                    "active": row[2],
-                    "draft": row[3],
-                    "deprecated": row[4],
-                }
-            return {"specs_by_kind": stats}
-        except Exception as e:
-            return {"error": str(e)}
+            yield
+            try:
+                # COMMIT of an aborted transaction silently rolls back; detect it first.
+                self.con.execute("SELECT 1")
+            except duckdb.TransactionException as e:
+                raise RuntimeError(
+                    "A statement in the transaction failed; all changes were rolled back"
+                ) from e
+        except BaseException:
+            self.con.execute("ROLLBACK")
+            self._spec_changes_logged = False
+            raise
+        else:
+            self.con.execute("COMMIT")
+        finally:
+            self._in_transaction = False
+        if self._spec_changes_logged:
+            self._spec_changes_logged = False
+            self._mirror_spec_changes()
+
+    def spec_bulk_upsert(self, records: Any) -> dict[str, Any]:
+        """
+        Insert or update many specs in a single transaction.
 
-    def get_loaded_extensions(self) -> list[str]:
-        """Get list of loaded DuckDB extensions."""
+        Records are matched on (kind, name, version). Fields left as None keep their
+        current value on existing specs; for duplicate keys the last record wins.
+
+        Args:
+            records: Iterable of dicts using the spec_create() field names,
+                or a pyarrow Table with (a subset of) SPEC_BULK_COLUMNS
+
+        Returns:
+            Dict with inserted/updated counts or error
+        """
         try:
-            result = self.con.execute(
-                "SELECT extension_name FROM duckdb_extensions() WHERE loaded = true"
-            ).fetchall()
-            return [row[0] for row in result]
+            if hasattr(records, "num_rows") and hasattr(records, "schema"):
+                self.con.register("spec_bulk_arrow", records)
+                try:
+                    return self._bulk_merge("SELECT * FROM spec_bulk_arrow", [])
+                finally:
+                    self.con.unregister("spec_bulk_arrow")
+
+            columns: dict[str, list[Any]] = {col: [] for col in SPEC_BULK_COLUMNS}
+            for record in records:
+                for col in SPEC_BULK_COLUMNS:
+                    value = record.get(col)
+                    if col == "payload":
+                        value = self._serialize_json_field(value)
+                    columns[col].append(value)
+            # Registered column arrays scan far faster than list parameters.
+            self.con.register(
+                "spec_bulk_rows",
+                {col: np.array(values, dtype=object) for col, values in columns.items()},
+            )
+            try:
+                return self._bulk_merge("SELECT * FROM spec_bulk_rows", [])
+            finally:
+                self.con.unregister("spec_bulk_rows")
         except Exception as e:
-            log.error("Error getting extensions: %s", e)
-            return []
+            return {"error": str(e), "inserted": 0, "updated": 0}
 
-    def get_spec_kinds(self) -> list[str]:
-        """Get list of all spec kinds in use."""
-        try:
-            result = self.con.execute(
-                "SELECT DISTINCT kind FROM spec_objects ORDER BY kind"
-            ).fetchall()
-            return [row[0] for row in result]
-        except Exception:
-            return []
-
-    def is_initialized(self) -> bool:
-        """Check if the Spec Engine is initialized."""
-        return self._initialized
-
-    def _serialize_json_field(self, value: Any) -> str | None:
-        """Serialize JSON-like values while leaving strings untouched."""
-        if value is None or isinstance(value, str):
-            return value
-        return json.dumps(value)
+    def spec_import(self, path: str) -> dict[str, Any]:
+        """
+        Bulk upsert specs from a JSONL or Parquet file (see spec_bulk_upsert()).
 
-    def _require_extension_loaded(self, extension_name: str, feature_name: str) -> None:
-        """Raise a clear error when an optional extension is required at runtime."""
-        if is_extension_loaded(self.con, extension_name):
-            return
-        raise RuntimeError(
-            f"{feature_name} requires the DuckDB '{extension_name}' extension to be loaded."
-        )
+        Args:
+            path: File path ending in .parquet, otherwise read as JSON lines
 
-    # =========================================================================
-    # Meta-Learning Methods (Self-Improvement)
-    # =========================================================================
+        Returns:
+            Dict with inserted/updated counts or error
+        """
+        try:
+            if path.endswith(".parquet"):
+                return self._bulk_merge("SELECT * FROM read_parquet(?)", [path])
+            json_columns = ", ".join(
+                f"{col}: '{'JSON' if col == 'payload' else 'VARCHAR'}'"
+                for col in SPEC_BULK_COLUMNS
+            )
+            return self._bulk_merge(
+                f"SELECT * FROM read_json(?, format = 'newline_delimited', "
+                f"columns = {{{json_columns}}})",
+                [path],
+            )
+        except Exception as e:
+            return {"error": str(e), "inserted": 0, "updated": 0}
 
-    def record_usage(self, spec_id: int, was_success: bool) -> dict[str, Any]:
+    def spec_export(self, path: str, kind: str | None = None) -> dict[str, Any]:
         """
-        Record that a spec was used and whether it was successful.
-        Updates use_count and success_rate.
+        Export specs (with doc and payload) to a JSONL or Parquet file.
 
         Args:
-            spec_id: ID of the spec that was used
-            was_success: Whether the usage was successful
+            path: File path ending in .parquet, otherwise written as JSON lines
+            kind: Optional kind filter
 
         Returns:
-            Dict with updated stats
+            Dict with the number of exported specs or error
         """
         try:
-            # Get current values
-            result = self.con.execute(
-                "SELECT use_count, success_rate FROM spec_objects WHERE id = ?", [spec_id]
+            parquet = path.endswith(".parquet")
+            payload_expr = "p.payload" if parquet else "p.payload::JSON"
+            query = f"""
+                SELECT
+                    o.kind, o.name, o.version, o.status, o.summary,
+                    d.doc, {payload_expr} AS payload, p.schema_ref
+                FROM spec_objects o
+                LEFT JOIN spec_docs d ON d.object_id = o.id
+                LEFT JOIN spec_payloads p ON p.object_id = o.id
+                WHERE ?::VARCHAR IS NULL OR o.kind = ?
+                ORDER BY o.kind, o.name, o.version
+            """
+            target = path.replace("'", "''")
+            fmt = "PARQUET" if parquet else "JSON"
+            # COPY returns the number of rows written
+            count = self.con.execute(
+                f"COPY ({query}) TO '{target}' (FORMAT {fmt})", [kind or None, kind or None]
+            ).fetchone()[0]
+            return {"exported": count, "path": path}
+        except Exception as e:
+            return {"error": str(e), "exported": 0}
+
+    def _bulk_merge(self, source_sql: str, params: list[Any]) -> dict[str, Any]:
+        """Stage rows from source_sql and merge them into objects, docs and payloads."""
+        source_types = {
+            row[0]: row[1] for row in self.con.execute(f"DESCRIBE {source_sql}", params).fetchall()
+        }
+        select = []
+        for col in SPEC_BULK_COLUMNS:
+            col_type = source_types.get(col)
+            if col_type is None:
+                expr = "NULL::VARCHAR"
+            elif col == "payload" and col_type not in ("VARCHAR", "JSON"):
+                expr = "to_json(payload)::VARCHAR"
+            else:
+                expr = f"{col}::VARCHAR"
+            if col == "version":
+                expr = f"COALESCE({expr}, '1.0.0')"
+            select.append(f"{expr} AS {col}")
+
+        self.con.execute(
+            f"""
+            CREATE OR REPLACE TEMP TABLE spec_bulk_staging AS
+            SELECT * EXCLUDE (ord), NULL::INTEGER AS existing_id
+            FROM (SELECT {", ".join(select)}, row_number() OVER () AS ord FROM ({source_sql}))
+            QUALIFY row_number() OVER (PARTITION BY kind, name, version ORDER BY ord DESC) = 1
+            """,
+            params,
+        )
+        try:
+            problems = self.con.execute(
+                """
+                SELECT
+                    COUNT(*) FILTER (WHERE kind IS NULL OR name IS NULL),
+                    COUNT(*) FILTER (WHERE payload IS NOT NULL AND NOT json_valid(payload)),
+                    COUNT(*) FILTER (WHERE summary IS NULL AND NOT EXISTS (
+                        SELECT 1 FROM spec_objects o
+                        WHERE o.kind = s.kind AND o.name = s.name AND o.version = s.version
+                    ))
+                FROM spec_bulk_staging s
+                """
             ).fetchone()
+            if problems[0]:
+                raise ValueError(f"{problems[0]} record(s) missing kind or name")
+            if problems[1]:
+                raise ValueError(f"{problems[1]} record(s) with a payload that is not valid JSON")
+            if problems[2]:
+                raise ValueError(f"{problems[2]} new record(s) missing summary")
+
+            with self._transaction():
+                self.con.execute(
+                    """
+                    UPDATE spec_bulk_staging s SET existing_id = o.id
+                    FROM spec_objects o
+                    WHERE o.kind = s.kind AND o.name = s.name AND o.version = s.version
+                    """
+                )
+                total, updated = self.con.execute(
+                    "SELECT COUNT(*), COUNT(existing_id) FROM spec_bulk_staging"
+                ).fetchone()
+                self.con.execute(
+                    """
+                    UPDATE spec_objects o
+                    SET status = COALESCE(s.status, o.status),
+                        summary = COALESCE(s.summary, o.summary),
+                        updated_at = current_timestamp
+                    FROM spec_bulk_staging s
+                    WHERE o.kind = s.kind AND o.name = s.name AND o.version = s.version
+                    """
+                )
+                self.con.execute(
+                    """
+                    INSERT INTO spec_objects (id, kind, name, version, status, summary)
+                    SELECT
+                        nextval('spec_objects_seq'), s.kind, s.name, s.version,
+                        COALESCE(s.status, 'draft'), s.summary
+                    FROM spec_bulk_staging s
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM spec_objects o
+                        WHERE o.kind = s.kind AND o.name = s.name AND o.version = s.version
+                    )
+                    """
+                )
+                self.con.execute(
+                    """
+                    CREATE OR REPLACE TEMP TABLE spec_bulk_targets AS
+                    SELECT o.id AS object_id, s.doc, s.payload, s.schema_ref
+                    FROM spec_bulk_staging s
+                    JOIN spec_objects o
+                      ON o.kind = s.kind AND o.name = s.name AND o.version = s.version
+                    """
+                )
+                self._merge_bulk_targets()
+                self._log_spec_changes(
+                    "update",
+                    "SELECT existing_id FROM spec_bulk_staging WHERE existing_id IS NOT NULL",
+                )
+                self._log_spec_changes(
+                    "insert",
+                    """
+                    SELECT o.id FROM spec_bulk_staging s
+                    JOIN spec_objects o
+                      ON o.kind = s.kind AND o.name = s.name AND o.version = s.version
+                    WHERE s.existing_id IS NULL
+                    """,
+                )
+                self._refresh_spec_latest("SELECT DISTINCT kind, name FROM spec_bulk_staging")
+                self._reindex_spec_trigrams(id_query="SELECT object_id FROM spec_bulk_targets")
+        finally:
+            self.con.execute("DROP TABLE IF EXISTS spec_bulk_staging")
+            self.con.execute("DROP TABLE IF EXISTS spec_bulk_targets")
+
+        self._invalidate_spec_caches()
+        return {"inserted": total - updated, "updated": updated}
+
+    def _merge_bulk_targets(self) -> None:
+        """Apply doc/payload/schema_ref of the spec_bulk_targets temp table (NULL = keep)."""
+        self.con.execute(
+            """
+            UPDATE spec_docs d SET doc = t.doc
+            FROM spec_bulk_targets t
+            WHERE d.object_id = t.object_id AND t.doc IS NOT NULL
+            """
+        )
+        self.con.execute(
+            """
+            INSERT INTO spec_docs (id, object_id, doc)
+            SELECT nextval('spec_docs_seq'), t.object_id, t.doc
+            FROM spec_bulk_targets t
+            WHERE t.doc IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM spec_docs d WHERE d.object_id = t.object_id)
+            """
+        )
+        self.con.execute(
+            """
+            UPDATE spec_payloads p
+            SET payload = COALESCE(t.payload, p.payload),
+                schema_ref = COALESCE(t.schema_ref, p.schema_ref)
+            FROM spec_bulk_targets t
+            WHERE p.object_id = t.object_id
+              AND (t.payload IS NOT NULL OR t.schema_ref IS NOT NULL)
+            """
+        )
+        self.con.execute(
+            """
+            INSERT INTO spec_payloads (id, object_id, payload, schema_ref)
+            SELECT nextval('spec_payloads_seq'), t.object_id,
+                   COALESCE(t.payload, '{}'), t.schema_ref
+            FROM spec_bulk_targets t
+            WHERE (t.payload IS NOT NULL OR t.schema_ref IS NOT NULL)
+              AND NOT EXISTS (
+                  SELECT 1 FROM spec_payloads p WHERE p.object_id = t.object_id
+              )
+            """
+        )
 
-            if not result:
-                return {"error": f"Spec {spec_id} not found"}
+    # =========================================================================
+    # Batch Mutations
+    # =========================================================================
 
-            use_count, success_rate = result
+    @contextmanager
+    def batch(self) -> Iterator["SpecEngine"]:
+        """
+        Group Spec Engine mutations into a single transaction.
 
-            # Calculate new success rate
-            if use_count == 0:
-                new_success_rate = 1.0 if was_success else 0.0
-            else:
-                new_success_rate = (success_rate * use_count + (1.0 if was_success else 0.0)) / (
-                    use_count + 1
-                )
+        Usage:
+            with engine.batch():
+                engine.spec_update(10, status="active")
+                engine.spec_delete(11)
 
-            # Update
-            self.con.execute(
-                """
-                UPDATE spec_objects
-                SET use_count = use_count + 1,
-                    success_rate = ?,
-                    updated_at = current_timestamp
-                WHERE id = ?
-                """,
-                [new_success_rate, spec_id],
+        All changes commit together on exit. If the block raises, or any statement
+        inside it failed, everything is rolled back and the error propagates.
+        """
+        with self._transaction():
+            yield self
+
+    def spec_update_many(self, changes: list[dict[str, Any]]) -> dict[str, Any]:
+        """
+        Update many specs in one transaction with set-based statements.
+
+        Args:
+            changes: Dicts with an "id" plus any spec_update() fields
+                (version, status, summary, doc, payload, schema_ref); None keeps the
+                current value and for duplicate IDs the last change wins
+
+        Returns:
+            Dict with updated count and the IDs that were not found, or error
+        """
+        try:
+            columns: dict[str, list[Any]] = {col: [] for col in _SPEC_UPDATE_COLUMNS}
+            for change in changes:
+                if change.get("id") is None:
+                    raise ValueError("Every change needs an 'id'")
+                for col in _SPEC_UPDATE_COLUMNS:
+                    value = change.get(col)
+                    if col == "payload":
+                        value = self._serialize_json_field(value)
+                    columns[col].append(value)
+            if not columns["id"]:
+                return {"updated": 0, "missing": []}
+
+            self.con.register(
+                "spec_update_rows",
+                {col: np.array(values, dtype=object) for col, values in columns.items()},
             )
+            try:
+                self.con.execute(
+                    """
+                    CREATE OR REPLACE TEMP TABLE spec_update_staging AS
+                    SELECT * EXCLUDE (ord)
+                    FROM (
+                        SELECT
+                            CAST(id AS INTEGER) AS id,
+                            NULLIF(version::VARCHAR, '') AS version,
+                            NULLIF(status::VARCHAR, '') AS status,
+                            NULLIF(summary::VARCHAR, '') AS summary,
+                            doc::VARCHAR AS doc,
+                            payload::VARCHAR AS payload,
+                            schema_ref::VARCHAR AS schema_ref,
+                            row_number() OVER () AS ord
+                        FROM spec_update_rows
+                    )
+                    QUALIFY row_number() OVER (PARTITION BY id ORDER BY ord DESC) = 1
+                    """
+                )
+            finally:
+                self.con.unregister("spec_update_rows")
 
-            return {
-                "spec_id": spec_id,
-                "use_count": use_count + 1,
-                "success_rate": new_success_rate,
-            }
+            try:
+                invalid = self.con.execute(
+                    """
+                    SELECT COUNT(*) FROM spec_update_staging
+                    WHERE payload IS NOT NULL AND NOT json_valid(payload)
+                    """
+                ).fetchone()[0]
+                if invalid:
+                    raise ValueError(f"{invalid} change(s) with a payload that is not valid JSON")
+
+                staged = self.con.execute(
+                    "SELECT COUNT(*) FROM spec_update_staging"
+                ).fetchone()[0]
+                missing = [
+                    row[0]
+                    for row in self.con.execute(
+                        """
+                        SELECT s.id FROM spec_update_staging s
+                        WHERE NOT EXISTS (SELECT 1 FROM spec_objects o WHERE o.id = s.id)
+                        ORDER BY s.id
+                        """
+                    ).fetchall()
+                ]
+                with self._transaction():
+                    self.con.execute(
+                        """
+                        UPDATE spec_objects o
+                        SET version = COALESCE(s.version, o.version),
+                            status = COALESCE(s.status, o.status),
+                            summary = COALESCE(s.summary, o.summary),
+                            updated_at = current_timestamp
+                        FROM spec_update_staging s
+                        WHERE o.id = s.id
+                        """
+                    )
+                    self.con.execute(
+                        """
+                        CREATE OR REPLACE TEMP TABLE spec_bulk_targets AS
+                        SELECT s.id AS object_id, s.doc, s.payload, s.schema_ref
+                        FROM spec_update_staging s
+                        JOIN spec_objects o ON o.id = s.id
+                        """
+                    )
+                    self._merge_bulk_targets()
+                    self._log_spec_changes("update", "SELECT id FROM spec_update_staging")
+                    self._refresh_spec_latest(
+                        """
+                        SELECT kind, name FROM spec_objects
+                        WHERE id IN (SELECT id FROM spec_update_staging)
+                        """
+                    )
+                    self._reindex_spec_trigrams(
+                        id_query="""
+                            SELECT id FROM spec_update_staging
+                            WHERE summary IS NOT NULL OR doc IS NOT NULL
+                        """
+                    )
+            finally:
+                self.con.execute("DROP TABLE IF EXISTS spec_update_staging")
+                self.con.execute("DROP TABLE IF EXISTS spec_bulk_targets")
 
+            self._invalidate_spec_caches()
+            return {"updated": staged - len(missing), "missing": missing}
         except Exception as e:
-            return {"error": str(e)}
+            return {"error": str(e), "updated": 0}
 
-    def record_feedback(
-        self,
-        spec_id: int,
-        feedback_type: str,
-        score: float = 0.0,
-        context: dict | None = None,
-        outcome: dict | None = None,
-        notes: str | None = None,
-        session_id: str | None = None,
-    ) -> dict[str, Any]:
+    def spec_delete_many(self, ids: list[int]) -> dict[str, Any]:
         """
-        Record feedback on a spec's usage.
+        Delete many specs and their dependent rows in one transaction.
 
         Args:
-            spec_id: ID of the spec
-            feedback_type: Type of feedback ('success', 'failure', 'error', 'user_correction')
-            score: Numeric score (-1.0 to 1.0)
-            context: JSON context of the usage
-            outcome: JSON outcome/result
-            notes: Human-readable notes
-            session_id: Session ID
+            ids: Spec IDs to delete (unknown IDs are ignored)
 
         Returns:
-            Dict with feedback ID
+            Dict with the number of deleted specs or error
         """
         try:
-            feedback_id = self._next_id("spec_feedback_seq")
+            if not ids:
+                return {"deleted": 0}
+            # Write buffered feedback out so it is deleted below rather than re-inserted later
+            self.flush_usage()
+            self.con.register("spec_delete_ids", {"id": np.asarray(ids, dtype=np.int64)})
+            try:
+                with self._transaction():
+                    self.con.execute(
+                        """
+                        CREATE OR REPLACE TEMP TABLE spec_delete_pairs AS
+                        SELECT DISTINCT kind, name FROM spec_objects
+                        WHERE id IN (SELECT id FROM spec_delete_ids)
+                        """
+                    )
+                    deleted = self.con.execute(
+                        """
+                        SELECT COUNT(*) FROM spec_objects
+                        WHERE id IN (SELECT id FROM spec_delete_ids)
+                        """
+                    ).fetchone()[0]
+                    self._log_spec_changes("delete", "SELECT id FROM spec_delete_ids")
+                    # Dependent records first (no FK CASCADE in schema)
+                    for table, column in (
+                        ("spec_feedback", "spec_id"),
+                        ("spec_usage_hourly", "spec_id"),
+                        ("spec_adaptations", "spec_id"),
+                        ("spec_relationships", "from_id"),
+                        ("spec_relationships", "to_id"),
+                        ("spec_docs", "object_id"),
+                        ("spec_payloads", "object_id"),
+                        ("spec_objects", "id"),
+                    ):
+                        self.con.execute(
+                            f"DELETE FROM {table} "
+                            f"WHERE {column} IN (SELECT id FROM spec_delete_ids)"
+                        )
+                    self.con.execute(
+                        """
+                        DELETE FROM spec_trigrams
+                        WHERE source = 'spec'
+                          AND row_key IN (SELECT CAST(id AS VARCHAR) FROM spec_delete_ids)
+                        """
+                    )
+                    self._refresh_spec_latest("SELECT kind, name FROM spec_delete_pairs")
+            finally:
+                self.con.unregister("spec_delete_ids")
+                self.con.execute("DROP TABLE IF EXISTS spec_delete_pairs")
+            self._invalidate_spec_caches()
+            self._relationship_graph = None
+            return {"deleted": deleted}
+        except Exception as e:
+            return {"error": str(e), "deleted": 0}
 
-            self.con.execute(
-                """
-                INSERT INTO spec_feedback
-                    (id, spec_id, session_id, feedback_type,
-                     context, outcome, score, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                [
-                    feedback_id,
-                    spec_id,
-                    session_id,
-                    feedback_type,
-                    json.dumps(context) if context else None,
-                    json.dumps(outcome) if outcome else None,
-                    score,
-                    notes,
-                ],
-            )
+    # =========================================================================
+    # Latest Version Index
+    # =========================================================================
+
+    def _refresh_spec_latest(
+        self, pairs_sql: str | None = None, params: list[Any] | None = None
+    ) -> None:
+        """
+        Recompute spec_latest rows, set-based.
+
+        Args:
+            pairs_sql: SELECT yielding the (kind, name) pairs to refresh (all if None)
+            params: Parameters for pairs_sql
+        """
+        params = params or []
+        scope = ""
+        if pairs_sql is None:
+            self.con.execute("DELETE FROM spec_latest")
+        else:
+            scope = f"WHERE (kind, name) IN ({pairs_sql})"
+            self.con.execute(f"DELETE FROM spec_latest {scope}", params)
+        self.con.execute(
+            f"""
+            INSERT INTO spec_latest (kind, name, latest_id, active_id)
+            SELECT
+                kind, name,
+                first(id ORDER BY {_VERSION_ORDER_SQL}),
+                first(id ORDER BY {_VERSION_ORDER_SQL}) FILTER (WHERE status = 'active')
+            FROM spec_objects
+            {scope}
+            GROUP BY kind, name
+            """,
+            params,
+        )
 
-            # Also update usage stats
-            was_success = feedback_type == "success" or score > 0.5
-            self.record_usage(spec_id, was_success)
+    def rebuild_spec_latest(self) -> dict[str, Any]:
+        """
+        Rebuild the spec_latest index from spec_objects.
 
-            return {"feedback_id": feedback_id}
+        Needed only after specs were written with raw SQL instead of the engine.
 
+        Returns:
+            Dict with the number of (kind, name) entries
+        """
+        try:
+            with self._transaction():
+                self._refresh_spec_latest()
+            self._invalidate_spec_caches()
+            count = self.con.execute("SELECT COUNT(*) FROM spec_latest").fetchone()[0]
+            return {"rebuilt": count}
         except Exception as e:
             return {"error": str(e)}
 
-    def create_relationship(
-        self,
-        from_id: int,
-        to_id: int,
-        rel_type: str,
-        metadata: dict | None = None,
-    ) -> dict[str, Any]:
+    # =========================================================================
+    # Change Feed (CDC)
+    # =========================================================================
+
+    @property
+    def change_origin(self) -> str:
         """
-        Create a relationship between two specs.
+        Identifier of this database in lake.spec_changes (sequence numbers are per origin).
 
-        Args:
-            from_id: Source spec ID
-            to_id: Target spec ID
-            rel_type: Relationship type
-                ('uses', 'extends', 'requires', 'implements', 'derived_from')
-            metadata: Optional metadata about the relationship
+        Ends in the spec_change_log id created with the database, so a recreated
+        file or another in-memory database never reuses an earlier origin.
+        """
+        if self._change_origin is None:
+            log_id = self.con.execute("SELECT log_id FROM spec_change_log").fetchone()[0]
+            label = "memory" if self.db_path == ":memory:" else Path(self.db_path).resolve()
+            self._change_origin = f"{socket.gethostname()}:{label}:{log_id}"
+        return self._change_origin
+
+    def _log_spec_changes(self, op: str, id_query: str, params: list[Any] | None = None) -> None:
+        """
+        Append one spec_changes row per spec in id_query.
+
+        Runs inside the mutating transaction; for deletes call it before the rows go.
+        """
+        self._spec_changes_logged = True
+        self.con.execute(
+            f"""
+            INSERT INTO spec_changes (seq, spec_id, kind, name, version, op)
+            SELECT nextval('spec_changes_seq'), id, kind, name, version, ?
+            FROM (
+                SELECT id, kind, name, version FROM spec_objects
+                WHERE id IN ({id_query})
+                ORDER BY id
+            )
+            """,
+            [op, *(params or [])],
+        )
+
+    def _log_reseed(self) -> None:
+        """
+        Log the schema reload that recreated the spec tables as one 'reseed' change.
+
+        Spec ids restart with the seed data, so consumers of the feed drop what they
+        derived from earlier changes instead of matching them by id.
+        """
+        self.con.execute(
+            "INSERT INTO spec_changes (seq, op) VALUES (nextval('spec_changes_seq'), 'reseed')"
+        )
+        self._invalidate_spec_caches()
+        self._mirror_spec_changes()
+
+    def _mirror_spec_changes(self) -> int:
+        """
+        Copy committed spec_changes rows to lake.spec_changes.
+
+        Called after each engine commit that logged spec changes. Failures are
+        logged and retried on the next one, since the local log stays the source
+        of truth.
 
         Returns:
-            Dict with relationship ID
+            Number of rows mirrored
         """
+        if not self._lake_attached():
+            return 0
+        origin = self.change_origin
         try:
-            rel_id = self._next_id("spec_relationships_seq")
-
+            if self._changes_mirrored_seq is None:
+                self._changes_mirrored_seq = self.con.execute(
+                    "SELECT COALESCE(MAX(seq), 0) FROM lake.spec_changes WHERE origin = ?",
+                    [origin],
+                ).fetchone()[0]
+            latest = self.con.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM spec_changes"
+            ).fetchone()[0]
+            if latest <= self._changes_mirrored_seq:
+                return 0
             self.con.execute(
                 """
-                INSERT INTO spec_relationships (id, from_id, to_id, rel_type, metadata)
-                VALUES (?, ?, ?, ?, ?)
-                ON CONFLICT (from_id, to_id, rel_type) DO UPDATE SET metadata = EXCLUDED.metadata
+                INSERT INTO lake.spec_changes
+                    (origin, seq, spec_id, kind, name, version, op, changed_at)
+                SELECT ?, seq, spec_id, kind, name, version, op, changed_at
+                FROM spec_changes
+                WHERE seq > ? AND seq <= ?
+                ORDER BY seq
                 """,
-                [rel_id, from_id, to_id, rel_type, json.dumps(metadata) if metadata else None],
+                [origin, self._changes_mirrored_seq, latest],
             )
+            mirrored = latest - self._changes_mirrored_seq
+            self._changes_mirrored_seq = latest
+            return mirrored
+        except Exception as e:
+            log.debug("Mirroring spec_changes to DuckLake failed: %s", e)
+            return 0
 
-            return {"relationship_id": rel_id}
+    def read_spec_changes(
+        self, subscriber: str, limit: int = 1000, *, shared: bool = False
+    ) -> dict[str, Any]:
+        """
+        Read spec changes a subscriber has not acknowledged yet.
+
+        Does not move the subscriber's offset; call ack_spec_changes() with the
+        returned offsets once the changes are processed (at-least-once delivery).
+
+        Args:
+            subscriber: Subscriber name (offsets are stored per subscriber)
+            limit: Maximum number of changes per origin
+            shared: Tail lake.spec_changes (all processes) instead of the local log
 
+        Returns:
+            Dict with 'changes' (oldest first) and 'offsets' ({origin: last seq read}),
+            or error
+        """
+        try:
+            if shared:
+                if not self._lake_attached():
+                    return {"error": "DuckLake catalog 'lake' is not attached"}
+                source, params = "lake.spec_changes", []
+            else:
+                source = "(SELECT ?::VARCHAR AS origin, * FROM spec_changes)"
+                params = [self.change_origin]
+            rows = self.con.execute(
+                f"""
+                SELECT c.origin, c.seq, c.spec_id, c.kind, c.name, c.version, c.op, c.changed_at
+                FROM {source} c
+                LEFT JOIN spec_change_offsets s
+                  ON s.subscriber = ? AND s.origin = c.origin
+                WHERE c.seq > COALESCE(s.last_seq, 0)
+                QUALIFY row_number() OVER (PARTITION BY c.origin ORDER BY c.seq) <= ?
+                ORDER BY c.changed_at, c.origin, c.seq
+                """,
+                [*params, subscriber, limit],
+            ).fetchall()
+
+            columns = ["origin", "seq", "spec_id", "kind", "name", "version", "op", "changed_at"]
+            changes = []
+            offsets: dict[str, int] = {}
+            for row in rows:
+                change = dict(zip(columns, row))
+                change["changed_at"] = str(change["changed_at"])
+                offsets[change["origin"]] = max(offsets.get(change["origin"], 0), change["seq"])
+                changes.append(change)
+            return {"changes": changes, "offsets": offsets}
         except Exception as e:
             return {"error": str(e)}
 
-    def get_related_specs(self, spec_id: int) -> list[dict[str, Any]]:
+    def ack_spec_changes(self, subscriber: str, offsets: dict[str, int]) -> dict[str, Any]:
         """
-        Get all specs related to a given spec.
+        Store how far a subscriber has processed the change feed.
+
+        Offsets only move forward, so a late or repeated ack is harmless.
 
         Args:
-            spec_id: Spec ID to find relations for
+            subscriber: Subscriber name
+            offsets: {origin: last processed seq}, as returned by read_spec_changes()
 
         Returns:
-            List of related specs with relationship info
+            Dict with the subscriber's stored offsets or error
         """
         try:
-            query = """
-                SELECT
-                    r.rel_type,
-                    'outgoing' as direction,
-                    o.id, o.kind, o.name, o.version, o.status, o.summary
-                FROM spec_relationships r
-                JOIN spec_objects o ON o.id = r.to_id
-                WHERE r.from_id = ?
-                UNION ALL
-                SELECT
-                    r.rel_type,
-                    'incoming' as direction,
-                    o.id, o.kind, o.name, o.version, o.status, o.summary
-                FROM spec_relationships r
-                JOIN spec_objects o ON o.id = r.from_id
-                WHERE r.to_id = ?
-            """
-            result = self.con.execute(query, [spec_id, spec_id]).fetchall()
-
-            columns = [
+            for origin, seq in offsets.items():
+                self.con.execute(
+                    """
+                    INSERT INTO spec_change_offsets (subscriber, origin, last_seq)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT (subscriber, origin) DO UPDATE
+                    SET last_seq = greatest(last_seq, EXCLUDED.last_seq),
+                        updated_at = now()
+                    """,
+                    [subscriber, origin, seq],
+                )
+            rows = self.con.execute(
+                "SELECT origin, last_seq FROM spec_change_offsets WHERE subscriber = ?",
+                [subscriber],
+            ).fetchall()
+            return {"subscriber": subscriber, "offsets": dict(rows)}
+        except Exception as e:
+            return {"error": str(e)}
+
+    # =========================================================================
+    # Trigram Index (substring search without FTS)
+    # =========================================================================
+
+    def _use_trigram_prefilter(self) -> bool:
+        """Use the trigram posting lists when the fts extension is not loaded."""
+        return not is_extension_loaded(self.con, "fts")
+
+    def _trigram_frequencies(self, source: str) -> dict[str, int]:
+        """
+        Document frequency per trigram of source, cached until the next full rebuild.
+
+        Only used to pick which posting lists to probe, so incremental writes may
+        leave it slightly stale without affecting results.
+        """
+        df = self._trigram_df.get(source)
+        if df is None:
+            df = dict(
+                self.con.execute(
+                    "SELECT trigram, COUNT(*) FROM spec_trigrams WHERE source = ? GROUP BY trigram",
+                    [source],
+                ).fetchall()
+            )
+            self._trigram_df[source] = df
+        return df
+
+    def _trigram_prefilter(
+        self, source: str, key_expr: str, term: str
+    ) -> tuple[str, list[Any]] | None:
+        """
+        Build a clause restricting key_expr to rows that contain the rarest trigrams of term.
+
+        The TRIGRAM_PROBES least frequent posting lists are intersected up front and
+        the surviving keys are inlined as constants. The caller's LIKE condition
+        still decides the final match, so probing a subset of trigrams is safe.
+        Trigrams are only taken from the parts of term between LIKE wildcards
+        ('%', '_'), and rows without postings are indexed first (see
+        _reconcile_trigrams()), so no matching row is filtered out.
+
+        Args:
+            source: Posting-list source ('spec', 'spec_embeddings', 'notes_board')
+            key_expr: SQL expression for the row key in the outer query
+            term: Substring being searched for
+
+        Returns:
+            (sql, params) tuple, or None if term is too short or not selective enough
+            for the pre-filter to beat a scan
+        """
+        grams = self.con.execute(
+            f"""
+            SELECT list_distinct(flatten(list({_TRIGRAM_LIST_SQL})))
+            FROM (SELECT unnest(regexp_split_to_array(?::VARCHAR, '[%_]')) AS t)
+            """,
+            [term],
+        ).fetchone()[0]
+        if not grams:
+            return None
+        if source in _TRIGRAM_TABLES:
+            self._reconcile_trigrams(source)
+        df = self._trigram_frequencies(source)
+        probes = sorted(grams, key=lambda gram: df.get(gram, 0))[:TRIGRAM_PROBES]
+        if df.get(probes[0], 0) > TRIGRAM_MAX_CANDIDATES:
+            return None
+
+        keys = self.con.execute(
+            " INTERSECT ".join(
+                "SELECT row_key FROM spec_trigrams WHERE source = ? AND trigram = ?"
+                for _ in probes
+            ),
+            [value for gram in probes for value in (source, gram)],
+        ).fetchall()
+        if len(keys) > TRIGRAM_MAX_CANDIDATES:
+            return None
+        if not keys:
+            return "FALSE", []
+        # Inlined literals plan far faster than a list parameter of the same size.
+        if source == "notes_board":
+            literals = ", ".join("'" + key.replace("'", "''") + "'" for (key,) in keys)
+        else:
+            literals = ", ".join(str(int(key)) for (key,) in keys)
+        return f"{key_expr} IN ({literals})", []
+
+    def _drop_trigrams(self, source: str, keys: list[Any]) -> None:
+        """Remove the posting lists of the given row keys."""
+        if not keys:
+            return
+        self.con.execute(
+            """
+            DELETE FROM spec_trigrams
+            WHERE source = ? AND row_key IN (SELECT unnest(?::VARCHAR[]))
+            """,
+            [source, [str(key) for key in keys]],
+        )
+
+    def _write_trigrams(
+        self, source: str, rows_sql: str, params: list[Any], *, replace_all: bool = False
+    ) -> int:
+        """
+        Replace posting lists from a query yielding (row_key, body) rows, set-based.
+
+        Postings are appended sorted by trigram so zonemaps can skip most row
+        groups when a single posting list is probed.
+
+        Args:
+            source: Posting-list source
+            rows_sql: SELECT producing row_key and body columns
+            params: Parameters for rows_sql
+            replace_all: Drop every posting of source first instead of only the listed rows
+
+        Returns:
+            Number of rows indexed
+        """
+        if replace_all:
+            self.con.execute("DELETE FROM spec_trigrams WHERE source = ?", [source])
+            self._trigram_df.pop(source, None)
+        else:
+            self.con.execute(
+                f"""
+                DELETE FROM spec_trigrams
+                WHERE source = ?
+                  AND row_key IN (SELECT CAST(row_key AS VARCHAR) FROM ({rows_sql}))
+                """,
+                [source, *params],
+            )
+        self.con.execute(
+            f"""
+            INSERT INTO spec_trigrams (source, row_key, trigram)
+            SELECT ?, row_key, unnest({_TRIGRAM_LIST_SQL})
+            FROM (SELECT CAST(row_key AS VARCHAR) AS row_key, body AS t FROM ({rows_sql}))
+            ORDER BY 3
+            """,
+            [source, *params],
+        )
+        return self.con.execute(f"SELECT COUNT(*) FROM ({rows_sql})", params).fetchone()[0]
+
+    def _reindex_spec_trigrams(
+        self, spec_ids: list[int] | None = None, *, id_query: str | None = None
+    ) -> int:
+        """
+        Index name, summary and doc of specs.
+
+        Args:
+            spec_ids: Spec IDs to reindex (all specs if both arguments are None)
+            id_query: Alternatively, a SELECT yielding the spec IDs to reindex
+        """
+        rows_sql = """
+            SELECT o.id AS row_key, concat_ws(' ', o.name, o.summary, d.doc) AS body
+            FROM spec_objects o
+            LEFT JOIN spec_docs d ON d.object_id = o.id
+        """
+        params: list[Any] = []
+        if id_query is not None:
+            rows_sql += f" WHERE o.id IN ({id_query})"
+        elif spec_ids is not None:
+            rows_sql += " WHERE o.id IN (SELECT unnest(?::INTEGER[]))"
+            params.append(list(spec_ids))
+        replace_all = spec_ids is None and id_query is None
+        return self._write_trigrams("spec", rows_sql, params, replace_all=replace_all)
+
+    def _reindex_embedding_trigrams(self, embedding_ids: list[int] | None = None) -> int:
+        """Index spec_embeddings.content of the given rows (all rows if None)."""
+        rows_sql = "SELECT id AS row_key, content AS body FROM spec_embeddings"
+        params: list[Any] = []
+        if embedding_ids is not None:
+            rows_sql += " WHERE id IN (SELECT unnest(?::INTEGER[]))"
+            params.append(_id_array_param(embedding_ids))
+        return self._write_trigrams(
+            "spec_embeddings", rows_sql, params, replace_all=embedding_ids is None
+        )
+
+    def _lake_attached(self) -> bool:
+        """Check whether the shared DuckLake catalog is attached as 'lake'."""
+        result = self.con.execute(
+            "SELECT COUNT(*) FROM duckdb_databases() WHERE database_name = 'lake'"
+        ).fetchone()
+        return bool(result and result[0])
+
+    def _refresh_trigram_index(self, *, quiet: bool = False) -> None:
+        """Rebuild spec postings and reconcile embedding postings by id."""
+        _info = log.debug if quiet else log.info
+        try:
+            specs = self._reindex_spec_trigrams()
+            embeddings = self._reconcile_trigrams("spec_embeddings")
+            _info("Trigram index ready (%d specs, %d embeddings reindexed)", specs, embeddings)
+        except Exception as e:
+            log.warning("Trigram index refresh failed: %s", e)
+
+    def _reconcile_trigrams(self, source: str) -> int:
+        """
+        Index rows of a local source that have no postings, drop postings of deleted rows.
+
+        A fingerprint of the base table (row count, id sum, highest id, latest
+        updated_at) is compared with the one from the last check, so an
+        unchanged table costs one small query. Rows past the id or updated_at
+        watermark are reindexed; if the count or id sum moved by more than those
+        new rows explain (deletes, raw SQL inserts below the highest id), the
+        posting keys are compared with the table by id. Raw SQL edits that leave
+        updated_at alone are not seen. The fingerprint is recorded in
+        spec_trigram_coverage so SQL macros know when the postings are complete.
+
+        Args:
+            source: 'spec' or 'spec_embeddings'
+
+        Returns:
+            Number of rows reindexed
+        """
+        table = _TRIGRAM_TABLES[source]
+        key = list(
+            self.con.execute(
+                f"""
+                SELECT count(*), coalesce(sum(id), 0), max(id), max(updated_at)::VARCHAR
+                FROM {table}
+                """
+            ).fetchone()
+        )
+        old = self._trigram_fingerprints.get(source)
+        if key == old:
+            return 0
+        reindex = (
+            self._reindex_spec_trigrams if source == "spec" else self._reindex_embedding_trigrams
+        )
+        with self._transaction():
+            if old is None:
+                reconcile = True
+                ids: list[int] = []
+            else:
+                changed = self.con.execute(
+                    f"""
+                    SELECT id, id > coalesce(?, -1) AS appended
+                    FROM {table}
+                    WHERE id > coalesce(?, -1) OR updated_at > ?::TIMESTAMP
+                    """,
+                    [old[2], old[2], old[3]],
+                ).fetchall()
+                ids = [row[0] for row in changed]
+                appended = [row[0] for row in changed if row[1]]
+                reconcile = (
+                    key[0] - old[0] != len(appended) or key[1] - old[1] != sum(appended)
+                )
+            if reconcile:
+                self.con.execute(
+                    f"""
+                    DELETE FROM spec_trigrams
+                    WHERE source = ?
+                      AND row_key NOT IN (SELECT CAST(id AS VARCHAR) FROM {table})
+                    """,
+                    [source],
+                )
+                ids += [
+                    row[0]
+                    for row in self.con.execute(
+                        f"""
+                        SELECT id FROM {table}
+                        WHERE CAST(id AS VARCHAR) NOT IN (
+                            SELECT row_key FROM spec_trigrams WHERE source = ?
+                        )
+                        """,
+                        [source],
+                    ).fetchall()
+                ]
+            if ids:
+                reindex(sorted(set(ids)))
+            self.con.execute(
+                """
+                INSERT OR REPLACE INTO spec_trigram_coverage
+                VALUES (?, concat_ws(':', ?, ?, ?, ?))
+                """,
+                [source, *key],
+            )
+        self._trigram_fingerprints[source] = key
+        return len(set(ids))
+
+    def sync_note_trigrams(self) -> int:
+        """
+        Index lake.notes_board rows changed since the last sync.
+
+        Notes are written by several processes, so postings are caught up from an
+        updated_at watermark instead of relying on the local write path alone.
+
+        Returns:
+            Number of note rows (re)indexed
+        """
+        watermark = self.con.execute("SELECT max(updated_at) FROM lake.notes_board").fetchone()[0]
+        rows_sql = """
+            SELECT id AS row_key, concat_ws(' ', title, content) AS body
+            FROM lake.notes_board
+        """
+        params: list[Any] = []
+        if self._notes_trigram_watermark is not None:
+            rows_sql += " WHERE updated_at >= ? OR updated_at IS NULL"
+            params.append(self._notes_trigram_watermark)
+        indexed = self._write_trigrams(
+            "notes_board", rows_sql, params, replace_all=self._notes_trigram_watermark is None
+        )
+        if watermark is not None:
+            self._notes_trigram_watermark = watermark
+        return indexed
+
+    def rebuild_trigram_index(self, source: str | None = None) -> dict[str, Any]:
+        """
+        Rebuild the trigram posting lists from the base tables.
+
+        Args:
+            source: One of TRIGRAM_SOURCES, or None for all available sources
+
+        Returns:
+            Dict mapping each rebuilt source to its indexed row count
+        """
+        try:
+            if source is not None and source not in TRIGRAM_SOURCES:
+                return {"error": f"Unknown trigram source: {source}"}
+            sources = [source] if source else list(TRIGRAM_SOURCES)
+            if source is None and not self._lake_attached():
+                sources.remove("notes_board")
+
+            rebuilt: dict[str, int] = {}
+            for src in sources:
+                if src == "spec":
+                    rebuilt[src] = self._reindex_spec_trigrams()
+                elif src == "spec_embeddings":
+                    rebuilt[src] = self._reindex_embedding_trigrams()
+                else:
+                    self._notes_trigram_watermark = None
+                    rebuilt[src] = self.sync_note_trigrams()
+            return {"rebuilt": rebuilt}
+        except Exception as e:
+            return {"error": str(e)}
+
+    def search_notes(
+        self, query: str, project: str | None = None, limit: int = 20
+    ) -> list[dict[str, Any]]:
+        """
+        Substring search over lake.notes_board titles and content.
+
+        FTS indexes cannot be built on DuckLake tables, so the trigram
+        pre-filter is always applied here.
+
+        Args:
+            query: Substring to look for (case-insensitive)
+            project: Optional project filter
+            limit: Maximum number of results
+
+        Returns:
+            List of matching notes, most recently updated first
+        """
+        term = query.strip()
+        if not term:
+            return []
+        try:
+            self.sync_note_trigrams()
+            clauses = ["(title ILIKE '%' || ? || '%' OR content ILIKE '%' || ? || '%')"]
+            params: list[Any] = [term, term]
+            prefilter = self._trigram_prefilter("notes_board", "id", term)
+            if prefilter:
+                clauses.append(prefilter[0])
+                params.extend(prefilter[1])
+            if project:
+                clauses.append("project = ?")
+                params.append(project)
+            params.append(limit)
+            result = self.con.execute(
+                f"""
+                SELECT id, project, title, content, status, updated_at
+                FROM lake.notes_board
+                WHERE {" AND ".join(clauses)}
+                ORDER BY updated_at DESC
+                LIMIT ?
+                """,
+                params,
+            ).fetchall()
+        except Exception as e:
+            log.error("Note search failed: %s", e)
+            return []
+
+        columns = ["id", "project", "title", "content", "status", "updated_at"]
+        notes = []
+        for row in result:
+            note = dict(zip(columns, row))
+            if note.get("updated_at"):
+                note["updated_at"] = str(note["updated_at"])
+            notes.append(note)
+        return notes
+
+    # =========================================================================
+    # Utility Methods
+    # =========================================================================
+
+    def get_stats(self) -> dict[str, Any]:
+        """Get statistics about the Spec Engine."""
+        try:
+            self.flush_usage()
+            stats_query = """
+                SELECT
+                    kind,
+                    COUNT(*) AS total,
+                    COUNT(*) FILTER (WHERE status = 'active') AS active,
+                    COUNT(*) FILTER (WHERE status = 'draft') AS draft,
+                    COUNT(*) FILTER (WHERE status = 'deprecated') AS deprecated
+                FROM spec_objects
+                GROUP BY kind
+                ORDER BY kind
+            """
+            result = self.con.execute(stats_query).fetchall()
+            stats = {}
+            for row in result:
+                stats[row[0]] = {
+                    "total": row[1],
+                    "active": row[2],
+                    "draft": row[3],
+                    "deprecated": row[4],
+                }
+            return {"specs_by_kind": stats}
+        except Exception as e:
+            return {"error": str(e)}
+
+    def get_loaded_extensions(self) -> list[str]:
+        """Get list of loaded DuckDB extensions."""
+        try:
+            result = self.con.execute(
+                "SELECT extension_name FROM duckdb_extensions() WHERE loaded = true"
+            ).fetchall()
+            return [row[0] for row in result]
+        except Exception as e:
+            log.error("Error getting extensions: %s", e)
+            return []
+
+    def get_spec_kinds(self) -> list[str]:
+        """Get list of all spec kinds in use."""
+        try:
+            result = self.con.execute(
+                "SELECT DISTINCT kind FROM spec_objects ORDER BY kind"
+            ).fetchall()
+            return [row[0] for row in result]
+        except Exception:
+            return []
+
+    def is_initialized(self) -> bool:
+        """Check if the Spec Engine is initialized."""
+        return self._initialized
+
+    def close(self) -> dict[str, Any]:
+        """
+        Write back buffered usage and embedding cache hits, and stop the
+        background flush timer.
+
+        The connection is left open; it belongs to the caller.
+        """
+        with self._usage_lock:
+            if self._usage_timer is not None:
+                self._usage_timer.cancel()
+                self._usage_timer = None
+        flush_embedding_hits(self.con)
+        return self.flush_usage()
+
+    def _serialize_json_field(self, value: Any) -> str | None:
+        """Serialize JSON-like values while leaving strings untouched."""
+        if value is None or isinstance(value, str):
+            return value
+        return json.dumps(value)
+
+    def _require_extension_loaded(self, extension_name: str, feature_name: str) -> None:
+        """Raise a clear error when an optional extension is required at runtime."""
+        if is_extension_loaded(self.con, extension_name):
+            return
+        raise RuntimeError(
+            f"{feature_name} requires the DuckDB '{extension_name}' extension to be loaded."
+        )
+
+    # =========================================================================
+    # Meta-Learning Methods (Self-Improvement)
+    # =========================================================================
+
+    def record_usage(self, spec_id: int, was_success: bool) -> dict[str, Any]:
+        """
+        Record that a spec was used and whether it was successful.
+
+        The event is buffered and applied to use_count/success_rate by the next
+        flush_usage(), which runs automatically every USAGE_FLUSH_MAX_PENDING
+        events or USAGE_FLUSH_INTERVAL seconds.
+
+        Args:
+            spec_id: ID of the spec that was used
+            was_success: Whether the usage was successful
+
+        Returns:
+            Dict with the spec ID, use_count and success_rate including buffered
+            events, and the number of buffered events; or error
+        """
+        try:
+            row = self.con.execute(
+                "SELECT use_count, success_rate FROM spec_objects WHERE id = ?", [spec_id]
+            ).fetchone()
+            if row is None:
+                return {"error": f"Spec {spec_id} not found"}
+            pending = self._buffer_usage(spec_id, was_success=was_success)
+            use_count, success_rate = self._projected_usage(spec_id, *row)
+            self._maybe_flush_usage(pending)
+            return {
+                "spec_id": spec_id,
+                "use_count": use_count,
+                "success_rate": success_rate,
+                "pending": pending,
+            }
+        except Exception as e:
+            return {"error": str(e)}
+
+    def record_feedback(
+        self,
+        spec_id: int,
+        feedback_type: str,
+        score: float = 0.0,
+        context: dict | None = None,
+        outcome: dict | None = None,
+        notes: str | None = None,
+        session_id: str | None = None,
+    ) -> dict[str, Any]:
+        """
+        Record feedback on a spec's usage.
+
+        Feedback rows are buffered together with the derived usage event and
+        bulk-inserted into spec_feedback by the next flush_usage().
+
+        Args:
+            spec_id: ID of the spec
+            feedback_type: Type of feedback ('success', 'failure', 'error', 'user_correction')
+            score: Numeric score (-1.0 to 1.0)
+            context: JSON context of the usage
+            outcome: JSON outcome/result
+            notes: Human-readable notes
+            session_id: Session ID
+
+        Returns:
+            Dict with the feedback ID (reserved now, row written by the flush),
+            the spec ID and the number of buffered events; or error
+        """
+        try:
+            reserved = self.con.execute(
+                "SELECT nextval('spec_feedback_seq') FROM spec_objects WHERE id = ?", [spec_id]
+            ).fetchone()
+            if reserved is None:
+                return {"error": f"Spec {spec_id} not found"}
+            feedback_id = reserved[0]
+            row = (
+                feedback_id,
+                spec_id,
+                session_id,
+                feedback_type,
+                json.dumps(context) if context else None,
+                json.dumps(outcome) if outcome else None,
+                score,
+                notes,
+                datetime.now(),
+            )
+            was_success = feedback_type == "success" or (score is not None and score > 0.5)
+            pending = self._buffer_usage(
+                spec_id, was_success=was_success, feedback=row
+            )
+            self._maybe_flush_usage(pending)
+            return {"feedback_id": feedback_id, "spec_id": spec_id, "pending": pending}
+        except Exception as e:
+            return {"error": str(e)}
+
+    def _buffer_usage(
+        self, spec_id: int, *, was_success: bool, feedback: tuple[Any, ...] | None = None
+    ) -> int:
+        """Add one usage (and optional feedback row) to the in-memory deltas."""
+        now = datetime.now()
+        bucket = now.replace(minute=0, second=0, microsecond=0)
+        with self._usage_lock:
+            delta = self._usage_deltas.setdefault(
+                (spec_id, bucket), [0] * len(_USAGE_ROLLUP_COLUMNS)
+            )
+            delta[0] += 1
+            delta[1] += 1 if was_success else 0
+            if feedback is not None:
+                feedback_type, score = feedback[3], feedback[6]
+                delta[2] += 1
+                delta[3] += 1 if feedback_type == "success" else 0
+                delta[4] += 1 if feedback_type == "failure" else 0
+                if score is not None:
+                    delta[5] += score
+                    delta[6] += 1
+                self._pending_feedback.append(feedback)
+            self._pending_usage_events += 1
+            if self._usage_timer is None:
+                self._start_usage_timer()
+            return self._pending_usage_events
+
+    def _start_usage_timer(self) -> None:
+        """Schedule a background flush; the caller holds _usage_lock."""
+        self._usage_timer = Timer(USAGE_FLUSH_INTERVAL, self._flush_usage_on_timer)
+        self._usage_timer.daemon = True
+        self._usage_timer.start()
+
+    def _flush_usage_on_timer(self) -> None:
+        """
+        Flush buffered usage of an idle engine on a cursor of its connection.
+
+        Waits for another interval while the engine is inside a transaction, so
+        the flush never races a batch() on the same rows.
+        """
+        with self._usage_lock:
+            self._usage_timer = None
+            if not self._pending_usage_events:
+                return
+            if self._in_transaction:
+                self._start_usage_timer()
+                return
+        try:
+            writer = SpecEngine(self.con.cursor(), self.db_path)
+        except Exception as e:
+            log.warning("Background usage flush skipped: %s", e)
+            return
+        try:
+            self._flush_usage_to(writer)
+        finally:
+            writer.con.close()
+
+    def _projected_usage(
+        self, spec_id: int, use_count: int, success_rate: float | None
+    ) -> tuple[int, float | None]:
+        """Stored use_count/success_rate of a spec combined with its buffered events."""
+        uses = successes = 0
+        with self._usage_lock:
+            for (delta_spec_id, _), delta in self._usage_deltas.items():
+                if delta_spec_id == spec_id:
+                    uses += delta[0]
+                    successes += delta[1]
+        total = use_count + uses
+        if not uses:
+            return use_count, success_rate
+        return total, (use_count * (success_rate or 0.0) + successes) / total
+
+    def _maybe_flush_usage(self, pending: int) -> None:
+        """Flush buffered usage when the size threshold is reached."""
+        if pending >= USAGE_FLUSH_MAX_PENDING:
+            self.flush_usage()
+
+    def flush_usage(self) -> dict[str, Any]:
+        """
+        Write buffered usage and feedback back in one transaction.
+
+        Applies all deltas with a single set-based UPDATE of use_count/success_rate,
+        bulk-inserts the feedback rows and upserts the spec_usage_hourly rollup.
+        On failure the buffer is restored so the events are retried on the next flush.
+
+        Returns:
+            Dict with the number of flushed usage events and feedback rows
+        """
+        return self._flush_usage_to(self)
+
+    def _flush_usage_to(self, writer: "SpecEngine") -> dict[str, Any]:
+        """Drain the buffer and write it through writer (self or a cursor engine)."""
+        with self._usage_lock:
+            deltas, self._usage_deltas = self._usage_deltas, {}
+            feedback, self._pending_feedback = self._pending_feedback, []
+            events, self._pending_usage_events = self._pending_usage_events, 0
+            if self._usage_timer is not None:
+                self._usage_timer.cancel()
+                self._usage_timer = None
+        if not events:
+            return {"usage_events": 0, "feedback": 0}
+
+        try:
+            writer._write_usage(deltas, feedback)
+            return {"usage_events": events, "feedback": len(feedback)}
+        except Exception as e:
+            with self._usage_lock:
+                for key, delta in deltas.items():
+                    merged = self._usage_deltas.setdefault(key, [0] * len(delta))
+                    for i, value in enumerate(delta):
+                        merged[i] += value
+                self._pending_feedback[:0] = feedback
+                self._pending_usage_events += events
+                if self._usage_timer is None:
+                    self._start_usage_timer()
+            log.warning("Usage flush failed, keeping %d events buffered: %s", events, e)
+            return {"error": str(e)}
+
+    def _write_usage(
+        self,
+        deltas: dict[tuple[int, datetime], list[float]],
+        feedback: list[tuple[Any, ...]],
+    ) -> None:
+        """Apply drained usage deltas and feedback rows set-based."""
+        delta_rows = [(spec_id, bucket, *values) for (spec_id, bucket), values in deltas.items()]
+        delta_columns = ("spec_id", "bucket", *_USAGE_ROLLUP_COLUMNS)
+        # Registered column arrays scan far faster than list parameters.
+        self.con.register(
+            "spec_usage_deltas",
+            {
+                col: np.array([row[i] for row in delta_rows], dtype=object)
+                for i, col in enumerate(delta_columns)
+            },
+        )
+        feedback_columns = (
+            "id",
+            "spec_id",
+            "session_id",
+            "feedback_type",
+            "context",
+            "outcome",
+            "score",
+            "notes",
+            "created_at",
+        )
+        if feedback:
+            self.con.register(
+                "spec_feedback_rows",
+                {
+                    col: np.array([row[i] for row in feedback], dtype=object)
+                    for i, col in enumerate(feedback_columns)
+                },
+            )
+        try:
+            with self._transaction():
+                self.con.execute(
+                    """
+                    UPDATE spec_objects AS o
+                    SET success_rate = (o.use_count * COALESCE(o.success_rate, 0.0) + d.successes)
+                            / (o.use_count + d.uses),
+                        use_count = o.use_count + d.uses,
+                        updated_at = current_timestamp
+                    FROM (
+                        SELECT CAST(spec_id AS INTEGER) AS spec_id,
+                               SUM(CAST(uses AS INTEGER)) AS uses,
+                               SUM(CAST(successes AS INTEGER)) AS successes
+                        FROM spec_usage_deltas
+                        GROUP BY 1
+                    ) AS d
+                    WHERE o.id = d.spec_id
+                    """
+                )
+                self.con.execute(
+                    """
+                    INSERT INTO spec_usage_hourly
+                    SELECT
+                        CAST(spec_id AS INTEGER), CAST(bucket AS TIMESTAMP),
+                        CAST(uses AS INTEGER), CAST(successes AS INTEGER),
+                        CAST(feedback_count AS INTEGER), CAST(success_feedback AS INTEGER),
+                        CAST(failure_feedback AS INTEGER), CAST(score_sum AS DOUBLE),
+                        CAST(scored_count AS INTEGER)
+                    FROM spec_usage_deltas
+                    ON CONFLICT (spec_id, bucket) DO UPDATE SET
+                        uses = uses + EXCLUDED.uses,
+                        successes = successes + EXCLUDED.successes,
+                        feedback_count = feedback_count + EXCLUDED.feedback_count,
+                        success_feedback = success_feedback + EXCLUDED.success_feedback,
+                        failure_feedback = failure_feedback + EXCLUDED.failure_feedback,
+                        score_sum = score_sum + EXCLUDED.score_sum,
+                        scored_count = scored_count + EXCLUDED.scored_count
+                    """
+                )
+                if feedback:
+                    self.con.execute(
+                        """
+                        INSERT INTO spec_feedback
+                            (id, spec_id, session_id, feedback_type,
+                             context, outcome, score, notes, created_at)
+                        SELECT
+                            CAST(id AS INTEGER),
+                            CAST(spec_id AS INTEGER), session_id, feedback_type,
+                            context, outcome, CAST(score AS REAL), notes,
+                            CAST(created_at AS TIMESTAMP)
+                        FROM spec_feedback_rows
+                        """
+                    )
+        finally:
+            self.con.unregister("spec_usage_deltas")
+            if feedback:
+                self.con.unregister("spec_feedback_rows")
+
+    def create_relationship(
+        self,
+        from_id: int,
+        to_id: int,
+        rel_type: str,
+        metadata: dict | None = None,
+    ) -> dict[str, Any]:
+        """
+        Create a relationship between two specs.
+
+        Args:
+            from_id: Source spec ID
+            to_id: Target spec ID
+            rel_type: Relationship type
+                ('uses', 'extends', 'requires', 'implements', 'derived_from')
+            metadata: Optional metadata about the relationship
+
+        Returns:
+            Dict with relationship ID
+        """
+        try:
+            rel_id = self._next_id("spec_relationships_seq")
+
+            self.con.execute(
+                """
+                INSERT INTO spec_relationships (id, from_id, to_id, rel_type, metadata)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (from_id, to_id, rel_type) DO UPDATE SET metadata = EXCLUDED.metadata
+                """,
+                [rel_id, from_id, to_id, rel_type, json.dumps(metadata) if metadata else None],
+            )
+            self._relationship_graph = None
+
+            return {"relationship_id": rel_id}
+
+        except Exception as e:
+            return {"error": str(e)}
+
+    def get_related_specs(self, spec_id: int) -> list[dict[str, Any]]:
+        """
+        Get all specs related to a given spec.
+
+        Args:
+            spec_id: Spec ID to find relations for
+
+        Returns:
+            List of related specs with relationship info
+        """
+        try:
+            query = """
+                SELECT
+                    r.rel_type,
+                    'outgoing' as direction,
+                    o.id, o.kind, o.name, o.version, o.status, o.summary
+                FROM spec_relationships r
+                JOIN spec_objects o ON o.id = r.to_id
+                WHERE r.from_id = ?
+                UNION ALL
+                SELECT
+                    r.rel_type,
+                    'incoming' as direction,
+                    o.id, o.kind, o.name, o.version, o.status, o.summary
+                FROM spec_relationships r
+                JOIN spec_objects o ON o.id = r.from_id
+                WHERE r.to_id = ?
+            """
+            result = self.con.execute(query, [spec_id, spec_id]).fetchall()
+
+            columns = [
                 "rel_type",
                 "direction",
                 "id",
                 "kind",
                 "name",
                 "version",
-                "status",
+                "status",
+                "summary",
+            ]
+            return [dict(zip(columns, row)) for row in result]
+
+        except Exception:
+            return []
+
+    def spec_dependencies(
+        self, spec_id: int, depth: int | None = None, rel_types: list[str] | None = None
+    ) -> list[dict[str, Any]]:
+        """
+        Get every spec a given spec transitively points at (outgoing relationships).
+
+        Args:
+            spec_id: Spec ID to start from
+            depth: Maximum number of hops (None for the full closure)
+            rel_types: Only follow these relationship types (default: all)
+
+        Returns:
+            List of reachable specs with their shortest hop count as 'depth'
+        """
+        return self._walk_relationships(spec_id, "out", depth, rel_types)
+
+    def spec_dependents(
+        self, spec_id: int, depth: int | None = None, rel_types: list[str] | None = None
+    ) -> list[dict[str, Any]]:
+        """
+        Get every spec that transitively points at a given spec (incoming relationships).
+
+        This answers impact questions such as "what breaks if this schema is deprecated?".
+
+        Args:
+            spec_id: Spec ID to start from
+            depth: Maximum number of hops (None for the full closure)
+            rel_types: Only follow these relationship types (default: all)
+
+        Returns:
+            List of reaching specs with their shortest hop count as 'depth'
+        """
+        return self._walk_relationships(spec_id, "in", depth, rel_types)
+
+    def _relationship_adjacency(self) -> dict[str, Any]:
+        """
+        Sorted edge arrays of spec_relationships for both directions.
+
+        Dropped by engine writes to relationships, and checked against the row
+        count and max id so raw SQL inserts and deletes are seen too. Raw SQL
+        UPDATEs of an edge need invalidate_spec_caches().
+        """
+        version = self.con.execute("SELECT COUNT(*), MAX(id) FROM spec_relationships").fetchone()
+        cached = self._relationship_graph
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        edges = self.con.execute(
+            "SELECT from_id, to_id, rel_type FROM spec_relationships"
+        ).fetchnumpy()
+        from_ids = np.asarray(edges["from_id"], dtype=np.int64)
+        to_ids = np.asarray(edges["to_id"], dtype=np.int64)
+        rel_names, rel_codes = np.unique(
+            np.asarray(edges["rel_type"], dtype=object).astype(str), return_inverse=True
+        )
+        adjacency: dict[str, Any] = {
+            "rel_types": {str(name): code for code, name in enumerate(rel_names)},
+            "size": int(max(from_ids.max(initial=0), to_ids.max(initial=0))) + 1,
+        }
+        for direction, keys, targets in (("out", from_ids, to_ids), ("in", to_ids, from_ids)):
+            order = np.argsort(keys, kind="stable")
+            adjacency[direction] = (keys[order], targets[order], rel_codes[order])
+        self._relationship_graph = (version, adjacency)
+        return adjacency
+
+    def _walk_relationships(
+        self,
+        spec_id: int,
+        direction: str,
+        depth: int | None,
+        rel_types: list[str] | None,
+    ) -> list[dict[str, Any]]:
+        """Breadth-first walk over the cached adjacency, one vectorized step per hop."""
+        try:
+            graph = self._relationship_adjacency()
+            keys, targets, codes = graph[direction]
+            allowed = None
+            if rel_types is not None:
+                allowed = np.array(
+                    [graph["rel_types"][t] for t in rel_types if t in graph["rel_types"]],
+                    dtype=np.int64,
+                )
+
+            seen = np.zeros(max(graph["size"], spec_id + 1), dtype=bool)
+            seen[spec_id] = True
+            frontier = np.array([spec_id], dtype=np.int64)
+            found_ids: list[np.ndarray] = []
+            found_depths: list[np.ndarray] = []
+            hop = 0
+            while frontier.size and (depth is None or hop < depth):
+                hop += 1
+                lo = np.searchsorted(keys, frontier, side="left")
+                counts = np.searchsorted(keys, frontier, side="right") - lo
+                total = int(counts.sum())
+                if not total:
+                    break
+                # Positions lo[i] .. lo[i] + counts[i] - 1 for every frontier node
+                group_start = np.cumsum(counts) - counts
+                positions = np.arange(total) + np.repeat(lo - group_start, counts)
+                if allowed is not None:
+                    positions = positions[np.isin(codes[positions], allowed)]
+                neighbours = np.unique(targets[positions])
+                frontier = neighbours[~seen[neighbours]]
+                seen[frontier] = True
+                found_ids.append(frontier)
+                found_depths.append(np.full(frontier.size, hop, dtype=np.int64))
+
+            if not found_ids or not sum(part.size for part in found_ids):
+                return []
+            self.con.register(
+                "spec_graph_hits",
+                {"id": np.concatenate(found_ids), "depth": np.concatenate(found_depths)},
+            )
+            try:
+                rows = self.con.execute(
+                    """
+                    SELECT o.id, o.kind, o.name, o.version, o.status, o.summary, h.depth
+                    FROM spec_graph_hits h
+                    JOIN spec_objects o ON o.id = h.id
+                    ORDER BY h.depth, o.id
+                    """
+                ).fetchall()
+            finally:
+                self.con.unregister("spec_graph_hits")
+            columns = ["id", "kind", "name", "version", "status", "summary", "depth"]
+            return [dict(zip(columns, row)) for row in rows]
+
+        except Exception:
+            return []
+
+    def get_spec_performance(self, spec_id: int) -> dict[str, Any]:
+        """
+        Get performance metrics for a spec.
+
+        Args:
+            spec_id: Spec ID
+
+        Returns:
+            Dict with performance metrics
+        """
+        try:
+            self.flush_usage()
+            query = """
+                SELECT
+                    o.id, o.kind, o.name,
+                    o.use_count,
+                    o.success_rate,
+                    o.confidence,
+                    (SELECT COALESCE(SUM(feedback_count), 0) FROM spec_usage_hourly
+                     WHERE spec_id = o.id) AS feedback_count,
+                    (SELECT SUM(score_sum) / NULLIF(SUM(scored_count), 0) FROM spec_usage_hourly
+                     WHERE spec_id = o.id) AS avg_score,
+                    (SELECT COUNT(*) FROM spec_adaptations WHERE spec_id = o.id)
+                        AS adaptation_count
+                FROM spec_objects o
+                WHERE o.id = ?
+            """
+            result = self.con.execute(query, [spec_id]).fetchone()
+
+            if not result:
+                return {"error": f"Spec {spec_id} not found"}
+
+            columns = [
+                "id",
+                "kind",
+                "name",
+                "use_count",
+                "success_rate",
+                "confidence",
+                "feedback_count",
+                "avg_score",
+                "adaptation_count",
+            ]
+            return dict(zip(columns, result))
+
+        except Exception as e:
+            return {"error": str(e)}
+
+    def get_specs_needing_improvement(
+        self,
+        min_usage: int = 5,
+        max_success_rate: float = 0.5,
+    ) -> list[dict[str, Any]]:
+        """
+        Get specs that have low success rates and might need improvement.
+
+        Args:
+            min_usage: Minimum usage count to consider
+            max_success_rate: Maximum success rate to include
+
+        Returns:
+            List of specs needing improvement
+        """
+        try:
+            self.flush_usage()
+            query = """
+                SELECT
+                    id, kind, name, version, status,
+                    use_count, success_rate, confidence,
+                    summary
+                FROM spec_objects
+                WHERE use_count >= ?
+                  AND success_rate < ?
+                  AND status = 'active'
+                ORDER BY success_rate ASC, use_count DESC
+            """
+            result = self.con.execute(query, [min_usage, max_success_rate]).fetchall()
+
+            columns = [
+                "id",
+                "kind",
+                "name",
+                "version",
+                "status",
+                "use_count",
+                "success_rate",
+                "confidence",
+                "summary",
+            ]
+            return [dict(zip(columns, row)) for row in result]
+
+        except Exception:
+            return []
+
+    def record_adaptation(
+        self,
+        spec_id: int,
+        adaptation_type: str,
+        reason: str,
+        changes: dict,
+        metrics_before: dict | None = None,
+        metrics_after: dict | None = None,
+    ) -> dict[str, Any]:
+        """
+        Record an adaptation made to a spec.
+
+        Args:
+            spec_id: Original spec ID
+            adaptation_type: Type ('parameter_tune', 'prompt_improve', 'tool_add', 'merge', 'split')
+            reason: Why the adaptation was made
+            changes: JSON describing the changes
+            metrics_before: Metrics before adaptation
+            metrics_after: Metrics after adaptation
+
+        Returns:
+            Dict with adaptation ID
+        """
+        try:
+            adaptation_id = self._next_id("spec_adaptations_seq")
+
+            self.con.execute(
+                """
+                INSERT INTO spec_adaptations
+                    (id, spec_id, adaptation_type, reason,
+                     changes, metrics_before, metrics_after)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    adaptation_id,
+                    spec_id,
+                    adaptation_type,
+                    reason,
+                    json.dumps(changes),
+                    json.dumps(metrics_before) if metrics_before else None,
+                    json.dumps(metrics_after) if metrics_after else None,
+                ],
+            )
+
+            return {"adaptation_id": adaptation_id}
+
+        except Exception as e:
+            return {"error": str(e)}
+
+    def record_learning(
+        self,
+        learning_type: str,
+        category: str,
+        description: str,
+        evidence: list | None = None,
+        confidence: float = 0.5,
+        application: str | None = None,
+    ) -> dict[str, Any]:
+        """
+        Record a learning insight from the meta-learning system.
+
+        Args:
+            learning_type: Type ('pattern', 'insight', 'rule', 'preference')
+            category: Category ('agent', 'skill', 'workflow', 'general')
+            description: What was learned
+            evidence: List of evidence (spec_ids, feedback_ids)
+            confidence: Confidence score (0.0 - 1.0)
+            application: How this should be applied
+
+        Returns:
+            Dict with learning ID
+        """
+        try:
+            learning_id = self._next_id("spec_learning_seq")
+
+            self.con.execute(
+                """
+                INSERT INTO spec_learning
+                    (id, learning_type, category, description,
+                     evidence, confidence, application)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    learning_id,
+                    learning_type,
+                    category,
+                    description,
+                    json.dumps(evidence) if evidence else None,
+                    confidence,
+                    application,
+                ],
+            )
+
+            return {"learning_id": learning_id}
+
+        except Exception as e:
+            return {"error": str(e)}
+
+    def get_top_learnings(self, limit: int = 10) -> list[dict[str, Any]]:
+        """
+        Get top learning insights by confidence.
+
+        Args:
+            limit: Maximum number of learnings to return
+
+        Returns:
+            List of learning insights
+        """
+        try:
+            query = """
+                SELECT
+                    id, learning_type, category,
+                    description, confidence,
+                    application,
+                    created_at
+                FROM spec_learning
+                WHERE confidence >= 0.5
+                ORDER BY confidence DESC, created_at DESC
+                LIMIT ?
+            """
+            result = self.con.execute(query, [limit]).fetchall()
+
+            columns = [
+                "id",
+                "learning_type",
+                "category",
+                "description",
+                "confidence",
+                "application",
+                "created_at",
+            ]
+            specs = []
+            for row in result:
+                spec = dict(zip(columns, row))
+                if spec.get("created_at"):
+                    spec["created_at"] = str(spec["created_at"])
+                specs.append(spec)
+            return specs
+
+        except Exception:
+            return []
+
+    # =========================================================================
+    # Provenance Methods (Source Tracking)
+    # =========================================================================
+
+    def set_upstream_source(
+        self,
+        spec_id: int,
+        source_url: str,
+        upstream_version: str,
+        source_ref: str | None = None,
+    ) -> dict[str, Any]:
+        """
+        Set upstream source for a spec.
+
+        Args:
+            spec_id: Spec ID
+            source_url: URL of the upstream source
+            upstream_version: Version in upstream
+            source_ref: Commit hash or other reference
+
+        Returns:
+            Dict with update status
+        """
+        try:
+            with self._transaction():
+                self.con.execute(
+                    """
+                    UPDATE spec_objects
+                    SET source_type = 'upstream',
+                        source_url = ?,
+                        upstream_version = ?,
+                        source_ref = ?,
+                        sync_status = 'synced',
+                        last_sync = current_timestamp,
+                        updated_at = current_timestamp
+                    WHERE id = ?
+                    """,
+                    [source_url, upstream_version, source_ref, spec_id],
+                )
+                self._log_spec_changes("update", "SELECT ?::INTEGER", [spec_id])
+            return {"updated": True, "sync_status": "synced"}
+
+        except Exception as e:
+            return {"error": str(e)}
+
+    def get_specs_needing_sync(self) -> list[dict[str, Any]]:
+        """
+        Get specs that need to be synced with their upstream source.
+
+        Returns:
+            List of specs with outdated or conflicting sync status
+        """
+        try:
+            query = """
+                SELECT
+                    id, kind, name, version,
+                    source_type, source_url, upstream_version,
+                    last_sync, sync_status,
+                    summary
+                FROM spec_objects
+                WHERE source_type = 'upstream'
+                  AND sync_status IN ('outdated', 'conflict')
+                ORDER BY last_sync ASC NULLS FIRST
+            """
+            result = self.con.execute(query).fetchall()
+
+            columns = [
+                "id",
+                "kind",
+                "name",
+                "version",
+                "source_type",
+                "source_url",
+                "upstream_version",
+                "last_sync",
+                "sync_status",
                 "summary",
             ]
-            return [dict(zip(columns, row)) for row in result]
+            specs = []
+            for row in result:
+                spec = dict(zip(columns, row))
+                if spec.get("last_sync"):
+                    spec["last_sync"] = str(spec["last_sync"])
+                specs.append(spec)
+            return specs
+
+        except Exception:
+            return []
+
+    # =========================================================================
+    # Embedding Models
+    # =========================================================================
+
+    def register_embedding_model(
+        self,
+        name: str,
+        dim: int,
+        metric: str = "cosine",
+        description: str | None = None,
+    ) -> dict[str, Any]:
+        """
+        Register an embedding model with a fixed dimension and similarity metric.
+
+        Vectors written for a registered model must have exactly dim values, and
+        its first write creates a persistent FLOAT[dim] vector table (see
+        build_vector_index()). Searches for the model use its metric and reject
+        queries of another dimension. The model 'default' also covers the knowledge
+        and memory tables, which have no embedding_model column.
+
+        Args:
+            name: Model name as stored in spec_embeddings.embedding_model
+            dim: Vector dimension
+            metric: 'cosine' or 'ip' (inner product, for normalized vectors)
+            description: Optional free text
+
+        Returns:
+            Dict with name, dim and metric, or error
+        """
+        try:
+            if metric not in _VECTOR_SIMILARITY_SQL:
+                return {"error": f"Unknown metric: {metric}"}
+            if dim <= 0:
+                return {"error": f"Invalid dimension: {dim}"}
+            existing = self._embedding_model(name)
+            if existing and (existing["dim"], existing["metric"]) != (dim, metric):
+                return {
+                    "error": (
+                        f"Embedding model {name!r} is registered as "
+                        f"{existing['dim']}/{existing['metric']}"
+                    )
+                }
+            self.con.execute(
+                """
+                INSERT INTO spec_embedding_models (name, dim, metric, description)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET description = excluded.description
+                """,
+                [name, dim, metric, description],
+            )
+            self._embedding_models = None
+            return {"name": name, "dim": dim, "metric": metric}
+        except Exception as e:
+            return {"error": str(e)}
+
+    def list_embedding_models(self) -> list[dict[str, Any]]:
+        """List registered embedding models with their stored spec_embeddings row counts."""
+        try:
+            rows = self.con.execute(
+                """
+                SELECT m.name, m.dim, m.metric, m.description,
+                       COUNT(e.id) AS vectors,
+                       COUNT(e.id) FILTER (WHERE len(e.embedding) <> m.dim) AS mismatched
+                FROM spec_embedding_models m
+                LEFT JOIN spec_embeddings e
+                    ON e.embedding_model = m.name AND e.embedding IS NOT NULL
+                GROUP BY ALL
+                ORDER BY m.name
+                """
+            ).fetchall()
+            columns = ["name", "dim", "metric", "description", "vectors", "mismatched"]
+            return [dict(zip(columns, row)) for row in rows]
+        except Exception:
+            return []
+
+    def migrate_embeddings(self, metric: str = "cosine") -> dict[str, Any]:
+        """
+        Move existing FLOAT[] vectors into per-model FLOAT[dim] storage.
+
+        Models found in spec_embeddings (and 'default' for the knowledge and memory
+        tables) that are not registered yet are registered with their most common
+        dimension. Every registered model then gets a persistent vector table per
+        source table that has its vectors. Rows of another dimension stay in the
+        source table, are counted under mismatched and are never compared.
+
+        Args:
+            metric: Metric for newly registered models
+
+        Returns:
+            Dict with registered (new models), migrated ("table/model" -> rows)
+            and mismatched ("table/model" -> rows), or error
+        """
+        try:
+            found: dict[tuple[str, str], list[tuple[int, int]]] = {}
+            for table in VECTOR_TABLES:
+                model_sql = "embedding_model" if table == "spec_embeddings" else "'default'"
+                rows = self.con.execute(
+                    f"""
+                    SELECT {model_sql} AS model, len(embedding) AS dim, COUNT(*) AS n
+                    FROM {table}
+                    WHERE embedding IS NOT NULL
+                    GROUP BY ALL
+                    ORDER BY n DESC, dim
+                    """
+                ).fetchall()
+                for model, dim, n in rows:
+                    found.setdefault((table, model), []).append((dim, n))
+
+            registered = []
+            for (_, model), dims in sorted(found.items()):
+                if self._embedding_model(model) is None:
+                    result = self.register_embedding_model(model, dims[0][0], metric)
+                    if "error" in result:
+                        return result
+                    registered.append(model)
+
+            migrated, mismatched = {}, {}
+            for (table, model), dims in sorted(found.items()):
+                result = self.build_vector_index(table, model, persistent=True)
+                if "error" in result:
+                    return result
+                migrated[f"{table}/{model}"] = result["rows"]
+                if result["skipped"]:
+                    mismatched[f"{table}/{model}"] = result["skipped"]
+            return {"registered": registered, "migrated": migrated, "mismatched": mismatched}
+        except Exception as e:
+            return {"error": str(e)}
+
+    def _embedding_model(self, name: str) -> dict[str, Any] | None:
+        """Registered embedding model by name, or None (cached until the next change)."""
+        if self._embedding_models is None:
+            rows = self.con.execute(
+                "SELECT name, dim, metric FROM spec_embedding_models"
+            ).fetchall()
+            self._embedding_models = {
+                row[0]: {"name": row[0], "dim": row[1], "metric": row[2]} for row in rows
+            }
+        return self._embedding_models.get(name)
+
+    def _check_embedding_dim(self, embedding_model: str, embedding: list[float] | None) -> None:
+        """Raise ValueError if a registered model's vector has the wrong dimension."""
+        model = self._embedding_model(embedding_model)
+        if model and embedding is not None and len(embedding) != model["dim"]:
+            raise ValueError(
+                f"Embedding model {embedding_model!r} has dimension {model['dim']}, "
+                f"got {len(embedding)} values"
+            )
+
+    def _scan_similarity_sql(self, embedding_model: str | None) -> str:
+        """FLOAT[] list similarity function for an exact scan over one model's vectors."""
+        model = self._embedding_model(embedding_model) if embedding_model else None
+        return _VECTOR_SIMILARITY_SQL[model["metric"] if model else "cosine"][1]
+
+    # =========================================================================
+    # Embedding Model Migration
+    # =========================================================================
+
+    def start_embedding_migration(
+        self,
+        from_model: str,
+        to_model: str,
+        *,
+        background: bool = True,
+        batch_size: int = EMBED_BATCH_SIZE,
+        throttle: float = EMBED_MIGRATION_THROTTLE,
+        embed_fn: Callable[[list[str]], list[list[float]]] | None = None,
+    ) -> dict[str, Any]:
+        """
+        Start (or resume) re-embedding the spec_embeddings vectors of one model with another.
+
+        The job is recorded in spec_embedding_migrations and driven by
+        run_embedding_migration(): new vectors go to spec_embedding_shadow while
+        searches keep using the old ones, and once every row of from_model has one
+        they are swapped in. With background=True the job runs in a daemon thread on
+        its own cursor; otherwise this call runs it to the end.
+
+        Args:
+            from_model: embedding_model of the vectors to replace
+            to_model: Model to re-embed with; stored in embedding_model after the switch
+            background: Run in a background thread
+            batch_size: Texts per embedding request
+            throttle: Seconds to sleep between batches
+            embed_fn: Replaces the Ollama call (texts -> vectors)
+
+        Returns:
+            Dict with to_model and from_model (plus the run totals in the
+            foreground), or error
+        """
+        try:
+            if from_model == to_model:
+                return {"error": "from_model and to_model must differ"}
+            job = self._embedding_migration(to_model)
+            if job and job["status"] == "running" and job["from_model"] != from_model:
+                return {
+                    "error": (
+                        f"A migration from {job['from_model']!r} to {to_model!r} is running"
+                    )
+                }
+            if not job or job["status"] != "running":
+                other = self.con.execute(
+                    """
+                    SELECT to_model FROM spec_embedding_migrations
+                    WHERE from_model = ? AND status = 'running'
+                    """,
+                    [from_model],
+                ).fetchone()
+                if other:
+                    return {
+                        "error": (
+                            f"A migration from {from_model!r} to {other[0]!r} is running"
+                        )
+                    }
+                self.con.execute("DELETE FROM spec_embedding_shadow WHERE model = ?", [to_model])
+                self.con.execute(
+                    """
+                    INSERT OR REPLACE INTO spec_embedding_migrations (to_model, from_model)
+                    VALUES (?, ?)
+                    """,
+                    [to_model, from_model],
+                )
+            options = {"batch_size": batch_size, "throttle": throttle, "embed_fn": embed_fn}
+            if not background:
+                return {
+                    "from_model": from_model,
+                    "to_model": to_model,
+                    **self.run_embedding_migration(to_model, **options),
+                }
+            thread = self._migration_threads.get(to_model)
+            if thread is None or not thread.is_alive():
+                thread = Thread(
+                    target=self._embedding_migration_worker,
+                    args=(to_model, options),
+                    name=f"embedding-migration-{to_model}",
+                    daemon=True,
+                )
+                self._migration_threads[to_model] = thread
+                thread.start()
+            return {"from_model": from_model, "to_model": to_model, "background": True}
+        except Exception as e:
+            return {"error": str(e)}
+
+    def run_embedding_migration(
+        self,
+        to_model: str,
+        *,
+        batch_size: int = EMBED_BATCH_SIZE,
+        throttle: float = EMBED_MIGRATION_THROTTLE,
+        limit: int | None = None,
+        switch: bool = True,
+        embed_fn: Callable[[list[str]], list[list[float]]] | None = None,
+    ) -> dict[str, Any]:
+        """
+        Advance a running embedding migration (see start_embedding_migration()).
+
+        Rows of from_model without a valid shadow vector are read in id order,
+        batch_size at a time; texts with a known to_model vector (embedding_cache or
+        spec_embeddings) reuse it. Each batch's shadow vectors and the job checkpoint
+        commit together, so an interrupted run resumes where it stopped. A shadow
+        vector stays valid while the row's content_hash is unchanged; rows changed
+        behind the checkpoint are picked up by a final rescan. At full coverage the
+        vectors are swapped into spec_embeddings in one transaction and the
+        vector indexes of both models are rebuilt.
+
+        Args:
+            to_model: Target model of the migration
+            batch_size: Texts per embedding request
+            throttle: Seconds to sleep between batches
+            limit: Stop after this many rows (None: until done)
+            switch: Switch reads at full coverage
+            embed_fn: Replaces the Ollama call (texts -> vectors)
+
+        Returns:
+            Dict with rows, embedded, reused, failed, last_id, pending, coverage_pct
+            and status, or error
+        """
+        try:
+            if batch_size <= 0:
+                return {"error": "batch_size must be positive"}
+            job = self._embedding_migration(to_model)
+            if job is None:
+                return {"error": f"No embedding migration to {to_model!r}"}
+            embed = embed_fn or (lambda texts: ollama_embed_batch(to_model, texts))
+            cursor, rescanned = job["last_id"], False
+            totals = {"rows": 0, "embedded": 0, "reused": 0, "failed": 0}
+            while job["status"] == "running" and (limit is None or totals["rows"] < limit):
+                chunk = batch_size if limit is None else min(batch_size, limit - totals["rows"])
+                rows = self.con.execute(
+                    """
+                    SELECT e.id, e.content, sha256(e.content), e.content_hash
+                    FROM spec_embeddings e
+                    WHERE e.embedding_model = ? AND e.embedding IS NOT NULL AND e.id > ?
+                      AND NOT EXISTS (
+                          SELECT 1 FROM spec_embedding_shadow s
+                          WHERE s.id = e.id AND s.model = ? AND s.content_hash = e.content_hash
+                      )
+                    ORDER BY e.id
+                    LIMIT ?
+                    """,
+                    [job["from_model"], cursor, to_model, chunk],
+                ).fetchall()
+                if not rows:
+                    if rescanned or cursor < 0:
+                        break
+                    cursor, rescanned = -1, True
+                    continue
+
+                vectors = self._known_vectors(to_model, {h for _, _, h, _ in rows})
+                reused = sum(1 for _, _, h, _ in rows if h in vectors)
+                pending = list({h: text for _, text, h, _ in rows if h not in vectors}.items())
+                if pending:
+                    result = self._embed_batch(embed, pending)
+                    if isinstance(result, Exception):
+                        log.warning("Re-embedding batch of %d failed: %s", len(pending), result)
+                    else:
+                        vectors.update(zip((h for h, _ in pending), result))
+                done = [(row_id, vectors[h], ch) for row_id, _, h, ch in rows if h in vectors]
+                cursor = rows[-1][0]
+                with self._transaction():
+                    if done:
+                        self._write_shadow_embeddings(to_model, done)
+                    self.con.execute(
+                        """
+                        UPDATE spec_embedding_migrations
+                        SET last_id = ?, migrated = migrated + ?, updated_at = now()
+                        WHERE to_model = ?
+                        """,
+                        [cursor, len(done), to_model],
+                    )
+                totals["rows"] += len(rows)
+                totals["embedded"] += len(done) - reused
+                totals["reused"] += reused
+                totals["failed"] += len(rows) - len(done)
+                job = self._embedding_migration(to_model) or {"status": "cancelled"}
+                if throttle > 0:
+                    time.sleep(throttle)
+
+            progress = self._embedding_migration_progress(job)
+            if job["status"] == "running" and switch and progress["pending"] == 0:
+                self._switch_embedding_migration(job)
+                job["status"] = "switched"
+            return {**totals, "last_id": cursor, **progress, "status": job["status"]}
+        except Exception as e:
+            return {"error": str(e)}
+
+    def cancel_embedding_migration(self, to_model: str) -> dict[str, Any]:
+        """Stop an embedding migration and drop its shadow vectors; reads are unchanged."""
+        try:
+            with self._transaction():
+                self.con.execute(
+                    """
+                    UPDATE spec_embedding_migrations SET status = 'cancelled', updated_at = now()
+                    WHERE to_model = ? AND status = 'running'
+                    """,
+                    [to_model],
+                )
+                self.con.execute("DELETE FROM spec_embedding_shadow WHERE model = ?", [to_model])
+            return {"cancelled": True}
+        except Exception as e:
+            return {"error": str(e)}
+
+    def list_embedding_migrations(self) -> list[dict[str, Any]]:
+        """List embedding migrations with their pending rows and coverage."""
+        try:
+            rows = self.con.execute(
+                """
+                SELECT to_model, from_model, status, last_id, migrated,
+                       started_at, updated_at, switched_at
+                FROM spec_embedding_migrations
+                ORDER BY started_at
+                """
+            ).fetchall()
+            columns = [
+                "to_model",
+                "from_model",
+                "status",
+                "last_id",
+                "migrated",
+                "started_at",
+                "updated_at",
+                "switched_at",
+            ]
+            migrations = []
+            for row in rows:
+                job = dict(zip(columns, row))
+                if job["status"] == "running":
+                    job.update(self._embedding_migration_progress(job))
+                for key in ("started_at", "updated_at", "switched_at"):
+                    job[key] = str(job[key]) if job[key] else None
+                migrations.append(job)
+            return migrations
+        except Exception:
+            return []
+
+    def _embedding_migration(self, to_model: str) -> dict[str, Any] | None:
+        """The migration row of a target model, or None."""
+        row = self.con.execute(
+            """
+            SELECT to_model, from_model, status, last_id
+            FROM spec_embedding_migrations WHERE to_model = ?
+            """,
+            [to_model],
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("to_model", "from_model", "status", "last_id"), row))
+
+    def _embedding_migration_progress(self, job: dict[str, Any]) -> dict[str, Any]:
+        """Rows of a migration's source model without a valid shadow vector, and coverage."""
+        pending, total = self.con.execute(
+            """
+            SELECT count(*) FILTER (WHERE s.id IS NULL), count(*)
+            FROM spec_embeddings e
+            LEFT JOIN spec_embedding_shadow s
+                ON s.id = e.id AND s.model = ? AND s.content_hash = e.content_hash
+            WHERE e.embedding_model = ? AND e.embedding IS NOT NULL
+            """,
+            [job["to_model"], job["from_model"]],
+        ).fetchone()
+        coverage = round(100.0 * (total - pending) / total, 2) if total else 100.0
+        return {"pending": pending, "coverage_pct": coverage}
+
+    def _write_shadow_embeddings(
+        self, model: str, rows: list[tuple[int, list[float], str]]
+    ) -> None:
+        """Upsert migration vectors (id, vector, content_hash) and cache them by text."""
+        for _, vector, _ in rows:
+            self._check_embedding_dim(model, vector)
+        ids = np.array([row_id for row_id, _, _ in rows], dtype=np.int64)
+        hashes = json.dumps({str(row_id): content_hash for row_id, _, content_hash in rows})
+        with self._staged_vectors(ids, [vector for _, vector, _ in rows]) as vectors_sql:
+            self.con.execute(
+                f"""
+                INSERT INTO spec_embedding_shadow (id, model, content_hash, embedding)
+                SELECT v.key, ?, json_extract_string(?, '$."' || v.key || '"'), v.embedding
+                FROM ({vectors_sql}) AS v
+                ON CONFLICT (id, model) DO UPDATE SET
+                    content_hash = excluded.content_hash, embedding = excluded.embedding
+                """,
+                [model, hashes],
+            )
+        self.con.execute(
+            """
+            INSERT INTO embedding_cache (model, content_hash, embedding)
+            SELECT ?, sha256(e.content), any_value(s.embedding)
+            FROM spec_embedding_shadow s
+            JOIN spec_embeddings e ON e.id = s.id
+            WHERE s.model = ? AND s.id IN (SELECT unnest(?::BIGINT[]))
+            GROUP BY sha256(e.content)
+            ON CONFLICT DO NOTHING
+            """,
+            [model, model, _id_array_param(ids.tolist())],
+        )
+
+    def _switch_embedding_migration(self, job: dict[str, Any]) -> None:
+        """
+        Swap a fully covered migration's shadow vectors into spec_embeddings.
+
+        Persistent vector tables of both models are rebuilt here; TEMP ones are
+        dropped and rebuilt by the owning connection on first use.
+        """
+        from_model, to_model = job["from_model"], job["to_model"]
+        with self._transaction():
+            switched = self.con.execute(
+                """
+                UPDATE spec_embeddings AS e
+                SET embedding = s.embedding, embedding_model = s.model, updated_at = now()
+                FROM spec_embedding_shadow s
+                WHERE s.id = e.id AND s.model = ? AND s.content_hash = e.content_hash
+                  AND e.embedding_model = ?
+                RETURNING e.id
+                """,
+                [to_model, from_model],
+            ).fetchall()
+            ids = [row[0] for row in switched]
+            self._quantize_rows("spec_embeddings", ids)
+            self.con.execute("DELETE FROM spec_embedding_shadow WHERE model = ?", [to_model])
+            self.con.execute(
+                """
+                UPDATE spec_embedding_migrations
+                SET status = 'switched', switched_at = now(), updated_at = now()
+                WHERE to_model = ?
+                """,
+                [to_model],
+            )
+
+        indexes = {
+            index["model"]: index
+            for index in self._vector_index_registry().get("spec_embeddings", [])
+        }
+        if from_model in indexes:
+            self.drop_vector_index("spec_embeddings", from_model)
+        index = indexes.get(to_model)
+        if index and index["persistent"]:
+            result = self.build_vector_index(
+                "spec_embeddings",
+                to_model,
+                metric=index["metric"],
+                persistent=True,
+                ef_construction=index["options"]["ef_construction"],
+                ef_search=index["options"]["ef_search"],
+                m=index["options"]["M"],
+            )
+        elif index:
+            self.con.execute(f"DROP TABLE IF EXISTS {index['vector_table']}")
+            self._ready_vector_tables.discard(index["vector_table"])
+            result = {}
+        elif self._embedding_model(to_model):
+            result = self.build_vector_index("spec_embeddings", to_model, persistent=True)
+        else:
+            result = {}
+        if "error" in result:
+            raise RuntimeError(result["error"])
+
+    def _embedding_migration_worker(self, to_model: str, options: dict[str, Any]) -> None:
+        """Run a migration on a cursor of this connection, then drop stale vector caches."""
+        worker = SpecEngine(self.con.cursor(), self.db_path)
+        try:
+            result = worker.run_embedding_migration(to_model, **options)
+            if "error" in result:
+                log.warning("Embedding migration to %s stopped: %s", to_model, result["error"])
+            elif result["status"] == "switched":
+                # TEMP vector tables live in this connection; rebuild them on next use.
+                stale = {
+                    index["vector_table"]
+                    for index in worker._vector_index_registry().get("spec_embeddings", [])
+                    if not index["persistent"]
+                }
+                self._stale_vector_tables.update(stale)
+                self._ready_vector_tables.difference_update(stale)
+                self._vector_indexes = None
+        finally:
+            worker.con.close()
+
+    # =========================================================================
+    # Vector Indexes (HNSW)
+    # =========================================================================
+
+    def build_vector_index(
+        self,
+        table: str = "spec_embeddings",
+        embedding_model: str = "default",
+        *,
+        metric: str | None = None,
+        persistent: bool = False,
+        defer: bool = False,
+        ef_construction: int = 128,
+        ef_search: int = 64,
+        m: int = 16,
+    ) -> dict[str, Any]:
+        """
+        Build (or rebuild) the ANN index for one embedding model of a vector table.
+
+        The model's vectors are copied into a fixed-dimension FLOAT[dim] table
+        ({table}__vec_{slug}_{hash}) that is kept in sync on write, with an HNSW index on
+        it when the vss extension is loaded. The copy exists because HNSW only
+        indexes fixed-size ARRAY columns, while the source column is a FLOAT[] list
+        shared by every model. Searches use it when the query has the same
+        dimension and fall back to the full scan otherwise. For a registered
+        model (see register_embedding_model()) the registered dimension is used,
+        otherwise the most common one.
+
+        Args:
+            table: One of VECTOR_TABLES
+            embedding_model: spec_embeddings.embedding_model to index; the knowledge
+                and memory tables have no model column and use 'default'
+            metric: HNSW metric ('cosine', 'ip' or 'l2sq'); defaults to the
+                registered model's metric, else cosine. Searches skip l2sq indexes
+            persistent: Store the vector table and index in the database file. vss
+                persistence is experimental, so by default a TEMP table is used and
+                rebuilt on first use after a restart
+            defer: Only register the index (registered models only); the vector
+                table is built by the first SQL search that uses it
+            ef_construction: HNSW build-time candidate list size
+            ef_search: HNSW query-time candidate list size
+            m: HNSW neighbours per node
+
+        Returns:
+            Dict with vector_table, dim, rows, skipped (other dimensions) and hnsw,
+            or error. A deferred index reports rows None
+        """
+        try:
+            if table not in VECTOR_TABLES:
+                return {"error": f"Unknown vector table: {table}"}
+            if table != "spec_embeddings" and embedding_model != "default":
+                return {"error": f"{table} has no embedding_model column; use 'default'"}
+            model = self._embedding_model(embedding_model)
+            metric = metric or (model["metric"] if model else "cosine")
+            if metric not in _VECTOR_DISTANCE_SQL:
+                return {"error": f"Unknown metric: {metric}"}
+
+            if defer and not model:
+                return {"error": f"Only registered models can defer: {embedding_model!r}"}
+
+            model_filter, params = self._vector_model_filter(table, embedding_model)
+            dims = [] if defer else self.con.execute(
+                f"""
+                SELECT len(embedding) AS dim, COUNT(*) AS n
+                FROM {table}
+                WHERE embedding IS NOT NULL {model_filter}
+                GROUP BY dim
+                ORDER BY n DESC, dim
+                """,
+                params,
+            ).fetchall()
+            if model:
+                dim = model["dim"]
+            elif dims:
+                dim = dims[0][0]
+            else:
+                return {"error": f"No {embedding_model!r} vectors in {table}"}
+
+            vector_table = f"{table}__vec_{_model_slug(embedding_model)}"
+            for other in self._vector_index_registry().get(table, []):
+                if other["model"] == embedding_model and other["vector_table"] != vector_table:
+                    self.con.execute(f"DROP TABLE IF EXISTS {other['vector_table']}")
+                    self._ready_vector_tables.discard(other["vector_table"])
+                elif other["model"] != embedding_model and other["vector_table"] == vector_table:
+                    return {
+                        "error": f"{vector_table} already holds model {other['model']!r}"
+                    }
+            index = {
+                "source_table": table,
+                "model": embedding_model,
+                "dim": dim,
+                "metric": metric,
+                "vector_table": vector_table,
+                "persistent": persistent,
+                "options": {"ef_construction": ef_construction, "ef_search": ef_search, "M": m},
+            }
+            if defer:
+                self.con.execute(f"DROP TABLE IF EXISTS {vector_table}")
+                self._ready_vector_tables.discard(vector_table)
+                rows, hnsw = None, False
+            else:
+                rows, hnsw = self._build_vector_table(index)
+            self.con.execute(
+                """
+                INSERT OR REPLACE INTO spec_vector_indexes
+                    (source_table, model, dim, metric, vector_table, persistent,
+                     options, hnsw, row_count, built_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, current_timestamp)
+                """,
+                [
+                    table,
+                    embedding_model,
+                    index["dim"],
+                    metric,
+                    index["vector_table"],
+                    persistent,
+                    json.dumps(index["options"]),
+                    hnsw,
+                    rows,
+                ],
+            )
+            self._vector_indexes = None
+            self._load_vector_ann_macros()
+            return {
+                "vector_table": index["vector_table"],
+                "dim": index["dim"],
+                "rows": rows,
+                "skipped": sum(n for d, n in dims if d != dim),
+                "hnsw": hnsw,
+            }
+        except Exception as e:
+            return {"error": str(e)}
+
+    def drop_vector_index(
+        self, table: str = "spec_embeddings", embedding_model: str = "default"
+    ) -> dict[str, Any]:
+        """Drop a vector index and its FLOAT[dim] table; searches go back to the scan."""
+        try:
+            for index in self._vector_index_registry().get(table, []):
+                if index["model"] == embedding_model:
+                    self.con.execute(f"DROP TABLE IF EXISTS {index['vector_table']}")
+                    self._ready_vector_tables.discard(index["vector_table"])
+            self.con.execute(
+                "DELETE FROM spec_vector_indexes WHERE source_table = ? AND model = ?",
+                [table, embedding_model],
+            )
+            self._vector_indexes = None
+            self._load_vector_ann_macros()
+            return {"dropped": True}
+        except Exception as e:
+            return {"error": str(e)}
+
+    def rebuild_vector_indexes(self) -> dict[str, Any]:
+        """
+        Rebuild every registered vector index from its source table.
+
+        Returns:
+            Dict mapping "table/model" to the rebuilt row count, or error
+        """
+        try:
+            rebuilt = {}
+            for table, indexes in self._vector_index_registry().items():
+                for index in indexes:
+                    result = self.build_vector_index(
+                        table,
+                        index["model"],
+                        metric=index["metric"],
+                        persistent=index["persistent"],
+                        ef_construction=index["options"]["ef_construction"],
+                        ef_search=index["options"]["ef_search"],
+                        m=index["options"]["M"],
+                    )
+                    if "error" in result:
+                        return result
+                    rebuilt[f"{table}/{index['model']}"] = result["rows"]
+            return {"rebuilt": rebuilt}
+        except Exception as e:
+            return {"error": str(e)}
 
+    def list_vector_indexes(self) -> list[dict[str, Any]]:
+        """List registered vector indexes with their dimension, metric and row count."""
+        try:
+            return [
+                {**index, "built_at": str(index["built_at"])}
+                for indexes in self._vector_index_registry().values()
+                for index in indexes
+            ]
         except Exception:
             return []
 
-    def get_spec_performance(self, spec_id: int) -> dict[str, Any]:
+    def _vector_model_filter(
+        self, table: str, embedding_model: str | None, alias: str = ""
+    ) -> tuple[str, list]:
+        """SQL fragment restricting a vector table to one embedding model, if it has one."""
+        if table == "spec_embeddings" and embedding_model is not None:
+            column = f"{alias}.embedding_model" if alias else "embedding_model"
+            return f"AND {column} = ?", [embedding_model]
+        return "", []
+
+    def _load_vector_ann_macros(self) -> None:
+        """
+        Point the vector_ann() and vector_ann_dims() macros (see rag.sql) at the vector tables.
+
+        The vss_search_* and hybrid macros take their candidates from vector_ann()
+        when the query's dimension has a persistent cosine index; TEMP vector
+        tables are invisible to other connections. The query vector is cast to the
+        index's FLOAT[dim] under a CASE on its length, so the branches of other
+        dimensions fold away and vss can plan an HNSW scan for the matching one.
+        """
+        existing = {
+            row[0]
+            for row in self.con.execute(
+                "SELECT table_name FROM duckdb_tables() WHERE NOT temporary"
+            ).fetchall()
+        }
+        indexes = [
+            index
+            for indexes in self._vector_index_registry().values()
+            for index in indexes
+            if index["persistent"]
+            and index["metric"] == "cosine"
+            and index["vector_table"] in existing
+        ]
+        branches = [
+            f"""
+            SELECT id FROM (
+                SELECT id FROM {index["vector_table"]}
+                ORDER BY array_cosine_distance(
+                    embedding,
+                    (CASE WHEN len(query_vec) = {index["dim"]} THEN query_vec END)
+                        ::FLOAT[{index["dim"]}]
+                )
+                LIMIT n
+            )
+            WHERE source = '{index["source_table"]}' AND len(query_vec) = {index["dim"]}
+            """
+            for index in indexes
+        ]
+        dims: dict[str, set[int]] = {}
+        for index in indexes:
+            dims.setdefault(index["source_table"], set()).add(index["dim"])
+        cases = " ".join(f"WHEN '{table}' THEN {sorted(d)}" for table, d in dims.items())
+        self.con.execute(
+            "CREATE OR REPLACE MACRO vector_ann(source, query_vec, n) AS TABLE ("
+            + (" UNION ALL ".join(branches) or "SELECT NULL::INTEGER AS id WHERE FALSE")
+            + ")"
+        )
+        self.con.execute(
+            "CREATE OR REPLACE MACRO vector_ann_dims(source) AS "
+            + (f"CASE source {cases} ELSE []::INTEGER[] END" if cases else "[]::INTEGER[]")
+        )
+
+    def _vector_index_registry(self) -> dict[str, list[dict[str, Any]]]:
+        """Registered vector indexes grouped by source table (cached until the next change)."""
+        if self._vector_indexes is None:
+            rows = self.con.execute(
+                """
+                SELECT source_table, model, dim, metric, vector_table, persistent,
+                       options, hnsw, row_count, built_at
+                FROM spec_vector_indexes
+                ORDER BY source_table, model
+                """
+            ).fetchall()
+            columns = [
+                "source_table",
+                "model",
+                "dim",
+                "metric",
+                "vector_table",
+                "persistent",
+                "options",
+                "hnsw",
+                "row_count",
+                "built_at",
+            ]
+            registry: dict[str, list[dict[str, Any]]] = {}
+            for row in rows:
+                index = dict(zip(columns, row))
+                index["options"] = json.loads(index["options"] or "{}")
+                registry.setdefault(index["source_table"], []).append(index)
+            self._vector_indexes = registry
+        return self._vector_indexes
+
+    def _build_vector_table(self, index: dict[str, Any]) -> tuple[int, bool]:
+        """(Re)create the FLOAT[dim] table of an index and its HNSW index if vss is loaded."""
+        table, dim = index["source_table"], index["dim"]
+        vector_table = index["vector_table"]
+        model_filter, params = self._vector_model_filter(table, index["model"])
+        self.con.execute(f"DROP TABLE IF EXISTS {vector_table}")
+        self.con.execute(
+            f"""
+            CREATE {"" if index["persistent"] else "TEMP "}TABLE {vector_table} AS
+            SELECT id, embedding::FLOAT[{dim}] AS embedding
+            FROM {table}
+            WHERE embedding IS NOT NULL AND len(embedding) = {dim} {model_filter}
+            """,
+            params,
+        )
+        hnsw = is_extension_loaded(self.con, "vss")
+        if hnsw:
+            if index["persistent"] and self.db_path != ":memory:":
+                self.con.execute("SET hnsw_enable_experimental_persistence = true")
+            options = ", ".join(
+                f"{key} = {int(value)}" for key, value in index["options"].items()
+            )
+            self.con.execute(
+                f"""
+                CREATE INDEX {vector_table}_hnsw ON {vector_table}
+                USING HNSW (embedding) WITH (metric = '{index["metric"]}', {options})
+                """
+            )
+        self._ready_vector_tables.add(vector_table)
+        rows = self.con.execute(f"SELECT COUNT(*) FROM {vector_table}").fetchone()[0]
+        return rows, hnsw
+
+    def _vector_index(
+        self, table: str, embedding_model: str | None, dim: int
+    ) -> dict[str, Any] | None:
+        """
+        Find the index a similarity search over table can use, or None to scan.
+
+        Without an embedding_model the index is only used when exactly one model
+        of that dimension is indexed. Deferred indexes, TEMP vector tables lost on
+        restart and tables left stale by a background embedding migration are
+        (re)built here on first use.
+
+        Raises:
+            ValueError: If embedding_model is registered with a different dimension
+        """
+        model = self._embedding_model(embedding_model) if embedding_model else None
+        if model and model["dim"] != dim:
+            raise ValueError(
+                f"Embedding model {embedding_model!r} has dimension {model['dim']}, "
+                f"got a {dim}-dimensional query"
+            )
+        candidates = [
+            index
+            for index in self._vector_index_registry().get(table, [])
+            if index["dim"] == dim
+            and index["metric"] in _VECTOR_SIMILARITY_SQL
+            and embedding_model in (None, index["model"])
+        ]
+        if len(candidates) != 1:
+            return None
+        index = candidates[0]
+        if not self._vector_table_ready(index):
+            self._stale_vector_tables.discard(index["vector_table"])
+            index["row_count"], index["hnsw"] = self._build_vector_table(index)
+            self.con.execute(
+                """
+                UPDATE spec_vector_indexes
+                SET row_count = ?, hnsw = ?, built_at = current_timestamp
+                WHERE source_table = ? AND model = ?
+                """,
+                [index["row_count"], index["hnsw"], table, index["model"]],
+            )
+            if index["persistent"]:
+                self._load_vector_ann_macros()
+        return index
+
+    def _vector_table_ready(self, index: dict[str, Any]) -> bool:
+        """Whether the index's vector table exists on this connection and is not stale."""
+        vector_table = index["vector_table"]
+        if vector_table in self._ready_vector_tables:
+            return True
+        if vector_table in self._stale_vector_tables:
+            return False
+        exists = self.con.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?", [vector_table]
+        ).fetchone()[0]
+        if exists:
+            self._ready_vector_tables.add(vector_table)
+        return bool(exists)
+
+    def _sync_vector_rows(self, table: str, ids: list[int], embedding_model: str) -> None:
+        """
+        Copy changed rows of a source table into its vector tables (HNSW updates in place).
+
+        The first write of a registered model only registers its persistent index;
+        the FLOAT[dim] table is built by the first SQL search that needs it, so the
+        write doesn't stall on an index build and NumPy-only setups never hold the
+        copy. Loaded NumPy vector stores re-read the rows on their next search.
+        """
+        for (store_table, _, _), store in self._numpy_stores.items():
+            if store_table == table:
+                store.dirty.update(int(i) for i in ids)
+        model = self._embedding_model(embedding_model)
+        indexed = {index["model"] for index in self._vector_index_registry().get(table, [])}
+        if model and embedding_model not in indexed:
+            result = self.build_vector_index(
+                table, embedding_model, persistent=True, defer=True
+            )
+            if "error" in result:
+                raise RuntimeError(result["error"])
+            return
+        for index in self._vector_index_registry().get(table, []):
+            vector_table = index["vector_table"]
+            if not self._vector_table_ready(index):
+                continue  # built from the source table on first search
+            model_filter, params = self._vector_model_filter(table, index["model"])
+            self.con.execute(
+                f"DELETE FROM {vector_table} WHERE id IN (SELECT unnest(?::INTEGER[]))",
+                [_id_array_param(ids)],
+            )
+            self.con.execute(
+                f"""
+                INSERT INTO {vector_table}
+                SELECT id, embedding::FLOAT[{index["dim"]}]
+                FROM {table}
+                WHERE id IN (SELECT unnest(?::INTEGER[]))
+                  AND embedding IS NOT NULL AND len(embedding) = {index["dim"]} {model_filter}
+                """,
+                [_id_array_param(ids), *params],
+            )
+
+    def _ann_search(
+        self,
+        index: dict[str, Any],
+        query_embedding: list[float],
+        k: int,
+        columns_sql: str,
+        where_sql: str = "",
+        params: list[Any] | None = None,
+        con: duckdb.DuckDBPyConnection | None = None,
+    ) -> list[tuple] | None:
+        """
+        Top-k rows of the index's source table by similarity via the vector table.
+
+        The index metric picks the similarity (array_cosine_similarity or
+        array_inner_product). The query vector is inlined as a constant so that vss
+        can rewrite the ORDER BY ... LIMIT into an HNSW scan. A WHERE filter is
+        planned by _filtered_ann_fetch(): enough candidates are fetched for about
+        k to survive it. None means the filter is selective enough for an exact
+        scan, or too few candidates survived, and the caller should scan.
+        """
+        vector = _vector_literal(query_embedding, f"FLOAT[{index['dim']}]")
+        distance = _VECTOR_DISTANCE_SQL[index["metric"]]
+        similarity = _VECTOR_SIMILARITY_SQL[index["metric"]][0]
+        fetch = k
+        if where_sql:
+            fetch = self._filtered_ann_fetch(
+                index["source_table"], index["model"], where_sql, params or [], k, con
+            )
+            if fetch is None:
+                return None
+        rows = (con or self.con).execute(
+            f"""
+            WITH ann AS (
+                SELECT id, {similarity}(embedding, {vector}) AS similarity
+                FROM {index["vector_table"]}
+                ORDER BY {distance}(embedding, {vector})
+                LIMIT {int(fetch)}
+            )
+            SELECT {columns_sql}, ann.similarity
+            FROM ann
+            JOIN {index["source_table"]} e ON e.id = ann.id
+            WHERE TRUE {where_sql}
+            ORDER BY ann.similarity DESC
+            LIMIT {int(k)}
+            """,
+            params or [],
+        ).fetchall()
+        if where_sql and len(rows) < k:
+            return None
+        return rows
+
+    def _filtered_ann_fetch(
+        self,
+        table: str,
+        embedding_model: str | None,
+        where_sql: str,
+        params: list[Any],
+        k: int,
+        con: duckdb.DuckDBPyConnection | None = None,
+    ) -> int | None:
+        """
+        Plan a filtered vector search by the selectivity of its filter.
+
+        Counts the model's rows and those passing where_sql (reading only the
+        filter columns). Returns None when the matching rows should be scored
+        exactly (see FILTERED_SCAN_MAX_ROWS), else how many nearest candidates to
+        take so that about k pass the filter.
+        """
+        model_filter, model_params = self._vector_model_filter(table, embedding_model)
+        matching, total = (con or self.con).execute(
+            f"""
+            SELECT count(*) FILTER (WHERE TRUE {where_sql}), count(*)
+            FROM {table} e
+            WHERE TRUE {model_filter}
+            """,
+            [*params, *model_params],
+        ).fetchone()
+        if matching <= FILTERED_SCAN_MAX_ROWS or matching < total * FILTERED_ANN_MIN_SELECTIVITY:
+            return None
+        return min(total, -(-k * ANN_OVERFETCH * total // matching))
+
+    def _numpy_filter(
+        self,
+        table: str,
+        embedding_model: str | None,
+        where_sql: str,
+        params: list[Any],
+        k: int,
+    ) -> tuple[int, np.ndarray | None]:
+        """
+        (candidates to select, allowed ids) of a search over the NumPy stores.
+
+        Without a filter that is (k, None). A selective filter (see
+        _filtered_ann_fetch()) yields the ids of its rows, so only those rows are
+        scored and the top k are exact; a wide one yields more candidates instead.
+        """
+        if not where_sql:
+            return k, None
+        fetch = self._filtered_ann_fetch(table, embedding_model, where_sql, params, k)
+        if fetch is not None:
+            return fetch, None
+        model_filter, model_params = self._vector_model_filter(table, embedding_model)
+        allowed = self.con.execute(
+            f"SELECT e.id FROM {table} e WHERE TRUE {model_filter} {where_sql}",
+            [*model_params, *params],
+        ).fetchnumpy()["id"].astype(np.int64)
+        return k, allowed
+
+    def _use_numpy_vectors(self) -> bool:
+        """Whether vector searches use the NumPy stores (no vss extension loaded)."""
+        return not is_extension_loaded(self.con, "vss")
+
+    def _numpy_vector_store(
+        self, table: str, embedding_model: str, dim: int
+    ) -> _NumpyVectorStore:
+        """The NumPy store of one table/model/dimension, refreshed from the table."""
+        store = self._numpy_stores.get((table, embedding_model, dim))
+        if store is None:
+            path = None
+            row = self.con.execute(
+                "SELECT path FROM duckdb_databases() WHERE database_name = current_database()"
+            ).fetchone()
+            if row and row[0]:
+                path = (
+                    Path(row[0] + NUMPY_VECTOR_DIR_SUFFIX)
+                    / f"{table}__{_model_slug(embedding_model)}__{dim}"
+                )
+            model = self._embedding_model(embedding_model)
+            normalize = (model["metric"] if model else "cosine") != "ip"
+            store = _NumpyVectorStore(path, dim, normalize)
+            self._numpy_stores[(table, embedding_model, dim)] = store
+        self._refresh_numpy_vectors(table, embedding_model, store)
+        return store
+
+    def _refresh_numpy_vectors(
+        self, table: str, embedding_model: str, store: _NumpyVectorStore
+    ) -> None:
+        """
+        Bring a NumPy store up to date with its table.
+
+        The store remembers the model's row count, vector count, highest id, id
+        sum and (spec_embeddings) latest updated_at; these are read without
+        touching the vectors, so an unchanged table costs one small query. Rows
+        past the id or updated_at watermark and rows written through the engine
+        since the last refresh are re-read. If the counts or the id sum moved by
+        more than the new rows explain (deletes, raw SQL inserts, vectors filled
+        in place), the id sets are compared as well. Raw SQL updates of an
+        existing vector that leave the counts and updated_at alone are not seen.
+        """
+        model_filter, params = self._vector_model_filter(table, embedding_model)
+        watermark = ", max(updated_at)::VARCHAR" if table == "spec_embeddings" else ""
+        key = list(
+            self.con.execute(
+                f"""
+                SELECT count(*), count(embedding), max(id), coalesce(sum(id), 0){watermark}
+                FROM {table}
+                WHERE TRUE {model_filter}
+                """,
+                params,
+            ).fetchone()
+        )
+        if key == store.key and not store.dirty:
+            return
+        eligible = f"embedding IS NOT NULL AND len(embedding) = {store.dim} {model_filter}"
+
+        def fetch(where: str, where_params: list[Any]) -> np.ndarray:
+            data = self.con.execute(
+                f"""
+                SELECT id, embedding::FLOAT[{store.dim}] AS embedding
+                FROM {table}
+                WHERE {eligible} AND ({where})
+                """,
+                [*params, *where_params],
+            ).fetchnumpy()
+            ids = data["id"].astype(np.int64)
+            if len(ids):
+                store.upsert(ids, np.stack(data["embedding"]))
+            return ids
+
+        old = store.key
+        if old is None:
+            fetch("TRUE", [])
+            reconcile = False
+        else:
+            where = "(?::BIGINT IS NULL OR id > ?) OR id IN (SELECT unnest(?::BIGINT[]))"
+            where_params = [old[2], old[2], _id_array_param(store.dirty)]
+            if watermark:
+                where += " OR updated_at > ?::TIMESTAMP"
+                where_params.append(old[4])
+            fetched = fetch(where, where_params)
+            store.remove(store.dirty.difference(fetched.tolist()))
+            appended, appended_ids = self.con.execute(
+                f"""
+                SELECT count(*), coalesce(sum(id), 0)
+                FROM {table}
+                WHERE (?::BIGINT IS NULL OR id > ?) {model_filter}
+                """,
+                [old[2], old[2], *params],
+            ).fetchone()
+            reconcile = (
+                key[0] - old[0] != appended
+                or key[1] - old[1] != appended
+                or key[3] - old[3] != appended_ids
+            )
+        store.dirty.clear()
+        if reconcile:
+            current = self.con.execute(
+                f"SELECT id FROM {table} WHERE {eligible}", params
+            ).fetchnumpy()["id"].astype(np.int64)
+            held = store.ids[: store.rows].copy()
+            store.remove(held[~np.isin(held, current)].tolist())
+            missing = current[~np.isin(current, held)]
+            if len(missing):
+                fetch("id IN (SELECT unnest(?::BIGINT[]))", [_id_array_param(missing)])
+        store.save(key)
+
+    def _numpy_vector_stores(
+        self, table: str, query_embedding: list[float], embedding_model: str | None
+    ) -> list[_NumpyVectorStore]:
+        """
+        Refreshed NumPy stores holding the rows of table with the query's dimension.
+
+        Without an embedding_model, there is one per spec_embeddings model.
+        """
+        if embedding_model is not None:
+            self._check_embedding_dim(embedding_model, query_embedding)
+        dim = len(query_embedding)
+        if table == "spec_embeddings" and embedding_model is None:
+            models = [
+                row[0]
+                for row in self.con.execute(
+                    """
+                    SELECT DISTINCT embedding_model FROM spec_embeddings
+                    WHERE embedding_model IS NOT NULL
+                    ORDER BY embedding_model
+                    """
+                ).fetchall()
+            ]
+        else:
+            models = [embedding_model or "default"]
+        return [self._numpy_vector_store(table, model, dim) for model in models]
+
+    def _numpy_vector_scores(
+        self, table: str, query_embedding: list[float], embedding_model: str | None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """(ids, similarities) of every row with the query's dimension via the NumPy stores."""
+        stores = self._numpy_vector_stores(table, query_embedding, embedding_model)
+        return _score_numpy_stores(stores, query_embedding)
+
+    def _numpy_vector_search(
+        self,
+        table: str,
+        query_embedding: list[float],
+        k: int,
+        columns_sql: str,
+        embedding_model: str | None,
+        where_sql: str = "",
+        params: list[Any] | None = None,
+    ) -> list[tuple] | None:
+        """
+        Top-k rows of table by similarity from the NumPy stores (see _ann_search()).
+
+        argpartition selects the candidates without sorting every score; only
+        those rows are fetched. columns_sql must start with e.id. A selective WHERE
+        filter scores only its rows; a wide one takes more candidates (see
+        _numpy_filter()). None means too few survived and the caller should scan.
+        """
+        params = params or []
+        stores = self._numpy_vector_stores(table, query_embedding, embedding_model)
+        fetch, allowed = self._numpy_filter(table, embedding_model, where_sql, params, k)
+        ids, scores = _score_numpy_stores(stores, query_embedding, fetch, allowed)
+        return self._numpy_candidate_rows(
+            table, ids, scores, k, fetch, columns_sql, where_sql, params
+        )
+
+    def _numpy_candidate_rows(
+        self,
+        table: str,
+        ids: np.ndarray,
+        scores: np.ndarray,
+        k: int,
+        fetch: int,
+        columns_sql: str,
+        where_sql: str,
+        params: list[Any],
+    ) -> list[tuple] | None:
+        """Fetch scored candidates through a filter; the top k rows with similarity, or None."""
+        if not len(ids):
+            return []
+        similarity = dict(zip(ids.tolist(), scores.tolist()))
+        rows = self.con.execute(
+            f"""
+            SELECT {columns_sql}
+            FROM {table} e
+            WHERE e.id IN (SELECT unnest(?::BIGINT[])) {where_sql}
+            """,
+            [_id_array_param(ids), *params],
+        ).fetchall()
+        rows.sort(key=lambda row: (-similarity[row[0]], row[0]))
+        if where_sql and len(rows) < k and len(ids) == fetch:
+            return None
+        return [(*row, similarity[row[0]]) for row in rows[:k]]
+
+    def search_vectors(
+        self,
+        table: str,
+        query_embedding: list[float],
+        k: int = 10,
+        embedding_model: str | None = None,
+        quantization: str | None = None,
+        rerank: int = QUANT_RERANK,
+    ) -> list[dict[str, Any]]:
+        """
+        Nearest rows of any VECTOR_TABLES table by similarity.
+
+        Uses the table's vector index when one matches the query dimension,
+        otherwise scans every row. Without vss, rows come from the NumPy stores.
+
+        Args:
+            table: One of VECTOR_TABLES
+            query_embedding: Query vector
+            k: Number of results to return
+            embedding_model: Restrict spec_embeddings to one model
+            quantization: 'binary' or 'int8' for a two-phase quantized search
+                (see quantize_embeddings())
+            rerank: Candidates per result re-ranked exactly in a quantized search
+
+        Returns:
+            List of dicts with id, content and similarity
+        """
+        if table not in VECTOR_TABLES:
+            raise ValueError(f"Unknown vector table: {table}")
+        try:
+            numpy_scan = self._use_numpy_vectors()
+            index = (
+                None
+                if numpy_scan
+                else self._vector_index(table, embedding_model, len(query_embedding))
+            )
+            model_filter, params = self._vector_model_filter(table, embedding_model)
+            result = None
+            if quantization:
+                result = self._quantized_search(
+                    table,
+                    query_embedding,
+                    k,
+                    "e.id, e.content",
+                    model_filter,
+                    params,
+                    quantization,
+                    rerank,
+                    embedding_model,
+                )
+            elif numpy_scan:
+                result = self._numpy_vector_search(
+                    table, query_embedding, k, "e.id, e.content", embedding_model
+                )
+            elif index is not None:
+                result = self._ann_search(index, query_embedding, k, "e.id, e.content")
+            if result is None:
+                similarity = self._scan_similarity_sql(embedding_model)
+                vector = _vector_literal(query_embedding, "FLOAT[]")
+                result = self.con.execute(
+                    f"""
+                    SELECT id, content, {similarity}(embedding, {vector}) AS similarity
+                    FROM {table}
+                    WHERE embedding IS NOT NULL AND len(embedding) = ? {model_filter}
+                    ORDER BY similarity DESC
+                    LIMIT ?
+                    """,
+                    [len(query_embedding), *params, k],
+                ).fetchall()
+        except Exception as e:
+            raise RuntimeError(f"search_vectors() failed: {e}") from e
+        return [dict(zip(["id", "content", "similarity"], row)) for row in result]
+
+    def knowledge_search(
+        self,
+        query_embedding: list[float],
+        k: int = 10,
+        sources: list[str] | None = None,
+        filters: dict[str, Any] | None = None,
+        *,
+        embedding_model: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Search several knowledge bases with one query vector and merge their top k.
+
+        Each source is searched like search_vectors(): through its vector index,
+        or without vss through the NumPy stores. Sources are searched concurrently,
+        one thread per source (see _knowledge_sql_rankings() and
+        _knowledge_numpy_rankings()). The per-source rankings are merged
+        by similarity with a heap. Every hit names its source table and org and
+        carries that table's provenance columns.
+
+        Args:
+            query_embedding: Query vector
+            k: Number of results to return
+            sources: Tables to search (default: all VECTOR_TABLES)
+            filters: Column -> value, or list of values; sources lacking one of
+                the columns are skipped
+            embedding_model: Restrict spec_embeddings to one model
+
+        Returns:
+            List of dicts with source, org, id, content, similarity and provenance
+        """
+        sources = list(VECTOR_TABLES) if sources is None else list(sources)
+        unknown = sorted(set(sources) - set(VECTOR_TABLES))
+        if unknown:
+            raise ValueError(f"Unknown knowledge source: {', '.join(unknown)}")
+        plans = self._knowledge_search_plans(sources, filters or {})
+        try:
+            if self._use_numpy_vectors():
+                rankings = self._knowledge_numpy_rankings(
+                    plans, query_embedding, k, embedding_model
+                )
+            else:
+                rankings = self._knowledge_sql_rankings(
+                    plans, query_embedding, k, embedding_model
+                )
+        except Exception as e:
+            raise RuntimeError(f"knowledge_search() failed: {e}") from e
+
+        hits = []
+        for plan, rows in zip(plans, rankings):
+            org, columns = _KNOWLEDGE_SEARCH_SOURCES[plan["source"]]
+            hits.append(
+                [
+                    {
+                        "source": plan["source"],
+                        "org": org,
+                        "id": row[0],
+                        "content": row[1],
+                        "similarity": float(row[-1]),
+                        "provenance": {
+                            column: str(value) if isinstance(value, datetime) else value
+                            for column, value in zip((*columns, "created_at"), row[2:-1])
+                        },
+                    }
+                    for row in rows
+                ]
+            )
+        merged = heapq.merge(*hits, key=lambda hit: -hit["similarity"])
+        return list(itertools.islice(merged, k))
+
+    def _knowledge_search_plans(
+        self, sources: list[str], filters: dict[str, Any]
+    ) -> list[dict[str, Any]]:
+        """Columns and filter SQL per source; sources lacking a filter column are skipped."""
+        rows = self.con.execute(
+            "SELECT table_name, column_name FROM duckdb_columns() WHERE table_name IN "
+            f"({', '.join('?' for _ in sources)})",
+            sources,
+        ).fetchall()
+        table_columns: dict[str, set[str]] = {}
+        for table, column in rows:
+            table_columns.setdefault(table, set()).add(column)
+        missing = [
+            column
+            for column in filters
+            if not any(column in table_columns.get(source, ()) for source in sources)
+        ]
+        if missing:
+            raise ValueError(f"No knowledge source has column: {', '.join(missing)}")
+
+        plans = []
+        for source in sources:
+            if any(column not in table_columns.get(source, ()) for column in filters):
+                continue
+            where, params = [], []
+            for column, value in filters.items():
+                if isinstance(value, (list, tuple, set)):
+                    values = list(value)
+                    where.append(f"AND e.{column} IN ({', '.join('?' for _ in values)})")
+                    params.extend(values)
+                else:
+                    where.append(f"AND e.{column} = ?")
+                    params.append(value)
+            _, columns = _KNOWLEDGE_SEARCH_SOURCES[source]
+            plans.append(
+                {
+                    "source": source,
+                    "columns_sql": ", ".join(
+                        f"e.{column}" for column in ("id", "content", *columns, "created_at")
+                    ),
+                    "where_sql": " ".join(where),
+                    "params": params,
+                }
+            )
+        return plans
+
+    def _knowledge_numpy_rankings(
+        self,
+        plans: list[dict[str, Any]],
+        query_embedding: list[float],
+        k: int,
+        embedding_model: str | None,
+    ) -> list[list[tuple]]:
+        """Rank each source from its NumPy stores, scoring all sources concurrently."""
+        # Refresh on this connection first; the scoring itself releases the GIL
+        stores = [
+            self._numpy_vector_stores(
+                plan["source"],
+                query_embedding,
+                embedding_model if plan["source"] == "spec_embeddings" else None,
+            )
+            for plan in plans
+        ]
+        filters = [
+            self._numpy_filter(
+                plan["source"],
+                embedding_model if plan["source"] == "spec_embeddings" else None,
+                plan["where_sql"],
+                plan["params"],
+                k,
+            )
+            for plan in plans
+        ]
+        with ThreadPoolExecutor(max_workers=max(len(plans), 1)) as pool:
+            scored = list(
+                pool.map(
+                    lambda args: _score_numpy_stores(args[0], query_embedding, *args[1]),
+                    zip(stores, filters),
+                )
+            )
+        rankings = []
+        for plan, (fetch, _), (ids, scores) in zip(plans, filters, scored):
+            rows = self._numpy_candidate_rows(
+                plan["source"],
+                ids,
+                scores,
+                k,
+                fetch,
+                plan["columns_sql"],
+                plan["where_sql"],
+                plan["params"],
+            )
+            if rows is None:
+                rows = self._knowledge_scan(plan, query_embedding, k, embedding_model)
+            rankings.append(rows)
+        return rankings
+
+    def _knowledge_sql_rankings(
+        self,
+        plans: list[dict[str, Any]],
+        query_embedding: list[float],
+        k: int,
+        embedding_model: str | None,
+    ) -> list[list[tuple]]:
+        """
+        Rank each source through its vector index, or by scanning it, sources concurrently.
+
+        Indexes are resolved on this connection first (TEMP vector tables are
+        rebuilt there), then each source is searched on its own cursor. TEMP
+        vector tables are invisible to other connections, and inside an open
+        transaction cursors would miss its writes, so those searches run here.
+        """
+        indexes = [
+            self._vector_index(
+                plan["source"],
+                embedding_model if plan["source"] == "spec_embeddings" else None,
+                len(query_embedding),
+            )
+            for plan in plans
+        ]
+        on_cursor = [
+            not self._in_transaction and (index is None or bool(index["persistent"]))
+            for index in indexes
+        ]
+
+        def rank_on_cursor(plan: dict[str, Any], index: dict[str, Any] | None) -> list[tuple]:
+            cursor = self.con.cursor()
+            try:
+                return self._knowledge_sql_ranking(
+                    plan, index, query_embedding, k, embedding_model, cursor
+                )
+            finally:
+                cursor.close()
+
+        with ThreadPoolExecutor(max_workers=max(sum(on_cursor), 1)) as pool:
+            futures = [
+                pool.submit(rank_on_cursor, plan, index) if shared else None
+                for plan, index, shared in zip(plans, indexes, on_cursor)
+            ]
+            rankings = [
+                future.result()
+                if future is not None
+                else self._knowledge_sql_ranking(plan, index, query_embedding, k, embedding_model)
+                for plan, index, future in zip(plans, indexes, futures)
+            ]
+        return rankings
+
+    def _knowledge_sql_ranking(
+        self,
+        plan: dict[str, Any],
+        index: dict[str, Any] | None,
+        query_embedding: list[float],
+        k: int,
+        embedding_model: str | None,
+        con: duckdb.DuckDBPyConnection | None = None,
+    ) -> list[tuple]:
+        """Rank one source through its vector index, or by scanning it."""
+        rows = None
+        if index is not None:
+            rows = self._ann_search(
+                index,
+                query_embedding,
+                k,
+                plan["columns_sql"],
+                plan["where_sql"],
+                plan["params"],
+                con,
+            )
+        if rows is None:
+            rows = self._knowledge_scan(plan, query_embedding, k, embedding_model, con)
+        return rows
+
+    def _knowledge_scan(
+        self,
+        plan: dict[str, Any],
+        query_embedding: list[float],
+        k: int,
+        embedding_model: str | None,
+        con: duckdb.DuckDBPyConnection | None = None,
+    ) -> list[tuple]:
+        """Exact top-k of one source by scanning every row of the query's dimension."""
+        table = plan["source"]
+        model = embedding_model if table == "spec_embeddings" else None
+        model_filter, model_params = self._vector_model_filter(table, model, "e")
+        similarity = self._scan_similarity_sql(model)
+        vector = _vector_literal(query_embedding, "FLOAT[]")
+        return (con or self.con).execute(
+            f"""
+            SELECT {plan["columns_sql"]}, {similarity}(e.embedding, {vector}) AS similarity
+            FROM {table} e
+            WHERE e.embedding IS NOT NULL AND len(e.embedding) = ?
+              {model_filter} {plan["where_sql"]}
+            ORDER BY similarity DESC
+            LIMIT ?
+            """,
+            [len(query_embedding), *model_params, *plan["params"], k],
+        ).fetchall()
+
+    # =========================================================================
+    # Quantized Embeddings
+    # =========================================================================
+
+    def enable_quantization(
+        self, table: str, embedding_model: str | None = None
+    ) -> dict[str, Any]:
+        """
+        Opt a vector table, or one spec_embeddings model, in to quantized search.
+
+        Quantization is off by default. Once enabled, store_embedding(),
+        store_org_knowledge() and store_conversation_memory() encode the rows
+        they write; existing rows are encoded here.
+
+        Args:
+            table: One of VECTOR_TABLES
+            embedding_model: Only this spec_embeddings model (default: every model)
+
+        Returns:
+            Dict with table, model and the number of rows encoded, or error
+        """
+        try:
+            model = self._quantization_scope(table, embedding_model)
+            with self._transaction():
+                self.con.execute(
+                    "INSERT OR IGNORE INTO spec_embedding_quantization (table_name, model) "
+                    "VALUES (?, ?)",
+                    [table, model],
+                )
+                encoded = self.quantize_embeddings(table)
+            if "error" in encoded:
+                return encoded
+            return {"table": table, "model": model, "quantized": encoded["quantized"][table]}
+        except Exception as e:
+            return {"error": str(e)}
+
+    def disable_quantization(
+        self, table: str, embedding_model: str | None = None
+    ) -> dict[str, Any]:
+        """
+        Undo enable_quantization() and drop the encodings it no longer covers.
+
+        Args:
+            table: One of VECTOR_TABLES
+            embedding_model: The model passed to enable_quantization()
+
+        Returns:
+            Dict with table, model and the number of encodings removed, or error
+        """
+        try:
+            model = self._quantization_scope(table, embedding_model)
+            with self._transaction():
+                self.con.execute(
+                    "DELETE FROM spec_embedding_quantization WHERE table_name = ? AND model = ?",
+                    [table, model],
+                )
+                row = self.con.execute(
+                    f"""
+                    DELETE FROM spec_embedding_quantized
+                    WHERE source_table = ? AND row_id NOT IN (
+                        SELECT id FROM {table} WHERE {self._quantized_rows_sql(table)}
+                    )
+                    """,
+                    [table],
+                ).fetchone()
+            return {"table": table, "model": model, "removed": row[0] if row else 0}
+        except Exception as e:
+            return {"error": str(e)}
+
+    def quantize_embeddings(
+        self, table: str | None = None, *, all_rows: bool = False
+    ) -> dict[str, Any]:
         """
-        Get performance metrics for a spec.
+        Backfill the binary and int8 encodings of opted-in tables.
+
+        The store_* methods quantize on write; this covers rows written with raw
+        SQL or before enable_quantization(), and drops the encodings of deleted
+        rows. Quantized searches skip rows without encodings.
 
         Args:
-            spec_id: Spec ID
+            table: One of VECTOR_TABLES (default: every opted-in table)
+            all_rows: Re-encode every row, not just rows missing an encoding
 
         Returns:
-            Dict with performance metrics
+            Dict mapping table to the number of rows encoded, or error
         """
         try:
-            query = """
-                SELECT
-                    o.id, o.kind, o.name,
-                    o.use_count,
-                    o.success_rate,
-                    o.confidence,
-                    COUNT(f.id) AS feedback_count,
-                    AVG(f.score) AS avg_score,
-                    COUNT(a.id) AS adaptation_count
-                FROM spec_objects o
-                LEFT JOIN spec_feedback f ON f.spec_id = o.id
-                LEFT JOIN spec_adaptations a ON a.spec_id = o.id
-                WHERE o.id = ?
-                GROUP BY o.id, o.kind, o.name, o.use_count, o.success_rate, o.confidence
-            """
-            result = self.con.execute(query, [spec_id]).fetchone()
-
-            if not result:
-                return {"error": f"Spec {spec_id} not found"}
-
-            columns = [
-                "id",
-                "kind",
-                "name",
-                "use_count",
-                "success_rate",
-                "confidence",
-                "feedback_count",
-                "avg_score",
-                "adaptation_count",
-            ]
-            return dict(zip(columns, result))
-
+            if table is not None and table not in VECTOR_TABLES:
+                return {"error": f"Unknown vector table: {table}"}
+            enabled = {
+                row[0]
+                for row in self.con.execute(
+                    "SELECT DISTINCT table_name FROM spec_embedding_quantization"
+                ).fetchall()
+            }
+            if table is not None and table not in enabled:
+                return {"error": f"Quantization is not enabled for {table}"}
+            encoded = {}
+            with self._transaction():
+                for name in [table] if table else [t for t in VECTOR_TABLES if t in enabled]:
+                    self.con.execute(
+                        f"""
+                        DELETE FROM spec_embedding_quantized
+                        WHERE source_table = ? AND (? OR row_id NOT IN (
+                            SELECT id FROM {name}
+                            WHERE embedding IS NOT NULL AND {self._quantized_rows_sql(name)}
+                        ))
+                        """,
+                        [name, all_rows],
+                    )
+                    row = self.con.execute(
+                        self._quantize_sql(
+                            name,
+                            "id NOT IN (SELECT row_id FROM spec_embedding_quantized "
+                            f"WHERE source_table = '{name}')",
+                        )
+                    ).fetchone()
+                    encoded[name] = row[0] if row else 0
+            return {"quantized": encoded}
         except Exception as e:
             return {"error": str(e)}
 
-    def get_specs_needing_improvement(
+    def _quantization_scope(self, table: str, embedding_model: str | None) -> str:
+        """spec_embedding_quantization.model for a table and optional model."""
+        if table not in VECTOR_TABLES:
+            raise ValueError(f"Unknown vector table: {table}")
+        if embedding_model is not None and table != "spec_embeddings":
+            raise ValueError(f"{table} has no embedding models")
+        return embedding_model or ""
+
+    def _quantized_rows_sql(self, table: str) -> str:
+        """Predicate on the rows of table whose table or model is opted in."""
+        model = "embedding_model" if table == "spec_embeddings" else "''"
+        return _QUANTIZED_ROWS_SQL.format(table=table, model=model)
+
+    def _quantize_sql(self, table: str, where: str) -> str:
+        return _QUANTIZE_SQL.format(
+            table=table, where=where, opted_in=self._quantized_rows_sql(table)
+        )
+
+    def _quantize_rows(self, table: str, ids: list[int]) -> None:
+        """Re-encode the embeddings of freshly written rows if the table is opted in."""
+        if not ids or not self.con.execute(
+            "SELECT 1 FROM spec_embedding_quantization WHERE table_name = ? LIMIT 1", [table]
+        ).fetchone():
+            return
+        id_array = _id_array_param(ids)
+        self.con.execute(
+            "DELETE FROM spec_embedding_quantized "
+            "WHERE source_table = ? AND row_id IN (SELECT unnest(?::BIGINT[]))",
+            [table, id_array],
+        )
+        self.con.execute(
+            self._quantize_sql(table, "id IN (SELECT unnest(?::BIGINT[]))"), [id_array]
+        )
+
+    def _quantized_search(
         self,
-        min_usage: int = 5,
-        max_success_rate: float = 0.5,
-    ) -> list[dict[str, Any]]:
+        table: str,
+        query_embedding: list[float],
+        k: int,
+        columns_sql: str,
+        where_sql: str,
+        params: list[Any],
+        quantization: str,
+        rerank: int,
+        embedding_model: str | None,
+    ) -> list[tuple]:
         """
-        Get specs that have low success rates and might need improvement.
-
-        Args:
-            min_usage: Minimum usage count to consider
-            max_success_rate: Maximum success rate to include
+        Two-phase search: rank by the quantized encoding, then re-rank exactly.
 
-        Returns:
-            List of specs needing improvement
+        Phase one scans only the spec_embedding_quantized bits (Hamming distance
+        to the query's sign bits) or int8 values (cosine) and keeps k * rerank
+        candidates; phase two scores those with the model's similarity on the
+        full FLOAT[] vectors. where_sql filters are applied in phase one.
         """
-        try:
-            query = """
-                SELECT
-                    id, kind, name, version, status,
-                    use_count, success_rate, confidence,
-                    summary
-                FROM spec_objects
-                WHERE use_count >= ?
-                  AND success_rate < ?
-                  AND status = 'active'
-                ORDER BY success_rate ASC, use_count DESC
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        if not self.con.execute(
             """
-            result = self.con.execute(query, [min_usage, max_success_rate]).fetchall()
-
-            columns = [
-                "id",
-                "kind",
-                "name",
-                "version",
-                "status",
-                "use_count",
-                "success_rate",
-                "confidence",
-                "summary",
-            ]
-            return [dict(zip(columns, row)) for row in result]
+            SELECT 1 FROM spec_embedding_quantization
+            WHERE table_name = ? AND (?::VARCHAR IS NULL OR model IN ('', ?))
+            LIMIT 1
+            """,
+            [table, embedding_model, embedding_model],
+        ).fetchone():
+            raise ValueError(f"Quantization is not enabled for {table}; see enable_quantization()")
+        dim = len(query_embedding)
+        if quantization == "binary":
+            bits = "".join("1" if x > 0 else "0" for x in query_embedding)
+            distance = f"bit_count(xor(q.bits, '{bits}'::BIT))"
+            encoded = f"bit_length(q.bits) = {dim}"
+        else:
+            scale = 127 / max(max(abs(x) for x in query_embedding), 1e-12)
+            quantized = _vector_literal([round(x * scale) for x in query_embedding], "FLOAT[]")
+            distance = f"-list_cosine_similarity(q.i8::FLOAT[], {quantized})"
+            encoded = f"len(q.i8) = {dim}"
+        similarity = self._scan_similarity_sql(embedding_model)
+        vector = _vector_literal(query_embedding, "FLOAT[]")
+        return self.con.execute(
+            f"""
+            WITH candidates AS (
+                SELECT q.row_id AS id
+                FROM spec_embedding_quantized q
+                JOIN {table} ON {table}.id = q.row_id
+                WHERE q.source_table = '{table}' AND {encoded} {where_sql}
+                ORDER BY {distance}
+                LIMIT {int(k) * int(rerank)}
+            )
+            SELECT {columns_sql}, {similarity}(e.embedding, {vector}) AS similarity
+            FROM {table} e
+            JOIN candidates c ON c.id = e.id
+            ORDER BY similarity DESC
+            LIMIT {int(k)}
+            """,
+            params,
+        ).fetchall()
 
-        except Exception:
-            return []
+    # =========================================================================
+    # Embedding Ingestion
+    # =========================================================================
 
-    def record_adaptation(
+    def embed_pending(
         self,
-        spec_id: int,
-        adaptation_type: str,
-        reason: str,
-        changes: dict,
-        metrics_before: dict | None = None,
-        metrics_after: dict | None = None,
+        table: str = "spec_embeddings",
+        model: str = EMBED_MODEL,
+        *,
+        batch_size: int = EMBED_BATCH_SIZE,
+        concurrency: int = EMBED_CONCURRENCY,
+        limit: int | None = None,
+        restart: bool = False,
+        embed_fn: Callable[[list[str]], list[list[float]]] | None = None,
     ) -> dict[str, Any]:
         """
-        Record an adaptation made to a spec.
+        Embed rows of a vector table that have no vector yet.
+
+        Rows are read in id order, batch_size * concurrency at a time. Texts whose
+        content hash already has a vector for the model (embedding_cache or
+        spec_embeddings) reuse it, and repeated texts are embedded once. The rest go to Ollama's
+        multi-input /api/embed with `concurrency` requests in flight. Each chunk's
+        vectors and its checkpoint (spec_embedding_progress) commit together, so
+        an interrupted run resumes after the last committed row. Rows of failed
+        requests stay NULL and are retried with restart=True.
 
         Args:
-            spec_id: Original spec ID
-            adaptation_type: Type ('parameter_tune', 'prompt_improve', 'tool_add', 'merge', 'split')
-            reason: Why the adaptation was made
-            changes: JSON describing the changes
-            metrics_before: Metrics before adaptation
-            metrics_after: Metrics after adaptation
+            table: One of VECTOR_TABLES
+            model: Embedding model; stored in spec_embeddings.embedding_model
+            batch_size: Texts per /api/embed request
+            concurrency: Requests in flight at once
+            limit: Stop after this many rows (None: all pending rows)
+            restart: Ignore the checkpoint and rescan from the first row
+            embed_fn: Replaces the Ollama call (texts -> vectors)
 
         Returns:
-            Dict with adaptation ID
+            Dict with rows, embedded, reused, failed, requests and last_id, or error
         """
         try:
-            adaptation_id = self._next_id("spec_adaptations_seq")
+            if table not in VECTOR_TABLES:
+                return {"error": f"Unknown vector table: {table}"}
+            if batch_size <= 0 or concurrency <= 0:
+                return {"error": "batch_size and concurrency must be positive"}
+            embed = embed_fn or (lambda texts: ollama_embed_batch(model, texts))
+            vector_model = model if table == "spec_embeddings" else "default"
+            row = self.con.execute(
+                "SELECT last_id FROM spec_embedding_progress WHERE source_table = ? AND model = ?",
+                [table, model],
+            ).fetchone()
+            cursor = -1 if restart or row is None else row[0]
+            totals = {"rows": 0, "embedded": 0, "reused": 0, "failed": 0, "requests": 0}
+
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                while limit is None or totals["rows"] < limit:
+                    chunk = batch_size * concurrency
+                    if limit is not None:
+                        chunk = min(chunk, limit - totals["rows"])
+                    rows = self.con.execute(
+                        f"""
+                        SELECT id, content, sha256(content)
+                        FROM {table}
+                        WHERE embedding IS NULL AND id > ?
+                        ORDER BY id
+                        LIMIT ?
+                        """,
+                        [cursor, chunk],
+                    ).fetchall()
+                    if not rows:
+                        break
+
+                    vectors = self._known_vectors(model, {h for _, _, h in rows})
+                    reused = sum(1 for _, _, h in rows if h in vectors)
+                    pending = list({h: text for _, text, h in rows if h not in vectors}.items())
+                    batches = [
+                        pending[i : i + batch_size] for i in range(0, len(pending), batch_size)
+                    ]
+                    results = pool.map(lambda b: self._embed_batch(embed, b), batches)
+                    for batch, result in zip(batches, results):
+                        if isinstance(result, Exception):
+                            log.warning("Embedding batch of %d failed: %s", len(batch), result)
+                            continue
+                        for (content_hash, _), vector in zip(batch, result):
+                            vectors[content_hash] = vector
+
+                    done = [(row_id, vectors[h]) for row_id, _, h in rows if h in vectors]
+                    cursor = rows[-1][0]
+                    with self._transaction():
+                        if done:
+                            self._write_embeddings(table, done, vector_model, model)
+                        self.con.execute(
+                            """
+                            INSERT INTO spec_embedding_progress
+                                (source_table, model, last_id, embedded, updated_at)
+                            VALUES (?, ?, ?, ?, now())
+                            ON CONFLICT (source_table, model) DO UPDATE SET
+                                last_id = excluded.last_id,
+                                embedded = spec_embedding_progress.embedded + excluded.embedded,
+                                updated_at = excluded.updated_at
+                            """,
+                            [table, model, cursor, len(done)],
+                        )
+                    totals["rows"] += len(rows)
+                    totals["embedded"] += len(done) - reused
+                    totals["reused"] += reused
+                    totals["failed"] += len(rows) - len(done)
+                    totals["requests"] += len(batches)
+
+            return {**totals, "last_id": cursor}
+        except Exception as e:
+            return {"error": str(e)}
+
+    def _known_vectors(self, model: str, hashes: set[str]) -> dict[str, list[float]]:
+        """Existing vectors of a model (embedding_cache, spec_embeddings), by content hash."""
+        rows = self.con.execute(
+            """
+            SELECT content_hash, any_value(embedding)
+            FROM (
+                SELECT content_hash, embedding FROM embedding_cache WHERE model = $1
+                UNION ALL
+                SELECT content_hash, embedding FROM spec_embeddings
+                WHERE embedding IS NOT NULL AND embedding_model = $1
+            )
+            WHERE content_hash IN (SELECT unnest($2::VARCHAR[]))
+            GROUP BY content_hash
+            """,
+            [model, sorted(hashes)],
+        ).fetchall()
+        return dict(rows)
+
+    def _embed_batch(
+        self, embed: Callable[[list[str]], list[list[float]]], batch: list[tuple[str, str]]
+    ) -> list[list[float]] | Exception:
+        """Run one embedding request in a worker thread, returning the error instead of raising."""
+        try:
+            vectors = embed([text for _, text in batch])
+            if len(vectors) != len(batch):
+                raise RuntimeError(f"Got {len(vectors)} vectors for {len(batch)} texts")
+            return vectors
+        except Exception as e:
+            return e
 
+    def _write_embeddings(
+        self,
+        table: str,
+        rows: list[tuple[int, list[float]]],
+        vector_model: str,
+        model: str,
+    ) -> None:
+        """Set the embedding of many rows in one UPDATE."""
+        for _, vector in rows:
+            self._check_embedding_dim(vector_model, vector)
+        ids = np.array([row_id for row_id, _ in rows], dtype=np.int64)
+        model_sql = ", embedding_model = ?" if table == "spec_embeddings" else ""
+        with self._staged_vectors(ids, [vector for _, vector in rows]) as vectors_sql:
             self.con.execute(
-                """
-                INSERT INTO spec_adaptations
-                    (id, spec_id, adaptation_type, reason,
-                     changes, metrics_before, metrics_after)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                f"""
+                UPDATE {table} AS t SET embedding = v.embedding{model_sql}
+                FROM ({vectors_sql}) AS v
+                WHERE t.id = v.key
                 """,
-                [
-                    adaptation_id,
-                    spec_id,
-                    adaptation_type,
-                    reason,
-                    json.dumps(changes),
-                    json.dumps(metrics_before) if metrics_before else None,
-                    json.dumps(metrics_after) if metrics_after else None,
-                ],
+                [model] if model_sql else [],
             )
+        id_list = ids.tolist()
+        self.con.execute(
+            f"""
+            INSERT INTO embedding_cache (model, content_hash, embedding)
+            SELECT ?, sha256(content), any_value(embedding)
+            FROM {table}
+            WHERE id IN (SELECT unnest(?::BIGINT[]))
+            GROUP BY sha256(content)
+            ON CONFLICT DO NOTHING
+            """,
+            [model, _id_array_param(id_list)],
+        )
+        self._quantize_rows(table, id_list)
+        self._sync_vector_rows(table, id_list, vector_model)
 
-            return {"adaptation_id": adaptation_id}
+    def embedding_cache_stats(self) -> dict[str, Any]:
+        """
+        Embedding cache counters: LRU/table hits and misses of this process,
+        saved_calls (Ollama round-trips avoided), table entries and lifetime hits.
+        """
+        return embedding_cache_stats(self.con)
 
+    def evict_embedding_cache(self, max_rows: int | None = None) -> dict[str, Any]:
+        """Drop least recently used embedding_cache rows beyond max_rows."""
+        try:
+            flush_embedding_hits(self.con)
+            return {"evicted": evict_embedding_cache(self.con, max_rows)}
         except Exception as e:
             return {"error": str(e)}
 
-    def record_learning(
+    @contextmanager
+    def _staged_vectors(self, keys: np.ndarray, vectors: Any) -> Iterator[str]:
+        """
+        Register vectors for one statement, yielding a (key, embedding FLOAT[]) relation.
+
+        NumPy matrices and lists of vectors are flattened into (key, position, value)
+        columns and regrouped in SQL, which is much faster than binding Python
+        lists. A pyarrow list array is registered as is.
+        """
+        if hasattr(vectors, "type") and hasattr(vectors, "to_pylist"):
+            import pyarrow as pa
+
+            self.con.register("_staged_vectors", pa.table({"key": keys, "embedding": vectors}))
+            relation = "SELECT key, embedding::FLOAT[] AS embedding FROM _staged_vectors"
+        else:
+            if isinstance(vectors, np.ndarray) and vectors.ndim == 2:
+                flat = np.ascontiguousarray(vectors, dtype=np.float32).ravel()
+                lengths = np.full(len(vectors), vectors.shape[1], dtype=np.int64)
+            else:
+                arrays = [np.asarray(vector, dtype=np.float32) for vector in vectors]
+                lengths = np.array([len(array) for array in arrays], dtype=np.int64)
+                flat = np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.float32)
+            positions = np.arange(len(flat)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            self.con.register(
+                "_staged_vectors",
+                {"key": np.repeat(keys, lengths), "pos": positions, "x": flat},
+            )
+            relation = (
+                "SELECT key, list(x ORDER BY pos)::FLOAT[] AS embedding "
+                "FROM _staged_vectors GROUP BY key"
+            )
+        try:
+            yield relation
+        finally:
+            self.con.unregister("_staged_vectors")
+
+    def store_embeddings_bulk(
         self,
-        learning_type: str,
-        category: str,
-        description: str,
-        evidence: list | None = None,
-        confidence: float = 0.5,
-        application: str | None = None,
+        contents: list[str],
+        vectors: Any,
+        content_type: str | list[str] = "doc",
+        *,
+        spec_ids: list[int | None] | None = None,
+        org_id: int | None = None,
+        metadata: list[dict | None] | None = None,
+        embedding_model: str = "default",
+        chunk_indexes: list[int] | None = None,
     ) -> dict[str, Any]:
         """
-        Record a learning insight from the meta-learning system.
+        Store many contents with their vectors in one upsert (see store_embedding()).
+
+        Rows are matched on (content hash, chunk_index); for duplicates within the
+        batch the last one wins.
 
         Args:
-            learning_type: Type ('pattern', 'insight', 'rule', 'preference')
-            category: Category ('agent', 'skill', 'workflow', 'general')
-            description: What was learned
-            evidence: List of evidence (spec_ids, feedback_ids)
-            confidence: Confidence score (0.0 - 1.0)
-            application: How this should be applied
+            contents: Text contents
+            vectors: (n, dim) NumPy array, list of vectors, pyarrow list array, or
+                None to store the rows without vectors
+            content_type: Content type for all rows, or one per row
+            spec_ids: Optional spec_objects reference per row
+            org_id: Optional org spec for all rows
+            metadata: Optional JSON metadata per row
+            embedding_model: Model used for embedding
+            chunk_indexes: Chunk number per row (default: 0)
 
         Returns:
-            Dict with learning ID
+            Dict with the embedding ids in input order and the stored row count
         """
         try:
-            learning_id = self._next_id("spec_learning_seq")
-
-            self.con.execute(
+            n = len(contents)
+            types = [content_type] * n if isinstance(content_type, str) else content_type
+            chunks = list(chunk_indexes) if chunk_indexes is not None else [0] * n
+            if any(index < 0 for index in chunks):
+                raise ValueError("chunk_index must be >= 0")
+            columns = {
+                "content": contents,
+                "content_type": types,
+                "content_hash": [hashlib.sha256(c.encode()).hexdigest() for c in contents],
+                "chunk_index": chunks,
+                "spec_id": spec_ids if spec_ids is not None else [None] * n,
+                "org_id": [org_id] * n,
+                "metadata": [self._serialize_json_field(m) for m in metadata or [None] * n],
+                "embedding_model": [embedding_model] * n,
+            }
+            returned = self._bulk_store_vectors(
+                "spec_embeddings",
+                columns,
+                vectors,
+                embedding_model,
                 """
-                INSERT INTO spec_learning
-                    (id, learning_type, category, description,
-                     evidence, confidence, application)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                QUALIFY row_number() OVER (
+                    PARTITION BY r.content_hash, r.chunk_index ORDER BY r.ord DESC
+                ) = 1
+                ON CONFLICT (content_hash, chunk_index) DO UPDATE SET
+                    embedding = EXCLUDED.embedding,
+                    embedding_model = EXCLUDED.embedding_model,
+                    metadata = EXCLUDED.metadata,
+                    updated_at = now()
+                RETURNING id, content_hash, chunk_index
                 """,
-                [
-                    learning_id,
-                    learning_type,
-                    category,
-                    description,
-                    json.dumps(evidence) if evidence else None,
-                    confidence,
-                    application,
-                ],
             )
+            by_key = {(h, index): row_id for row_id, h, index in returned}
+            ids = [by_key[key] for key in zip(columns["content_hash"], chunks)]
+            return {"ids": ids, "stored": len(by_key)}
+        except Exception as e:
+            return {"error": str(e)}
 
-            return {"learning_id": learning_id}
+    def store_org_knowledge_bulk(
+        self,
+        org: str,
+        contents: list[str],
+        vectors: Any = None,
+        rows: list[dict[str, Any]] | None = None,
+    ) -> dict[str, Any]:
+        """
+        Store many entries in an organization knowledge base in one INSERT.
+
+        Args:
+            org: Organization name ('dev', 'research', 'studio', 'ops')
+            contents: Contents to store
+            vectors: Vectors as for store_embeddings_bulk(), or None
+            rows: Optional org-specific fields per entry (see store_org_knowledge())
 
+        Returns:
+            Dict with the entry ids in input order
+        """
+        try:
+            if org not in _KNOWLEDGE_COLUMNS:
+                return {"error": f"Unknown org: {org}"}
+            rows = rows or [{}] * len(contents)
+            columns: dict[str, list[Any]] = {"content": contents}
+            for column, default in _KNOWLEDGE_COLUMNS[org].items():
+                values = [row.get(column, default) for row in rows]
+                if column in _KNOWLEDGE_JSON_COLUMNS:
+                    values = [self._serialize_json_field(value) for value in values]
+                columns[column] = values
+            returned = self._bulk_store_vectors(
+                f"knowledge_{org}", columns, vectors, "default", "RETURNING id"
+            )
+            return {"entry_ids": [row[0] for row in returned], "org": org}
         except Exception as e:
             return {"error": str(e)}
 
-    def get_top_learnings(self, limit: int = 10) -> list[dict[str, Any]]:
+    def store_conversation_memory_bulk(
+        self,
+        session_id: str,
+        roles: list[str],
+        contents: list[str],
+        vectors: Any = None,
+        *,
+        agent_spec_id: int | None = None,
+        importance: float | list[float] = 0.5,
+    ) -> dict[str, Any]:
         """
-        Get top learning insights by confidence.
+        Store many messages of a session in long-term memory in one INSERT.
 
         Args:
-            limit: Maximum number of learnings to return
+            session_id: Session identifier
+            roles: Message role per content
+            contents: Message contents
+            vectors: Vectors as for store_embeddings_bulk(), or None
+            agent_spec_id: Optional reference to agent spec
+            importance: Importance for all messages, or one per message
 
         Returns:
-            List of learning insights
+            Dict with the memory ids in input order
         """
         try:
-            query = """
-                SELECT
-                    id, learning_type, category,
-                    description, confidence,
-                    application,
-                    created_at
-                FROM spec_learning
-                WHERE confidence >= 0.5
-                ORDER BY confidence DESC, created_at DESC
-                LIMIT ?
-            """
-            result = self.con.execute(query, [limit]).fetchall()
+            n = len(contents)
+            columns = {
+                "session_id": [session_id] * n,
+                "agent_spec_id": [agent_spec_id] * n,
+                "role": roles,
+                "content": contents,
+                "importance": (
+                    list(importance) if isinstance(importance, list) else [importance] * n
+                ),
+            }
+            returned = self._bulk_store_vectors(
+                "memory_conversations", columns, vectors, "default", "RETURNING id"
+            )
+            memory_ids = [row[0] for row in returned]
+            self._memory_written(session_id, memory_ids)
+            return {"memory_ids": memory_ids}
+        except Exception as e:
+            return {"error": str(e)}
 
-            columns = [
-                "id",
-                "learning_type",
-                "category",
-                "description",
-                "confidence",
-                "application",
-                "created_at",
-            ]
-            specs = []
-            for row in result:
-                spec = dict(zip(columns, row))
-                if spec.get("created_at"):
-                    spec["created_at"] = str(spec["created_at"])
-                specs.append(spec)
-            return specs
+    def _bulk_store_vectors(
+        self,
+        table: str,
+        columns: dict[str, list[Any]],
+        vectors: Any,
+        vector_model: str,
+        tail_sql: str,
+    ) -> list[tuple]:
+        """
+        Insert one row per entry of columns (plus vectors) into a vector table.
 
-        except Exception:
+        Ids are drawn from the table's sequence up front, so RETURNING rows come
+        back in input order for plain inserts. Column values are staged as text
+        and cast to the table's types (lists via JSON). The rows are then
+        quantized, synced to the vector tables and, for spec_embeddings, indexed
+        and written to embedding_cache.
+        """
+        n = len(columns["content"])
+        if vectors is not None and len(vectors) != n:
+            raise ValueError(f"Got {len(vectors)} vectors for {n} contents")
+        if any(len(values) != n for values in columns.values()):
+            raise ValueError("All columns need one value per content")
+        if n == 0:
             return []
+        types = dict(
+            self.con.execute(
+                "SELECT column_name, data_type FROM information_schema.columns "
+                "WHERE table_name = ?",
+                [table],
+            ).fetchall()
+        )
+        staged: dict[str, np.ndarray] = {}
+        select = []
+        for column, values in columns.items():
+            texts = np.empty(n, dtype=object)
+            texts[:] = [
+                None
+                if value is None
+                else json.dumps(value)
+                if isinstance(value, (list, tuple))
+                else str(value)
+                for value in values
+            ]
+            staged[column] = texts
+            cast = "::JSON" if types[column].endswith("[]") else ""
+            select.append(f"r.{column}{cast}::{types[column]} AS {column}")
+        keys = np.arange(n, dtype=np.int64)
+        staged["ord"] = keys
+        staged["id"] = self.con.execute(
+            f"SELECT nextval('{table}_seq') AS id FROM range(?)", [n]
+        ).fetchnumpy()["id"]
+
+        model = self._embedding_model(vector_model)
+        with self._transaction():
+            self.con.register("_bulk_rows", staged)
+            try:
+                staged_vectors = (
+                    nullcontext("SELECT NULL::BIGINT AS key, NULL::FLOAT[] AS embedding")
+                    if vectors is None
+                    else self._staged_vectors(keys, vectors)
+                )
+                with staged_vectors as vectors_sql:
+                    if model:
+                        wrong = self.con.execute(
+                            f"SELECT count(*) FROM ({vectors_sql}) WHERE len(embedding) <> ?",
+                            [model["dim"]],
+                        ).fetchone()[0]
+                        if wrong:
+                            raise ValueError(
+                                f"Embedding model {vector_model!r} has dimension "
+                                f"{model['dim']}, got {wrong} vectors of another length"
+                            )
+                    returned = self.con.execute(
+                        f"""
+                        INSERT INTO {table} (id, {", ".join(columns)}, embedding)
+                        SELECT r.id, {", ".join(select)}, v.embedding
+                        FROM _bulk_rows r
+                        LEFT JOIN ({vectors_sql}) v ON v.key = r.ord
+                        {tail_sql}
+                        """
+                    ).fetchall()
+            finally:
+                self.con.unregister("_bulk_rows")
+            ids = [row[0] for row in returned]
+            if table == "spec_embeddings":
+                self._reindex_embedding_trigrams(ids)
+                self.con.execute(
+                    """
+                    INSERT INTO embedding_cache (model, content_hash, embedding)
+                    SELECT ?, sha256(content), any_value(embedding)
+                    FROM spec_embeddings
+                    WHERE id IN (SELECT unnest(?::BIGINT[])) AND embedding IS NOT NULL
+                    GROUP BY sha256(content)
+                    ON CONFLICT DO NOTHING
+                    """,
+                    [vector_model, _id_array_param(ids)],
+                )
+            if vectors is not None:
+                self._quantize_rows(table, ids)
+                self._sync_vector_rows(table, ids, vector_model)
+        return returned
 
     # =========================================================================
-    # Provenance Methods (Source Tracking)
+    # File Ingestion
     # =========================================================================
 
-    def set_upstream_source(
+    def ingest_path(
         self,
-        spec_id: int,
-        source_url: str,
-        upstream_version: str,
-        source_ref: str | None = None,
+        path: str | os.PathLike,
+        *,
+        org: str | None = None,
+        content_type: str = "doc",
+        model: str = EMBED_MODEL,
+        max_lines: int = INGEST_CHUNK_LINES,
+        overlap: int = INGEST_CHUNK_OVERLAP,
+        max_tokens: int = INGEST_CHUNK_TOKENS,
+        embed: bool = True,
+        batch_size: int = EMBED_BATCH_SIZE,
+        concurrency: int = EMBED_CONCURRENCY,
+        embed_fn: Callable[[list[str]], list[list[float]]] | None = None,
     ) -> dict[str, Any]:
         """
-        Set upstream source for a spec.
+        Chunk the text files of a file or directory into spec_embeddings and embed them.
+
+        Files are streamed one at a time. A file whose (mtime, size) or content
+        hash matches spec_ingest_files is skipped. A changed file is re-chunked
+        and only chunks whose text or position changed are inserted or deleted.
+        Files that disappeared below path lose their chunks, and so do files that
+        are now skipped (binary, undecodable or oversized). A file that can't be
+        read is reported under unreadable and keeps its previous chunks. New chunks
+        are then embedded by embed_pending(), which reuses cached vectors of
+        unchanged text.
 
         Args:
-            spec_id: Spec ID
-            source_url: URL of the upstream source
-            upstream_version: Version in upstream
-            source_ref: Commit hash or other reference
+            path: File or directory to ingest
+            org: Org type or id ('dev', 'dev-org', ...); restricts paths to its workspaces
+            content_type: spec_embeddings.content_type of the chunks
+            model: Embedding model passed to embed_pending()
+            max_lines: Lines per chunk
+            overlap: Lines repeated from the previous chunk
+            max_tokens: Whitespace tokens per chunk
+            embed: Embed the new chunks (False: leave their vectors NULL)
+            batch_size: Texts per /api/embed request
+            concurrency: Requests in flight at once
+            embed_fn: Replaces the Ollama call (texts -> vectors)
 
         Returns:
-            Dict with update status
+            Dict with files, unchanged, ingested, removed, skipped, unreadable
+            ("path: reason" strings), chunks_added, chunks_removed and the
+            embed_pending() result, or error
         """
         try:
-            self.con.execute(
-                """
-                UPDATE spec_objects
-                SET source_type = 'upstream',
-                    source_url = ?,
-                    upstream_version = ?,
-                    source_ref = ?,
-                    sync_status = 'synced',
-                    last_sync = current_timestamp,
-                    updated_at = current_timestamp
-                WHERE id = ?
-                """,
-                [source_url, upstream_version, source_ref, spec_id],
-            )
-            return {"updated": True, "sync_status": "synced"}
+            root = Path(path).resolve()
+            if not root.exists():
+                return {"error": f"Path not found: {path}"}
+            allowed = self._ingest_filter(org)
+            if not allowed(root):
+                return {"error": f"Path is outside the workspaces of org {org}: {root}"}
+            totals = {
+                "files": 0,
+                "unchanged": 0,
+                "ingested": 0,
+                "removed": 0,
+                "skipped": 0,
+                "unreadable": [],
+                "chunks_added": 0,
+                "chunks_removed": 0,
+            }
+            seen: set[str] = set()
+            skipped: set[str] = set()
+            for file in self._iter_ingest_files(root, allowed):
+                totals["files"] += 1
+                try:
+                    outcome = self._ingest_file(
+                        file, org, content_type, max_lines, overlap, max_tokens
+                    )
+                except OSError as e:
+                    seen.add(str(file))
+                    totals["unreadable"].append(f"{file}: {e.strerror or e}")
+                    continue
+                if outcome is None:
+                    # Not in seen: chunks from before the file was skipped are dropped below
+                    skipped.add(str(file))
+                    continue
+                seen.add(str(file))
+                if outcome[0]:
+                    totals["ingested"] += 1
+                    totals["chunks_added"] += outcome[1]
+                    totals["chunks_removed"] += outcome[2]
+                else:
+                    totals["unchanged"] += 1
 
+            prefix = str(root) if root.is_file() else os.path.join(str(root), "")
+            known = self.con.execute(
+                "SELECT path, chunk_hashes FROM spec_ingest_files "
+                "WHERE path = ? OR starts_with(path, ?)",
+                [str(root), prefix],
+            ).fetchall()
+            for file_path, hashes in known:
+                if file_path in seen:
+                    continue
+                with self._transaction():
+                    totals["chunks_removed"] += self._drop_ingested_chunks(
+                        list(enumerate(hashes or []))
+                    )
+                    self.con.execute(
+                        "DELETE FROM spec_ingest_files WHERE path = ?", [file_path]
+                    )
+                if file_path not in skipped:
+                    totals["removed"] += 1
+            totals["skipped"] = len(skipped)
+
+            if embed and totals["chunks_added"]:
+                totals["embedding"] = self.embed_pending(
+                    "spec_embeddings",
+                    model,
+                    batch_size=batch_size,
+                    concurrency=concurrency,
+                    embed_fn=embed_fn,
+                )
+            return totals
         except Exception as e:
             return {"error": str(e)}
 
-    def get_specs_needing_sync(self) -> list[dict[str, Any]]:
+    def _ingest_filter(self, org: str | None) -> Callable[[Path], bool]:
+        """Path predicate for an org: inside one of its workspaces and not denied."""
+        if org is None:
+            return lambda path: True
+        config = next(
+            (
+                config
+                for org_type, config in ORG_CONFIGS.items()
+                if org in (org_type.value, config["id"], config["name"])
+            ),
+            None,
+        )
+        if config is None:
+            raise ValueError(f"Unknown org: {org} (expected one of {[t.value for t in OrgType]})")
+        workspaces = [(ws["path"], ws["mode"]) for ws in config["workspaces"]]
+        denied = [pattern for kind, pattern, _ in config["denials"] if kind == "workspace"]
+
+        def allowed(path: Path) -> bool:
+            return path_is_allowed(str(path), workspaces) and not any(
+                fnmatch.fnmatch(str(path), pattern) for pattern in denied
+            )
+
+        return allowed
+
+    def _iter_ingest_files(self, root: Path, allowed: Callable[[Path], bool]) -> Iterator[Path]:
+        """Regular files below root in path order, skipping hidden and build directories."""
+        if root.is_file():
+            yield root
+            return
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(
+                name
+                for name in dirnames
+                if name not in INGEST_SKIP_DIRS and not name.startswith(".")
+            )
+            for name in sorted(filenames):
+                file = Path(dirpath) / name
+                if not name.startswith(".") and file.is_file() and allowed(file):
+                    yield file
+
+    def _ingest_file(
+        self,
+        file: Path,
+        org: str | None,
+        content_type: str,
+        max_lines: int,
+        overlap: int,
+        max_tokens: int,
+    ) -> tuple[bool, int, int] | None:
         """
-        Get specs that need to be synced with their upstream source.
+        Bring one file's chunks up to date.
 
-        Returns:
-            List of specs with outdated or conflicting sync status
+        Returns (content changed, chunks added, chunks removed), or None for a
+        skipped (binary, undecodable or oversized) file.
         """
+        stat = file.stat()
+        if stat.st_size > INGEST_MAX_FILE_BYTES:
+            return None
+        key = str(file)
+        record = self.con.execute(
+            "SELECT mtime, size, file_hash, chunk_hashes FROM spec_ingest_files WHERE path = ?",
+            [key],
+        ).fetchone()
+        if record and record[0] == stat.st_mtime and record[1] == stat.st_size:
+            return False, 0, 0
+
+        digest = hashlib.sha256()
+        with open(file, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 16), b""):
+                if b"\0" in block:
+                    return None
+                digest.update(block)
+        file_hash = digest.hexdigest()
+        old_hashes = list(record[3] or []) if record else []
+        if record and record[2] == file_hash:
+            self.con.execute(
+                "UPDATE spec_ingest_files SET mtime = ?, size = ? WHERE path = ?",
+                [stat.st_mtime, stat.st_size, key],
+            )
+            return False, 0, 0
+
         try:
-            query = """
-                SELECT
-                    id, kind, name, version,
-                    source_type, source_url, upstream_version,
-                    last_sync, sync_status,
-                    summary
-                FROM spec_objects
-                WHERE source_type = 'upstream'
-                  AND sync_status IN ('outdated', 'conflict')
-                ORDER BY last_sync ASC NULLS FIRST
-            """
-            result = self.con.execute(query).fetchall()
+            with open(file, encoding="utf-8") as fh:
+                chunks = [
+                    (
+                        hashlib.sha256(f"{key}\0{text}".encode()).hexdigest(),
+                        text,
+                        {"path": key, "start_line": start, "end_line": end, "org": org},
+                    )
+                    for start, end, text in _chunk_lines(fh, max_lines, overlap, max_tokens)
+                    if text.strip()
+                ]
+        except UnicodeDecodeError:
+            return None
 
-            columns = [
-                "id",
-                "kind",
-                "name",
-                "version",
-                "source_type",
-                "source_url",
-                "upstream_version",
-                "last_sync",
-                "sync_status",
-                "summary",
-            ]
-            specs = []
-            for row in result:
-                spec = dict(zip(columns, row))
-                if spec.get("last_sync"):
-                    spec["last_sync"] = str(spec["last_sync"])
-                specs.append(spec)
-            return specs
+        # Match chunks by hash so that text which only moved keeps its row and vector.
+        old_indexes: dict[str, list[int]] = {}
+        for index, chunk_hash in enumerate(old_hashes):
+            old_indexes.setdefault(chunk_hash, []).append(index)
+        added, moved = [], []
+        for index, chunk in enumerate(chunks):
+            if old_indexes.get(chunk[0]):
+                moved.append((old_indexes[chunk[0]].pop(0), index, chunk))
+            else:
+                added.append((index, chunk))
+        stale = [(index, h) for h, indexes in old_indexes.items() for index in indexes]
+        with self._transaction():
+            removed = self._drop_ingested_chunks(stale)
+            if moved:
+                # Positions and line numbers of unchanged text may have shifted. The
+                # rows are deleted and re-inserted with their ids and vectors: an
+                # UPDATE moving a chunk onto the old position of an identical one
+                # can violate UNIQUE (content_hash, chunk_index) mid-statement.
+                self.con.execute(
+                    """
+                    CREATE OR REPLACE TEMP TABLE _ingest_moved AS
+                    SELECT e.* REPLACE (k.j AS chunk_index, k.m AS metadata)
+                    FROM spec_embeddings AS e
+                    JOIN (
+                        SELECT unnest(?::VARCHAR[]) AS h, unnest(?::INTEGER[]) AS i,
+                               unnest(?::INTEGER[]) AS j, unnest(?::VARCHAR[]) AS m
+                    ) AS k ON e.content_hash = k.h AND e.chunk_index = k.i
+                    WHERE k.i <> k.j OR e.metadata IS DISTINCT FROM k.m
+                    """,
+                    [
+                        [chunk[0] for _, _, chunk in moved],
+                        [old for old, _, _ in moved],
+                        [index for _, index, _ in moved],
+                        [json.dumps(chunk[2]) for _, _, chunk in moved],
+                    ],
+                )
+                self.con.execute(
+                    "DELETE FROM spec_embeddings WHERE id IN (SELECT id FROM _ingest_moved)"
+                )
+                self.con.execute("INSERT INTO spec_embeddings SELECT * FROM _ingest_moved")
+                self.con.execute("DROP TABLE _ingest_moved")
+            ids: list[int] = []
+            if added:
+                ids = [
+                    row[0]
+                    for row in self.con.execute(
+                        """
+                        INSERT INTO spec_embeddings
+                            (id, content_type, content_hash, content, chunk_index, metadata)
+                        SELECT nextval('spec_embeddings_seq'), ?, h, c, i, m
+                        FROM (
+                            SELECT unnest(?::VARCHAR[]) AS h, unnest(?::VARCHAR[]) AS c,
+                                   unnest(?::INTEGER[]) AS i, unnest(?::VARCHAR[]) AS m
+                        )
+                        ON CONFLICT (content_hash, chunk_index) DO NOTHING
+                        RETURNING id
+                        """,
+                        [
+                            content_type,
+                            [chunk[0] for _, chunk in added],
+                            [chunk[1] for _, chunk in added],
+                            [index for index, _ in added],
+                            [json.dumps(chunk[2]) for _, chunk in added],
+                        ],
+                    ).fetchall()
+                ]
+            if ids:
+                self._reindex_embedding_trigrams(ids)
+            self.con.execute(
+                """
+                INSERT INTO spec_ingest_files
+                    (path, org, mtime, size, file_hash, chunk_hashes, ingested_at)
+                VALUES (?, ?, ?, ?, ?, ?, now())
+                ON CONFLICT (path) DO UPDATE SET
+                    org = excluded.org,
+                    mtime = excluded.mtime,
+                    size = excluded.size,
+                    file_hash = excluded.file_hash,
+                    chunk_hashes = excluded.chunk_hashes,
+                    ingested_at = excluded.ingested_at
+                """,
+                [key, org, stat.st_mtime, stat.st_size, file_hash, [c[0] for c in chunks]],
+            )
+        return True, len(ids), removed
 
-        except Exception:
-            return []
+    def _drop_ingested_chunks(self, keys: list[tuple[int, str]]) -> int:
+        """Delete ingested chunk rows by (chunk_index, content_hash) with their postings."""
+        if not keys:
+            return 0
+        ids = [
+            row[0]
+            for row in self.con.execute(
+                """
+                DELETE FROM spec_embeddings
+                WHERE (chunk_index, content_hash) IN (
+                    SELECT (unnest(?::INTEGER[]), unnest(?::VARCHAR[]))
+                )
+                RETURNING id
+                """,
+                [[index for index, _ in keys], [chunk_hash for _, chunk_hash in keys]],
+            ).fetchall()
+        ]
+        self._drop_trigrams("spec_embeddings", ids)
+        indexes = self._vector_index_registry().get("spec_embeddings", [])
+        for model in {index["model"] for index in indexes}:
+            self._sync_vector_rows("spec_embeddings", ids, model)
+        return len(ids)
 
     # =========================================================================
     # Intelligence Layer Methods (RAG/Embeddings)
@@ -1470,7 +6301,7 @@ class SpecEngine:
     def store_embedding(
         self,
         content: str,
-        embedding: list[float],
+        embedding: list[float] | None,
         content_type: str,
         spec_id: int | None = None,
         org_id: int | None = None,
@@ -1481,9 +6312,13 @@ class SpecEngine:
         """
         Store content with its embedding vector.
 
+        The vector is written through to embedding_cache under (embedding_model,
+        content hash). With embedding=None it is taken from the cache, or
+        embedded with embedding_model via Ollama on a miss.
+
         Args:
             content: Text content to store
-            embedding: Vector embedding as list of floats
+            embedding: Vector embedding as list of floats (None: cache / Ollama)
             content_type: Type of content ('code', 'doc', 'decision', 'research', 'design', 'log')
             spec_id: Optional reference to spec_objects
             org_id: Optional reference to org spec
@@ -1498,6 +6333,9 @@ class SpecEngine:
             content_hash = hashlib.sha256(content.encode()).hexdigest()
             if chunk_index < 0:
                 raise ValueError("chunk_index must be >= 0")
+            if embedding is None:
+                embedding = cached_embed(self.con, embedding_model, content)
+            self._check_embedding_dim(embedding_model, embedding)
 
             emb_id = self._next_id("spec_embeddings_seq")
 
@@ -1536,6 +6374,10 @@ class SpecEngine:
                 [content_hash, chunk_index],
             ).fetchone()
             stored_id = stored_row[0] if stored_row else emb_id
+            self._reindex_embedding_trigrams([stored_id])
+            self._quantize_rows("spec_embeddings", [stored_id])
+            self._sync_vector_rows("spec_embeddings", [stored_id], embedding_model)
+            embedding_cache_put(self.con, embedding_model, content_hash, embedding)
 
             return {
                 "embedding_id": stored_id,
@@ -1551,46 +6393,104 @@ class SpecEngine:
         query_embedding: list[float],
         k: int = 10,
         content_type: str | None = None,
+        embedding_model: str | None = None,
+        quantization: str | None = None,
+        rerank: int = QUANT_RERANK,
     ) -> list[dict[str, Any]]:
         """
         Search for similar content using vector similarity.
 
+        Uses the HNSW vector index (see build_vector_index()) when one matches the
+        query dimension and model, otherwise scans every embedding. With
+        quantization, candidates come from the binary or int8 encodings and are
+        re-ranked on the full vectors. Without the vss extension, the rows are
+        ranked by the NumPy stores (memory-mapped per model next to the database).
+
         Args:
             query_embedding: Query vector
             k: Number of results to return
             content_type: Optional filter by content type
+            embedding_model: Optional filter by embedding model
+            quantization: 'binary' or 'int8' for a two-phase quantized search
+            rerank: Candidates per result re-ranked exactly in a quantized search
 
         Returns:
             List of similar content with similarity scores
         """
-        self._require_extension_loaded("vss", "search_similar()")
-
         try:
-            if content_type:
-                query = """
-                    SELECT
-                        id, spec_id, org_id, content_type,
-                        content, metadata,
-                        list_cosine_similarity(embedding, ?::FLOAT[]) AS similarity
-                    FROM spec_embeddings
-                    WHERE content_type = ?
-                      AND embedding IS NOT NULL
-                    ORDER BY similarity DESC
-                    LIMIT ?
-                """
-                result = self.con.execute(query, [query_embedding, content_type, k]).fetchall()
-            else:
-                query = """
+            result = None
+            numpy_scan = self._use_numpy_vectors()
+            index = (
+                None
+                if numpy_scan
+                else self._vector_index("spec_embeddings", embedding_model, len(query_embedding))
+            )
+            if quantization:
+                filters, params = [], []
+                for column, value in (
+                    ("content_type", content_type),
+                    ("embedding_model", embedding_model),
+                ):
+                    if value is not None:
+                        filters.append(f"AND {column} = ?")
+                        params.append(value)
+                result = self._quantized_search(
+                    "spec_embeddings",
+                    query_embedding,
+                    k,
+                    "e.id, e.spec_id, e.org_id, e.content_type, e.content, e.metadata",
+                    " ".join(filters),
+                    params,
+                    quantization,
+                    rerank,
+                    embedding_model,
+                )
+            elif numpy_scan:
+                result = self._numpy_vector_search(
+                    "spec_embeddings",
+                    query_embedding,
+                    k,
+                    "e.id, e.spec_id, e.org_id, e.content_type, e.content, e.metadata",
+                    embedding_model,
+                    "AND e.content_type = ?" if content_type else "",
+                    [content_type] if content_type else [],
+                )
+            elif index is not None:
+                result = self._ann_search(
+                    index,
+                    query_embedding,
+                    k,
+                    "e.id, e.spec_id, e.org_id, e.content_type, e.content, e.metadata",
+                    "AND e.content_type = ?" if content_type else "",
+                    [content_type] if content_type else [],
+                )
+            if result is None:
+                similarity = self._scan_similarity_sql(embedding_model)
+                vector = _vector_literal(query_embedding, "FLOAT[]")
+                query = f"""
                     SELECT
                         id, spec_id, org_id, content_type,
                         content, metadata,
-                        list_cosine_similarity(embedding, ?::FLOAT[]) AS similarity
+                        {similarity}(embedding, {vector}) AS similarity
                     FROM spec_embeddings
                     WHERE embedding IS NOT NULL
+                      AND len(embedding) = ?
+                      AND (?::VARCHAR IS NULL OR content_type = ?)
+                      AND (?::VARCHAR IS NULL OR embedding_model = ?)
                     ORDER BY similarity DESC
                     LIMIT ?
                 """
-                result = self.con.execute(query, [query_embedding, k]).fetchall()
+                result = self.con.execute(
+                    query,
+                    [
+                        len(query_embedding),
+                        content_type,
+                        content_type,
+                        embedding_model,
+                        embedding_model,
+                        k,
+                    ],
+                ).fetchall()
         except Exception as e:
             raise RuntimeError(f"search_similar() failed: {e}") from e
 
@@ -1616,6 +6516,8 @@ class SpecEngine:
         """
         Hybrid search combining keyword matching with vector similarity.
 
+        Without the vss extension, the vector scores come from the NumPy stores.
+
         Args:
             text_query: Text query for keyword matching
             query_embedding: Query vector for semantic matching
@@ -1626,11 +6528,37 @@ class SpecEngine:
         Returns:
             List of results with hybrid scores
         """
-        self._require_extension_loaded("vss", "hybrid_search()")
-
         try:
             vector_weight = 1.0 - keyword_weight
             params: list[Any]
+            if self._use_numpy_vectors():
+                # Scores of every model's rows with the query dimension, as a relation
+                ids, scores = self._numpy_vector_scores(
+                    "spec_embeddings", query_embedding, None
+                )
+                self.con.register(
+                    "_hybrid_vector_scores",
+                    {"id": ids, "vector_score": scores.astype(np.float64)},
+                )
+                vector_sql = "SELECT id, vector_score FROM _hybrid_vector_scores"
+                vector_params: list[Any] = []
+            else:
+                vector_sql = f"""
+                    SELECT
+                        id,
+                        list_cosine_similarity(embedding, ?::FLOAT[]) AS vector_score
+                    FROM spec_embeddings
+                    WHERE embedding IS NOT NULL
+                      {"AND content_type = ?" if content_type else ""}
+                """
+                vector_params = [query_embedding, *([content_type] if content_type else [])]
+            keyword_clause = ""
+            keyword_params: list[Any] = []
+            if self._use_trigram_prefilter():
+                prefilter = self._trigram_prefilter("spec_embeddings", "id", text_query)
+                if prefilter:
+                    keyword_clause = f"AND {prefilter[0]}"
+                    keyword_params = prefilter[1]
             if content_type:
                 query = f"""
                     WITH keyword_matches AS (
@@ -1638,15 +6566,9 @@ class SpecEngine:
                         FROM spec_embeddings
                         WHERE content ILIKE '%' || ? || '%'
                           AND content_type = ?
+                          {keyword_clause}
                     ),
-                    vector_matches AS (
-                        SELECT
-                            id,
-                            list_cosine_similarity(embedding, ?::FLOAT[]) AS vector_score
-                        FROM spec_embeddings
-                        WHERE embedding IS NOT NULL
-                          AND content_type = ?
-                    )
+                    vector_matches AS ({vector_sql})
                     SELECT
                         e.id, e.spec_id, e.org_id, e.content_type,
                         e.content, e.metadata,
@@ -1662,21 +6584,23 @@ class SpecEngine:
                     ORDER BY hybrid_score DESC
                     LIMIT ?
                 """
-                params = [text_query, content_type, query_embedding, content_type, content_type, k]
+                params = [
+                    text_query,
+                    content_type,
+                    *keyword_params,
+                    *vector_params,
+                    content_type,
+                    k,
+                ]
             else:
                 query = f"""
                     WITH keyword_matches AS (
                         SELECT id, 1.0 AS keyword_score
                         FROM spec_embeddings
                         WHERE content ILIKE '%' || ? || '%'
+                          {keyword_clause}
                     ),
-                    vector_matches AS (
-                        SELECT
-                            id,
-                            list_cosine_similarity(embedding, ?::FLOAT[]) AS vector_score
-                        FROM spec_embeddings
-                        WHERE embedding IS NOT NULL
-                    )
+                    vector_matches AS ({vector_sql})
                     SELECT
                         e.id, e.spec_id, e.org_id, e.content_type,
                         e.content, e.metadata,
@@ -1691,10 +6615,12 @@ class SpecEngine:
                     ORDER BY hybrid_score DESC
                     LIMIT ?
                 """
-                params = [text_query, query_embedding, k]
+                params = [text_query, *keyword_params, *vector_params, k]
             result = self.con.execute(query, params).fetchall()
         except Exception as e:
             raise RuntimeError(f"hybrid_search() failed: {e}") from e
+        finally:
+            self.con.unregister("_hybrid_vector_scores")
 
         columns = [
             "id",
@@ -1709,6 +6635,232 @@ class SpecEngine:
         ]
         return [dict(zip(columns, row)) for row in result]
 
+    def rrf_search(
+        self,
+        text_query: str | None,
+        query_embedding: list[float] | None,
+        k: int = 10,
+        content_type: str | None = None,
+        *,
+        embedding_model: str | None = None,
+        rrf_k: int = RRF_K,
+        keyword_weight: float = 1.0,
+        vector_weight: float = 1.0,
+        candidates: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Hybrid search fusing a keyword ranking and a vector ranking (reciprocal rank fusion).
+
+        Takes the top `candidates` rows of each signal: BM25 via the fts index when
+        the extension is loaded, else BM25 over the trigram-prefiltered matches; and
+        search_similar() (HNSW index when one matches). Each row scores
+        sum(weight / (rrf_k + rank)) over the lists it appears in; only the fused
+        top k rows are fetched. Either query may be None to use one signal.
+
+        Args:
+            text_query: Keywords (any word may match), or None
+            query_embedding: Query vector, or None
+            k: Number of results to return
+            content_type: Optional filter by content type
+            embedding_model: Optional filter by embedding model (vector signal)
+            rrf_k: Rank constant; larger values flatten the rank contribution
+            keyword_weight: Weight of the keyword ranking
+            vector_weight: Weight of the vector ranking
+            candidates: Rows taken from each ranking (default max(k, RRF_CANDIDATES))
+
+        Returns:
+            List of results with keyword/vector ranks and scores and rrf_score
+        """
+        n = max(k, RRF_CANDIDATES) if candidates is None else max(k, candidates)
+        try:
+            keyword = self._keyword_ranking(text_query, n, content_type) if text_query else []
+            vector = (
+                [
+                    (row["id"], row["similarity"])
+                    for row in self.search_similar(
+                        query_embedding, n, content_type, embedding_model
+                    )
+                ]
+                if query_embedding
+                else []
+            )
+            fused: dict[int, dict[str, Any]] = {}
+            for name, weight, ranking in (
+                ("keyword", keyword_weight, keyword),
+                ("vector", vector_weight, vector),
+            ):
+                for rank, (row_id, score) in enumerate(ranking, start=1):
+                    entry = fused.setdefault(
+                        row_id,
+                        {
+                            "keyword_rank": None,
+                            "keyword_score": None,
+                            "vector_rank": None,
+                            "vector_score": None,
+                            "rrf_score": 0.0,
+                        },
+                    )
+                    entry[f"{name}_rank"] = rank
+                    entry[f"{name}_score"] = score
+                    entry["rrf_score"] += weight / (rrf_k + rank)
+            top = sorted(fused, key=lambda row_id: (-fused[row_id]["rrf_score"], row_id))[:k]
+            if not top:
+                return []
+            rows = self.con.execute(
+                f"""
+                SELECT id, spec_id, org_id, content_type, content, metadata
+                FROM spec_embeddings
+                WHERE id IN ({", ".join(str(int(row_id)) for row_id in top)})
+                """
+            ).fetchall()
+        except Exception as e:
+            raise RuntimeError(f"rrf_search() failed: {e}") from e
+
+        columns = ["id", "spec_id", "org_id", "content_type", "content", "metadata"]
+        by_id = {row[0]: dict(zip(columns, row)) for row in rows}
+        return [{**by_id[row_id], **fused[row_id]} for row_id in top if row_id in by_id]
+
+    def _keyword_ranking(
+        self, text_query: str, n: int, content_type: str | None
+    ) -> list[tuple[int, float]]:
+        """Top n spec_embeddings rows for text_query by BM25, as (id, score)."""
+        words = sorted({w for w in text_query.lower().split() if w})
+        if not words:
+            return []
+        if is_extension_loaded(self.con, "fts"):
+            unindexed = _id_array_param(self._fts_unindexed_ids())
+            ranked = self.con.execute(
+                """
+                SELECT id, score FROM (
+                    SELECT id, fts_main_spec_embeddings.match_bm25(id, ?) AS score
+                    FROM spec_embeddings
+                    WHERE (?::VARCHAR IS NULL OR content_type = ?)
+                      AND id NOT IN (SELECT unnest(?::BIGINT[]))
+                )
+                WHERE score IS NOT NULL
+                ORDER BY score DESC, id
+                LIMIT ?
+                """,
+                [" ".join(words), content_type, content_type, unindexed, n],
+            ).fetchall()
+            if unindexed == "[]":
+                return ranked
+            ranked += self._substring_bm25(
+                words, n, content_type, "AND id IN (SELECT unnest(?::BIGINT[]))", [unindexed]
+            )
+            return sorted(ranked, key=lambda row: (-row[1], row[0]))[:n]
+
+        # Without fts: rows containing any word, narrowed by the trigram posting lists
+        # when every word is selective.
+        prefilters = [self._trigram_prefilter("spec_embeddings", "id", w) for w in words]
+        prefilter_clause = ""
+        if all(prefilters):
+            prefilter_clause = "AND (" + " OR ".join(sql for sql, _ in prefilters) + ")"
+        return self._substring_bm25(words, n, content_type, prefilter_clause, [])
+
+    def _substring_bm25(
+        self,
+        words: list[str],
+        n: int,
+        content_type: str | None,
+        restrict_sql: str,
+        restrict_params: list[Any],
+    ) -> list[tuple[int, float]]:
+        """Top n rows containing any of words, scored with BM25 on substring counts."""
+        match_clause = " OR ".join("lower(content) LIKE '%' || ? || '%'" for _ in words)
+        return self.con.execute(
+            f"""
+            WITH docs AS (
+                SELECT id, lower(content) AS text, length(content) AS dl
+                FROM spec_embeddings
+                WHERE (?::VARCHAR IS NULL OR content_type = ?)
+                  {restrict_sql}
+                  AND ({match_clause})
+            ),
+            tf AS (
+                SELECT * FROM (
+                    SELECT d.id, d.dl, t.term,
+                           (length(d.text) - length(replace(d.text, t.term, '')))
+                               // length(t.term) AS tf
+                    FROM docs d, (SELECT unnest(?::VARCHAR[]) AS term) t
+                )
+                WHERE tf > 0
+            ),
+            df AS (SELECT term, count(*) AS df FROM tf GROUP BY term),
+            stats AS (
+                SELECT (SELECT count(*) FROM spec_embeddings) AS n,
+                       (SELECT avg(dl) FROM docs) AS avg_dl
+            )
+            SELECT tf.id, sum(
+                ln(1 + (stats.n - df.df + 0.5) / (df.df + 0.5))
+                * tf.tf * ({BM25_K1} + 1)
+                / (tf.tf + {BM25_K1} * (1 - {BM25_B} + {BM25_B} * tf.dl / stats.avg_dl))
+            ) AS score
+            FROM tf JOIN df USING (term), stats
+            GROUP BY tf.id
+            ORDER BY score DESC, tf.id
+            LIMIT ?
+            """,
+            [content_type, content_type, *restrict_params, *words, words, n],
+        ).fetchall()
+
+    def _fts_unindexed_ids(self) -> list[int]:
+        """
+        Ids of spec_embeddings rows the fts index does not cover, rebuilding it when many.
+
+        The fts extension has no incremental updates, so the index is a snapshot.
+        A fingerprint of the table (row count, id sum, highest id, latest
+        updated_at) tells whether it changed since the build, whoever wrote it.
+        Rows past the id or updated_at watermark are returned, plus rows missing
+        from the index when the count or id sum moved by more than those explain.
+        Deleted rows need nothing: the caller ranks through the table. Above
+        FTS_REBUILD_ROWS and FTS_REBUILD_FRACTION, the index is rebuilt instead.
+        """
+        key = list(
+            self.con.execute(
+                """
+                SELECT count(*), coalesce(sum(id), 0), max(id), max(updated_at)::VARCHAR
+                FROM spec_embeddings
+                """
+            ).fetchone()
+        )
+        built = self._fts_snapshot
+        if key == built:
+            return []
+        if self._fts_unindexed is not None and self._fts_unindexed[0] == key:
+            return self._fts_unindexed[1]
+        ids: set[int] = set()
+        if built is not None:
+            changed = self.con.execute(
+                """
+                SELECT id, id > coalesce(?, -1) AS appended
+                FROM spec_embeddings
+                WHERE id > coalesce(?, -1) OR updated_at > ?::TIMESTAMP
+                """,
+                [built[2], built[2], built[3]],
+            ).fetchall()
+            ids = {row[0] for row in changed}
+            appended = [row[0] for row in changed if row[1]]
+            if key[0] - built[0] != len(appended) or key[1] - built[1] != sum(appended):
+                ids.update(
+                    row[0]
+                    for row in self.con.execute(
+                        """
+                        SELECT id FROM spec_embeddings
+                        WHERE id NOT IN (SELECT name FROM fts_main_spec_embeddings.docs)
+                        """
+                    ).fetchall()
+                )
+        if built is None or len(ids) > max(FTS_REBUILD_ROWS, FTS_REBUILD_FRACTION * built[0]):
+            self.con.execute(
+                "PRAGMA create_fts_index('spec_embeddings', 'id', 'content', overwrite = 1)"
+            )
+            self._fts_snapshot = key
+            self._fts_unindexed = None
+            return []
+        self._fts_unindexed = (key, sorted(ids))
+        return self._fts_unindexed[1]
+
     def store_conversation_memory(
         self,
         session_id: str,
@@ -1735,6 +6887,7 @@ class SpecEngine:
             Dict with memory ID
         """
         try:
+            self._check_embedding_dim("default", embedding)
             mem_id = self._next_id("memory_conversations_seq")
 
             self.con.execute(
@@ -1755,41 +6908,115 @@ class SpecEngine:
                     self._serialize_json_field(tool_calls),
                 ],
             )
+            if embedding is not None:
+                self._quantize_rows("memory_conversations", [mem_id])
+                self._sync_vector_rows("memory_conversations", [mem_id], "default")
+            self._memory_written(session_id, [mem_id])
 
             return {"memory_id": mem_id}
 
         except Exception as e:
             return {"error": str(e)}
 
+    def _memory_written(self, session_id: str, ids: list[int]) -> None:
+        """
+        Set decay_key on fresh memory rows and compact the session when it grew large.
+
+        Uncompacted rows are counted per session in-process (seeded from the table
+        on first write), so the check costs no query per turn.
+        """
+        if not ids:
+            return
+        self.con.execute(
+            f"UPDATE memory_conversations SET decay_key = {_MEMORY_DECAY_KEY_SQL} "
+            "WHERE id = ANY(?::BIGINT[])",
+            [_id_array_param(ids)],
+        )
+        active = self._memory_active.get(session_id)
+        if active is None:
+            active = self.con.execute(
+                "SELECT count(*) FROM memory_conversations "
+                "WHERE session_id = ? AND compacted_into IS NULL",
+                [session_id],
+            ).fetchone()[0]
+        else:
+            active += len(ids)
+        self._memory_active[session_id] = active
+        if active >= MEMORY_COMPACT_AFTER:
+            self.compact_conversation_memory(session_id)
+
     def get_conversation_context(
         self,
         session_id: str,
         k: int = 10,
+        *,
+        query_embedding: list[float] | None = None,
+        recent: int = MEMORY_RECENT_WINDOW,
+        relevance_weight: float = MEMORY_RELEVANCE_WEIGHT,
     ) -> list[dict[str, Any]]:
         """
-        Get recent conversation context for a session.
+        Get the conversation context of a session for the next turn.
+
+        The newest `recent` turns are always included (a LIMIT on created_at, served
+        by the (session_id, created_at) index). The other k - recent slots go to older
+        turns and compaction summaries by decayed importance, which halves every
+        MEMORY_HALF_LIFE seconds and is read from the precomputed decay_key; with
+        query_embedding, relevance_weight * cosine similarity is added. Turns folded
+        into a summary are skipped, so the work per turn stays bounded as sessions grow.
 
         Args:
             session_id: Session identifier
             k: Number of messages to retrieve
+            query_embedding: Optional vector of the current turn for relevance
+            recent: Newest turns always included (at most k)
+            relevance_weight: Weight of cosine similarity against decayed importance
 
         Returns:
-            List of conversation messages
+            List of conversation messages, oldest first, with their score
+            (decayed importance plus weighted similarity; None for the recent window)
         """
         try:
-            query = """
-                SELECT role, content, importance, created_at
+            recent = max(0, min(recent, k))
+            rows = self.con.execute(
+                """
+                SELECT id, role, content, importance, created_at, NULL AS score
                 FROM memory_conversations
-                WHERE session_id = ?
-                ORDER BY importance DESC, created_at DESC
+                WHERE session_id = ? AND compacted_into IS NULL
+                ORDER BY created_at DESC, id DESC
                 LIMIT ?
-            """
-            result = self.con.execute(query, [session_id, k]).fetchall()
+                """,
+                [session_id, recent],
+            ).fetchall()
+            if k > len(rows) == recent:
+                relevance = "0"
+                if query_embedding is not None:
+                    relevance = (
+                        f"? * COALESCE(list_cosine_similarity(embedding, "
+                        f"{_vector_literal(query_embedding, 'FLOAT[]')}), 0)"
+                    )
+                rows += self.con.execute(
+                    f"""
+                    SELECT id, role, content, importance, created_at,
+                           exp(COALESCE(decay_key, {_MEMORY_DECAY_KEY_SQL})
+                               - {_MEMORY_NOW_KEY_SQL}) + {relevance} AS score
+                    FROM memory_conversations
+                    WHERE session_id = ? AND compacted_into IS NULL
+                      AND NOT (id = ANY(?::BIGINT[]))
+                    ORDER BY score DESC, created_at DESC
+                    LIMIT ?
+                    """,
+                    [
+                        *([relevance_weight] if query_embedding is not None else []),
+                        session_id,
+                        _id_array_param(row[0] for row in rows),
+                        k - len(rows),
+                    ],
+                ).fetchall()
 
-            columns = ["role", "content", "importance", "created_at"]
+            columns = ["role", "content", "importance", "created_at", "score"]
             messages = []
-            for row in result:
-                msg = dict(zip(columns, row))
+            for row in sorted(rows, key=lambda r: (r[4], r[0])):
+                msg = dict(zip(columns, row[1:]))
                 if msg.get("created_at"):
                     msg["created_at"] = str(msg["created_at"])
                 messages.append(msg)
@@ -1798,6 +7025,104 @@ class SpecEngine:
         except Exception:
             return []
 
+    def compact_conversation_memory(
+        self,
+        session_id: str,
+        *,
+        keep_recent: int = MEMORY_COMPACT_KEEP,
+        chunk: int = MEMORY_COMPACT_CHUNK,
+        summarize: Callable[[list[dict[str, Any]]], str] | None = None,
+    ) -> dict[str, Any]:
+        """
+        Fold the older turns of a session into 'summary' rows.
+
+        Uncompacted rows older than the newest keep_recent are taken oldest first in
+        full chunks of `chunk`; earlier summaries are included, so summaries nest and
+        a session keeps fewer than keep_recent + chunk active rows. Each chunk becomes
+        one summary row with summarize(turns) as content (default: one truncated
+        "role: text" line per turn), the chunk's highest importance, the created_at
+        of its last turn and the normalized mean of its turns' vectors. The turns
+        stay in the table with compacted_into set to the summary id.
+
+        Args:
+            session_id: Session identifier
+            keep_recent: Newest rows never compacted
+            chunk: Rows folded into one summary
+            summarize: Optional callable turning [{role, content, importance,
+                created_at}] into summary text (e.g. an LLM call)
+
+        Returns:
+            Dict with the new summary ids and the number of turns compacted
+        """
+        try:
+            if chunk < 2:
+                raise ValueError("chunk must be at least 2")
+            rows = self.con.execute(
+                """
+                SELECT id, agent_spec_id, role, content, importance, created_at, embedding
+                FROM memory_conversations
+                WHERE session_id = ? AND compacted_into IS NULL
+                ORDER BY created_at DESC, id DESC
+                OFFSET ?
+                """,
+                [session_id, max(keep_recent, 0)],
+            ).fetchall()
+            rows.reverse()
+            chunks = [rows[i : i + chunk] for i in range(0, len(rows) - chunk + 1, chunk)]
+            summary_ids = []
+            with self._transaction():
+                for turns in chunks:
+                    records = [
+                        dict(zip(("role", "content", "importance", "created_at"), turn[2:6]))
+                        for turn in turns
+                    ]
+                    content = (summarize or _summarize_turns)(records)
+                    vectors = [turn[6] for turn in turns if turn[6] is not None]
+                    embedding = None
+                    if vectors and all(len(v) == len(vectors[0]) for v in vectors):
+                        mean = np.asarray(vectors, dtype=np.float32).mean(axis=0)
+                        norm = float(np.linalg.norm(mean))
+                        embedding = (mean / norm if norm else mean).tolist()
+                    summary_id = self._next_id("memory_conversations_seq")
+                    self.con.execute(
+                        """
+                        INSERT INTO memory_conversations
+                            (id, session_id, agent_spec_id, role, content, embedding,
+                             importance, created_at)
+                        VALUES (?, ?, ?, 'summary', ?, ?, ?, ?)
+                        """,
+                        [
+                            summary_id,
+                            session_id,
+                            next((t[1] for t in turns if t[1] is not None), None),
+                            content,
+                            embedding,
+                            max(t[4] if t[4] is not None else 0.5 for t in turns),
+                            turns[-1][5],
+                        ],
+                    )
+                    self.con.execute(
+                        "UPDATE memory_conversations SET compacted_into = ? "
+                        "WHERE id = ANY(?::BIGINT[])",
+                        [summary_id, _id_array_param(t[0] for t in turns)],
+                    )
+                    if embedding is not None:
+                        self._quantize_rows("memory_conversations", [summary_id])
+                        self._sync_vector_rows("memory_conversations", [summary_id], "default")
+                    summary_ids.append(summary_id)
+                if summary_ids:
+                    self.con.execute(
+                        f"UPDATE memory_conversations SET decay_key = {_MEMORY_DECAY_KEY_SQL} "
+                        "WHERE id = ANY(?::BIGINT[])",
+                        [_id_array_param(summary_ids)],
+                    )
+            compacted = sum(len(turns) for turns in chunks)
+            if session_id in self._memory_active:
+                self._memory_active[session_id] -= compacted - len(summary_ids)
+            return {"summary_ids": summary_ids, "compacted": compacted}
+        except Exception as e:
+            return {"error": str(e)}
+
     def store_org_knowledge(
         self,
         org: str,
@@ -1818,6 +7143,7 @@ class SpecEngine:
             Dict with knowledge entry ID
         """
         try:
+            self._check_embedding_dim("default", embedding)
             if org == "dev":
                 entry_id = self._next_id("knowledge_dev_seq")
                 self.con.execute(
@@ -1911,6 +7237,9 @@ class SpecEngine:
                 )
             else:
                 return {"error": f"Unknown org: {org}"}
+            if embedding is not None:
+                self._quantize_rows(f"knowledge_{org}", [entry_id])
+                self._sync_vector_rows(f"knowledge_{org}", [entry_id], "default")
 
             return {"entry_id": entry_id, "org": org}
 
@@ -2014,6 +7343,13 @@ def get_spec_engine(con: duckdb.DuckDBPyConnection | None = None, *, quiet: bool
         return engine
 
 
+@atexit.register
+def _flush_cached_engines() -> None:
+    """Write back usage still buffered in cached engines at interpreter exit."""
+    for engine in list(_spec_engines.values()):
+        engine.close()
+
+
 def register_spec_engine_tools(con: duckdb.DuckDBPyConnection) -> list[str]:
     """
     Register Spec Engine tools as Python UDFs in DuckDB.
@@ -28,36 +28,35 @@ CREATE OR REPLACE MACRO extract_response(response_body) AS (
     SELECT json_extract_string(response_body, '$.message.content')
 );
 
--- Generate a float embedding vector for text using an Ollama embedding model
+-- Generate a float embedding vector for text using an Ollama embedding model.
+-- embed_cached() (Python UDF) serves repeated (model, text) pairs from an
+-- in-process LRU and the embedding_cache table before calling /api/embed.
 CREATE OR REPLACE MACRO ollama_embed(model_name, text_input) AS (
-    SELECT json_extract(
-        http_post(
-            ollama_base() || '/api/embeddings',
-            headers := MAP {'Content-Type': 'application/json'},
-            body := json_object(
-                'model', model_name,
-                'prompt', text_input
-            )
-        ).body,
-        '$.embedding'
-    )::FLOAT[]
+    embed_cached(model_name, text_input)
 );
 
--- Model shortcuts: single prompt via chat-with-tools (empty tools), return text
-CREATE OR REPLACE MACRO deepseek(prompt) AS extract_response(ollama_chat_with_tools('deepseek-v3.2:cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
-CREATE OR REPLACE MACRO kimi(prompt) AS extract_response(ollama_chat_with_tools('kimi-k2.5:cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
-CREATE OR REPLACE MACRO kimi_think(prompt) AS extract_response(ollama_chat_with_tools('kimi-k2-thinking:cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
-CREATE OR REPLACE MACRO gemini(prompt) AS extract_response(ollama_chat_with_tools('gemini-3-pro-preview:latest', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
-CREATE OR REPLACE MACRO gemini_flash(prompt) AS extract_response(ollama_chat_with_tools('gemini-3-flash-preview:latest', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
-CREATE OR REPLACE MACRO qwen3_coder(prompt) AS extract_response(ollama_chat_with_tools('qwen3-coder-next:cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
-CREATE OR REPLACE MACRO qwen3_vl(prompt) AS extract_response(ollama_chat_with_tools('qwen3-vl:235b-cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
-CREATE OR REPLACE MACRO qwen(prompt) AS extract_response(ollama_chat_with_tools('qwen3.5:cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
-CREATE OR REPLACE MACRO glm(prompt) AS extract_response(ollama_chat_with_tools('glm-5:cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
-CREATE OR REPLACE MACRO minimax(prompt) AS extract_response(ollama_chat_with_tools('minimax-m2.5:cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
-CREATE OR REPLACE MACRO gpt_oss(prompt) AS extract_response(ollama_chat_with_tools('gpt-oss:120b-cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
-CREATE OR REPLACE MACRO gpt_oss_small(prompt) AS extract_response(ollama_chat_with_tools('gpt-oss:20b-cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
-CREATE OR REPLACE MACRO gpt_codex(prompt) AS extract_response(ollama_chat_with_tools('gpt-5.3-codex:latest', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
-CREATE OR REPLACE MACRO devstral(prompt) AS extract_response(ollama_chat_with_tools('devstral-2:123b-cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
+-- Chat via the llm_chat UDF: same request and /api/chat-style body as
+-- ollama_chat_with_tools, but through the shared connection pool and, with
+-- LLM_RESPONSE_CACHE=1, answered from llm_response_cache for repeated prompts.
+CREATE OR REPLACE MACRO llm_chat_cached(model_name, messages_json, tools_json) AS (
+    llm_chat(model_name, messages_json::VARCHAR, tools_json::VARCHAR)
+);
+
+-- Model shortcuts: single prompt via llm_chat_cached (empty tools), return text
+CREATE OR REPLACE MACRO deepseek(prompt) AS extract_response(llm_chat_cached('deepseek-v3.2:cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
+CREATE OR REPLACE MACRO kimi(prompt) AS extract_response(llm_chat_cached('kimi-k2.5:cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
+CREATE OR REPLACE MACRO kimi_think(prompt) AS extract_response(llm_chat_cached('kimi-k2-thinking:cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
+CREATE OR REPLACE MACRO gemini(prompt) AS extract_response(llm_chat_cached('gemini-3-pro-preview:latest', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
+CREATE OR REPLACE MACRO gemini_flash(prompt) AS extract_response(llm_chat_cached('gemini-3-flash-preview:latest', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
+CREATE OR REPLACE MACRO qwen3_coder(prompt) AS extract_response(llm_chat_cached('qwen3-coder-next:cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
+CREATE OR REPLACE MACRO qwen3_vl(prompt) AS extract_response(llm_chat_cached('qwen3-vl:235b-cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
+CREATE OR REPLACE MACRO qwen(prompt) AS extract_response(llm_chat_cached('qwen3.5:cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
+CREATE OR REPLACE MACRO glm(prompt) AS extract_response(llm_chat_cached('glm-5:cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
+CREATE OR REPLACE MACRO minimax(prompt) AS extract_response(llm_chat_cached('minimax-m2.5:cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
+CREATE OR REPLACE MACRO gpt_oss(prompt) AS extract_response(llm_chat_cached('gpt-oss:120b-cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
+CREATE OR REPLACE MACRO gpt_oss_small(prompt) AS extract_response(llm_chat_cached('gpt-oss:20b-cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
+CREATE OR REPLACE MACRO gpt_codex(prompt) AS extract_response(llm_chat_cached('gpt-5.3-codex:latest', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
+CREATE OR REPLACE MACRO devstral(prompt) AS extract_response(llm_chat_cached('devstral-2:123b-cloud', json_array(json_object('role', 'user', 'content', prompt)), json_array()));
 
 -- Single-turn agent call: build system+user messages and invoke model with tools
 CREATE OR REPLACE MACRO agent_call(model_name, system_prompt, user_prompt, tools_json) AS (
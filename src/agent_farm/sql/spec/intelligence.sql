@@ -121,8 +121,178 @@ CREATE TABLE IF NOT EXISTS memory_conversations (
 CREATE INDEX IF NOT EXISTS idx_memory_session ON memory_conversations(session_id);
 CREATE INDEX IF NOT EXISTS idx_memory_agent ON memory_conversations(agent_spec_id);
 
+-- Retrieval state maintained by SpecEngine: decay_key = ln(importance) +
+-- epoch(created_at) * ln(2) / MEMORY_HALF_LIFE ranks turns by decayed importance
+-- without the current time; compacted_into points at the 'summary' row a turn
+-- was folded into by compact_conversation_memory() (NULL while active).
+ALTER TABLE memory_conversations ADD COLUMN IF NOT EXISTS decay_key DOUBLE;
+ALTER TABLE memory_conversations ADD COLUMN IF NOT EXISTS compacted_into INTEGER;
+CREATE INDEX IF NOT EXISTS idx_memory_session_time
+    ON memory_conversations(session_id, created_at);
+
+-- ============================================================================
+-- 4. Trigram Posting Lists (substring search without FTS)
+-- ============================================================================
+
+-- One row per (source, row, trigram). Sources: 'spec' (name + summary + doc),
+-- 'spec_embeddings' (content) and 'notes_board' (lake.notes_board title + content).
+-- Maintained by SpecEngine on write; used to pre-filter '%term%' lookups.
+CREATE TABLE IF NOT EXISTS spec_trigrams (
+    source          VARCHAR NOT NULL,
+    row_key         VARCHAR NOT NULL,           -- Row id in the source table (as text)
+    trigram         VARCHAR NOT NULL            -- Lower-cased 3-character window
+);
+
+-- Base-table fingerprint (row count, id sum, highest id, latest updated_at,
+-- joined by ':') the postings of a source were last reconciled against by
+-- SpecEngine. SQL macros use the postings only while it matches the table.
+CREATE TABLE IF NOT EXISTS spec_trigram_coverage (
+    source          VARCHAR PRIMARY KEY,
+    fingerprint     VARCHAR NOT NULL
+);
+
+-- No ART index: DuckDB does not use one for the multi-column IN/GROUP BY probes
+-- and it dominates bulk commit time; lookups rely on zonemaps and vectorized scans.
+
+-- ============================================================================
+-- 5. Quantized Embeddings
+-- ============================================================================
+
+-- Quantization is opt-in per vector table and, for spec_embeddings, per model
+-- (SpecEngine.enable_quantization()). model '' covers every model of the table.
+CREATE TABLE IF NOT EXISTS spec_embedding_quantization (
+    table_name      VARCHAR NOT NULL,           -- one of the vector tables
+    model           VARCHAR NOT NULL DEFAULT '',
+    enabled_at      TIMESTAMP DEFAULT now(),
+    PRIMARY KEY (table_name, model)
+);
+
+-- Compact encodings of the embeddings of opted-in rows, kept by SpecEngine for
+-- two-phase search: sign bits (Hamming candidate scan) and per-vector max-abs
+-- scaled int8. Tables that are not opted in have no rows here.
+CREATE TABLE IF NOT EXISTS spec_embedding_quantized (
+    source_table    VARCHAR NOT NULL,
+    row_id          BIGINT NOT NULL,            -- id in source_table
+    bits            BIT,
+    i8              TINYINT[],
+    PRIMARY KEY (source_table, row_id)
+);
+
+-- ============================================================================
+-- 6. Embedding Models and Vector Indexes
+-- ============================================================================
+
+-- Registered embedding models. Vectors of a registered model must have exactly
+-- `dim` values; each model is stored as FLOAT[dim] in its vector tables below.
+-- 'default' also covers the knowledge and memory tables (no model column).
+CREATE TABLE IF NOT EXISTS spec_embedding_models (
+    name            VARCHAR PRIMARY KEY,        -- spec_embeddings.embedding_model
+    dim             INTEGER NOT NULL,
+    metric          VARCHAR NOT NULL DEFAULT 'cosine',  -- 'cosine', 'ip'
+    description     VARCHAR,
+    created_at      TIMESTAMP DEFAULT current_timestamp
+);
+
+-- One row per ANN index built by SpecEngine.build_vector_index(). Vectors of one
+-- model are copied into a FLOAT[dim] table ({source_table}__vec_{model}) carrying
+-- the HNSW index; TEMP tables are rebuilt from the source table after a restart.
+CREATE TABLE IF NOT EXISTS spec_vector_indexes (
+    source_table    VARCHAR NOT NULL,           -- spec_embeddings, knowledge_*, memory_conversations
+    model           VARCHAR NOT NULL,           -- embedding_model ('default' for tables without one)
+    dim             INTEGER NOT NULL,
+    metric          VARCHAR NOT NULL,           -- 'cosine', 'ip', 'l2sq'
+    vector_table    VARCHAR NOT NULL,
+    persistent      BOOLEAN DEFAULT FALSE,      -- FALSE: TEMP table, rebuilt on first use
+    options         VARCHAR,                    -- JSON HNSW options (ef_construction, ef_search, M)
+    hnsw            BOOLEAN DEFAULT FALSE,      -- FALSE when vss was not loaded (exact scan)
+    row_count       BIGINT,
+    built_at        TIMESTAMP DEFAULT current_timestamp,
+    PRIMARY KEY (source_table, model)
+);
+
+-- Checkpoint of SpecEngine.embed_pending() per source table and model: rows up to
+-- last_id have been processed, so an interrupted run resumes after it.
+CREATE TABLE IF NOT EXISTS spec_embedding_progress (
+    source_table    VARCHAR NOT NULL,
+    model           VARCHAR NOT NULL,
+    last_id         BIGINT NOT NULL,
+    embedded        BIGINT DEFAULT 0,           -- Rows given a vector over all runs
+    updated_at      TIMESTAMP DEFAULT current_timestamp,
+    PRIMARY KEY (source_table, model)
+);
+
+-- Embedding model migrations of SpecEngine.start_embedding_migration(): rows of
+-- from_model get a to_model vector in spec_embedding_shadow while searches keep the
+-- old ones; at full coverage the vectors are swapped in one transaction and status
+-- becomes 'switched'. last_id is the resume checkpoint of the re-embedding scan.
+CREATE TABLE IF NOT EXISTS spec_embedding_migrations (
+    to_model        VARCHAR PRIMARY KEY,
+    from_model      VARCHAR NOT NULL,
+    status          VARCHAR DEFAULT 'running',  -- 'running', 'switched', 'cancelled'
+    last_id         BIGINT DEFAULT -1,
+    migrated        BIGINT DEFAULT 0,           -- Shadow vectors written over all runs
+    started_at      TIMESTAMP DEFAULT current_timestamp,
+    updated_at      TIMESTAMP DEFAULT current_timestamp,
+    switched_at     TIMESTAMP
+);
+
+-- Vectors of a migration's target model per spec_embeddings row; valid while the
+-- row's content_hash is unchanged.
+CREATE TABLE IF NOT EXISTS spec_embedding_shadow (
+    id              INTEGER NOT NULL,           -- spec_embeddings.id
+    model           VARCHAR NOT NULL,
+    content_hash    VARCHAR NOT NULL,
+    embedding       FLOAT[] NOT NULL,
+    PRIMARY KEY (id, model)
+);
+
+-- Files chunked into spec_embeddings by SpecEngine.ingest_path(). A file is
+-- re-read only when (mtime, size) change and re-chunked only when file_hash does;
+-- chunk_hashes[i] is the content_hash of its chunk_index i row (SHA256 of path + text).
+CREATE TABLE IF NOT EXISTS spec_ingest_files (
+    path            VARCHAR PRIMARY KEY,        -- Resolved absolute path
+    org             VARCHAR,                    -- Org whose workspaces were enforced
+    mtime           DOUBLE NOT NULL,
+    size            BIGINT NOT NULL,
+    file_hash       VARCHAR NOT NULL,           -- SHA256 of the file bytes
+    chunk_hashes    VARCHAR[],
+    ingested_at     TIMESTAMP DEFAULT current_timestamp
+);
+
+-- Vectors by (model, SHA256 of the text), shared by the embed()/ollama_embed()
+-- macros (embed_cached UDF), SpecEngine.store_embedding and embed_pending so a
+-- text is sent to Ollama once per model. Fronted by an in-process LRU; rows
+-- beyond EMBEDDING_CACHE_MAX_ROWS are evicted by last_used_at.
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    model           VARCHAR NOT NULL,
+    content_hash    VARCHAR NOT NULL,
+    embedding       FLOAT[] NOT NULL,
+    hits            BIGINT DEFAULT 0,           -- Lookups served from this row
+    created_at      TIMESTAMP DEFAULT current_timestamp,
+    last_used_at    TIMESTAMP DEFAULT current_timestamp,
+    PRIMARY KEY (model, content_hash)
+);
+
+-- Model responses by SHA256 of (model, prepared messages, tools, temperature),
+-- consulted by chat_with_model() and the llm_chat UDF when LLM_RESPONSE_CACHE=1.
+-- Rows expire at expires_at and are evicted by last_used_at beyond
+-- LLM_CACHE_MAX_ROWS; latency_ms is what each hit saves. cache_key is indexed
+-- but not unique: hits UPDATE rows from inside running queries (the llm_chat
+-- UDF), which DuckDB rejects as write-write conflicts on unique-indexed rows.
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+    cache_key       VARCHAR NOT NULL,
+    model           VARCHAR NOT NULL,
+    response        JSON NOT NULL,
+    latency_ms      DOUBLE,                     -- Backend latency of the original call
+    hits            BIGINT DEFAULT 0,
+    created_at      TIMESTAMP DEFAULT current_timestamp,
+    last_used_at    TIMESTAMP DEFAULT current_timestamp,
+    expires_at      TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_key ON llm_response_cache(cache_key);
+
 -- ============================================================================
--- 4. Sequences
+-- 7. Sequences
 -- ============================================================================
 
 CREATE SEQUENCE IF NOT EXISTS spec_embeddings_seq START 1;
@@ -133,7 +303,7 @@ CREATE SEQUENCE IF NOT EXISTS knowledge_ops_seq START 1;
 CREATE SEQUENCE IF NOT EXISTS memory_conversations_seq START 1;
 
 -- ============================================================================
--- 5. Views for Easy Access
+-- 8. Views for Easy Access
 -- ============================================================================
 
 -- Recent embeddings by org
@@ -27,16 +27,20 @@ CREATE OR REPLACE MACRO spec_render(template_str, context) AS (
     spec_render_direct_udf(template_str, context)
 );
 
--- Get raw template string by name
+-- Get raw template string by name. A name used by both a task and a prompt
+-- template resolves to the higher version, then the lower id.
 -- Usage: SELECT spec_get_template('plan_pia_swarm');
 CREATE OR REPLACE MACRO spec_get_template(template_name) AS (
     SELECT p.payload->>'template'
-    FROM spec_objects o
-    JOIN spec_payloads p ON p.object_id = o.id
-    WHERE o.kind IN ('task_template', 'prompt_template')
-      AND o.name = template_name
-      AND o.status = 'active'
-    ORDER BY o.version DESC
+    FROM spec_latest l
+    JOIN spec_objects o ON o.id = l.active_id
+    JOIN spec_payloads p ON p.object_id = l.active_id
+    WHERE l.kind IN ('task_template', 'prompt_template')
+      AND l.name = template_name
+    ORDER BY
+        [COALESCE(TRY_CAST(part AS BIGINT), -1) FOR part IN string_split(
+            regexp_extract(ltrim(lower(o.version), 'v'), '^[0-9]+(\.[0-9]+)*'), '.')] DESC,
+        (o.version NOT LIKE '%-%') DESC, o.version DESC, o.id
     LIMIT 1
 );
 
@@ -50,13 +54,10 @@ CREATE OR REPLACE MACRO spec_validate(schema_name, payload) AS (
     SELECT json_schema_validate(
         (
             SELECT p.payload
-            FROM spec_objects o
-            JOIN spec_payloads p ON p.object_id = o.id
-            WHERE o.kind = 'schema'
-              AND o.name = schema_name
-              AND o.status = 'active'
-            ORDER BY o.version DESC
-            LIMIT 1
+            FROM spec_latest l
+            JOIN spec_payloads p ON p.object_id = l.active_id
+            WHERE l.kind = 'schema'
+              AND l.name = schema_name
         ),
         payload
     )
@@ -67,22 +68,17 @@ CREATE OR REPLACE MACRO spec_validate(schema_name, payload) AS (
 CREATE OR REPLACE MACRO spec_validate_against(spec_kind, spec_name, payload) AS (
     WITH spec_info AS (
         SELECT p.schema_ref
-        FROM spec_objects o
-        JOIN spec_payloads p ON p.object_id = o.id
-        WHERE o.kind = spec_kind
-          AND o.name = spec_name
-          AND o.status = 'active'
-        ORDER BY o.version DESC
-        LIMIT 1
+        FROM spec_latest l
+        JOIN spec_payloads p ON p.object_id = l.active_id
+        WHERE l.kind = spec_kind
+          AND l.name = spec_name
     ),
     schema_payload AS (
         SELECT sp.payload AS schema_json
-        FROM spec_objects so
-        JOIN spec_payloads sp ON sp.object_id = so.id
-        WHERE so.kind = 'schema'
-          AND so.name = (SELECT schema_ref FROM spec_info)
-          AND so.status = 'active'
-        LIMIT 1
+        FROM spec_latest sl
+        JOIN spec_payloads sp ON sp.object_id = sl.active_id
+        WHERE sl.kind = 'schema'
+          AND sl.name = (SELECT schema_ref FROM spec_info)
     )
     SELECT json_schema_validate(
         (SELECT schema_json FROM schema_payload),
@@ -100,6 +96,30 @@ CREATE OR REPLACE MACRO spec_is_valid(schema_name, payload) AS (
     END
 );
 
+-- Validate a whole column of payloads in one pass (bulk ingestion checks).
+-- The table must have a `payload` column; all its columns are returned plus
+-- `errors` (validation result) and `ok`.
+-- Usage: SELECT * FROM spec_validate_table('agent_config_schema', 'staging_agents') WHERE NOT ok;
+CREATE OR REPLACE MACRO spec_validate_table(schema_name, table_name) AS TABLE (
+    WITH schema_spec AS (
+        SELECT p.payload AS schema_json
+        FROM spec_latest l
+        JOIN spec_payloads p ON p.object_id = l.active_id
+        WHERE l.kind = 'schema'
+          AND l.name = schema_name
+    )
+    SELECT v.*, (v.errors IS NULL OR v.errors = '') AS ok
+    FROM (
+        SELECT
+            t.*,
+            json_schema_validate(
+                (SELECT schema_json FROM schema_spec),
+                t.payload::VARCHAR
+            ) AS errors
+        FROM query_table(table_name) t
+    ) v
+);
+
 -- ============================================================================
 -- C) Spec Query Macros
 -- ============================================================================
@@ -170,13 +190,12 @@ CREATE OR REPLACE MACRO spec_get(kind_filter, name_filter) AS TABLE (
         d.doc,
         p.payload,
         p.schema_ref
-    FROM spec_objects o
+    FROM spec_latest l
+    JOIN spec_objects o ON o.id = l.latest_id
     LEFT JOIN spec_docs d ON d.object_id = o.id
     LEFT JOIN spec_payloads p ON p.object_id = o.id
-    WHERE o.kind = kind_filter
-      AND o.name = name_filter
-    ORDER BY o.version DESC
-    LIMIT 1
+    WHERE l.kind = kind_filter
+      AND l.name = name_filter
 );
 
 -- Get a spec by kind, name, and version
@@ -200,26 +219,20 @@ CREATE OR REPLACE MACRO spec_get_v(kind_filter, name_filter, version_filter) AS
 -- Usage: SELECT spec_get_payload('agent', 'pia');
 CREATE OR REPLACE MACRO spec_get_payload(kind_filter, name_filter) AS (
     SELECT p.payload
-    FROM spec_objects o
-    JOIN spec_payloads p ON p.object_id = o.id
-    WHERE o.kind = kind_filter
-      AND o.name = name_filter
-      AND o.status = 'active'
-    ORDER BY o.version DESC
-    LIMIT 1
+    FROM spec_latest l
+    JOIN spec_payloads p ON p.object_id = l.active_id
+    WHERE l.kind = kind_filter
+      AND l.name = name_filter
 );
 
 -- Get spec documentation
 -- Usage: SELECT spec_get_doc('agent', 'pia');
 CREATE OR REPLACE MACRO spec_get_doc(kind_filter, name_filter) AS (
     SELECT d.doc
-    FROM spec_objects o
-    JOIN spec_docs d ON d.object_id = o.id
-    WHERE o.kind = kind_filter
-      AND o.name = name_filter
-      AND o.status = 'active'
-    ORDER BY o.version DESC
-    LIMIT 1
+    FROM spec_latest l
+    JOIN spec_docs d ON d.object_id = l.active_id
+    WHERE l.kind = kind_filter
+      AND l.name = name_filter
 );
 
 -- ============================================================================
@@ -296,52 +309,40 @@ CREATE OR REPLACE MACRO mcp_get_remote_prompt(server_name, prompt_name, args) AS
 -- Usage: SELECT spec_agent_prompt('pia');
 CREATE OR REPLACE MACRO spec_agent_prompt(agent_name) AS (
     SELECT p.payload->>'system_prompt'
-    FROM spec_objects o
-    JOIN spec_payloads p ON p.object_id = o.id
-    WHERE o.kind = 'agent'
-      AND o.name = agent_name
-      AND o.status = 'active'
-    ORDER BY o.version DESC
-    LIMIT 1
+    FROM spec_latest l
+    JOIN spec_payloads p ON p.object_id = l.active_id
+    WHERE l.kind = 'agent'
+      AND l.name = agent_name
 );
 
 -- Get agent model configuration
 -- Usage: SELECT spec_agent_model('pia');
 CREATE OR REPLACE MACRO spec_agent_model(agent_name) AS (
     SELECT p.payload->>'model'
-    FROM spec_objects o
-    JOIN spec_payloads p ON p.object_id = o.id
-    WHERE o.kind = 'agent'
-      AND o.name = agent_name
-      AND o.status = 'active'
-    ORDER BY o.version DESC
-    LIMIT 1
+    FROM spec_latest l
+    JOIN spec_payloads p ON p.object_id = l.active_id
+    WHERE l.kind = 'agent'
+      AND l.name = agent_name
 );
 
 -- Get skill tools schema
 -- Usage: SELECT spec_skill_tools('duckdb-spec-engine');
 CREATE OR REPLACE MACRO spec_skill_tools(skill_name) AS (
     SELECT p.payload->'tools'
-    FROM spec_objects o
-    JOIN spec_payloads p ON p.object_id = o.id
-    WHERE o.kind = 'skill'
-      AND o.name = skill_name
-      AND o.status = 'active'
-    ORDER BY o.version DESC
-    LIMIT 1
+    FROM spec_latest l
+    JOIN spec_payloads p ON p.object_id = l.active_id
+    WHERE l.kind = 'skill'
+      AND l.name = skill_name
 );
 
 -- Get workflow steps
 -- Usage: SELECT spec_workflow_steps('agent_onboarding');
 CREATE OR REPLACE MACRO spec_workflow_steps(workflow_name) AS (
     SELECT p.payload->'steps'
-    FROM spec_objects o
-    JOIN spec_payloads p ON p.object_id = o.id
-    WHERE o.kind = 'workflow'
-      AND o.name = workflow_name
-      AND o.status = 'active'
-    ORDER BY o.version DESC
-    LIMIT 1
+    FROM spec_latest l
+    JOIN spec_payloads p ON p.object_id = l.active_id
+    WHERE l.kind = 'workflow'
+      AND l.name = workflow_name
 );
 
 -- ============================================================================
@@ -422,6 +423,51 @@ CREATE OR REPLACE MACRO spec_related_to(spec_id_val) AS TABLE (
     WHERE r.to_id = spec_id_val
 );
 
+-- Get every spec a spec transitively points at, with its shortest hop count.
+-- Each walk carries its path, so a cycle in spec_relationships is not re-entered.
+-- Usage: SELECT * FROM spec_dependencies(10, 3);  -- NULL depth walks the full closure
+CREATE OR REPLACE MACRO spec_dependencies(spec_id_val, max_depth) AS TABLE (
+    WITH RECURSIVE walk(id, depth, path) AS (
+        SELECT to_id, 1, [spec_id_val, to_id]
+        FROM spec_relationships WHERE from_id = spec_id_val
+        UNION ALL
+        SELECT r.to_id, w.depth + 1, list_append(w.path, r.to_id)
+        FROM walk w
+        JOIN spec_relationships r ON r.from_id = w.id
+        WHERE (max_depth IS NULL OR w.depth < max_depth)
+          AND NOT list_contains(w.path, r.to_id)
+    ),
+    hits AS (
+        SELECT id, min(depth) AS depth FROM walk WHERE id <> spec_id_val GROUP BY id
+    )
+    SELECT o.id, o.kind, o.name, o.version, o.status, o.summary, h.depth
+    FROM hits h
+    JOIN spec_objects o ON o.id = h.id
+    ORDER BY h.depth, o.id
+);
+
+-- Get every spec that transitively points at a spec (impact analysis), cycle-safe
+-- Usage: SELECT * FROM spec_dependents(10, 3);  -- NULL depth walks the full closure
+CREATE OR REPLACE MACRO spec_dependents(spec_id_val, max_depth) AS TABLE (
+    WITH RECURSIVE walk(id, depth, path) AS (
+        SELECT from_id, 1, [spec_id_val, from_id]
+        FROM spec_relationships WHERE to_id = spec_id_val
+        UNION ALL
+        SELECT r.from_id, w.depth + 1, list_append(w.path, r.from_id)
+        FROM walk w
+        JOIN spec_relationships r ON r.to_id = w.id
+        WHERE (max_depth IS NULL OR w.depth < max_depth)
+          AND NOT list_contains(w.path, r.from_id)
+    ),
+    hits AS (
+        SELECT id, min(depth) AS depth FROM walk WHERE id <> spec_id_val GROUP BY id
+    )
+    SELECT o.id, o.kind, o.name, o.version, o.status, o.summary, h.depth
+    FROM hits h
+    JOIN spec_objects o ON o.id = h.id
+    ORDER BY h.depth, o.id
+);
+
 -- Get performance metrics for a spec
 -- Usage: SELECT * FROM spec_performance(10);
 CREATE OR REPLACE MACRO spec_performance(spec_id_val) AS TABLE (
@@ -430,14 +476,13 @@ CREATE OR REPLACE MACRO spec_performance(spec_id_val) AS TABLE (
         o.use_count,
         o.success_rate,
         o.confidence,
-        COUNT(f.id) AS feedback_count,
-        AVG(f.score) AS avg_score,
-        COUNT(a.id) AS adaptation_count
+        (SELECT COALESCE(SUM(feedback_count), 0) FROM spec_usage_hourly
+         WHERE spec_id = o.id) AS feedback_count,
+        (SELECT SUM(score_sum) / NULLIF(SUM(scored_count), 0) FROM spec_usage_hourly
+         WHERE spec_id = o.id) AS avg_score,
+        (SELECT COUNT(*) FROM spec_adaptations WHERE spec_id = o.id) AS adaptation_count
     FROM spec_objects o
-    LEFT JOIN spec_feedback f ON f.spec_id = o.id
-    LEFT JOIN spec_adaptations a ON a.spec_id = o.id
     WHERE o.id = spec_id_val
-    GROUP BY o.id, o.kind, o.name, o.use_count, o.success_rate, o.confidence
 );
 
 -- Get low-performing specs that need improvement
@@ -11,36 +11,144 @@
 -- A) Vector Similarity Search Macros (VSS)
 -- ============================================================================
 
+-- Every vss_search_* macro takes quantization := 'binary' for a two-phase search
+-- over the encodings in spec_embedding_quantized (tables opted in with
+-- SpecEngine.enable_quantization()): phase one ranks rows by the Hamming
+-- distance between their sign bits and the query's, keeping
+-- limit_count * rerank candidates; phase two re-ranks those by exact cosine on
+-- the FLOAT[] vectors. Rows without encodings are skipped. The query encodings
+-- are wrapped in scalar subqueries so they are computed once.
+--
+-- Without quantization, a query whose dimension has a persistent cosine index
+-- (SpecEngine.build_vector_index(..., persistent=True)) takes its candidates
+-- from the index's FLOAT[dim] table through vector_ann() and re-scores them
+-- exactly; other queries scan. Macros with a filter take 4 * limit_count
+-- candidates, so a very selective filter can return fewer than limit_count rows.
+
+-- Nearest row ids of a source table from its vector tables, and the dimensions
+-- those cover. SpecEngine replaces both whenever an index is built or dropped;
+-- these defaults (no index) are only created once, so reloading this file
+-- keeps the engine's versions.
+CREATE MACRO IF NOT EXISTS vector_ann(source, query_vec, n) AS TABLE (
+    SELECT NULL::INTEGER AS id WHERE FALSE
+);
+CREATE MACRO IF NOT EXISTS vector_ann_dims(source) AS []::INTEGER[];
+
+-- Sign bit per dimension, as stored in spec_embedding_quantized.bits
+CREATE OR REPLACE MACRO embedding_sign_bits(vec) AS
+    array_to_string(list_transform(vec, x -> CASE WHEN x > 0 THEN '1' ELSE '0' END), '')::BIT;
+
 -- Search embeddings by vector similarity
 -- Usage: SELECT * FROM vss_search_embeddings(query_embedding, 10, 'code');
-CREATE OR REPLACE MACRO vss_search_embeddings(query_vec, limit_count, content_type_filter) AS TABLE (
+CREATE OR REPLACE MACRO vss_search_embeddings(query_vec, limit_count, content_type_filter, quantization := NULL, rerank := 10) AS TABLE (
+    WITH candidates AS (
+        SELECT q.row_id AS id
+        FROM spec_embedding_quantized q
+        JOIN spec_embeddings e ON e.id = q.row_id
+        WHERE quantization = 'binary' AND q.source_table = 'spec_embeddings'
+          AND bit_length(q.bits) = (SELECT len(query_vec))
+          AND e.content_type = content_type_filter
+        ORDER BY bit_count(xor(q.bits, (SELECT embedding_sign_bits(query_vec))))
+        LIMIT limit_count * rerank
+    ),
+    ann AS (
+        SELECT id FROM vector_ann('spec_embeddings', query_vec, limit_count * 4)
+    )
     SELECT
         id, spec_id, org_id, content_type,
         content, metadata,
         list_cosine_similarity(embedding, query_vec::FLOAT[]) AS similarity
     FROM spec_embeddings
     WHERE content_type = content_type_filter
-      AND embedding IS NOT NULL
+      AND embedding IS NOT NULL AND len(embedding) = len(query_vec)
+      AND NOT list_contains(vector_ann_dims('spec_embeddings'), len(query_vec))
+      AND CASE WHEN quantization IS NULL THEN TRUE
+           WHEN quantization = 'binary' THEN FALSE
+           ELSE error('quantization must be NULL or ''binary''') END
+    UNION ALL
+    SELECT
+        e.id, e.spec_id, e.org_id, e.content_type,
+        e.content, e.metadata,
+        list_cosine_similarity(e.embedding, query_vec::FLOAT[])
+    FROM spec_embeddings e
+    JOIN ann a ON a.id = e.id
+    WHERE e.content_type = content_type_filter
+      AND CASE WHEN quantization IS NULL THEN TRUE
+           WHEN quantization = 'binary' THEN FALSE
+           ELSE error('quantization must be NULL or ''binary''') END
+    UNION ALL
+    SELECT
+        e.id, e.spec_id, e.org_id, e.content_type,
+        e.content, e.metadata,
+        list_cosine_similarity(e.embedding, query_vec::FLOAT[])
+    FROM spec_embeddings e
+    JOIN candidates c ON c.id = e.id
     ORDER BY similarity DESC
     LIMIT limit_count
 );
 
 -- Search all embeddings regardless of type
 -- Usage: SELECT * FROM vss_search_all(query_embedding, 20);
-CREATE OR REPLACE MACRO vss_search_all(query_vec, limit_count) AS TABLE (
+CREATE OR REPLACE MACRO vss_search_all(query_vec, limit_count, quantization := NULL, rerank := 10) AS TABLE (
+    WITH candidates AS (
+        SELECT q.row_id AS id
+        FROM spec_embedding_quantized q
+        JOIN spec_embeddings e ON e.id = q.row_id
+        WHERE quantization = 'binary' AND q.source_table = 'spec_embeddings'
+          AND bit_length(q.bits) = (SELECT len(query_vec))
+        ORDER BY bit_count(xor(q.bits, (SELECT embedding_sign_bits(query_vec))))
+        LIMIT limit_count * rerank
+    ),
+    ann AS (
+        SELECT id FROM vector_ann('spec_embeddings', query_vec, limit_count)
+    )
     SELECT
         id, spec_id, org_id, content_type,
         content, metadata,
         list_cosine_similarity(embedding, query_vec::FLOAT[]) AS similarity
     FROM spec_embeddings
-    WHERE embedding IS NOT NULL
+    WHERE embedding IS NOT NULL AND len(embedding) = len(query_vec)
+      AND NOT list_contains(vector_ann_dims('spec_embeddings'), len(query_vec))
+      AND CASE WHEN quantization IS NULL THEN TRUE
+           WHEN quantization = 'binary' THEN FALSE
+           ELSE error('quantization must be NULL or ''binary''') END
+    UNION ALL
+    SELECT
+        e.id, e.spec_id, e.org_id, e.content_type,
+        e.content, e.metadata,
+        list_cosine_similarity(e.embedding, query_vec::FLOAT[])
+    FROM spec_embeddings e
+    JOIN ann a ON a.id = e.id
+    WHERE CASE WHEN quantization IS NULL THEN TRUE
+           WHEN quantization = 'binary' THEN FALSE
+           ELSE error('quantization must be NULL or ''binary''') END
+    UNION ALL
+    SELECT
+        e.id, e.spec_id, e.org_id, e.content_type,
+        e.content, e.metadata,
+        list_cosine_similarity(e.embedding, query_vec::FLOAT[])
+    FROM spec_embeddings e
+    JOIN candidates c ON c.id = e.id
     ORDER BY similarity DESC
     LIMIT limit_count
 );
 
 -- Search DevOrg code knowledge
 -- Usage: SELECT * FROM vss_search_code(query_embedding, 10, 'python');
-CREATE OR REPLACE MACRO vss_search_code(query_vec, limit_count, lang_filter) AS TABLE (
+CREATE OR REPLACE MACRO vss_search_code(query_vec, limit_count, lang_filter, quantization := NULL, rerank := 10) AS TABLE (
+    WITH candidates AS (
+        SELECT q.row_id AS id
+        FROM spec_embedding_quantized q
+        JOIN knowledge_dev e ON e.id = q.row_id
+        WHERE quantization = 'binary' AND q.source_table = 'knowledge_dev'
+          AND bit_length(q.bits) = (SELECT len(query_vec))
+          AND (lang_filter IS NULL OR e.language = lang_filter)
+        ORDER BY bit_count(xor(q.bits, (SELECT embedding_sign_bits(query_vec))))
+        LIMIT limit_count * rerank
+    ),
+    ann AS (
+        SELECT id FROM vector_ann('knowledge_dev', query_vec, limit_count * 4)
+    )
     SELECT
         id, repo, file_path, language, ast_type, symbol_name,
         content, doc_string,
@@ -48,26 +156,94 @@ CREATE OR REPLACE MACRO vss_search_code(query_vec, limit_count, lang_filter) AS
     FROM knowledge_dev
     WHERE (lang_filter IS NULL OR language = lang_filter)
       AND embedding IS NOT NULL
+      AND NOT list_contains(vector_ann_dims('knowledge_dev'), len(query_vec))
+      AND CASE WHEN quantization IS NULL THEN TRUE
+           WHEN quantization = 'binary' THEN FALSE
+           ELSE error('quantization must be NULL or ''binary''') END
+    UNION ALL
+    SELECT
+        e.id, e.repo, e.file_path, e.language, e.ast_type, e.symbol_name,
+        e.content, e.doc_string,
+        list_cosine_similarity(e.embedding, query_vec::FLOAT[])
+    FROM knowledge_dev e
+    JOIN ann a ON a.id = e.id
+    WHERE (lang_filter IS NULL OR e.language = lang_filter)
+      AND CASE WHEN quantization IS NULL THEN TRUE
+           WHEN quantization = 'binary' THEN FALSE
+           ELSE error('quantization must be NULL or ''binary''') END
+    UNION ALL
+    SELECT
+        e.id, e.repo, e.file_path, e.language, e.ast_type, e.symbol_name,
+        e.content, e.doc_string,
+        list_cosine_similarity(e.embedding, query_vec::FLOAT[])
+    FROM knowledge_dev e
+    JOIN candidates c ON c.id = e.id
     ORDER BY similarity DESC
     LIMIT limit_count
 );
 
 -- Search ResearchOrg knowledge
 -- Usage: SELECT * FROM vss_search_research(query_embedding, 10);
-CREATE OR REPLACE MACRO vss_search_research(query_vec, limit_count) AS TABLE (
+CREATE OR REPLACE MACRO vss_search_research(query_vec, limit_count, quantization := NULL, rerank := 10) AS TABLE (
+    WITH candidates AS (
+        SELECT q.row_id AS id
+        FROM spec_embedding_quantized q
+        JOIN knowledge_research e ON e.id = q.row_id
+        WHERE quantization = 'binary' AND q.source_table = 'knowledge_research'
+          AND bit_length(q.bits) = (SELECT len(query_vec))
+        ORDER BY bit_count(xor(q.bits, (SELECT embedding_sign_bits(query_vec))))
+        LIMIT limit_count * rerank
+    ),
+    ann AS (
+        SELECT id FROM vector_ann('knowledge_research', query_vec, limit_count)
+    )
     SELECT
         id, query, source_url, source_title,
         content, relevance_score,
         list_cosine_similarity(embedding, query_vec::FLOAT[]) AS similarity
     FROM knowledge_research
     WHERE embedding IS NOT NULL
+      AND NOT list_contains(vector_ann_dims('knowledge_research'), len(query_vec))
+      AND CASE WHEN quantization IS NULL THEN TRUE
+           WHEN quantization = 'binary' THEN FALSE
+           ELSE error('quantization must be NULL or ''binary''') END
+    UNION ALL
+    SELECT
+        e.id, e.query, e.source_url, e.source_title,
+        e.content, e.relevance_score,
+        list_cosine_similarity(e.embedding, query_vec::FLOAT[])
+    FROM knowledge_research e
+    JOIN ann a ON a.id = e.id
+    WHERE CASE WHEN quantization IS NULL THEN TRUE
+           WHEN quantization = 'binary' THEN FALSE
+           ELSE error('quantization must be NULL or ''binary''') END
+    UNION ALL
+    SELECT
+        e.id, e.query, e.source_url, e.source_title,
+        e.content, e.relevance_score,
+        list_cosine_similarity(e.embedding, query_vec::FLOAT[])
+    FROM knowledge_research e
+    JOIN candidates c ON c.id = e.id
     ORDER BY similarity DESC
     LIMIT limit_count
 );
 
 -- Search StudioOrg decisions
 -- Usage: SELECT * FROM vss_search_decisions(query_embedding, 10, 'design');
-CREATE OR REPLACE MACRO vss_search_decisions(query_vec, limit_count, decision_type_filter) AS TABLE (
+CREATE OR REPLACE MACRO vss_search_decisions(query_vec, limit_count, decision_type_filter, quantization := NULL, rerank := 10) AS TABLE (
+    WITH candidates AS (
+        SELECT q.row_id AS id
+        FROM spec_embedding_quantized q
+        JOIN knowledge_studio e ON e.id = q.row_id
+        WHERE quantization = 'binary' AND q.source_table = 'knowledge_studio'
+          AND bit_length(q.bits) = (SELECT len(query_vec))
+          AND (decision_type_filter IS NULL OR e.decision_type = decision_type_filter)
+        ORDER BY bit_count(xor(q.bits, (SELECT embedding_sign_bits(query_vec))))
+        LIMIT limit_count * rerank
+    ),
+    ann AS (
+        SELECT id FROM vector_ann('knowledge_studio', query_vec, limit_count * 4)
+    )
     SELECT
         id, project, decision_type, title,
         description, content, rationale, performance,
@@ -75,19 +251,127 @@ CREATE OR REPLACE MACRO vss_search_decisions(query_vec, limit_count, decision_ty
     FROM knowledge_studio
     WHERE (decision_type_filter IS NULL OR decision_type = decision_type_filter)
       AND embedding IS NOT NULL
+      AND NOT list_contains(vector_ann_dims('knowledge_studio'), len(query_vec))
+      AND CASE WHEN quantization IS NULL THEN TRUE
+           WHEN quantization = 'binary' THEN FALSE
+           ELSE error('quantization must be NULL or ''binary''') END
+    UNION ALL
+    SELECT
+        e.id, e.project, e.decision_type, e.title,
+        e.description, e.content, e.rationale, e.performance,
+        list_cosine_similarity(e.embedding, query_vec::FLOAT[])
+    FROM knowledge_studio e
+    JOIN ann a ON a.id = e.id
+    WHERE (decision_type_filter IS NULL OR e.decision_type = decision_type_filter)
+      AND CASE WHEN quantization IS NULL THEN TRUE
+           WHEN quantization = 'binary' THEN FALSE
+           ELSE error('quantization must be NULL or ''binary''') END
+    UNION ALL
+    SELECT
+        e.id, e.project, e.decision_type, e.title,
+        e.description, e.content, e.rationale, e.performance,
+        list_cosine_similarity(e.embedding, query_vec::FLOAT[])
+    FROM knowledge_studio e
+    JOIN candidates c ON c.id = e.id
     ORDER BY similarity DESC
     LIMIT limit_count
 );
 
 -- Search conversation memory
 -- Usage: SELECT * FROM vss_search_memory(query_embedding, 10, 'session-123');
-CREATE OR REPLACE MACRO vss_search_memory(query_vec, limit_count, session_filter) AS TABLE (
+CREATE OR REPLACE MACRO vss_search_memory(query_vec, limit_count, session_filter, quantization := NULL, rerank := 10) AS TABLE (
+    WITH candidates AS (
+        SELECT q.row_id AS id
+        FROM spec_embedding_quantized q
+        JOIN memory_conversations e ON e.id = q.row_id
+        WHERE quantization = 'binary' AND q.source_table = 'memory_conversations'
+          AND bit_length(q.bits) = (SELECT len(query_vec))
+          AND (session_filter IS NULL OR e.session_id = session_filter)
+        ORDER BY bit_count(xor(q.bits, (SELECT embedding_sign_bits(query_vec))))
+        LIMIT limit_count * rerank
+    ),
+    ann AS (
+        SELECT id FROM vector_ann('memory_conversations', query_vec, limit_count * 4)
+    )
     SELECT
         id, session_id, role, content, importance,
         list_cosine_similarity(embedding, query_vec::FLOAT[]) AS similarity
     FROM memory_conversations
     WHERE (session_filter IS NULL OR session_id = session_filter)
       AND embedding IS NOT NULL
+      AND NOT list_contains(vector_ann_dims('memory_conversations'), len(query_vec))
+      AND CASE WHEN quantization IS NULL THEN TRUE
+           WHEN quantization = 'binary' THEN FALSE
+           ELSE error('quantization must be NULL or ''binary''') END
+    UNION ALL
+    SELECT
+        e.id, e.session_id, e.role, e.content, e.importance,
+        list_cosine_similarity(e.embedding, query_vec::FLOAT[])
+    FROM memory_conversations e
+    JOIN ann a ON a.id = e.id
+    WHERE (session_filter IS NULL OR e.session_id = session_filter)
+      AND CASE WHEN quantization IS NULL THEN TRUE
+           WHEN quantization = 'binary' THEN FALSE
+           ELSE error('quantization must be NULL or ''binary''') END
+    UNION ALL
+    SELECT
+        e.id, e.session_id, e.role, e.content, e.importance,
+        list_cosine_similarity(e.embedding, query_vec::FLOAT[])
+    FROM memory_conversations e
+    JOIN candidates c ON c.id = e.id
+    ORDER BY similarity DESC
+    LIMIT limit_count
+);
+
+-- Search every knowledge base at once: the top limit_count rows of each source,
+-- merged by similarity. provenance holds the source's identifying columns.
+-- Usage: SELECT * FROM knowledge_search(query_embedding, 10);
+CREATE OR REPLACE MACRO knowledge_search(query_vec, limit_count) AS TABLE (
+    SELECT * FROM (
+        (SELECT 'spec_embeddings' AS source, NULL::VARCHAR AS org, id, content,
+                list_cosine_similarity(embedding, query_vec::FLOAT[]) AS similarity,
+                json_object('spec_id', spec_id, 'content_type', content_type,
+                            'chunk_index', chunk_index, 'embedding_model', embedding_model) AS provenance
+         FROM spec_embeddings
+         WHERE embedding IS NOT NULL AND len(embedding) = len(query_vec)
+         ORDER BY similarity DESC LIMIT limit_count)
+        UNION ALL
+        (SELECT 'knowledge_dev', 'dev', id, content,
+                list_cosine_similarity(embedding, query_vec::FLOAT[]),
+                json_object('repo', repo, 'file_path', file_path, 'language', language,
+                            'symbol_name', symbol_name)
+         FROM knowledge_dev
+         WHERE embedding IS NOT NULL AND len(embedding) = len(query_vec)
+         ORDER BY 5 DESC LIMIT limit_count)
+        UNION ALL
+        (SELECT 'knowledge_research', 'research', id, content,
+                list_cosine_similarity(embedding, query_vec::FLOAT[]),
+                json_object('query', query, 'source_url', source_url, 'source_title', source_title)
+         FROM knowledge_research
+         WHERE embedding IS NOT NULL AND len(embedding) = len(query_vec)
+         ORDER BY 5 DESC LIMIT limit_count)
+        UNION ALL
+        (SELECT 'knowledge_studio', 'studio', id, content,
+                list_cosine_similarity(embedding, query_vec::FLOAT[]),
+                json_object('project', project, 'decision_type', decision_type, 'title', title)
+         FROM knowledge_studio
+         WHERE embedding IS NOT NULL AND len(embedding) = len(query_vec)
+         ORDER BY 5 DESC LIMIT limit_count)
+        UNION ALL
+        (SELECT 'knowledge_ops', 'ops', id, content,
+                list_cosine_similarity(embedding, query_vec::FLOAT[]),
+                json_object('pipeline', pipeline, 'run_id', run_id, 'status', status)
+         FROM knowledge_ops
+         WHERE embedding IS NOT NULL AND len(embedding) = len(query_vec)
+         ORDER BY 5 DESC LIMIT limit_count)
+        UNION ALL
+        (SELECT 'memory_conversations', NULL, id, content,
+                list_cosine_similarity(embedding, query_vec::FLOAT[]),
+                json_object('session_id', session_id, 'role', role, 'importance', importance)
+         FROM memory_conversations
+         WHERE embedding IS NOT NULL AND len(embedding) = len(query_vec)
+         ORDER BY 5 DESC LIMIT limit_count)
+    )
     ORDER BY similarity DESC
     LIMIT limit_count
 );
@@ -96,7 +380,50 @@ CREATE OR REPLACE MACRO vss_search_memory(query_vec, limit_count, session_filter
 -- B) Hybrid Search Macros (VSS + FTS)
 -- ============================================================================
 
--- Hybrid search combining keyword match with vector similarity
+-- Ids of spec_embeddings rows containing text_query (case-insensitive). ILIKE
+-- decides; when spec_trigram_coverage shows the spec_trigrams postings were
+-- reconciled against the current table (same row count, id sum, highest id and
+-- latest updated_at), only rows holding every trigram of text_query are
+-- checked. Otherwise, and for queries shorter than three characters, the table
+-- is scanned, so rows written with plain SQL are always found.
+-- Usage: SELECT * FROM embedding_keyword_matches('duckdb');
+CREATE OR REPLACE MACRO embedding_keyword_matches(text_query) AS TABLE (
+    WITH query_grams AS (
+        SELECT list_distinct([substr(lower(text_query), i, 3)
+                              FOR i IN range(1, length(text_query) - 1)]) AS grams
+    ),
+    coverage AS (
+        SELECT length(text_query) >= 3
+               AND (SELECT fingerprint FROM spec_trigram_coverage
+                    WHERE source = 'spec_embeddings')
+                   IS NOT DISTINCT FROM
+                   (SELECT concat_ws(':', count(*), coalesce(sum(id), 0), max(id),
+                                     max(updated_at)::VARCHAR)
+                    FROM spec_embeddings) AS use_postings
+    ),
+    posted AS (
+        SELECT CAST(row_key AS INTEGER) AS id
+        FROM spec_trigrams
+        WHERE source = 'spec_embeddings'
+          AND trigram IN (SELECT unnest(grams) FROM query_grams)
+          AND (SELECT use_postings FROM coverage)
+        GROUP BY row_key
+        HAVING count(DISTINCT trigram) = (SELECT len(grams) FROM query_grams)
+    )
+    SELECT e.id
+    FROM spec_embeddings e
+    WHERE (SELECT use_postings FROM coverage) AND e.id IN (SELECT id FROM posted)
+      AND e.content ILIKE '%' || text_query || '%'
+    UNION ALL
+    SELECT id
+    FROM spec_embeddings
+    WHERE NOT (SELECT use_postings FROM coverage) AND content ILIKE '%' || text_query || '%'
+);
+
+-- Hybrid search combining keyword match with vector similarity. Only keyword
+-- matches and the vss_search_* top limit_count can reach the top limit_count
+-- (a row ranked lower by vector alone is beaten by limit_count rows), so just
+-- those are scored.
 -- Usage: SELECT * FROM hybrid_search_embeddings(query_text, query_embedding, 10, 'doc');
 CREATE OR REPLACE MACRO hybrid_search_embeddings(
     text_query,
@@ -106,17 +433,15 @@ CREATE OR REPLACE MACRO hybrid_search_embeddings(
 ) AS TABLE (
     WITH keyword_matches AS (
         SELECT id, 1.0 AS keyword_score
-        FROM spec_embeddings
-        WHERE content_type = content_type_filter
-          AND content ILIKE '%' || text_query || '%'
+        FROM embedding_keyword_matches(text_query)
     ),
     vector_matches AS (
-        SELECT
-            id,
-            list_cosine_similarity(embedding, query_vec::FLOAT[]) AS vector_score
-        FROM spec_embeddings
-        WHERE content_type = content_type_filter
-          AND embedding IS NOT NULL
+        SELECT id FROM vss_search_embeddings(query_vec, limit_count, content_type_filter)
+    ),
+    matched AS (
+        SELECT id FROM keyword_matches
+        UNION
+        SELECT id FROM vector_matches
     )
     SELECT
         e.id, e.spec_id, e.org_id, e.content_type,
@@ -124,11 +449,16 @@ CREATE OR REPLACE MACRO hybrid_search_embeddings(
         COALESCE(kw.keyword_score, 0) AS keyword_score,
         COALESCE(v.vector_score, 0) AS vector_score,
         (COALESCE(kw.keyword_score, 0) * 0.3 + COALESCE(v.vector_score, 0) * 0.7) AS hybrid_score
-    FROM spec_embeddings e
+    FROM matched m
+    JOIN spec_embeddings e ON e.id = m.id
     LEFT JOIN keyword_matches kw ON kw.id = e.id
-    LEFT JOIN vector_matches v ON v.id = e.id
+    LEFT JOIN (
+        SELECT id, list_cosine_similarity(embedding, query_vec::FLOAT[]) AS vector_score
+        FROM spec_embeddings
+        WHERE id IN (SELECT id FROM matched)
+          AND embedding IS NOT NULL AND len(embedding) = len(query_vec)
+    ) v ON v.id = e.id
     WHERE e.content_type = content_type_filter
-      AND (kw.id IS NOT NULL OR v.id IS NOT NULL)
     ORDER BY hybrid_score DESC
     LIMIT limit_count
 );
@@ -137,16 +467,16 @@ CREATE OR REPLACE MACRO hybrid_search_embeddings(
 -- Usage: SELECT * FROM hybrid_search_all(query_text, query_embedding, 20);
 CREATE OR REPLACE MACRO hybrid_search_all(text_query, query_vec, limit_count) AS TABLE (
     WITH keyword_matches AS (
-        SELECT id, 'embeddings' as source, 1.0 AS keyword_score
-        FROM spec_embeddings
-        WHERE content ILIKE '%' || text_query || '%'
+        SELECT id, 1.0 AS keyword_score
+        FROM embedding_keyword_matches(text_query)
     ),
     vector_matches AS (
-        SELECT
-            id, 'embeddings' as source,
-            list_cosine_similarity(embedding, query_vec::FLOAT[]) AS vector_score
-        FROM spec_embeddings
-        WHERE embedding IS NOT NULL
+        SELECT id FROM vss_search_all(query_vec, limit_count)
+    ),
+    matched AS (
+        SELECT id FROM keyword_matches
+        UNION
+        SELECT id FROM vector_matches
     )
     SELECT
         e.id, e.content_type as source_type,
@@ -154,14 +484,71 @@ CREATE OR REPLACE MACRO hybrid_search_all(text_query, query_vec, limit_count) AS
         COALESCE(kw.keyword_score, 0) AS keyword_score,
         COALESCE(v.vector_score, 0) AS vector_score,
         (COALESCE(kw.keyword_score, 0) * 0.3 + COALESCE(v.vector_score, 0) * 0.7) AS hybrid_score
-    FROM spec_embeddings e
+    FROM matched m
+    JOIN spec_embeddings e ON e.id = m.id
     LEFT JOIN keyword_matches kw ON kw.id = e.id
-    LEFT JOIN vector_matches v ON v.id = e.id
-    WHERE kw.id IS NOT NULL OR v.id IS NOT NULL
+    LEFT JOIN (
+        SELECT id, list_cosine_similarity(embedding, query_vec::FLOAT[]) AS vector_score
+        FROM spec_embeddings
+        WHERE id IN (SELECT id FROM matched)
+          AND embedding IS NOT NULL AND len(embedding) = len(query_vec)
+    ) v ON v.id = e.id
     ORDER BY hybrid_score DESC
     LIMIT limit_count
 );
 
+-- Reciprocal rank fusion of the top `candidates` keyword matches (ranked by
+-- occurrences of text_query, see embedding_keyword_matches()) and the top
+-- `candidates` vector matches (see vss_search_all()); only the fused top rows
+-- are joined back. SpecEngine.rrf_search() adds BM25.
+-- Usage: SELECT * FROM rrf_search_embeddings(query_text, query_embedding, 10, rrf_k := 60);
+CREATE OR REPLACE MACRO rrf_search_embeddings(
+    text_query,
+    query_vec,
+    limit_count,
+    rrf_k := 60,
+    keyword_weight := 1.0,
+    vector_weight := 1.0,
+    candidates := 50
+) AS TABLE (
+    WITH keyword_ranked AS (
+        SELECT id, row_number() OVER (ORDER BY hits DESC, id) AS keyword_rank
+        FROM (
+            SELECT e.id,
+                   (length(e.content)
+                       - length(replace(lower(e.content), lower(text_query), '')))
+                       // greatest(length(text_query), 1) AS hits
+            FROM spec_embeddings e
+            WHERE e.id IN (SELECT id FROM embedding_keyword_matches(text_query))
+            ORDER BY hits DESC, id
+            LIMIT candidates
+        )
+    ),
+    vector_ranked AS (
+        SELECT id, row_number() OVER (ORDER BY similarity DESC, id) AS vector_rank
+        FROM vss_search_all(query_vec, candidates)
+    ),
+    fused AS (
+        SELECT
+            COALESCE(kw.id, v.id) AS id,
+            kw.keyword_rank,
+            v.vector_rank,
+            COALESCE(keyword_weight / (rrf_k + kw.keyword_rank), 0)
+                + COALESCE(vector_weight / (rrf_k + v.vector_rank), 0) AS rrf_score
+        FROM keyword_ranked kw
+        FULL OUTER JOIN vector_ranked v ON v.id = kw.id
+        ORDER BY rrf_score DESC, id
+        LIMIT limit_count
+    )
+    SELECT
+        e.id, e.spec_id, e.org_id, e.content_type,
+        e.content, e.metadata,
+        f.keyword_rank, f.vector_rank, f.rrf_score
+    FROM fused f
+    JOIN spec_embeddings e ON e.id = f.id
+    ORDER BY f.rrf_score DESC, e.id
+);
+
 -- ============================================================================
 -- C) Context Building Macros (for RAG prompts)
 -- ============================================================================
@@ -199,15 +586,20 @@ CREATE OR REPLACE MACRO rag_relevant_specs(query_vec, limit_count) AS TABLE (
 -- D) Memory Management Macros
 -- ============================================================================
 
--- Get recent conversation context with importance weighting
+-- Get conversation context ranked by decayed importance (halving every 24h, the
+-- MEMORY_HALF_LIFE of SpecEngine); turns folded into a summary row are skipped.
+-- SpecEngine.get_conversation_context() adds the recent window and relevance.
 -- Usage: SELECT * FROM get_conversation_context('session-123', 10);
 CREATE OR REPLACE MACRO get_conversation_context(session_id_val, limit_count) AS TABLE (
     SELECT
         role, content, importance, created_at
     FROM memory_conversations
-    WHERE session_id = session_id_val
+    WHERE session_id = session_id_val AND compacted_into IS NULL
     ORDER BY
-        importance DESC,
+        COALESCE(
+            decay_key,
+            ln(greatest(COALESCE(importance, 0.5), 1e-6)) + epoch(created_at) * ln(2) / 86400.0
+        ) DESC,
         created_at DESC
     LIMIT limit_count
 );
@@ -231,17 +623,31 @@ CREATE OR REPLACE MACRO find_similar_conversations(query_vec, limit_count) AS TA
 -- E) Knowledge Base Statistics
 -- ============================================================================
 
--- Get embedding coverage stats
+-- Get embedding coverage stats; migrated_pct is the share of vectors of a model
+-- being migrated (see embedding_model_stats()) that already have the new vector.
 -- Usage: SELECT * FROM embedding_coverage();
 CREATE OR REPLACE MACRO embedding_coverage() AS TABLE (
     SELECT
-        content_type,
+        e.content_type,
         COUNT(*) AS total_entries,
-        COUNT(embedding) AS with_embeddings,
-        ROUND(COUNT(embedding) * 100.0 / COUNT(*), 2) AS coverage_pct
-    FROM spec_embeddings
-    GROUP BY content_type
-    ORDER BY content_type
+        COUNT(e.embedding) AS with_embeddings,
+        ROUND(COUNT(e.embedding) * 100.0 / COUNT(*), 2) AS coverage_pct,
+        ROUND(
+            COUNT(s.id) * 100.0 / NULLIF(COUNT(e.embedding) FILTER (WHERE m.to_model IS NOT NULL), 0),
+            2
+        ) AS migrated_pct
+    FROM spec_embeddings e
+    LEFT JOIN (
+        -- One running job per source model (start_embedding_migration() enforces it)
+        SELECT from_model, arg_max(to_model, started_at) AS to_model
+        FROM spec_embedding_migrations
+        WHERE status = 'running'
+        GROUP BY from_model
+    ) m ON m.from_model = e.embedding_model
+    LEFT JOIN spec_embedding_shadow s
+        ON s.id = e.id AND s.model = m.to_model AND s.content_hash = e.content_hash
+    GROUP BY e.content_type
+    ORDER BY e.content_type
 );
 
 -- Get knowledge freshness
@@ -280,16 +686,31 @@ CREATE OR REPLACE MACRO knowledge_freshness() AS TABLE (
 -- F) Embedding / model stats
 -- ============================================================================
 
--- Get embedding model stats
+-- Get embedding model stats, with the progress of a running migration away from
+-- each model (SpecEngine.start_embedding_migration()).
 -- Usage: SELECT * FROM embedding_model_stats();
 CREATE OR REPLACE MACRO embedding_model_stats() AS TABLE (
     SELECT
-        embedding_model,
+        e.embedding_model,
         COUNT(*) AS embeddings_count,
-        MIN(created_at) AS first_used,
-        MAX(created_at) AS last_used
-    FROM spec_embeddings
-    WHERE embedding IS NOT NULL
-    GROUP BY embedding_model
+        MIN(e.created_at) AS first_used,
+        MAX(e.created_at) AS last_used,
+        any_value(m.to_model) AS migrating_to,
+        COUNT(s.id) AS migrated,
+        CASE WHEN any_value(m.to_model) IS NOT NULL
+            THEN ROUND(COUNT(s.id) * 100.0 / COUNT(*), 2)
+        END AS migrated_pct
+    FROM spec_embeddings e
+    LEFT JOIN (
+        -- One running job per source model (start_embedding_migration() enforces it)
+        SELECT from_model, arg_max(to_model, started_at) AS to_model
+        FROM spec_embedding_migrations
+        WHERE status = 'running'
+        GROUP BY from_model
+    ) m ON m.from_model = e.embedding_model
+    LEFT JOIN spec_embedding_shadow s
+        ON s.id = e.id AND s.model = m.to_model AND s.content_hash = e.content_hash
+    WHERE e.embedding IS NOT NULL
+    GROUP BY e.embedding_model
     ORDER BY embeddings_count DESC
 );
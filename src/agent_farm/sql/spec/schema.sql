@@ -14,8 +14,10 @@
 -- Drop existing tables if they exist (clean slate - no backwards compatibility)
 DROP TABLE IF EXISTS spec_learning CASCADE;
 DROP TABLE IF EXISTS spec_adaptations CASCADE;
+DROP TABLE IF EXISTS spec_usage_hourly CASCADE;
 DROP TABLE IF EXISTS spec_feedback CASCADE;
 DROP TABLE IF EXISTS spec_relationships CASCADE;
+DROP TABLE IF EXISTS spec_latest CASCADE;
 DROP TABLE IF EXISTS spec_payloads CASCADE;
 DROP TABLE IF EXISTS spec_docs CASCADE;
 DROP TABLE IF EXISTS spec_objects CASCADE;
@@ -73,6 +75,54 @@ CREATE TABLE spec_payloads (
     created_at  TIMESTAMP DEFAULT current_timestamp
 );
 
+-- Latest version per (kind, name) in semver order (1.10.0 > 1.9.0, releases
+-- above pre-releases). Maintained by SpecEngine on write; lookups join on it
+-- instead of sorting spec_objects.version.
+CREATE TABLE spec_latest (
+    kind        VARCHAR NOT NULL,
+    name        VARCHAR NOT NULL,
+    latest_id   INTEGER NOT NULL,   -- Highest version, any status
+    active_id   INTEGER,            -- Highest version with status = 'active'
+    PRIMARY KEY (kind, name)
+);
+
+-- ============================================================================
+-- Change Feed (CDC)
+-- ============================================================================
+
+-- Append-only log of spec mutations written by SpecEngine in the same
+-- transaction as the change, and mirrored to lake.spec_changes after commit.
+-- Not dropped above: the log and subscriber offsets outlive a schema reload.
+-- The reload itself is logged as one 'reseed' row with no spec columns: spec
+-- ids restart with the seed data, so consumers must drop what they derived.
+CREATE TABLE IF NOT EXISTS spec_changes (
+    seq         BIGINT PRIMARY KEY, -- From spec_changes_seq; monotonic per database
+    spec_id     INTEGER,
+    kind        VARCHAR,
+    name        VARCHAR,
+    version     VARCHAR,
+    op          VARCHAR NOT NULL,   -- 'insert', 'update', 'delete', 'reseed'
+    changed_at  TIMESTAMP DEFAULT current_timestamp
+);
+
+-- Random identifier of this database's change log, created once. It names the
+-- log in lake.spec_changes, so a recreated database file or a new in-memory
+-- database never reuses the (origin, seq) pairs of an earlier one.
+CREATE TABLE IF NOT EXISTS spec_change_log (
+    id          INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    log_id      UUID NOT NULL DEFAULT uuid()
+);
+INSERT OR IGNORE INTO spec_change_log (id) VALUES (1);
+
+-- Last sequence number a subscriber has processed, per origin database
+CREATE TABLE IF NOT EXISTS spec_change_offsets (
+    subscriber  VARCHAR NOT NULL,
+    origin      VARCHAR NOT NULL,
+    last_seq    BIGINT NOT NULL,
+    updated_at  TIMESTAMP DEFAULT current_timestamp,
+    PRIMARY KEY (subscriber, origin)
+);
+
 -- ============================================================================
 -- Relationship Tracking (Links between specs)
 -- ============================================================================
@@ -105,6 +155,20 @@ CREATE TABLE spec_feedback (
     created_at  TIMESTAMP DEFAULT current_timestamp
 );
 
+-- Hourly usage/feedback rollup, written in batches by SpecEngine.flush_usage()
+CREATE TABLE spec_usage_hourly (
+    spec_id          INTEGER NOT NULL,
+    bucket           TIMESTAMP NOT NULL,  -- Start of the hour
+    uses             INTEGER DEFAULT 0,   -- record_usage()/record_feedback() calls
+    successes        INTEGER DEFAULT 0,   -- ... of which were successful
+    feedback_count   INTEGER DEFAULT 0,
+    success_feedback INTEGER DEFAULT 0,   -- feedback_type = 'success'
+    failure_feedback INTEGER DEFAULT 0,   -- feedback_type = 'failure'
+    score_sum        DOUBLE DEFAULT 0.0,
+    scored_count     INTEGER DEFAULT 0,   -- Feedback rows with a non-NULL score
+    PRIMARY KEY (spec_id, bucket)
+);
+
 -- Track adaptations/improvements made to specs
 CREATE TABLE spec_adaptations (
     id              INTEGER PRIMARY KEY,
@@ -375,12 +439,12 @@ SELECT
     o.id, o.kind, o.name, o.version,
     o.use_count,
     o.success_rate,
-    COUNT(f.id) AS feedback_count,
-    AVG(f.score) AS avg_feedback_score,
-    COUNT(f.id) FILTER (WHERE f.feedback_type = 'success') AS success_count,
-    COUNT(f.id) FILTER (WHERE f.feedback_type = 'failure') AS failure_count
+    COALESCE(SUM(h.feedback_count), 0) AS feedback_count,
+    SUM(h.score_sum) / NULLIF(SUM(h.scored_count), 0) AS avg_feedback_score,
+    COALESCE(SUM(h.success_feedback), 0) AS success_count,
+    COALESCE(SUM(h.failure_feedback), 0) AS failure_count
 FROM spec_objects o
-LEFT JOIN spec_feedback f ON f.spec_id = o.id
+LEFT JOIN spec_usage_hourly h ON h.spec_id = o.id
 GROUP BY o.id, o.kind, o.name, o.version, o.use_count, o.success_rate
 ORDER BY o.use_count DESC;
 
@@ -430,3 +494,4 @@ CREATE SEQUENCE IF NOT EXISTS spec_relationships_seq START 1;
 CREATE SEQUENCE IF NOT EXISTS spec_feedback_seq START 1;
 CREATE SEQUENCE IF NOT EXISTS spec_adaptations_seq START 1;
 CREATE SEQUENCE IF NOT EXISTS spec_learning_seq START 1;
+CREATE SEQUENCE IF NOT EXISTS spec_changes_seq START 1;
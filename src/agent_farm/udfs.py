@@ -9,27 +9,69 @@ Usage:
     register_udfs(con)  # Register UDFs in DuckDB connection
 """
 
+import functools
+import hashlib
+import http.client
 import json
 import os
+import random
+import threading
 import time
-import urllib.request
+import urllib.parse
+from collections import OrderedDict
+from collections.abc import Iterator
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any
 from uuid import uuid4
 
 import duckdb
 
+# Request timeout (seconds) and SDK retry count for Claude calls; overridable
+# with ANTHROPIC_TIMEOUT and ANTHROPIC_MAX_RETRIES.
+ANTHROPIC_TIMEOUT = 600.0
+ANTHROPIC_MAX_RETRIES = 2
+
+_anthropic_client = None
+_anthropic_client_key: tuple | None = None
+_anthropic_lock = threading.Lock()
+
 
 def _get_anthropic_client():
-    """Get Anthropic client if available."""
-    try:
-        import anthropic
+    """
+    Get the process-wide Anthropic client if available.
 
-        return anthropic.Anthropic()
-    except ImportError:
-        return None
-    except Exception:
-        return None
+    The client is thread-safe and keeps its HTTP connections alive, so it is
+    created once and shared; it is rebuilt only when the API key, base URL,
+    timeout or retry settings in the environment change.
+    """
+    key = (
+        os.getenv("ANTHROPIC_API_KEY"),
+        os.getenv("ANTHROPIC_BASE_URL"),
+        _env_number("ANTHROPIC_TIMEOUT", ANTHROPIC_TIMEOUT),
+        _env_number("ANTHROPIC_MAX_RETRIES", ANTHROPIC_MAX_RETRIES),
+    )
+    global _anthropic_client, _anthropic_client_key
+    with _anthropic_lock:
+        if _anthropic_client is not None and _anthropic_client_key == key:
+            return _anthropic_client
+        try:
+            import anthropic
+
+            client = anthropic.Anthropic(timeout=key[2], max_retries=key[3])
+        except ImportError:
+            return None
+        except Exception:
+            return None
+        _anthropic_client, _anthropic_client_key = client, key
+        return client
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return type(default)(os.environ[name])
+    except (KeyError, ValueError):
+        return default
 
 
 def _utc_now_iso() -> str:
@@ -70,36 +112,762 @@ def _prepare_messages(messages: list[dict], system_prompt: str | None = None) ->
     return prepared
 
 
-def _get_ollama_response(model: str, messages: list, tools: list | None = None) -> dict:
-    """Call Ollama API directly."""
-    base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-    url = f"{base_url}/api/chat"
+# ---------------------------------------------------------------------------
+# Ollama HTTP (keep-alive connection pool)
+# ---------------------------------------------------------------------------
+
+# Per OLLAMA_BASE_URL: at most OLLAMA_MAX_CONNECTIONS sockets (callers beyond it
+# wait), connect/read timeouts in seconds, and OLLAMA_RETRIES retries of failed
+# connects and 502/503/504 responses with jittered exponential backoff. Each
+# can be overridden by the environment variable of the same name. A request that
+# fails after it was sent (e.g. a read timeout) is only retried for idempotent
+# endpoints; chat/generate calls raise instead of being run twice.
+OLLAMA_DEFAULT_URL = "http://localhost:11434"
+OLLAMA_MAX_CONNECTIONS = 8
+OLLAMA_CONNECT_TIMEOUT = 10.0
+OLLAMA_READ_TIMEOUT = 120.0
+OLLAMA_RETRIES = 2
+OLLAMA_RETRY_BACKOFF = 0.25
+_RETRY_STATUSES = frozenset({502, 503, 504})
+_IDEMPOTENT_PATHS = frozenset({"/api/embed", "/api/embeddings"})
+# How a keep-alive socket the server closed while idle fails before any response
+_STALE_SOCKET_ERRORS = (BrokenPipeError, ConnectionResetError, ConnectionAbortedError)
+
+
+class _OllamaPool:
+    """
+    Thread-safe pool of keep-alive HTTP connections to one Ollama server.
+
+    Idle connections are reused LIFO; a reused socket the server has meanwhile
+    closed is replaced at once without counting as a retry.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        max_connections: int,
+        connect_timeout: float,
+        read_timeout: float,
+        retries: int,
+    ):
+        parts = urllib.parse.urlsplit(base_url)
+        self.base_url = base_url
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port
+        self.prefix = parts.path.rstrip("/")
+        self.max_connections = max(1, max_connections)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = max(0, retries)
+        self._idle: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self.stats = {"requests": 0, "opened": 0, "reused": 0, "retries": 0, "failures": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def _connection(self) -> tuple[http.client.HTTPConnection, bool]:
+        """An idle connection (reused=True) or a new one; the caller holds a slot."""
+        with self._lock:
+            if self._idle:
+                self.stats["reused"] += 1
+                return self._idle.pop(), True
+            self.stats["opened"] += 1
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        conn = cls(self.host, self.port, timeout=self.connect_timeout)
+        conn.connect()
+        conn.sock.settimeout(self.read_timeout)
+        return conn, False
+
+    def _release(self, conn: http.client.HTTPConnection, reusable: bool) -> None:
+        if reusable:
+            with self._lock:
+                self._idle.append(conn)
+        else:
+            conn.close()
+        self._slots.release()
+
+    def _open(self, path: str, payload: dict) -> tuple[http.client.HTTPConnection, Any]:
+        """POST payload and return (connection, response) once the status is final."""
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        self._count("requests")
+        attempt = 0
+        while True:
+            self._slots.acquire()
+            conn = None
+            reused = False
+            try:
+                conn, reused = self._connection()
+                conn.request("POST", self.prefix + path, body, headers)
+                resp = conn.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                if conn is None:
+                    self._slots.release()
+                else:
+                    self._release(conn, False)
+                if reused and isinstance(e, _STALE_SOCKET_ERRORS):
+                    continue  # closed while idle, nothing was answered: use a fresh one
+                error: Exception = e
+                if conn is not None and path not in _IDEMPOTENT_PATHS:
+                    self._count("failures")
+                    raise  # the server may already be running the request
+            else:
+                if resp.status not in _RETRY_STATUSES:
+                    return conn, resp
+                resp.read()
+                self._release(conn, not resp.will_close)
+                error = RuntimeError(f"HTTP {resp.status} {resp.reason}")
+            if attempt >= self.retries:
+                self._count("failures")
+                raise error
+            attempt += 1
+            self._count("retries")
+            time.sleep(OLLAMA_RETRY_BACKOFF * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+    def post(self, path: str, payload: dict) -> dict:
+        """POST a JSON payload and decode the JSON response."""
+        conn, resp = self._open(path, payload)
+        try:
+            data = resp.read()
+        except BaseException:
+            self._release(conn, False)
+            raise
+        self._release(conn, not resp.will_close)
+        if resp.status >= 400:
+            raise RuntimeError(f"HTTP {resp.status}: {data[:200].decode('utf-8', 'replace')}")
+        return json.loads(data.decode("utf-8"))
+
+    def stream(self, path: str, payload: dict) -> Iterator[dict]:
+        """POST a JSON payload and yield each JSON line of a streamed response."""
+        conn, resp = self._open(path, payload)
+        finished = False
+        try:
+            if resp.status >= 400:
+                data = resp.read()
+                finished = True
+                raise RuntimeError(
+                    f"HTTP {resp.status}: {data[:200].decode('utf-8', 'replace')}"
+                )
+            for raw_line in resp:
+                line = raw_line.decode("utf-8").strip()
+                if line:
+                    yield json.loads(line)
+            resp.read()  # marks the response closed so the connection can be reused
+            finished = True
+        finally:
+            # A stream abandoned half-way leaves unread data on the socket
+            self._release(conn, finished and not resp.will_close)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["idle"] = len(self._idle)
+        stats["max_connections"] = self.max_connections
+        stats["reuse_ratio"] = round(stats["reused"] / max(stats["reused"] + stats["opened"], 1), 3)
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_ollama_pools: dict[str, _OllamaPool] = {}
+_ollama_pools_lock = threading.Lock()
+
+
+def ollama_pool(base_url: str | None = None) -> _OllamaPool:
+    """The shared connection pool for base_url (default: OLLAMA_BASE_URL)."""
+    base_url = (base_url or os.getenv("OLLAMA_BASE_URL") or OLLAMA_DEFAULT_URL).rstrip("/")
+    with _ollama_pools_lock:
+        pool = _ollama_pools.get(base_url)
+        if pool is None:
+            pool = _ollama_pools[base_url] = _OllamaPool(
+                base_url,
+                _env_number("OLLAMA_MAX_CONNECTIONS", OLLAMA_MAX_CONNECTIONS),
+                _env_number("OLLAMA_CONNECT_TIMEOUT", OLLAMA_CONNECT_TIMEOUT),
+                _env_number("OLLAMA_READ_TIMEOUT", OLLAMA_READ_TIMEOUT),
+                _env_number("OLLAMA_RETRIES", OLLAMA_RETRIES),
+            )
+        return pool
+
 
+def ollama_pool_stats() -> dict:
+    """
+    Counters of every Ollama pool, by base URL.
+
+    requests counts calls; opened and reused count connections handed out, so
+    reuse_ratio is the share of requests that skipped TCP/TLS setup.
+    """
+    with _ollama_pools_lock:
+        pools = list(_ollama_pools.values())
+    return {pool.base_url: pool.snapshot() for pool in pools}
+
+
+def close_ollama_pools() -> None:
+    """Close all idle connections and forget the pools (settings are re-read)."""
+    with _ollama_pools_lock:
+        pools = list(_ollama_pools.values())
+        _ollama_pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def _get_ollama_response(
+    model: str, messages: list, tools: list | None = None, options: dict | None = None
+) -> dict:
+    """Call Ollama API directly."""
     payload = {"model": model, "messages": messages, "stream": False}
     if tools:
         payload["tools"] = tools
-
-    data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(
-        url, data=data, headers={"Content-Type": "application/json"}, method="POST"
-    )
+    if options:
+        payload["options"] = options
 
     try:
-        with urllib.request.urlopen(req, timeout=120) as resp:
-            return json.loads(resp.read().decode("utf-8"))
+        return ollama_pool().post("/api/chat", payload)
     except Exception as e:
         return {"error": str(e)}
 
 
+def ollama_embed_batch(model: str, texts: list[str]) -> list[list[float]]:
+    """
+    Embed several texts with one call to Ollama's multi-input /api/embed endpoint.
+
+    Raises:
+        RuntimeError: If the request fails or returns a different number of vectors
+    """
+    try:
+        body = ollama_pool().post("/api/embed", {"model": model, "input": texts})
+    except Exception as e:
+        raise RuntimeError(f"Ollama /api/embed failed: {e}") from e
+
+    embeddings = body.get("embeddings") or []
+    if len(embeddings) != len(texts):
+        raise RuntimeError(
+            f"Ollama /api/embed returned {len(embeddings)} vectors for {len(texts)} inputs"
+        )
+    return embeddings
+
+
+# ---------------------------------------------------------------------------
+# Embedding cache (in-process LRU in front of the embedding_cache table)
+# ---------------------------------------------------------------------------
+
+# Vectors kept in memory per process; (model, content_hash) -> vector is the same
+# for every database, so one LRU is shared by all connections.
+EMBEDDING_LRU_SIZE = 4096
+# Rows kept in the embedding_cache table; least recently used rows are evicted
+# once it grows past this, checked every EMBEDDING_CACHE_EVICT_EVERY new rows.
+EMBEDDING_CACHE_MAX_ROWS = 200_000
+EMBEDDING_CACHE_EVICT_EVERY = 1000
+
+_embedding_lru: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+_embedding_lock = threading.Lock()
+_embedding_stats = {"lru_hits": 0, "table_hits": 0, "misses": 0, "puts": 0}
+# Table hits not yet written to embedding_cache.hits. Lookups run inside queries
+# (embed_cached), where updating the same row twice is a write-write conflict,
+# so hits are counted here and written by flush_embedding_hits().
+_embedding_hits: dict[tuple[str, str], int] = {}
+
+
+def content_hash(text: str) -> str:
+    """SHA256 hex digest of text, the key of embedding_cache rows."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _lru_put(key: tuple[str, str], vector: list[float]) -> None:
+    _embedding_lru[key] = vector
+    _embedding_lru.move_to_end(key)
+    while len(_embedding_lru) > EMBEDDING_LRU_SIZE:
+        _embedding_lru.popitem(last=False)
+
+
+def embedding_cache_get(
+    con: duckdb.DuckDBPyConnection | None, model: str, text_hash: str
+) -> list[float] | None:
+    """
+    Look up a cached vector: LRU first, then the embedding_cache table (if any).
+
+    The lookup only reads; table hits are buffered until flush_embedding_hits().
+    """
+    key = (model, text_hash)
+    with _embedding_lock:
+        vector = _embedding_lru.get(key)
+        if vector is not None:
+            _embedding_lru.move_to_end(key)
+            _embedding_stats["lru_hits"] += 1
+            return vector
+    row = None
+    if con is not None:
+        try:
+            row = con.execute(
+                "SELECT embedding FROM embedding_cache WHERE model = ? AND content_hash = ?",
+                [model, text_hash],
+            ).fetchone()
+        except duckdb.Error:
+            row = None
+    with _embedding_lock:
+        if row is None:
+            _embedding_stats["misses"] += 1
+            return None
+        vector = list(row[0])
+        _embedding_stats["table_hits"] += 1
+        _embedding_hits[key] = _embedding_hits.get(key, 0) + 1
+        _lru_put(key, vector)
+    return vector
+
+
+def flush_embedding_hits(con: duckdb.DuckDBPyConnection) -> int:
+    """
+    Write buffered table hits to embedding_cache.hits and last_used_at.
+
+    Must not run inside a query that reads the cache (the embed_cached UDF);
+    embedding_cache_stats(), SpecEngine.evict_embedding_cache() and
+    SpecEngine.close() call it. Returns the number of rows updated.
+    """
+    with _embedding_lock:
+        pending = dict(_embedding_hits)
+        _embedding_hits.clear()
+    if not pending:
+        return 0
+    keys = list(pending)
+    try:
+        con.execute(
+            """
+            UPDATE embedding_cache AS c
+            SET hits = c.hits + p.n, last_used_at = now()
+            FROM (
+                SELECT unnest(?::VARCHAR[]) AS model,
+                       unnest(?::VARCHAR[]) AS content_hash,
+                       unnest(?::BIGINT[]) AS n
+            ) AS p
+            WHERE c.model = p.model AND c.content_hash = p.content_hash
+            """,
+            [[k[0] for k in keys], [k[1] for k in keys], [pending[k] for k in keys]],
+        )
+    except duckdb.Error:
+        with _embedding_lock:
+            for key, n in pending.items():
+                _embedding_hits[key] = _embedding_hits.get(key, 0) + n
+        return 0
+    return len(keys)
+
+
+def embedding_cache_put(
+    con: duckdb.DuckDBPyConnection | None, model: str, text_hash: str, vector: list[float]
+) -> None:
+    """Store a vector in the LRU and the embedding_cache table (if any)."""
+    vector = [float(x) for x in vector]
+    with _embedding_lock:
+        _lru_put((model, text_hash), vector)
+        _embedding_stats["puts"] += 1
+        evict = _embedding_stats["puts"] % EMBEDDING_CACHE_EVICT_EVERY == 0
+    if con is None:
+        return
+    try:
+        con.execute(
+            "INSERT INTO embedding_cache (model, content_hash, embedding) VALUES (?, ?, ?) "
+            "ON CONFLICT (model, content_hash) DO UPDATE SET "
+            "embedding = excluded.embedding, last_used_at = now()",
+            [model, text_hash, vector],
+        )
+    except duckdb.Error:
+        return
+    if evict:
+        evict_embedding_cache(con)
+
+
+def evict_embedding_cache(con: duckdb.DuckDBPyConnection, max_rows: int | None = None) -> int:
+    """Delete the least recently used embedding_cache rows beyond max_rows."""
+    max_rows = EMBEDDING_CACHE_MAX_ROWS if max_rows is None else max_rows
+    row = con.execute(
+        """
+        DELETE FROM embedding_cache WHERE (model, content_hash) IN (
+            SELECT (model, content_hash) FROM embedding_cache
+            ORDER BY last_used_at DESC, hits DESC OFFSET ?
+        ) RETURNING 1
+        """,
+        [max_rows],
+    ).fetchall()
+    return len(row)
+
+
+def cached_embed(con: duckdb.DuckDBPyConnection | None, model: str, text: str) -> list[float]:
+    """Embed one text, asking Ollama only when neither cache layer has the vector."""
+    text_hash = content_hash(text)
+    vector = embedding_cache_get(con, model, text_hash)
+    if vector is None:
+        vector = ollama_embed_batch(model, [text])[0]
+        embedding_cache_put(con, model, text_hash, vector)
+    return vector
+
+
+def embedding_cache_stats(con: duckdb.DuckDBPyConnection | None = None) -> dict:
+    """
+    Hit counters of the embedding cache.
+
+    lru_hits/table_hits/misses count lookups in this process; saved_calls is the
+    number of Ollama round-trips they avoided. With a connection, the table's
+    entries and lifetime hits (all processes) are added.
+    """
+    with _embedding_lock:
+        stats = dict(_embedding_stats)
+        stats["lru_entries"] = len(_embedding_lru)
+    stats["saved_calls"] = stats["lru_hits"] + stats["table_hits"]
+    if con is not None:
+        flush_embedding_hits(con)
+        try:
+            entries, hits = con.execute(
+                "SELECT count(*), coalesce(sum(hits), 0) FROM embedding_cache"
+            ).fetchone()
+            stats["table_entries"] = int(entries)
+            stats["table_lifetime_hits"] = int(hits)
+        except duckdb.Error:
+            pass
+    return stats
+
+
+def clear_embedding_lru() -> None:
+    """Drop the in-process LRU, buffered hits and counters (the table is kept)."""
+    with _embedding_lock:
+        _embedding_lru.clear()
+        _embedding_hits.clear()
+        for name in _embedding_stats:
+            _embedding_stats[name] = 0
+
+
+# ---------------------------------------------------------------------------
+# LLM response cache (opt-in, llm_response_cache table)
+# ---------------------------------------------------------------------------
+
+# Enabled by LLM_RESPONSE_CACHE=1 or chat_with_model(cache=True). Entries expire
+# after LLM_CACHE_TTL seconds; rows beyond LLM_CACHE_MAX_ROWS are evicted least
+# recently used first, checked every LLM_CACHE_EVICT_EVERY new rows. With
+# LLM_CACHE_LAKE=1 and the DuckLake catalog attached, new entries are also
+# appended to lake.llm_response_cache and local misses are looked up there.
+LLM_CACHE_TTL = 7 * 24 * 3600.0
+LLM_CACHE_MAX_ROWS = 50_000
+LLM_CACHE_EVICT_EVERY = 500
+
+_TRUTHY = ("1", "true", "yes", "on")
+
+_llm_cache_con: duckdb.DuckDBPyConnection | None = None
+_llm_cache_lock = threading.Lock()
+_llm_cache_local = threading.local()
+_llm_cache_puts = 0
+_llm_cache_stats: dict[str, dict] = {}
+
+
+def set_llm_cache_connection(con: duckdb.DuckDBPyConnection | None) -> None:
+    """
+    Store cached responses of Python callers through con (a dedicated cursor).
+
+    Only used by chat_with_model() calls that pass no cache_con; None (the
+    default) disables the table for them. UDFs always use the cursor of the
+    connection they were registered on (see register_udfs()).
+    """
+    global _llm_cache_con
+    with _llm_cache_lock:
+        _llm_cache_con = con
+
+
+def _llm_cache_connection(
+    con: duckdb.DuckDBPyConnection | None = None,
+) -> duckdb.DuckDBPyConnection | None:
+    """con if given, else the cursor of the connection running the current UDF, else the default."""
+    if con is not None:
+        return con
+    con = getattr(_llm_cache_local, "con", None)
+    return _llm_cache_con if con is None else con
+
+
+def _with_llm_cache(udf, cache_con: duckdb.DuckDBPyConnection):
+    """Wrap udf so that the chat_with_model() calls it makes cache through cache_con."""
+
+    @functools.wraps(udf)
+    def wrapper(*args):
+        previous = getattr(_llm_cache_local, "con", None)
+        _llm_cache_local.con = cache_con
+        try:
+            return udf(*args)
+        finally:
+            _llm_cache_local.con = previous
+
+    return wrapper
+
+
+def llm_cache_key(
+    model: str, messages: list[dict], tools: list | None = None, temperature: float | None = None
+) -> str:
+    """SHA-256 of the canonical JSON of everything that determines a response."""
+    blob = json.dumps(
+        {"model": model, "messages": messages, "tools": tools or None, "temperature": temperature},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _llm_cache_enabled(cache: bool | None) -> bool:
+    if cache is not None:
+        return cache
+    return os.getenv("LLM_RESPONSE_CACHE", "").lower() in _TRUTHY
+
+
+def _llm_lake_mirror(con: duckdb.DuckDBPyConnection) -> bool:
+    """Whether entries are mirrored to lake.llm_response_cache."""
+    if os.getenv("LLM_CACHE_LAKE", "").lower() not in _TRUTHY:
+        return False
+    try:
+        row = con.execute(
+            "SELECT COUNT(*) FROM duckdb_databases() WHERE database_name = 'lake'"
+        ).fetchone()
+    except duckdb.Error:
+        return False
+    return bool(row and row[0])
+
+
+def llm_cache_get(
+    key: str, model: str, con: duckdb.DuckDBPyConnection | None = None
+) -> dict | None:
+    """
+    Return the unexpired cached response for key, counting the hit or miss for model.
+
+    con defaults to _llm_cache_connection(). The lake.llm_response_cache
+    lookup runs on its own cursor outside the cache lock.
+    """
+    con = _llm_cache_connection(con)
+    row = None
+    if con is not None:
+        with _llm_cache_lock:
+            try:
+                row = con.execute(
+                    "UPDATE llm_response_cache SET hits = hits + 1, last_used_at = now() "
+                    "WHERE cache_key = ? AND expires_at > now() RETURNING response, latency_ms",
+                    [key],
+                ).fetchone()
+            except duckdb.Error:
+                row = None
+        if row is None:
+            row = _llm_lake_get(con, key)
+    with _llm_cache_lock:
+        stats = _llm_cache_stats.setdefault(model, {"hits": 0, "misses": 0, "saved_ms": 0.0})
+        if row is None:
+            stats["misses"] += 1
+            return None
+        stats["hits"] += 1
+        stats["saved_ms"] += row[1] or 0.0
+    return json.loads(row[0])
+
+
+def _llm_lake_get(con: duckdb.DuckDBPyConnection, key: str) -> tuple | None:
+    """Copy the unexpired lake.llm_response_cache entry for key into the local table."""
+    lake = con.cursor()
+    try:
+        if not _llm_lake_mirror(lake):
+            return None
+        row = lake.execute(
+            "SELECT model, response, latency_ms, expires_at FROM lake.llm_response_cache "
+            "WHERE cache_key = ? AND expires_at > now() ORDER BY created_at DESC LIMIT 1",
+            [key],
+        ).fetchone()
+    except duckdb.Error:
+        return None
+    finally:
+        lake.close()
+    if row is None:
+        return None
+    with _llm_cache_lock:
+        try:
+            con.execute(
+                "INSERT INTO llm_response_cache "
+                "(cache_key, model, response, latency_ms, hits, expires_at) "
+                "VALUES (?, ?, ?, ?, 1, ?)",
+                [key, *row],
+            )
+        except duckdb.Error:
+            pass
+    return row[1], row[2]
+
+
+def llm_cache_put(
+    key: str,
+    model: str,
+    response: dict,
+    latency_ms: float,
+    ttl: float | None = None,
+    con: duckdb.DuckDBPyConnection | None = None,
+) -> None:
+    """
+    Store a response for ttl seconds (default LLM_CACHE_TTL), evicting periodically.
+
+    The previous entry for key is replaced in the same transaction. con
+    defaults to _llm_cache_connection().
+    """
+    global _llm_cache_puts
+    ttl = _env_number("LLM_CACHE_TTL", LLM_CACHE_TTL) if ttl is None else ttl
+    con = _llm_cache_connection(con)
+    if con is None:
+        return
+    params = [key, model, json.dumps(response), latency_ms, ttl]
+    with _llm_cache_lock:
+        try:
+            con.execute("BEGIN TRANSACTION")
+            try:
+                con.execute("DELETE FROM llm_response_cache WHERE cache_key = ?", [key])
+                con.execute(
+                    "INSERT INTO llm_response_cache "
+                    "(cache_key, model, response, latency_ms, expires_at) "
+                    "VALUES (?, ?, ?, ?, now() + to_seconds(?))",
+                    params,
+                )
+                con.execute("COMMIT")
+            except duckdb.Error:
+                con.execute("ROLLBACK")
+                raise
+        except duckdb.Error:
+            return
+        if _llm_lake_mirror(con):
+            try:
+                con.execute(
+                    "INSERT INTO lake.llm_response_cache "
+                    "(cache_key, model, response, latency_ms, created_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, now(), now() + to_seconds(?))",
+                    params,
+                )
+            except duckdb.Error:
+                pass
+        _llm_cache_puts += 1
+        if _llm_cache_puts % LLM_CACHE_EVICT_EVERY == 0:
+            _evict_llm_cache(con, LLM_CACHE_MAX_ROWS)
+
+
+def _evict_llm_cache(con: duckdb.DuckDBPyConnection, max_rows: int) -> int:
+    expired = con.execute(
+        "DELETE FROM llm_response_cache WHERE expires_at <= now() RETURNING 1"
+    ).fetchall()
+    overflow = con.execute(
+        """
+        DELETE FROM llm_response_cache WHERE cache_key IN (
+            SELECT cache_key FROM llm_response_cache
+            ORDER BY last_used_at DESC, hits DESC OFFSET ?
+        ) RETURNING 1
+        """,
+        [max_rows],
+    ).fetchall()
+    if _llm_lake_mirror(con):
+        try:
+            con.execute("DELETE FROM lake.llm_response_cache WHERE expires_at <= now()")
+        except duckdb.Error:
+            pass
+    return len(expired) + len(overflow)
+
+
+def evict_llm_cache(
+    con: duckdb.DuckDBPyConnection | None = None, max_rows: int | None = None
+) -> int:
+    """Delete expired llm_response_cache rows, then the least recently used beyond max_rows."""
+    max_rows = LLM_CACHE_MAX_ROWS if max_rows is None else max_rows
+    with _llm_cache_lock:
+        con = con or _llm_cache_connection()
+        return 0 if con is None else _evict_llm_cache(con, max_rows)
+
+
+def llm_cache_stats(con: duckdb.DuckDBPyConnection | None = None) -> dict:
+    """
+    Hit rates and saved latency of the response cache, overall and per model.
+
+    hits/misses/saved_ms count lookups in this process; saved_ms sums the
+    original latency of every response served from the cache. With a
+    connection, each model's table entries, lifetime hits and lifetime saved
+    latency (all processes using the database) are added.
+    """
+    with _llm_cache_lock:
+        models = {model: dict(stats) for model, stats in _llm_cache_stats.items()}
+    if con is not None:
+        try:
+            rows = con.execute(
+                "SELECT model, count(*), sum(hits), sum(hits * latency_ms) "
+                "FROM llm_response_cache GROUP BY model"
+            ).fetchall()
+        except duckdb.Error:
+            rows = []
+        for model, entries, hits, saved in rows:
+            stats = models.setdefault(model, {"hits": 0, "misses": 0, "saved_ms": 0.0})
+            stats["entries"] = int(entries)
+            stats["lifetime_hits"] = int(hits or 0)
+            stats["lifetime_saved_ms"] = round(float(saved or 0.0), 1)
+    for stats in models.values():
+        stats["hit_rate"] = round(stats["hits"] / max(stats["hits"] + stats["misses"], 1), 3)
+        stats["saved_ms"] = round(stats["saved_ms"], 1)
+    hits = sum(stats["hits"] for stats in models.values())
+    misses = sum(stats["misses"] for stats in models.values())
+    return {
+        "enabled": _llm_cache_enabled(None),
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / max(hits + misses, 1), 3),
+        "saved_ms": round(sum(stats["saved_ms"] for stats in models.values()), 1),
+        "models": models,
+    }
+
+
+def clear_llm_cache_stats() -> None:
+    """Reset the per-process response cache counters (the table is kept)."""
+    with _llm_cache_lock:
+        _llm_cache_stats.clear()
+
+
 def chat_with_model(
     model: str,
     messages: list[dict],
     system_prompt: str | None = None,
     tools: list | None = None,
+    temperature: float | None = None,
+    cache: bool | None = None,
+    cache_con: duckdb.DuckDBPyConnection | None = None,
 ) -> dict:
-    """Send a message history to the configured backend."""
+    """
+    Send a message history to the configured backend.
+
+    With the response cache enabled (cache=True, or LLM_RESPONSE_CACHE=1 when
+    cache is None), a request identical in model, messages, tools and
+    temperature is answered from llm_response_cache. Errors are never cached.
+    The table is read through cache_con; without it, through the cursor of the
+    connection running the calling UDF, else set_llm_cache_connection()'s.
+    """
     prepared_messages = _prepare_messages(messages, system_prompt)
+    if not _llm_cache_enabled(cache):
+        return _model_response(model, prepared_messages, system_prompt, tools, temperature)
+
+    key = llm_cache_key(model, prepared_messages, tools, temperature)
+    cache_con = _llm_cache_connection(cache_con)
+    cached = llm_cache_get(key, model, cache_con)
+    if cached is not None:
+        return cached
+    started = time.perf_counter()
+    response = _model_response(model, prepared_messages, system_prompt, tools, temperature)
+    if "error" not in response:
+        llm_cache_put(
+            key, model, response, (time.perf_counter() - started) * 1000, con=cache_con
+        )
+    return response
 
+
+def _model_response(
+    model: str,
+    prepared_messages: list[dict],
+    system_prompt: str | None,
+    tools: list | None,
+    temperature: float | None,
+) -> dict:
+    """Call the backend for model with already prepared messages."""
     if "claude" in model.lower():
         client = _get_anthropic_client()
         if client:
@@ -116,6 +884,8 @@ def chat_with_model(
                     "system": system_prompt or "",
                     "messages": anthropic_messages,
                 }
+                if temperature is not None:
+                    request_kwargs["temperature"] = temperature
 
                 if tools:
                     anthropic_tools = []
@@ -166,7 +936,8 @@ def chat_with_model(
             except Exception as e:
                 return {"error": str(e)}
 
-    response = _get_ollama_response(model, prepared_messages, tools)
+    options = {"temperature": temperature} if temperature is not None else None
+    response = _get_ollama_response(model, prepared_messages, tools, options)
     if "error" in response:
         return response
 
@@ -195,24 +966,12 @@ def stream_model_response(
             yield response["content"]
         return
 
-    base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-    url = f"{base_url}/api/chat"
     payload = {"model": model, "messages": prepared_messages, "stream": True}
-    data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(
-        url, data=data, headers={"Content-Type": "application/json"}, method="POST"
-    )
-
     try:
-        with urllib.request.urlopen(req, timeout=120) as resp:
-            for raw_line in resp:
-                line = raw_line.decode("utf-8").strip()
-                if not line:
-                    continue
-                chunk = json.loads(line)
-                content = chunk.get("message", {}).get("content", "")
-                if content:
-                    yield content
+        for chunk in ollama_pool().stream("/api/chat", payload):
+            content = chunk.get("message", {}).get("content", "")
+            if content:
+                yield content
     except Exception:
         response = chat_with_model(model, messages, system_prompt=system_prompt)
         if response.get("content"):
@@ -244,6 +1003,39 @@ def udf_agent_chat(model: str, prompt: str, system_prompt: str | None = None) ->
     return json.dumps(response)
 
 
+def udf_llm_chat(model: str, messages_json: str, tools_json: str | None = None) -> str:
+    """
+    Chat through chat_with_model() and return an Ollama /api/chat-style body.
+
+    Backs the ollama.sql shortcut macros, so they share the Ollama connection
+    pool and the response cache with Python callers.
+
+    Args:
+        model: Model name
+        messages_json: JSON array of chat messages (system messages included)
+        tools_json: Optional JSON array of tool definitions
+
+    Returns:
+        JSON string {"model", "message": {"role", "content", "tool_calls"?}, "done"}
+        or {"error"}
+    """
+    try:
+        messages = json.loads(messages_json)
+        tools = json.loads(tools_json) if tools_json else None
+    except (TypeError, json.JSONDecodeError) as e:
+        return json.dumps({"error": f"Invalid JSON: {e}"})
+    system_prompt = next(
+        (m.get("content") for m in messages if m.get("role") == "system"), None
+    )
+    response = chat_with_model(model, messages, system_prompt=system_prompt, tools=tools or None)
+    if "error" in response:
+        return json.dumps(response)
+    message = {"role": "assistant", "content": response.get("content", "")}
+    if response.get("tool_calls"):
+        message["tool_calls"] = response["tool_calls"]
+    return json.dumps({"model": model, "message": message, "done": True})
+
+
 def udf_agent_tools(
     model: str, prompt: str, tools_json: str, system_prompt: str | None = None
 ) -> str:
@@ -273,7 +1065,7 @@ def udf_agent_tools(
     return json.dumps(response)
 
 
-def _path_is_allowed(path: str, workspaces: list[tuple[str, str]]) -> bool:
+def path_is_allowed(path: str, workspaces: list[tuple[str, str]]) -> bool:
     """Return True when a path is inside one of the allowed workspaces."""
     try:
         candidate = Path(path).resolve()
@@ -300,7 +1092,7 @@ def _execute_agent_tool(
         path = tool_args.get("path", "")
         if not path:
             return {"error": "path required"}
-        if not _path_is_allowed(path, workspaces):
+        if not path_is_allowed(path, workspaces):
             return {"error": "Path not in allowed workspace", "path": path}
         return {"path": path, "content": Path(path).read_text(encoding="utf-8")}
 
@@ -308,7 +1100,7 @@ def _execute_agent_tool(
         path = tool_args.get("path", "")
         if not path:
             return {"error": "path required"}
-        if not _path_is_allowed(path, workspaces):
+        if not path_is_allowed(path, workspaces):
             return {"error": "Path not in allowed workspace", "path": path}
         entries = sorted(p.name for p in Path(path).iterdir())
         return {"path": path, "entries": entries}
@@ -806,21 +1598,44 @@ def register_udfs(con: duckdb.DuckDBPyConnection) -> list[str]:
         List of registered UDF names
     """
     registered = []
+    # One cursor per connection for the response cache of its UDFs
+    cache_con = con.cursor()
 
     # agent_chat(model, prompt, system_prompt?) -> JSON
     con.create_function(
         "agent_chat",
-        udf_agent_chat,
+        _with_llm_cache(udf_agent_chat, cache_con),
         [str, str, str],
         str,
         null_handling="default",
     )
     registered.append("agent_chat")
 
+    # llm_chat(model, messages_json, tools_json) -> /api/chat-style JSON (response-cached)
+    con.create_function(
+        "llm_chat",
+        _with_llm_cache(udf_llm_chat, cache_con),
+        [str, str, str],
+        str,
+        null_handling="special",
+        side_effects=True,
+    )
+    registered.append("llm_chat")
+
+    # llm_cache_stats() -> JSON of response cache hit rates per model
+    con.create_function(
+        "llm_cache_stats",
+        lambda: json.dumps(llm_cache_stats(cache_con)),
+        [],
+        str,
+        side_effects=True,
+    )
+    registered.append("llm_cache_stats")
+
     # agent_tools(model, prompt, tools_json, system_prompt?) -> JSON
     con.create_function(
         "agent_tools",
-        udf_agent_tools,
+        _with_llm_cache(udf_agent_tools, cache_con),
         [str, str, str, str],
         str,
         null_handling="default",
@@ -829,11 +1644,14 @@ def register_udfs(con: duckdb.DuckDBPyConnection) -> list[str]:
 
     con.create_function(
         "agent_run",
-        lambda agent_id, prompt, max_turns: udf_agent_run(
-            agent_id,
-            prompt,
-            max_turns,
-            con.cursor(),
+        _with_llm_cache(
+            lambda agent_id, prompt, max_turns: udf_agent_run(
+                agent_id,
+                prompt,
+                max_turns,
+                con.cursor(),
+            ),
+            cache_con,
         ),
         [str, str, int],
         str,
@@ -928,6 +1746,35 @@ def register_udfs(con: duckdb.DuckDBPyConnection) -> list[str]:
     )
     registered.append("radio_channel_list")
 
+    # ollama_pool_stats() -> JSON of connection-pool counters per base URL
+    con.create_function(
+        "ollama_pool_stats",
+        lambda: json.dumps(ollama_pool_stats()),
+        [],
+        str,
+        side_effects=True,
+    )
+    registered.append("ollama_pool_stats")
+
+    # embed_cached(model, text) -> FLOAT[] (LRU + embedding_cache, then Ollama)
+    embed_cursor = con.cursor()
+    embed_lock = threading.Lock()
+
+    def _embed_cached(model: str, text: str) -> list[float] | None:
+        if model is None or text is None:
+            return None
+        with embed_lock:
+            return cached_embed(embed_cursor, model, text)
+
+    con.create_function(
+        "embed_cached",
+        _embed_cached,
+        [str, str],
+        "FLOAT[]",
+        null_handling="special",
+    )
+    registered.append("embed_cached")
+
     # safe_json_extract(json_str, path) -> VARCHAR or NULL
     con.create_function(
         "safe_json_extract",
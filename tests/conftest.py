@@ -0,0 +1,64 @@
+"""Shared fixtures for the Agent Farm tests."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+@pytest.fixture
+def stub_ollama(monkeypatch):
+    """
+    Start a local HTTP server standing in for Ollama and point OLLAMA_BASE_URL at it.
+
+    Call the fixture with respond(path, body) -> (status, payload[, keep_alive]).
+    payload is a dict (sent as JSON), bytes (sent as is, e.g. NDJSON) or None
+    (empty body); keep_alive=False drops the connection after the response
+    without announcing it, like a server closing an idle keep-alive socket.
+    The returned server records every request as (path, body, client_address)
+    in server.requests.
+    """
+    servers = []
+
+    def start(respond):
+        requests = []
+
+        class StubOllama(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                requests.append((self.path, body, self.client_address))
+                status, payload, *keep_alive = respond(self.path, body)
+                if payload is None:
+                    data = b""
+                elif isinstance(payload, bytes):
+                    data = payload
+                else:
+                    data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                if keep_alive and not keep_alive[0]:
+                    self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllama)
+        server.requests = requests
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        monkeypatch.setenv("OLLAMA_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+        return server
+
+    yield start
+    from agent_farm.udfs import close_ollama_pools
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    close_ollama_pools()
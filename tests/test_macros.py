@@ -244,5 +244,102 @@ def test_bootstrap_db_and_init_farm_parity():
     assert engine_cli.is_initialized() is True
 
 
+def test_ollama_calls_reuse_pooled_connections(monkeypatch, stub_ollama):
+    from agent_farm import udfs
+
+    failures = [1]
+
+    def respond(path, body):
+        if body["model"] == "flaky" and failures[0]:
+            failures[0] -= 1
+            return 503, None
+        if body["model"] == "drop":
+            return 200, {"message": {"role": "assistant", "content": "bye"}}, False
+        if path == "/api/embed":
+            return 200, {"embeddings": [[1.0, 2.0] for _ in body["input"]]}
+        if body["stream"]:
+            lines = [{"message": {"content": part}} for part in ("he", "llo")]
+            return 200, "".join(json.dumps(line) + "\n" for line in lines).encode()
+        return 200, {"message": {"role": "assistant", "content": "hi"}}
+
+    server = stub_ollama(respond)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    monkeypatch.setattr(udfs, "OLLAMA_RETRY_BACKOFF", 0.0)
+    try:
+        messages = [{"role": "user", "content": "hey"}]
+        assert udfs._get_ollama_response("m", messages)["message"]["content"] == "hi"
+        assert udfs.ollama_embed_batch("m", ["a", "b"]) == [[1.0, 2.0], [1.0, 2.0]]
+        assert "".join(udfs.stream_model_response("m", messages)) == "hello"
+        assert udfs._get_ollama_response("flaky", messages)["message"]["content"] == "hi"
+
+        stats = udfs.ollama_pool_stats()[base_url]
+        assert stats["requests"] == 4
+        assert stats["opened"] == 1 and stats["reused"] == 4
+        assert stats["retries"] == 1 and stats["failures"] == 0
+        assert len({client for _, _, client in server.requests}) == 1
+
+        # A keep-alive socket the server closed while idle is replaced, not retried
+        assert udfs._get_ollama_response("drop", messages)["message"]["content"] == "bye"
+        assert udfs._get_ollama_response("m", messages)["message"]["content"] == "hi"
+        stats = udfs.ollama_pool_stats()[base_url]
+        assert (stats["opened"], stats["retries"], stats["idle"]) == (2, 1, 1)
+        assert len(server.requests) == 7
+    finally:
+        udfs.close_ollama_pools()
+
+
+def test_ollama_chat_read_timeout_is_raised_once(monkeypatch, stub_ollama):
+    import time
+
+    from agent_farm import udfs
+
+    def respond(path, body):
+        time.sleep(0.6)
+        if path == "/api/embed":
+            return 200, {"embeddings": [[1.0] for _ in body["input"]]}
+        return 200, {"message": {"role": "assistant", "content": "late"}}
+
+    server = stub_ollama(respond)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    monkeypatch.setenv("OLLAMA_READ_TIMEOUT", "0.2")
+    monkeypatch.setattr(udfs, "OLLAMA_RETRY_BACKOFF", 0.0)
+
+    # A chat POST may already be running on the server: never send it twice
+    response = udfs._get_ollama_response("m", [{"role": "user", "content": "x"}])
+    assert "timed out" in response["error"]
+    assert len(server.requests) == 1
+    stats = udfs.ollama_pool_stats()[base_url]
+    assert (stats["retries"], stats["failures"]) == (0, 1)
+
+    # Embedding is idempotent, so it is retried up to OLLAMA_RETRIES times
+    with pytest.raises(RuntimeError):
+        udfs.ollama_embed_batch("m", ["a"])
+    assert len(server.requests) == 1 + 1 + udfs.OLLAMA_RETRIES
+
+
+def test_anthropic_client_is_shared_until_settings_change(monkeypatch):
+    import types
+
+    from agent_farm import udfs
+
+    created = []
+
+    class FakeAnthropic:
+        def __init__(self, **kwargs):
+            created.append(kwargs)
+
+    monkeypatch.setitem(sys.modules, "anthropic", types.SimpleNamespace(Anthropic=FakeAnthropic))
+    monkeypatch.setenv("ANTHROPIC_MAX_RETRIES", "5")
+    monkeypatch.setattr(udfs, "_anthropic_client", None)
+
+    client = udfs._get_anthropic_client()
+    assert udfs._get_anthropic_client() is client
+    assert created == [{"timeout": udfs.ANTHROPIC_TIMEOUT, "max_retries": 5}]
+
+    monkeypatch.setenv("ANTHROPIC_TIMEOUT", "30")
+    assert udfs._get_anthropic_client() is not client
+    assert created[-1] == {"timeout": 30.0, "max_retries": 5}
+
+
 if __name__ == "__main__":
     sys.exit(0 if test_macros() else 1)
@@ -142,6 +142,21 @@ class TestSpecEngineRegressions:
             con2.close()
             spec_module._spec_engines.clear()
 
+    @pytest.fixture
+    def spec_schema_setup(self):
+        from agent_farm.duckdb_utils import has_non_comment_content, split_sql_statements
+
+        con = duckdb.connect(":memory:")
+        for filename in ("schema.sql", "intelligence.sql"):
+            with open(os.path.join(SPEC_SQL_DIR, filename), "r", encoding="utf-8") as f:
+                sql_content = f.read()
+            for stmt in split_sql_statements(sql_content):
+                stmt = stmt.strip()
+                if has_non_comment_content(stmt):
+                    con.sql(stmt)
+        yield con
+        con.close()
+
     @pytest.fixture
     def intelligence_setup(self):
         from agent_farm.duckdb_utils import has_non_comment_content, split_sql_statements
@@ -239,13 +254,1289 @@ class TestSpecEngineRegressions:
         assert json.loads(ops_row[1]) == {"latency_ms": 82}
         assert ops_row[2] == 1200
 
-    def test_vector_search_methods_fail_clearly_without_vss(self, intelligence_setup):
+    def test_vector_search_falls_back_to_numpy_without_vss(self, intelligence_setup, tmp_path):
+        import numpy as np
+
+        from agent_farm.duckdb_utils import has_non_comment_content, split_sql_statements
+        from agent_farm.spec_engine import SpecEngine, _model_slug, _NumpyVectorStore
+
+        engine = SpecEngine(intelligence_setup)
+        scan = SpecEngine(intelligence_setup)
+        scan._use_numpy_vectors = lambda: False
+        for i in range(30):
+            vector = [1.0, (i % 7) / 3, (i % 5) / 4]
+            engine.store_embedding(f"doc {i}", vector, "doc" if i % 3 else "code")
+        engine.store_embedding("other model", [0.0, 1.0, 0.0], "doc", embedding_model="m")
+
+        query = [1.0, 0.9, 0.2]
+
+        def ids(results):
+            return [r["id"] for r in results]
+
+        assert ids(engine.search_similar(query, k=5)) == ids(scan.search_similar(query, k=5))
+        assert ids(engine.search_similar(query, k=4, content_type="code")) == ids(
+            scan.search_similar(query, k=4, content_type="code")
+        )
+        assert engine.search_similar(query, k=3, embedding_model="m")[0]["content"] == "other model"
+        assert ids(engine.hybrid_search("doc 1", query, k=5)) == ids(
+            scan.hybrid_search("doc 1", query, k=5)
+        )
+        assert engine.search_similar([1.0, 0.0], k=3) == []
+
+        # Engine writes and raw SQL inserts/deletes are picked up incrementally
+        hit = engine.store_embedding("exact", query, "doc")["embedding_id"]
+        assert engine.search_similar(query, k=1)[0]["id"] == hit
+        intelligence_setup.execute(f"DELETE FROM spec_embeddings WHERE id = {hit}")
+        intelligence_setup.execute(
+            "INSERT INTO spec_embeddings (id, content_type, content_hash, content, embedding) "
+            "VALUES (0, 'doc', 'raw', 'raw row', [1.0, 0.9, 0.2])"
+        )
+        assert engine.search_similar(query, k=1)[0]["content"] == "raw row"
+        store = engine._numpy_stores[("spec_embeddings", "default", 3)]
+        assert store.rows == 31 and store.path is None
+
+        # A file-backed database keeps memory-mapped .npy files next to it
+        con = duckdb.connect(str(tmp_path / "farm.db"))
+        with open(os.path.join(SPEC_SQL_DIR, "intelligence.sql"), encoding="utf-8") as f:
+            for stmt in split_sql_statements(f.read()):
+                if has_non_comment_content(stmt.strip()):
+                    con.sql(stmt)
+        first = SpecEngine(con)
+        for i in range(5):
+            first.store_embedding(f"file doc {i}", [1.0, i, 0.0], "doc")
+        assert first.search_similar([1.0, 4.0, 0.0], k=1)[0]["content"] == "file doc 4"
+        files = tmp_path / "farm.db.vectors"
+        stem = f"spec_embeddings__{_model_slug('default')}__3"
+        assert (files / f"{stem}.vectors.npy").exists()
+
+        reopened = _NumpyVectorStore(files / stem, 3, True)
+        assert reopened.rows == 5 and isinstance(reopened.matrix, np.memmap)
+        assert reopened.key == first._numpy_stores[("spec_embeddings", "default", 3)].key
+        con.close()
+
+    def test_conversation_context_uses_recent_window_decay_and_compaction(self, intelligence_setup):
         from agent_farm.spec_engine import SpecEngine
 
         engine = SpecEngine(intelligence_setup)
+        for i in range(10):
+            engine.store_conversation_memory(
+                "s1", "user", f"turn {i}", [1.0, float(i), 0.0], importance=0.9 if i == 1 else 0.2
+            )
+        intelligence_setup.execute(
+            "UPDATE memory_conversations SET created_at = created_at - INTERVAL 2 DAY "
+            "WHERE content = 'turn 2'"
+        )
+        intelligence_setup.execute(
+            "UPDATE memory_conversations SET importance = 0.9, decay_key = NULL "
+            "WHERE content = 'turn 2'"
+        )
+
+        context = engine.get_conversation_context("s1", k=4, recent=3)
+        assert [m["content"] for m in context] == ["turn 1", "turn 7", "turn 8", "turn 9"]
+        assert context[0]["score"] > 0.8 and context[-1]["score"] is None
+
+        result = engine.compact_conversation_memory("s1", keep_recent=3, chunk=3)
+        assert result["compacted"] == 6 and len(result["summary_ids"]) == 2
+        context = engine.get_conversation_context("s1", k=4, recent=3)
+        assert context[0]["role"] == "summary"
+        assert context[0]["content"] == "user: turn 2\nuser: turn 0\nuser: turn 1"
+        assert [m["content"] for m in context[1:]] == ["turn 7", "turn 8", "turn 9"]
+        active = intelligence_setup.execute(
+            "SELECT count(*) FROM memory_conversations WHERE compacted_into IS NULL"
+        ).fetchone()[0]
+        assert active == 6
+
+    def test_embedding_migration_resumes_and_switches_at_full_coverage(self, intelligence_setup):
+        from agent_farm.spec_engine import SpecEngine
+
+        engine = SpecEngine(intelligence_setup)
+        for i in range(5):
+            engine.store_embedding(f"text {i}", [1.0, float(i), 0.0], "doc")
+
+        def embed(texts):
+            return [[float(len(t)), 1.0] for t in texts]
+
+        options = {"batch_size": 2, "throttle": 0, "embed_fn": embed}
+        intelligence_setup.execute(
+            "INSERT INTO spec_embedding_migrations (to_model, from_model) VALUES ('m2', 'default')"
+        )
+        partial = engine.run_embedding_migration("m2", limit=2, **options)
+        assert (partial["rows"], partial["pending"], partial["status"]) == (2, 3, "running")
+        assert engine.search_vectors("spec_embeddings", [1.0, 2.0, 0.0], k=1)[0]["content"] == (
+            "text 2"
+        )
+        intelligence_setup.execute("UPDATE spec_embeddings SET content_hash = 'x' WHERE id = 1")
+        assert "is running" in engine.start_embedding_migration("default", "m3", **options)["error"]
+
+        assert engine.start_embedding_migration("default", "m2", **options)["background"]
+        engine._migration_threads["m2"].join()
+        [job] = engine.list_embedding_migrations()
+        assert (job["status"], job["migrated"]) == ("switched", 6)
+        rows = intelligence_setup.execute(
+            "SELECT DISTINCT embedding_model, embedding FROM spec_embeddings"
+        ).fetchall()
+        assert rows == [("m2", [6.0, 1.0])]
+        assert len(engine.search_vectors("spec_embeddings", [6.0, 1.0], k=5)) == 5
+
+    def test_filtered_vector_search_plans_by_selectivity(self, intelligence_setup, monkeypatch):
+        from agent_farm import spec_engine as spec_module
+        from agent_farm.spec_engine import SpecEngine
+
+        engine = SpecEngine(intelligence_setup)
+        texts = [f"doc {i}" for i in range(40)]
+        engine.store_embeddings_bulk(texts, [[1.0, i / 100, 0.0] for i in range(40)], "doc")
+        rare = [[0.0, 0.0, 1.0], [0.0, 0.1, 1.0]]
+        engine.store_embeddings_bulk(["rare a", "rare b"], rare, "rare")
+        monkeypatch.setattr(spec_module, "FILTERED_SCAN_MAX_ROWS", 10)
+
+        where = "AND e.content_type = ?"
+        assert engine._filtered_ann_fetch("spec_embeddings", None, where, ["rare"], 2) is None
+        assert engine._filtered_ann_fetch("spec_embeddings", None, where, ["doc"], 2) == 9
+        fetch, allowed = engine._numpy_filter("spec_embeddings", None, where, ["rare"], 2)
+        assert (fetch, len(allowed)) == (2, 2)
+
+        hits = engine.search_similar([1.0, 0.0, 0.0], k=2, content_type="rare")
+        assert sorted(hit["content"] for hit in hits) == ["rare a", "rare b"]
+        hits = engine.search_similar([1.0, 0.0, 0.0], k=2, content_type="doc")
+        assert [hit["content"] for hit in hits] == ["doc 0", "doc 1"]
+
+    def test_knowledge_search_merges_sources_with_provenance(self, intelligence_setup):
+        from agent_farm.spec_engine import SpecEngine
+
+        engine = SpecEngine(intelligence_setup)
+        engine.store_embedding("spec doc", [1.0, 0.0, 0.0], "doc")
+        engine.store_embedding("spec log", [0.0, 1.0, 0.0], "log")
+        engine.store_org_knowledge(
+            "dev", "def parse()", [0.9, 0.1, 0.0], repo="farm", file_path="a.py", language="py"
+        )
+        engine.store_org_knowledge("research", "vector notes", [0.7, 0.7, 0.0], query="ann")
+        engine.store_conversation_memory("s1", "user", "hello", [0.5, 0.5, 0.5])
+
+        hits = engine.knowledge_search([1.0, 0.0, 0.0], k=3)
+        assert [(h["source"], h["content"]) for h in hits] == [
+            ("spec_embeddings", "spec doc"),
+            ("knowledge_dev", "def parse()"),
+            ("knowledge_research", "vector notes"),
+        ]
+        assert hits[1]["org"] == "dev"
+        assert hits[1]["provenance"]["file_path"] == "a.py"
+        similarities = [h["similarity"] for h in hits]
+        assert similarities == sorted(similarities, reverse=True)
+
+        # Filters skip sources without the column; the SQL path ranks the same
+        scan = SpecEngine(intelligence_setup)
+        scan._use_numpy_vectors = lambda: False
+        for searcher in (engine, scan):
+            assert [h["source"] for h in searcher.knowledge_search([1.0, 0.0, 0.0])] == [
+                h["source"] for h in engine.knowledge_search([1.0, 0.0, 0.0])
+            ]
+            logs = searcher.knowledge_search([1.0, 0.0, 0.0], filters={"content_type": ["log"]})
+            assert [h["content"] for h in logs] == ["spec log"]
+        # Sources are searched on cursors, except inside a transaction they cannot see
+        with scan.batch():
+            scan.store_embedding("uncommitted", [1.0, 0.0, 0.0], "log")
+            logs = scan.knowledge_search([1.0, 0.0, 0.0], filters={"content_type": ["log"]})
+            assert [h["content"] for h in logs] == ["uncommitted", "spec log"]
+        memory = engine.knowledge_search(
+            [1.0, 0.0, 0.0], sources=["memory_conversations"], filters={"session_id": "s1"}
+        )
+        assert memory[0]["provenance"]["role"] == "user"
+
+        with pytest.raises(ValueError, match="Unknown knowledge source"):
+            engine.knowledge_search([1.0, 0.0, 0.0], sources=["spec_objects"])
+        with pytest.raises(ValueError, match="No knowledge source has column"):
+            engine.knowledge_search([1.0, 0.0, 0.0], filters={"nope": 1})
+
+    def test_spec_search_is_prefiltered_by_trigram_postings(self, spec_schema_setup):
+        from agent_farm.spec_engine import SpecEngine
+
+        engine = SpecEngine(spec_schema_setup)
+        fetcher = engine.spec_create(
+            "skill", "web_fetcher", "Fetch pages over HTTP", doc="Follows redirects"
+        )["id"]
+        engine.spec_create("skill", "summarizer", "Condense long text")
+
+        assert [r["name"] for r in engine.spec_search("REDIRECT pages")] == ["web_fetcher"]
+
+        engine.spec_update(fetcher, doc="Retries on timeouts")
+        assert engine.spec_search("redirect") == []
+        assert [r["name"] for r in engine.spec_search("timeouts")] == ["web_fetcher"]
+
+        # LIKE wildcards in a word are not turned into trigrams; short words bypass it.
+        assert [r["name"] for r in engine.spec_search("time%uts")] == ["web_fetcher"]
+        assert [r["name"] for r in engine.spec_search("fetch_pages")] == ["web_fetcher"]
+        assert [r["name"] for r in engine.spec_search("we")] == ["web_fetcher"]
+
+        # Rows whose postings are missing (raw SQL, another process) are indexed by id
+        # before the pre-filter runs, even when the row count is unchanged.
+        spec_schema_setup.execute("DELETE FROM spec_trigrams WHERE row_key = ?", [str(fetcher)])
+        spec_schema_setup.execute("DELETE FROM spec_objects WHERE name = 'summarizer'")
+        spec_schema_setup.execute(
+            "INSERT INTO spec_objects (id, kind, name, summary) "
+            "VALUES (0, 'skill', 'raw_probe', 'Probe endpoints')"
+        )
+        assert [r["name"] for r in engine.spec_search("timeouts")] == ["web_fetcher"]
+        assert [r["name"] for r in engine.spec_search("endpoints")] == ["raw_probe"]
+        assert engine.spec_search("condense") == []
+        assert engine.rebuild_trigram_index("spec") == {"rebuilt": {"spec": 2}}
+
+        engine.spec_delete(fetcher)
+        remaining = spec_schema_setup.execute(
+            "SELECT COUNT(*) FROM spec_trigrams WHERE row_key = ?", [str(fetcher)]
+        ).fetchone()[0]
+        assert remaining == 0
+
+    def test_search_notes_catches_up_from_lake_watermark(self, spec_schema_setup):
+        from agent_farm.spec_engine import SpecEngine
+
+        spec_schema_setup.execute("ATTACH ':memory:' AS lake")
+        spec_schema_setup.execute(
+            """
+            CREATE TABLE lake.notes_board (
+                id VARCHAR, project VARCHAR, title VARCHAR, content VARCHAR,
+                status VARCHAR DEFAULT 'open', updated_at TIMESTAMP
+            )
+            """
+        )
+        spec_schema_setup.execute(
+            """
+            INSERT INTO lake.notes_board
+            VALUES ('n1', 'farm', 'Deploy', 'Roll out', 'open', now())
+            """
+        )
+        engine = SpecEngine(spec_schema_setup)
+
+        assert [n["id"] for n in engine.search_notes("roll out")] == ["n1"]
+
+        # A write from another process is picked up by the next search.
+        spec_schema_setup.execute(
+            """
+            INSERT INTO lake.notes_board
+            VALUES ('n2', 'lab', 'Rollback plan', 'Keep it short', 'open', now())
+            """
+        )
+        assert {n["id"] for n in engine.search_notes("roll")} == {"n1", "n2"}
+        assert [n["id"] for n in engine.search_notes("roll", project="lab")] == ["n2"]
+
+    def test_spec_bulk_upsert_merges_and_round_trips(self, spec_schema_setup, tmp_path):
+        from agent_farm.spec_engine import SpecEngine
+
+        engine = SpecEngine(spec_schema_setup)
+        existing = engine.spec_create(
+            "skill", "fetch", "Old summary", doc="Old doc", payload={"v": 1}, schema_ref="s1"
+        )["id"]
+
+        result = engine.spec_bulk_upsert(
+            [
+                {"kind": "skill", "name": "fetch", "summary": "New summary", "payload": {"v": 2}},
+                {"kind": "skill", "name": "parse", "summary": "first", "doc": "Parses"},
+                {"kind": "skill", "name": "parse", "summary": "Parse input", "doc": "Parses"},
+            ]
+        )
+        assert result == {"inserted": 1, "updated": 1}
+
+        fetch = engine.spec_get(id=existing)
+        assert (fetch["summary"], fetch["doc"]) == ("New summary", "Old doc")
+        assert (fetch["payload"], fetch["schema_ref"]) == ({"v": 2}, "s1")
+        assert engine.spec_get(kind="skill", name="parse")["summary"] == "Parse input"
+        assert [r["name"] for r in engine.spec_search("parses")] == ["parse"]
+
+        invalid = engine.spec_bulk_upsert(
+            [{"kind": "skill", "name": "x", "summary": "s", "payload": "{not json"}]
+        )
+        assert "not valid JSON" in invalid["error"]
+        assert engine.spec_get(kind="skill", name="x") is None
+
+        for suffix in ("jsonl", "parquet"):
+            path = str(tmp_path / f"specs.{suffix}")
+            assert engine.spec_export(path)["exported"] == 2
+
+            con = duckdb.connect(":memory:")
+            target = SpecEngine(con)
+            target._load_schema(quiet=True)
+            assert target.spec_import(path) == {"inserted": 2, "updated": 0}
+            assert target.spec_get(kind="skill", name="fetch")["payload"] == {"v": 2}
+            con.close()
+
+        # kind is bound, not spliced into the SQL
+        path = str(tmp_path / "quoted.jsonl")
+        assert engine.spec_export(path, kind="skill")["exported"] == 2
+        assert engine.spec_export(path, kind="x' OR TRUE OR '")["exported"] == 0
+
+    def test_usage_and_feedback_are_written_behind(self, spec_schema_setup):
+        from agent_farm.spec_engine import SpecEngine
+
+        engine = SpecEngine(spec_schema_setup)
+        spec_id = engine.spec_create("skill", "fetch", "Fetch pages")["id"]
+
+        usage = engine.record_usage(spec_id, True)
+        assert usage == {"spec_id": spec_id, "use_count": 1, "success_rate": 1.0, "pending": 1}
+        first = engine.record_feedback(spec_id, "failure", score=-1.0, notes="timed out")
+        second = engine.record_feedback(spec_id, "success", score=1.0)
+        assert second["feedback_id"] == first["feedback_id"] + 1 and second["pending"] == 3
+        assert engine.record_usage(99999, True) == {"error": "Spec 99999 not found"}
+        assert engine.record_feedback(99999, "success") == {"error": "Spec 99999 not found"}
+        use_count = spec_schema_setup.execute(
+            "SELECT use_count FROM spec_objects WHERE id = ?", [spec_id]
+        ).fetchone()[0]
+        assert use_count == 0
+
+        assert engine.flush_usage() == {"usage_events": 3, "feedback": 2}
+        assert engine.flush_usage() == {"usage_events": 0, "feedback": 0}
+        engine.record_usage(spec_id, False)
+
+        perf = engine.get_spec_performance(spec_id)
+        assert (perf["use_count"], perf["feedback_count"], perf["avg_score"]) == (4, 2, 0.0)
+        assert perf["success_rate"] == pytest.approx(0.5)
+        view = spec_schema_setup.execute(
+            """
+            SELECT feedback_count, success_count, failure_count
+            FROM spec_performance_view WHERE id = ?
+            """,
+            [spec_id],
+        ).fetchone()
+        assert view == (2, 1, 1)
+        notes = spec_schema_setup.execute(
+            "SELECT id, notes FROM spec_feedback WHERE spec_id = ? ORDER BY id", [spec_id]
+        ).fetchall()
+        assert notes == [(first["feedback_id"], "timed out"), (second["feedback_id"], None)]
+        assert spec_schema_setup.execute(
+            "SELECT count(*) FROM spec_usage_hourly WHERE spec_id = 99999"
+        ).fetchone() == (0,)
+
+    def test_idle_engine_flushes_usage_on_a_timer(self, spec_schema_setup, monkeypatch):
+        import time
+
+        from agent_farm import spec_engine as spec_module
+        from agent_farm.spec_engine import SpecEngine
+
+        monkeypatch.setattr(spec_module, "USAGE_FLUSH_INTERVAL", 0.2)
+        engine = SpecEngine(spec_schema_setup)
+        spec_id = engine.spec_create("skill", "fetch", "Fetch pages")["id"]
+        engine.record_feedback(spec_id, "success", score=1.0)
+
+        # No further engine call: the timer writes the buffer back on its own
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not spec_schema_setup.execute(
+            "SELECT count(*) FROM spec_feedback"
+        ).fetchone()[0]:
+            time.sleep(0.05)
+        row = spec_schema_setup.execute(
+            "SELECT use_count, success_rate FROM spec_objects WHERE id = ?", [spec_id]
+        ).fetchone()
+        assert row == (1, 1.0)
+        assert engine.flush_usage() == {"usage_events": 0, "feedback": 0}
+
+        engine.record_usage(spec_id, False)
+        assert engine.close() == {"usage_events": 1, "feedback": 0}
+        assert engine._usage_timer is None
+
+    def test_batch_mutations_are_set_based_and_atomic(self, spec_schema_setup):
+        from agent_farm.spec_engine import SpecEngine
+
+        engine = SpecEngine(spec_schema_setup)
+        ids = [
+            engine.spec_create("skill", f"s{i}", f"Skill {i}", doc="old")["id"] for i in range(3)
+        ]
+        engine.create_relationship(ids[0], ids[2], "uses")
+
+        result = engine.spec_update_many(
+            [
+                {"id": ids[0], "status": "active", "doc": "rewritten"},
+                {"id": ids[1], "payload": {"v": 1}, "schema_ref": "s"},
+                {"id": 999, "summary": "ghost"},
+            ]
+        )
+        assert result == {"updated": 2, "missing": [999]}
+        first, second = engine.spec_get(id=ids[0]), engine.spec_get(id=ids[1])
+        assert (first["status"], first["doc"]) == ("active", "rewritten")
+        assert first["summary"] == "Skill 0"
+        assert (second["payload"], second["schema_ref"], second["doc"]) == ({"v": 1}, "s", "old")
+        assert [r["name"] for r in engine.spec_search("rewritten")] == ["s0"]
+
+        assert engine.spec_delete_many([ids[0], ids[2], 999]) == {"deleted": 2}
+        assert [r["name"] for r in engine.spec_list()] == ["s1"]
+        relationships = spec_schema_setup.execute("SELECT COUNT(*) FROM spec_relationships")
+        assert relationships.fetchone() == (0,)
+
+        with pytest.raises(RuntimeError, match="rolled back"):
+            with engine.batch():
+                engine.spec_update(ids[1], status="deprecated")
+                engine.spec_create("skill", "s1", "Duplicate of s1")
+        assert engine.spec_get(id=ids[1])["status"] == "draft"
+
+    def test_validate_many_caches_compiled_validators(self, spec_schema_setup, monkeypatch):
+        pytest.importorskip("jsonschema")
+        from agent_farm import spec_engine
+        from agent_farm.spec_engine import SpecEngine
+
+        engine = SpecEngine(spec_schema_setup)
+        schema = {"type": "object", "required": ["name"]}
+        schema_id = engine.spec_create(
+            "schema", "tool_schema", "Tool schema", status="active", payload=schema
+        )["id"]
+        engine.spec_create(
+            "skill", "fetch", "Fetch", status="active", payload={}, schema_ref="tool_schema"
+        )
+
+        results = engine.validate_many("skill", "fetch", [{"name": "x"}, {}, "{not json"])
+        assert [r["ok"] for r in results] == [True, False, False]
+        assert "'name' is a required property" in results[1]["errors"]
+        assert list(engine._validators) == [("tool_schema", "1.0.0")]
+
+        engine.spec_update(schema_id, payload={"type": "object"})
+        assert engine._validators == {}
+        assert engine.validate_payload_against_spec("skill", "fetch", {}) == {
+            "ok": True,
+            "errors": [],
+        }
+        assert engine.validate_many("skill", "missing", [{}])[0]["note"]
+
+        # Raw SQL edits are seen once they bump updated_at, or after invalidate_spec_caches()
+        monkeypatch.setattr(spec_engine, "SPEC_DATA_POLL_INTERVAL", 0.0)
+        assert engine.validate_payload_against_spec("skill", "fetch", {})["ok"]
+        spec_schema_setup.execute(
+            "UPDATE spec_payloads SET payload = '{\"required\": [\"id\"]}' WHERE object_id = ?",
+            [schema_id],
+        )
+        assert engine.validate_payload_against_spec("skill", "fetch", {})["ok"]
+        engine.invalidate_spec_caches()
+        assert not engine.validate_payload_against_spec("skill", "fetch", {})["ok"]
+        spec_schema_setup.execute(
+            "UPDATE spec_payloads SET payload = '{}' WHERE object_id = ?", [schema_id]
+        )
+        spec_schema_setup.execute(
+            "UPDATE spec_objects SET updated_at = now() + INTERVAL 1 SECOND WHERE id = ?",
+            [schema_id],
+        )
+        assert engine.validate_payload_against_spec("skill", "fetch", {})["ok"]
+
+    def test_render_template_udf_uses_shared_environment(self, spec_schema_setup):
+        pytest.importorskip("minijinja")
+        from agent_farm.spec_engine import SpecEngine
+
+        engine = SpecEngine(spec_schema_setup)
+        engine._register_internal_udfs()
+        template_id = engine.spec_create(
+            "prompt_template",
+            "greet",
+            "Greeting",
+            status="active",
+            payload={"template": "Hi {{ name }}"},
+        )["id"]
+
+        rows = spec_schema_setup.execute(
+            """
+            SELECT spec_render_template_udf('greet', json_object('name', n))
+            FROM (VALUES ('Ada'), ('Bob')) t(n)
+            """
+        ).fetchall()
+        assert rows == [("Hi Ada",), ("Hi Bob",)]
+        assert engine.render_from_template("greet", {"name": "Cy"}) == {"rendered": "Hi Cy"}
+        assert len(engine._template_names) == 1
+
+        engine.spec_update(template_id, payload={"template": "Bye {{ name }}"})
+        assert engine.render_from_template("greet", {"name": "Cy"}) == {"rendered": "Bye Cy"}
+
+    def test_spec_caches_follow_spec_data_changes(self, spec_schema_setup, monkeypatch):
+        from agent_farm import spec_engine
+        from agent_farm.spec_engine import SpecEngine
+
+        monkeypatch.setattr(spec_engine, "SPEC_DATA_POLL_INTERVAL", 0.0)
+        reader = SpecEngine(spec_schema_setup)
+        writer = SpecEngine(spec_schema_setup.cursor())
+        spec_id = writer.spec_create(
+            "prompt_template", "greet", "Greeting", status="active", payload={"template": "Hi"}
+        )["id"]
+        assert reader._get_template_str("greet") == "Hi"
+
+        # The reader's cache is not invalidated directly, only by the data version
+        writer.spec_update(spec_id, payload={"template": "Hello"})
+        assert reader._get_template_str("greet") == "Hello"
+        spec_schema_setup.execute(
+            "UPDATE spec_payloads SET payload = '{\"template\": \"Hey\"}' WHERE object_id = ?",
+            [spec_id],
+        )
+        # A raw payload edit leaves the version key alone; raw inserts and deletes do not
+        assert reader._get_template_str("greet") == "Hello"
+        reader.invalidate_spec_caches()
+        assert reader._get_template_str("greet") == "Hey"
+        spec_schema_setup.execute(
+            "INSERT INTO spec_payloads (id, object_id, payload) "
+            "VALUES (nextval('spec_payloads_seq'), ?, '{\"template\": \"Yo\"}')",
+            [spec_id],
+        )
+        spec_schema_setup.execute(
+            "DELETE FROM spec_payloads WHERE object_id = ? AND payload LIKE '%Hey%'", [spec_id]
+        )
+        assert reader._get_template_str("greet") == "Yo"
+
+        # Template bodies are LRU-bounded
+        for i in range(3):
+            writer.spec_create(
+                "prompt_template", f"t{i}", "T", status="active", payload={"template": str(i)}
+            )
+        monkeypatch.setattr(spec_engine, "TEMPLATE_CACHE_SIZE", 2)
+        for name in ("t0", "t1", "t0", "t2"):
+            reader._get_template_str(name)
+        assert list(reader._template_sources) == [("t0", None), ("t2", None)]
+
+    def test_spec_latest_orders_versions_semantically(self, spec_schema_setup):
+        from agent_farm.spec_engine import SpecEngine
 
-        with pytest.raises(RuntimeError, match="requires the DuckDB 'vss' extension"):
-            engine.search_similar([0.1, 0.2])
+        engine = SpecEngine(spec_schema_setup)
+        ids = {
+            version: engine.spec_create(
+                "prompt_template",
+                "versioned",
+                "Versioned",
+                version=version,
+                status=status,
+                payload={"template": version},
+            )["id"]
+            for version, status in (
+                ("1.9.0", "active"),
+                ("1.10.0", "active"),
+                ("2.0.0-rc1", "draft"),
+            )
+        }
 
-        with pytest.raises(RuntimeError, match="requires the DuckDB 'vss' extension"):
-            engine.hybrid_search("query", [0.1, 0.2])
+        assert engine.spec_get(kind="prompt_template", name="versioned")["version"] == "2.0.0-rc1"
+        assert engine._get_template_str("versioned") == "1.10.0"
+
+        engine.spec_update(ids["1.10.0"], status="deprecated")
+        assert engine._get_template_str("versioned") == "1.9.0"
+
+        engine.spec_delete(ids["2.0.0-rc1"])
+        assert engine.spec_get(kind="prompt_template", name="versioned")["version"] == "1.10.0"
+
+        spec_schema_setup.execute("DELETE FROM spec_latest")
+        assert engine.rebuild_spec_latest() == {"rebuilt": 1}
+        row = spec_schema_setup.execute(
+            "SELECT latest_id, active_id FROM spec_latest WHERE name = 'versioned'"
+        ).fetchone()
+        assert row == (ids["1.10.0"], ids["1.9.0"])
+
+        # A name used by both template kinds resolves to the higher version, then lower id
+        from agent_farm.duckdb_utils import split_sql_statements
+
+        with open(os.path.join(SPEC_SQL_DIR, "macros.sql"), encoding="utf-8") as f:
+            for stmt in split_sql_statements(f.read()):
+                if "MACRO spec_get_template" in stmt:
+                    spec_schema_setup.execute(stmt)
+        engine.spec_create(
+            "task_template",
+            "versioned",
+            "Task",
+            version="1.9.5",
+            status="active",
+            payload={"template": "task"},
+        )
+        macro = spec_schema_setup.execute("SELECT spec_get_template('versioned')").fetchone()
+        assert macro[0] == engine._get_template_str("versioned") == "task"
+
+    def test_dependency_closure_follows_relationship_chains(self, spec_schema_setup):
+        from agent_farm.spec_engine import SpecEngine
+
+        engine = SpecEngine(spec_schema_setup)
+        ids = [engine.spec_create("skill", f"node_{i}", f"Node {i}")["id"] for i in range(5)]
+        # 0 -> 1 -> 2 -> 3, 0 -> 2 (shortcut), 3 -> 0 (cycle), 4 -> 2 (extends)
+        edges = [(0, 1, "uses"), (1, 2, "uses"), (2, 3, "uses"), (0, 2, "uses")]
+        edges += [(3, 0, "uses"), (4, 2, "extends")]
+        for src, dst, rel in edges:
+            engine.create_relationship(ids[src], ids[dst], rel)
+
+        deps = engine.spec_dependencies(ids[0])
+        assert [(d["name"], d["depth"]) for d in deps] == [
+            ("node_1", 1),
+            ("node_2", 1),
+            ("node_3", 2),
+        ]
+        near = engine.spec_dependencies(ids[0], depth=1)
+        assert [d["name"] for d in near] == ["node_1", "node_2"]
+        dependents = engine.spec_dependents(ids[2], rel_types=["uses"])
+        assert {d["name"] for d in dependents} == {"node_0", "node_1", "node_3"}
+        direct = engine.spec_dependents(ids[2], depth=1)
+        assert {d["name"] for d in direct} == {"node_0", "node_1", "node_4"}
+
+        # The SQL macros carry their path, so the 3 -> 0 cycle ends without a depth limit
+        from agent_farm.duckdb_utils import split_sql_statements
+
+        with open(os.path.join(SPEC_SQL_DIR, "macros.sql"), encoding="utf-8") as f:
+            for stmt in split_sql_statements(f.read()):
+                if "MACRO spec_depend" in stmt:
+                    spec_schema_setup.execute(stmt)
+        walked = spec_schema_setup.execute(
+            "SELECT name, depth FROM spec_dependencies(?, NULL)", [ids[0]]
+        ).fetchall()
+        assert walked == [(d["name"], d["depth"]) for d in deps]
+
+        # Engine writes drop the adjacency, raw inserts and deletes change its version
+        spec_schema_setup.execute(
+            "DELETE FROM spec_relationships WHERE from_id = ? AND to_id = ?", [ids[2], ids[3]]
+        )
+        assert [d["name"] for d in engine.spec_dependencies(ids[0])] == ["node_1", "node_2"]
+        engine.create_relationship(ids[2], ids[3], "uses")
+        assert [d["name"] for d in engine.spec_dependencies(ids[0])] == [
+            "node_1",
+            "node_2",
+            "node_3",
+        ]
+        spec_schema_setup.execute(
+            "UPDATE spec_relationships SET to_id = ? WHERE from_id = ? AND to_id = ?",
+            [ids[4], ids[2], ids[3]],
+        )
+        engine.invalidate_spec_caches()
+        assert [d["name"] for d in engine.spec_dependencies(ids[0])] == [
+            "node_1",
+            "node_2",
+            "node_4",
+        ]
+        engine.spec_delete(ids[1])
+        assert [d["name"] for d in engine.spec_dependencies(ids[0])] == ["node_2", "node_4"]
+
+    def test_spec_changes_feed_logs_mutations_and_tracks_offsets(self, spec_schema_setup):
+        from agent_farm.spec_engine import SpecEngine
+
+        spec_schema_setup.execute("ATTACH ':memory:' AS lake")
+        spec_schema_setup.execute(
+            """
+            CREATE TABLE lake.spec_changes (
+                origin VARCHAR, seq BIGINT, spec_id INTEGER, kind VARCHAR, name VARCHAR,
+                version VARCHAR, op VARCHAR, changed_at TIMESTAMP
+            )
+            """
+        )
+        engine = SpecEngine(spec_schema_setup)
+        first = engine.spec_create("skill", "feed_a", "A")["id"]
+        engine.spec_bulk_upsert(
+            [
+                {"kind": "skill", "name": "feed_a", "status": "active"},
+                {"kind": "skill", "name": "feed_b", "summary": "B"},
+            ]
+        )
+        engine.spec_delete(first)
+        with pytest.raises(RuntimeError):
+            with engine.batch():
+                engine.spec_update_many([{"id": first + 1, "summary": "rolled back"}])
+                raise RuntimeError("abort")
+
+        batch = engine.read_spec_changes("indexer")
+        ops = [(c["name"], c["op"]) for c in batch["changes"]]
+        assert ops == [
+            ("feed_a", "insert"),
+            ("feed_a", "update"),
+            ("feed_b", "insert"),
+            ("feed_a", "delete"),
+        ]
+        assert batch["offsets"] == {engine.change_origin: batch["changes"][-1]["seq"]}
+
+        # Reading does not advance; acking does, and only forward
+        assert len(engine.read_spec_changes("indexer")["changes"]) == 4
+        engine.ack_spec_changes("indexer", batch["offsets"])
+        engine.ack_spec_changes("indexer", {engine.change_origin: 1})
+        assert engine.read_spec_changes("indexer")["changes"] == []
+        assert len(engine.read_spec_changes("other", limit=2)["changes"]) == 2
+
+        # Committed changes are mirrored to the lake for other processes
+        shared = engine.read_spec_changes("remote", shared=True)
+        assert [(c["name"], c["op"]) for c in shared["changes"]] == ops
+
+        # Commits that log no spec change skip the mirror
+        mirrored = []
+        engine._mirror_spec_changes = lambda: mirrored.append(1) or 0
+        engine.record_usage(first + 1, True)
+        engine.flush_usage()
+        assert mirrored == []
+
+        # A reseed is logged; the origin is the database's own, never another's
+        engine._log_reseed()
+        changes = engine.read_spec_changes("indexer")["changes"]
+        assert [(c["spec_id"], c["op"]) for c in changes] == [(None, "reseed")]
+        other = duckdb.connect(":memory:")
+        other.execute("CREATE TABLE spec_change_log (id INTEGER, log_id UUID DEFAULT uuid())")
+        other.execute("INSERT INTO spec_change_log (id) VALUES (1)")
+        assert SpecEngine(other).change_origin != engine.change_origin
+        other.close()
+
+    def test_vector_index_matches_scan_and_stays_in_sync(self, intelligence_setup):
+        from agent_farm.spec_engine import SpecEngine
+
+        engine = SpecEngine(intelligence_setup)
+        engine._use_numpy_vectors = lambda: False  # index/scan paths without vss
+        for i in range(12):
+            engine.store_embedding(
+                f"doc {i}", [1.0, i / 4, (i % 3) / 2], "doc" if i % 2 else "code"
+            )
+        engine.store_embedding("other model", [0.0, 1.0], "doc", embedding_model="small")
+        engine.store_embedding("other dimension", [0.5, 0.5], "doc")
+
+        query = [1.0, 1.1, 0.4]
+        scan = engine.search_similar(query, k=5)
+        built = engine.build_vector_index("spec_embeddings")
+        assert built["dim"] == 3 and built["rows"] == 12 and built["skipped"] == 1
+        default_table = engine.list_vector_indexes()[0]["vector_table"]
+        assert default_table.startswith("spec_embeddings__vec_default_")
+        assert [r["id"] for r in engine.search_similar(query, k=5)] == [r["id"] for r in scan]
+
+        # Filters over-fetch from the index and fall back to the scan when too few survive
+        docs = engine.search_similar(query, k=2, content_type="doc")
+        assert [r["content_type"] for r in docs] == ["doc", "doc"]
+        assert len(engine.search_similar(query, k=6, content_type="code")) == 6
+        assert engine.search_similar([0.0, 1.0], k=1, embedding_model="small")[0]["content"] == (
+            "other model"
+        )
+
+        # Writes are copied into the vector table; TEMP tables are rebuilt on first use
+        new_id = engine.store_embedding("exact hit", query, "doc")["embedding_id"]
+        assert engine.search_similar(query, k=1)[0]["id"] == new_id
+        intelligence_setup.execute(f"DROP TABLE {default_table}")
+        engine._ready_vector_tables.clear()
+        assert engine.search_similar(query, k=1)[0]["id"] == new_id
+
+        engine.store_org_knowledge("dev", "def parse()", [0.2, 0.9], repo="r", file_path="a.py")
+        assert engine.build_vector_index("knowledge_dev")["rows"] == 1
+        assert engine.search_vectors("knowledge_dev", [0.2, 0.9], k=1)[0]["content"] == (
+            "def parse()"
+        )
+        assert engine.drop_vector_index("knowledge_dev") == {"dropped": True}
+        assert "error" in engine.build_vector_index("knowledge_dev", "small")
+
+    def test_embedding_models_fix_dimension_and_migrate_storage(self, intelligence_setup):
+        from agent_farm.spec_engine import SpecEngine
+
+        engine = SpecEngine(intelligence_setup)
+        engine._use_numpy_vectors = lambda: False
+        intelligence_setup.execute(
+            """
+            INSERT INTO spec_embeddings (id, content_type, content_hash, content, embedding,
+                                         embedding_model)
+            VALUES (101, 'doc', 'h1', 'a', [1, 0, 0], 'legacy'),
+                   (102, 'doc', 'h2', 'b', [0, 1, 0], 'legacy'),
+                   (103, 'doc', 'h3', 'c', [1, 1], 'legacy')
+            """
+        )
+        migrated = engine.migrate_embeddings()
+        assert migrated == {
+            "registered": ["legacy"],
+            "migrated": {"spec_embeddings/legacy": 2},
+            "mismatched": {"spec_embeddings/legacy": 1},
+        }
+        vector_type = intelligence_setup.execute(
+            "SELECT data_type FROM duckdb_columns() "
+            "WHERE table_name LIKE 'spec_embeddings__vec_legacy_%' AND column_name = 'embedding'"
+        ).fetchone()[0]
+        assert vector_type == "FLOAT[3]"
+        with pytest.raises(RuntimeError, match="has dimension 3"):
+            engine.search_similar([1.0, 1.0], embedding_model="legacy")
+
+        assert engine.register_embedding_model("ip-model", 2, "ip") == {
+            "name": "ip-model",
+            "dim": 2,
+            "metric": "ip",
+        }
+        assert "error" in engine.register_embedding_model("ip-model", 3, "ip")
+        bad = engine.store_embedding("x", [1.0, 2.0, 3.0], "doc", embedding_model="ip-model")
+        assert "has dimension 2" in bad["error"]
+        engine.store_embedding("small", [1.0, 0.0], "doc", embedding_model="ip-model")
+        engine.store_embedding("large", [3.0, 0.0], "doc", embedding_model="ip-model")
+
+        # First write only registered the persistent FLOAT[2] index; the first
+        # search builds it. Scores are inner products
+        indexes = engine.list_vector_indexes()
+        tables = [i["vector_table"].rsplit("_", 1)[0] for i in indexes]
+        assert tables == ["spec_embeddings__vec_ip_model", "spec_embeddings__vec_legacy"]
+        assert indexes[0]["row_count"] is None
+        vector_tables = (
+            "SELECT count(*) FROM duckdb_tables() WHERE table_name LIKE 'spec_embeddings__vec_%'"
+        )
+        assert intelligence_setup.execute(vector_tables).fetchone()[0] == 1
+        engine.register_embedding_model("ip_model", 2, "ip")
+        engine.store_embedding("same slug", [0.0, 1.0], "doc", embedding_model="ip_model")
+        assert len({i["vector_table"] for i in engine.list_vector_indexes()}) == 3
+        hits = engine.search_similar([2.0, 0.0], k=2, embedding_model="ip-model")
+        assert [(h["content"], h["similarity"]) for h in hits] == [("large", 6.0), ("small", 2.0)]
+        assert intelligence_setup.execute(vector_tables).fetchone()[0] == 2
+        assert engine.list_vector_indexes()[0]["row_count"] == 2
+        engine.store_embedding("synced", [0.0, 5.0], "doc", embedding_model="ip-model")
+        hits = engine.search_similar([0.0, 1.0], k=1, embedding_model="ip-model")
+        assert hits[0]["content"] == "synced"
+        models = {m["name"]: m for m in engine.list_embedding_models()}
+        assert (models["ip-model"]["vectors"], models["legacy"]["mismatched"]) == (3, 1)
+
+    def test_quantized_search_reranks_binary_and_int8_candidates(self, intelligence_setup):
+        from agent_farm.spec_engine import SpecEngine
+
+        engine = SpecEngine(intelligence_setup)
+        engine._use_numpy_vectors = lambda: False
+        query = [0.9, -0.2, 0.4, 1.0, -0.8, 0.1, 0.3, -0.5]
+        for i in range(40):
+            vector = [((i * 7 + j * 3) % 11 - 5) / 5 for j in range(8)]
+            engine.store_org_knowledge("research", f"finding {i}", vector, query="q")
+            engine.store_embedding(f"doc {i}", vector, "doc" if i % 2 else "code")
+
+        # Off by default: nothing is encoded and quantized search refuses to run
+        encoded = "SELECT source_table, count(*) FROM spec_embedding_quantized GROUP BY 1"
+        assert intelligence_setup.execute(encoded).fetchall() == []
+        with pytest.raises(RuntimeError, match="not enabled for knowledge_research"):
+            engine.search_vectors("knowledge_research", query, 5, quantization="binary")
+        assert engine.enable_quantization("knowledge_research") == {
+            "table": "knowledge_research",
+            "model": "",
+            "quantized": 40,
+        }
+        assert engine.enable_quantization("spec_embeddings", embedding_model="default")[
+            "quantized"
+        ] == 40
+        assert "error" in engine.enable_quantization("knowledge_dev", embedding_model="x")
+
+        bits, i8 = intelligence_setup.execute(
+            "SELECT bits::VARCHAR, i8 FROM spec_embedding_quantized "
+            "WHERE source_table = 'knowledge_research' AND row_id = 1"
+        ).fetchone()
+        assert bits == "00110011" and max(map(abs, i8)) == 127
+
+        # Vectors repeat every 11 rows, so compare scores rather than tied ids
+        exact = [r["similarity"] for r in engine.search_vectors("knowledge_research", query, k=5)]
+        for quantization in ("binary", "int8"):
+            hits = engine.search_vectors("knowledge_research", query, 5, quantization=quantization)
+            assert [r["similarity"] for r in hits] == exact
+        docs = engine.search_similar(query, k=3, content_type="doc", quantization="binary")
+        assert {d["content_type"] for d in docs} == {"doc"}
+        assert [d["similarity"] for d in docs] == [
+            d["similarity"] for d in engine.search_similar(query, k=3, content_type="doc")
+        ]
+
+        # Raw SQL rows are invisible to quantized search until backfilled
+        intelligence_setup.execute(
+            "INSERT INTO knowledge_research (id, query, content, embedding) "
+            "VALUES (999, 'q', 'raw', ?)",
+            [query],
+        )
+        assert engine.search_vectors("knowledge_research", query, 1, quantization="int8")[0][
+            "content"
+        ] != "raw"
+        assert engine.quantize_embeddings() == {
+            "quantized": {"spec_embeddings": 0, "knowledge_research": 1}
+        }
+        assert engine.search_vectors("knowledge_research", query, 1, quantization="int8")[0][
+            "content"
+        ] == "raw"
+        with pytest.raises(RuntimeError, match="Unknown quantization"):
+            engine.search_similar(query, quantization="pq")
+
+        # Opting out drops the encodings; later writes are not encoded
+        assert engine.disable_quantization("knowledge_research")["removed"] == 41
+        engine.store_org_knowledge("research", "late", query, query="q")
+        assert intelligence_setup.execute(encoded).fetchall() == [("spec_embeddings", 40)]
+
+    def test_rrf_search_fuses_keyword_and_vector_rankings(self, spec_schema_setup):
+        from agent_farm.spec_engine import RRF_K, SpecEngine
+
+        engine = SpecEngine(spec_schema_setup)
+        engine._use_numpy_vectors = lambda: False
+        docs = [
+            ("duckdb vector search with duckdb indexes", [0.2, 1.0], "doc"),
+            ("vector math primer", [1.0, 0.0], "doc"),
+            ("duckdb release notes", [0.0, 1.0], "log"),
+            ("gardening tips", [0.9, 0.1], "doc"),
+            ("unrelated vector", [-1.0, 0.0], "doc"),
+        ]
+        ids = [engine.store_embedding(text, vec, kind)["embedding_id"] for text, vec, kind in docs]
+
+        keyword = engine._keyword_ranking("DuckDB vector", 10, None)
+        assert [row_id for row_id, _ in keyword][:1] == [ids[0]]
+        assert {row_id for row_id, _ in keyword} == {ids[0], ids[1], ids[2], ids[4]}
+        engine._trigram_prefilter = lambda *args: None
+        assert engine._keyword_ranking("DuckDB vector", 10, None) == keyword
+
+        results = engine.rrf_search("duckdb vector", [1.0, 0.0], k=3)
+        by_id = {row["id"]: row for row in results}
+        assert len(results) == 3 and results[0]["id"] in (ids[0], ids[1])
+        for row in results:
+            expected = sum(
+                1.0 / (RRF_K + rank)
+                for rank in (row["keyword_rank"], row["vector_rank"])
+                if rank is not None
+            )
+            assert row["rrf_score"] == pytest.approx(expected)
+        assert by_id[ids[1]]["vector_rank"] == 1 and by_id[ids[1]]["content"] == docs[1][0]
+
+        keyword_only = engine.rrf_search("duckdb vector", [1.0, 0.0], k=4, vector_weight=0)
+        assert [row["id"] for row in keyword_only] == [row_id for row_id, _ in keyword]
+        assert [row["id"] for row in engine.rrf_search(None, [1.0, 0.0], k=2)] == [
+            ids[1],
+            ids[3],
+        ]
+        logs = engine.rrf_search("duckdb", [0.0, 1.0], k=5, content_type="log")
+        assert [row["id"] for row in logs] == [ids[2]]
+        assert engine.rrf_search("zzz", None) == []
+
+        # The SQL macro finds keyword matches through the posting lists
+        engine._load_sql_file(os.path.join(SPEC_SQL_DIR, "rag.sql"))
+        macro = spec_schema_setup.execute(
+            "SELECT id, keyword_rank FROM rrf_search_embeddings('DuckDB', [1.0, 0.0], 10) "
+            "WHERE keyword_rank IS NOT NULL ORDER BY keyword_rank"
+        ).fetchall()
+        assert macro == [(ids[0], 1), (ids[2], 2)]
+
+        # The vss macros take their candidates from a persistent index of the dimension
+        search = "SELECT id FROM vss_search_all([1.0, 0.0], 3)"
+        scan = spec_schema_setup.execute(search).fetchall()
+        engine.build_vector_index("spec_embeddings", persistent=True)
+        dims = spec_schema_setup.execute("SELECT vector_ann_dims('spec_embeddings')").fetchone()
+        assert dims == ([2],)
+        assert "__vec_" in spec_schema_setup.execute(f"EXPLAIN {search}").fetchall()[0][1]
+        assert spec_schema_setup.execute(search).fetchall() == scan
+        hybrid = spec_schema_setup.execute(
+            "SELECT id FROM hybrid_search_embeddings('duckdb', [1.0, 0.0], 2, 'doc')"
+        ).fetchall()
+        assert hybrid == [(ids[1],), (ids[3],)]
+
+        # Rows written with plain SQL have no postings yet and are still matched
+        fingerprint = (
+            "SELECT fingerprint = (SELECT concat_ws(':', count(*), sum(id), max(id), "
+            "max(updated_at)::VARCHAR) FROM spec_embeddings) FROM spec_trigram_coverage "
+            "WHERE source = 'spec_embeddings'"
+        )
+        assert spec_schema_setup.execute(fingerprint).fetchone() == (True,)
+        plain = spec_schema_setup.execute(
+            "INSERT INTO spec_embeddings (id, content_type, content, content_hash, embedding) "
+            "SELECT max(id) + 1, 'doc', 'DuckDB is fast', md5('DuckDB is fast'), [0.0, -1.0] "
+            "FROM spec_embeddings "
+            "RETURNING id"
+        ).fetchone()[0]
+        scores = dict(
+            spec_schema_setup.execute(
+                "SELECT id, keyword_score FROM hybrid_search_all('duckdb', [1.0, 0.0], 10)"
+            ).fetchall()
+        )
+        assert scores[plain] == 1.0 and scores[ids[0]] == 1.0
+        assert spec_schema_setup.execute(fingerprint).fetchone() == (False,)
+
+    def test_ingest_path_only_touches_changed_chunks(
+        self, intelligence_setup, tmp_path, monkeypatch
+    ):
+        from agent_farm import spec_engine
+        from agent_farm.spec_engine import SpecEngine, _chunk_lines
+
+        chunks = list(_chunk_lines([f"l{i}\n" for i in range(10)], 4, 1, 100))
+        assert [(start, end) for start, end, _ in chunks] == [(1, 4), (4, 7), (7, 10)]
+
+        engine = SpecEngine(intelligence_setup)
+        embedded = []
+
+        def embed_fn(texts):
+            embedded.extend(texts)
+            return [[float(len(text)), 1.0] for text in texts]
+
+        lines = [f"line {i}\n" for i in range(60)]
+        (tmp_path / "notes.md").write_text("".join(lines), encoding="utf-8")
+        (tmp_path / "blob.bin").write_bytes(b"\0\1\2")
+        (tmp_path / ".git").mkdir()
+        (tmp_path / ".git" / "HEAD").write_text("ref: main\n", encoding="utf-8")
+
+        def ingest():
+            return engine.ingest_path(tmp_path, max_lines=10, overlap=2, embed_fn=embed_fn)
+
+        first = ingest()
+        assert (first["files"], first["ingested"], first["skipped"]) == (2, 1, 1)
+        assert first["embedding"]["embedded"] == first["chunks_added"] == len(embedded)
+        assert ingest() == {
+            "files": 2,
+            "unchanged": 1,
+            "ingested": 0,
+            "removed": 0,
+            "skipped": 1,
+            "unreadable": [],
+            "chunks_added": 0,
+            "chunks_removed": 0,
+        }
+
+        # A line inserted at the top only replaces the first chunk
+        embedded.clear()
+        (tmp_path / "notes.md").write_text("# title\n" + "".join(lines), encoding="utf-8")
+        os.utime(tmp_path / "notes.md", (1, 1))
+        second = ingest()
+        assert (second["chunks_added"], second["chunks_removed"]) == (1, 1)
+        assert len(embedded) == 1 and embedded[0].startswith("# title")
+        rows = intelligence_setup.execute(
+            "SELECT chunk_index, metadata, embedding IS NOT NULL FROM spec_embeddings "
+            "ORDER BY chunk_index"
+        ).fetchall()
+        assert [row[0] for row in rows] == list(range(first["chunks_added"]))
+        assert all(row[2] for row in rows)
+        assert json.loads(rows[-1][1])["end_line"] == 61
+
+        # Identical chunks shifting past a 2048-row vector keep their rows
+        (tmp_path / "same.md").write_text("same\n" * 2100, encoding="utf-8")
+        repeated = dict(max_lines=1, overlap=0, embed=False)
+        assert engine.ingest_path(tmp_path / "same.md", **repeated)["chunks_added"] == 2100
+        (tmp_path / "same.md").write_text("top\n" + "same\n" * 2100, encoding="utf-8")
+        os.utime(tmp_path / "same.md", (1, 1))
+        shifted = engine.ingest_path(tmp_path / "same.md", **repeated)
+        assert (shifted["chunks_added"], shifted["chunks_removed"]) == (1, 0)
+        engine.ingest_path(tmp_path / "same.md", **repeated)
+        (tmp_path / "same.md").unlink()
+
+        # An unreadable file is reported and keeps its chunks; the rest is ingested
+        def locked_open(file, *args, **kwargs):
+            if str(file).endswith("notes.md"):
+                raise PermissionError(13, "Permission denied", str(file))
+            return open(file, *args, **kwargs)
+
+        (tmp_path / "other.md").write_text("other\n", encoding="utf-8")
+        os.utime(tmp_path / "notes.md", (2, 2))
+        monkeypatch.setattr(spec_engine, "open", locked_open, raising=False)
+        partial = ingest()
+        monkeypatch.undo()
+        assert (partial["ingested"], partial["chunks_added"]) == (1, 1)
+        assert partial["unreadable"] == [f"{tmp_path / 'notes.md'}: Permission denied"]
+
+        # A file that turns binary is skipped and loses its chunks
+        (tmp_path / "other.md").write_bytes(b"other\0\n")
+        turned = ingest()
+        assert (turned["skipped"], turned["removed"], turned["chunks_removed"]) == (2, 0, 1)
+        (tmp_path / "other.md").unlink()
+        assert ingest()["chunks_removed"] == 0
+
+        (tmp_path / "notes.md").unlink()
+        assert ingest()["chunks_removed"] == first["chunks_added"]
+        assert intelligence_setup.execute("SELECT count(*) FROM spec_embeddings").fetchone() == (0,)
+
+        outside = engine.ingest_path(tmp_path, org="dev")
+        assert "outside the workspaces" in outside["error"]
+        assert "Unknown org" in engine.ingest_path(tmp_path, org="nope")["error"]
+
+    def test_store_embeddings_bulk_upserts_numpy_batches(self, intelligence_setup):
+        import numpy as np
+
+        from agent_farm.spec_engine import SpecEngine
+
+        engine = SpecEngine(intelligence_setup)
+        vectors = np.arange(12, dtype=np.float32).reshape(3, 4)
+        first = engine.store_embeddings_bulk(
+            ["a", "b", "a"], vectors, metadata=[{"x": 1}, None, None]
+        )
+        assert first["stored"] == 2 and first["ids"][0] == first["ids"][2]
+        # The last duplicate wins
+        row = intelligence_setup.execute(
+            "SELECT embedding, metadata FROM spec_embeddings WHERE content = 'a'"
+        ).fetchone()
+        assert row == ([8.0, 9.0, 10.0, 11.0], None)
+
+        second = engine.store_embeddings_bulk(
+            ["a", "c"], [[1, 2, 3, 4], [5, 6, 7, 8]], chunk_indexes=[0, 1]
+        )
+        assert second["ids"][0] == first["ids"][0]
+        assert intelligence_setup.execute("SELECT count(*) FROM spec_embeddings").fetchone() == (3,)
+        assert intelligence_setup.execute(
+            "SELECT chunk_index FROM spec_embeddings WHERE content = 'c'"
+        ).fetchone() == (1,)
+
+        knowledge = engine.store_org_knowledge_bulk(
+            "ops",
+            ["deploy", "render"],
+            rows=[{"artifact_refs": ["a", "b"], "metrics": {"m": 1}, "duration_ms": 5}, {}],
+        )
+        assert len(knowledge["entry_ids"]) == 2
+        assert intelligence_setup.execute(
+            "SELECT artifact_refs, metrics::VARCHAR, duration_ms FROM knowledge_ops ORDER BY id"
+        ).fetchall() == [(["a", "b"], '{"m": 1}', 5), (None, None, None)]
+
+        engine.enable_quantization("memory_conversations")
+        memory = engine.store_conversation_memory_bulk(
+            "s1", ["user", "assistant"], ["hi", "yo"], np.ones((2, 3)), importance=[0.1, 0.9]
+        )
+        assert len(memory["memory_ids"]) == 2
+        assert intelligence_setup.execute(
+            "SELECT count(*) FROM spec_embedding_quantized "
+            "WHERE source_table = 'memory_conversations'"
+        ).fetchone() == (2,)
+
+        assert "Unknown org" in engine.store_org_knowledge_bulk("nope", ["x"])["error"]
+        engine.register_embedding_model("m3", 3)
+        wrong = engine.store_embeddings_bulk(["q"], np.ones((1, 4)), embedding_model="m3")
+        assert "error" in wrong
+
+    def test_embed_pending_batches_requests_to_a_stub_ollama(
+        self, intelligence_setup, stub_ollama
+    ):
+        from agent_farm.spec_engine import SpecEngine
+
+        def respond(path, body):
+            if "boom" in body["input"]:
+                return 500, None
+            return 200, {"embeddings": [[float(len(t)), 1.0, 0.5] for t in body["input"]]}
+
+        requests = stub_ollama(respond).requests
+        engine = SpecEngine(intelligence_setup)
+        engine.store_embedding("known", [9.0, 9.0, 9.0], "doc", embedding_model="stub")
+        for i, text in enumerate(["alpha", "beta", "alpha", "known", "gamma", "delta"]):
+            intelligence_setup.execute(
+                "INSERT INTO spec_embeddings (id, content_type, content_hash, content) "
+                "VALUES (?, 'doc', ?, ?)",
+                [100 + i, f"raw-{i}", text],
+            )
+
+        result = engine.embed_pending(model="stub", batch_size=2, concurrency=2)
+        assert result == {
+            "rows": 6,
+            "embedded": 5,
+            "reused": 1,
+            "failed": 0,
+            "requests": 2,
+            "last_id": 105,
+        }
+        assert sorted(len(body["input"]) for _, body, _ in requests) == [2, 2]
+        assert {(path, body["model"]) for path, body, _ in requests} == {("/api/embed", "stub")}
+        vectors = dict(
+            intelligence_setup.execute(
+                "SELECT content, embedding FROM spec_embeddings WHERE id >= 100"
+            ).fetchall()
+        )
+        assert vectors["alpha"] == [5.0, 1.0, 0.5] and vectors["known"] == [9.0, 9.0, 9.0]
+
+        # Checkpointed: nothing left; failed rows stay NULL until a restart
+        assert engine.embed_pending(model="stub")["rows"] == 0
+        intelligence_setup.execute(
+            "INSERT INTO knowledge_ops (id, pipeline, content) VALUES (1, 'ci', 'boom'), "
+            "(2, 'ci', 'ok')"
+        )
+        ops = engine.embed_pending("knowledge_ops", "stub", batch_size=1)
+        assert (ops["embedded"], ops["failed"]) == (1, 1)
+        assert engine.embed_pending("knowledge_ops", "stub", restart=True)["failed"] == 1
+        progress = intelligence_setup.execute(
+            "SELECT source_table, last_id, embedded FROM spec_embedding_progress ORDER BY 1"
+        ).fetchall()
+        assert progress == [("knowledge_ops", 1, 1), ("spec_embeddings", 105, 6)]
+
+    def test_embedding_cache_serves_repeated_texts_without_ollama(
+        self, intelligence_setup, monkeypatch, stub_ollama
+    ):
+        from agent_farm import udfs
+        from agent_farm.spec_engine import SpecEngine
+        from agent_farm.udfs import clear_embedding_lru, register_udfs
+
+        requests = []
+
+        def respond(path, body):
+            requests.extend(body["input"])
+            return 200, {"embeddings": [[float(len(text)), 1.0] for text in body["input"]]}
+
+        stub_ollama(respond)
+        clear_embedding_lru()
+        try:
+            con = intelligence_setup
+            engine = SpecEngine(con)
+            register_udfs(con)
+            con.execute("CREATE OR REPLACE MACRO embed(t) AS embed_cached('stub', t)")
+            query = (
+                "SELECT list_cosine_similarity(embed('ab'), embed(doc)) "
+                "FROM (VALUES ('ab'), ('abc'), ('ab')) t(doc)"
+            )
+            first = [row[0] for row in con.execute(query).fetchall()]
+            assert con.execute(query).fetchall() == [(score,) for score in first]
+            assert sorted(requests) == ["ab", "abc"]
+
+            # A fresh process (empty LRU) is served by the table
+            clear_embedding_lru()
+            assert con.execute("SELECT embed('abc')").fetchone()[0] == [3.0, 1.0]
+            stored = engine.store_embedding("ab", None, "doc", embedding_model="stub")
+            assert "error" not in stored and len(requests) == 2
+            engine.store_embedding("given", [7.0, 7.0], "doc", embedding_model="stub")
+            assert con.execute("SELECT embed('given')").fetchone()[0] == [7.0, 7.0]
+            assert len(requests) == 2
+
+            stats = engine.embedding_cache_stats()
+            assert (stats["table_hits"], stats["lru_hits"]) == (2, 1)
+            assert stats["saved_calls"] == 3 and stats["table_entries"] == 3
+            assert stats["table_lifetime_hits"] == 2
+
+            # Table hits on the same key within one query are buffered, not UPDATEd in place
+            monkeypatch.setattr(udfs, "EMBEDDING_LRU_SIZE", 0)
+            clear_embedding_lru()
+            rows = con.execute(
+                "SELECT embed(doc) FROM (VALUES ('abc'), ('abc'), ('given')) t(doc)"
+            ).fetchall()
+            assert rows == [([3.0, 1.0],), ([3.0, 1.0],), ([7.0, 7.0],)] and len(requests) == 2
+            assert engine.embedding_cache_stats()["table_lifetime_hits"] == 5
+            assert engine.evict_embedding_cache(max_rows=1) == {"evicted": 2}
+            assert engine.embedding_cache_stats()["table_entries"] == 1
+        finally:
+            clear_embedding_lru()
+
+    def test_llm_response_cache_answers_repeated_prompts_without_the_model(
+        self, intelligence_setup, monkeypatch, stub_ollama
+    ):
+        from agent_farm import udfs
+
+        prompts = []
+
+        def respond(path, body):
+            prompt = body["messages"][-1]["content"]
+            prompts.append((body["model"], prompt, body.get("options")))
+            return 200, {"message": {"role": "assistant", "content": prompt.upper()}, "done": True}
+
+        stub_ollama(respond)
+        udfs.clear_llm_cache_stats()
+        try:
+            con = intelligence_setup
+            udfs.register_udfs(con)
+            con.execute(
+                "CREATE OR REPLACE MACRO stub(p) AS json_extract_string(llm_chat("
+                "'stub', json_array(json_object('role', 'user', 'content', p))::VARCHAR, "
+                "'[]'), '$.message.content')"
+            )
+            query = "SELECT stub(p) FROM (VALUES ('a'), ('b'), ('a')) t(p)"
+
+            # Opt-in: without LLM_RESPONSE_CACHE every row calls the model
+            assert con.execute(query).fetchall() == [("A",), ("B",), ("A",)]
+            assert len(prompts) == 3
+            monkeypatch.setenv("LLM_RESPONSE_CACHE", "1")
+            assert con.execute(query).fetchall() == [("A",), ("B",), ("A",)]
+            assert con.execute(query).fetchall() == [("A",), ("B",), ("A",)]
+            assert len(prompts) == 5
+
+            # UDFs keep their connection's cache when another connection registers
+            other = duckdb.connect()
+            udfs.register_udfs(other)
+            assert con.execute(query).fetchall() == [("A",), ("B",), ("A",)]
+            assert len(prompts) == 5
+            other.close()
+
+            # Python callers pass their cursor or set a default, registering leaves it
+            # alone; they share the entries and temperature is part of the key
+            assert udfs._llm_cache_connection() is None
+            cursor = con.cursor()
+            messages = [{"role": "user", "content": "a"}]
+            assert udfs.chat_with_model("stub", messages, cache_con=cursor)["content"] == "A"
+            udfs.set_llm_cache_connection(cursor)
+            assert udfs.chat_with_model("stub", messages, temperature=0.0)["content"] == "A"
+            assert prompts[-1] == ("stub", "a", {"temperature": 0.0})
+            assert udfs.chat_with_model("stub", messages, cache=False)["content"] == "A"
+            assert len(prompts) == 7
+
+            stats = udfs.llm_cache_stats(con)
+            assert (stats["hits"], stats["misses"]) == (8, 3)
+            model = stats["models"]["stub"]
+            assert model["hit_rate"] == 0.727 and model["entries"] == 3
+            assert model["lifetime_hits"] == 8 and model["saved_ms"] > 0
+            assert json.loads(con.execute("SELECT llm_cache_stats()").fetchone()[0])["hits"] == 8
+
+            # Expired entries miss and are evicted; size eviction keeps the newest
+            con.execute(
+                "UPDATE llm_response_cache SET expires_at = now() - INTERVAL 1 MINUTE "
+                "WHERE response->>'content' = 'B'"
+            )
+            assert con.execute("SELECT stub('b')").fetchone() == ("B",)
+            assert len(prompts) == 8
+            con.execute("UPDATE llm_response_cache SET expires_at = now() - INTERVAL 1 MINUTE")
+            assert udfs.evict_llm_cache(con) == 3
+            udfs.chat_with_model("stub", messages)
+            udfs.chat_with_model("stub", [{"role": "user", "content": "c"}])
+            assert udfs.evict_llm_cache(con, max_rows=1) == 1
+            assert con.execute("SELECT count(*) FROM llm_response_cache").fetchone() == (1,)
+        finally:
+            udfs.set_llm_cache_connection(None)
+            udfs.clear_llm_cache_stats()